@@ -26,6 +26,22 @@ def create_app(config_class=Config):
     db.init_app(app)
     CORS(app)
     
+    # Журнал недавних публикаций в Redis пополняется после commit строк publication_history
+    from app.utils.publication_ledger import register_ledger_events
+    register_ledger_events()
+    
+    # Кеш пользователей jwt_required: сброс при изменении роли/настроек/удалении
+    from app.utils.auth_cache import register_auth_cache_events
+    register_auth_cache_events()
+    
+    # Счётчики ссылок на файлы фото (photo_blobs) ведутся вместе с изменениями objects.photos_json
+    from app.utils.photo_storage import register_photo_storage_events
+    register_photo_storage_events()
+    
+    # Словарь действий журнала (action_log_actions) пополняется при вставке логов
+    from app.utils.action_log_search import register_action_dictionary_events
+    register_action_dictionary_events()
+    
     # Request logging middleware
     @app.before_request
     def before_request():
@@ -35,6 +51,11 @@ def create_app(config_class=Config):
     def after_request(response):
         return log_response(response)
     
+    # Метрики Prometheus: время запросов по маршрутам, число SQL-запросов и GET /metrics
+    from app.utils.metrics import register_db_query_metrics, register_http_metrics
+    register_http_metrics(app)
+    register_db_query_metrics()
+    
     # Error handler
     @app.errorhandler(Exception)
     def handle_exception(e):
@@ -46,4 +46,86 @@ class Config:
     ADMIN_ID = int(os.environ.get('ADMIN_ID', '0'))
     
     # Token для скачивания логов (используется скриптами, не JWT)
-    LOGS_DOWNLOAD_TOKEN = os.environ.get('LOGS_DOWNLOAD_TOKEN', '')
\ No newline at end of file
+    LOGS_DOWNLOAD_TOKEN = os.environ.get('LOGS_DOWNLOAD_TOKEN', '')
+    
+    # Повторные попытки публикаций через Bot API (см. app/utils/publication_retry.py)
+    PUBLICATION_RETRY_MAX_ATTEMPTS = int(os.environ.get('PUBLICATION_RETRY_MAX_ATTEMPTS', '5'))
+    PUBLICATION_RETRY_BASE_DELAY_SECONDS = int(os.environ.get('PUBLICATION_RETRY_BASE_DELAY_SECONDS', '30'))
+    PUBLICATION_RETRY_MAX_DELAY_SECONDS = int(os.environ.get('PUBLICATION_RETRY_MAX_DELAY_SECONDS', '1800'))  # 30 минут
+    PUBLICATION_RETRY_JITTER_SECONDS = int(os.environ.get('PUBLICATION_RETRY_JITTER_SECONDS', '5'))
+    # 429 не расходует попытки, но подряд идущих переносов по rate limit не больше этого числа
+    PUBLICATION_RETRY_MAX_RATE_LIMITED = int(os.environ.get('PUBLICATION_RETRY_MAX_RATE_LIMITED', '10'))
+    
+    # Аренда задач очередей публикаций (см. app/utils/queue_leases.py):
+    # воркер продлевает аренду heartbeat'ом, просроченные строки возвращает reaper
+    QUEUE_LEASE_SECONDS = int(os.environ.get('QUEUE_LEASE_SECONDS', '120'))
+    
+    # Архивация завершённых строк очередей публикаций (см. app/utils/queue_archive.py):
+    # в горячих таблицах остаются примерно сутки; окно дубликатов (24 часа) читает
+    # publication_history, а не очереди
+    PUBLICATION_ARCHIVE_AFTER_HOURS = int(os.environ.get('PUBLICATION_ARCHIVE_AFTER_HOURS', '24'))
+    PUBLICATION_ARCHIVE_BATCH_SIZE = int(os.environ.get('PUBLICATION_ARCHIVE_BATCH_SIZE', '5000'))
+    PUBLICATION_ARCHIVE_MAX_BATCHES = int(os.environ.get('PUBLICATION_ARCHIVE_MAX_BATCHES', '20'))  # За один запуск задачи
+    
+    # Сколько месячных партиций publication_history держать созданными заранее
+    PUBLICATION_HISTORY_PARTITIONS_AHEAD = int(os.environ.get('PUBLICATION_HISTORY_PARTITIONS_AHEAD', '3'))
+    
+    # Redis (брокер Celery, кеши и служебные структуры приложения)
+    REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    
+    # Журнал недавних публикаций в Redis для проверки дубликатов (см. app/utils/publication_ledger.py)
+    PUBLICATION_DUPLICATE_WINDOW_HOURS = int(os.environ.get('PUBLICATION_DUPLICATE_WINDOW_HOURS', '24'))
+    
+    # Пагинация списков (см. app/utils/pagination.py): TTL кеша COUNT(*) отфильтрованных списков
+    PAGINATION_COUNT_CACHE_SECONDS = int(os.environ.get('PAGINATION_COUNT_CACHE_SECONDS', '60'))
+    
+    # Поток логов SSE (см. app/log_stream_server.py): отдельный asyncio-сервис за nginx.
+    # Если запрос всё же пришёл в gunicorn, слежение ограничено по времени - воркер не занимается навсегда
+    LOG_STREAM_HOST = os.environ.get('LOG_STREAM_HOST', '0.0.0.0')
+    LOG_STREAM_PORT = int(os.environ.get('LOG_STREAM_PORT', '5001'))
+    LOG_STREAM_SYNC_MAX_SECONDS = int(os.environ.get('LOG_STREAM_SYNC_MAX_SECONDS', '25'))
+    
+    # Индекс текстовых логов для запросов по времени и queue/object/user (см. app/utils/log_index.py)
+    LOG_INDEX_BLOCK_BYTES = int(os.environ.get('LOG_INDEX_BLOCK_BYTES', str(64 * 1024)))
+    LOG_QUERY_MAX_RECORDS = int(os.environ.get('LOG_QUERY_MAX_RECORDS', '2000'))
+    
+    # Логирование (см. app/utils/log_pipeline.py): профиль по умолчанию (production/diagnose/trace),
+    # пока он не выбран в админке; период сверки профиля процессами; лимит размера test_*.log
+    LOG_PROFILE = os.environ.get('LOG_PROFILE', 'production')
+    LOG_PROFILE_POLL_SECONDS = int(os.environ.get('LOG_PROFILE_POLL_SECONDS', '15'))
+    TEST_LOG_MAX_BYTES = int(os.environ.get('TEST_LOG_MAX_BYTES', str(20 * 1024 * 1024)))
+    TEST_LOG_BACKUP_COUNT = int(os.environ.get('TEST_LOG_BACKUP_COUNT', '2'))
+    
+    # Метрики Prometheus (см. app/utils/metrics.py): порт HTTP-сервера метрик воркеров Celery,
+    # кеш запроса глубины очередей (один GROUP BY на несколько опросов)
+    METRICS_PORT = int(os.environ.get('METRICS_PORT', '9101'))
+    METRICS_QUEUE_CACHE_SECONDS = int(os.environ.get('METRICS_QUEUE_CACHE_SECONDS', '15'))
+    
+    # Трассы публикаций по этапам (см. app/utils/publication_trace.py): хранение в publication_traces
+    # и необязательный экспорт в OTLP/HTTP коллектор (например http://otel-collector:4318/v1/traces)
+    PUBLICATION_TRACE_ENABLED = os.environ.get('PUBLICATION_TRACE_ENABLED', 'true').lower() == 'true'
+    PUBLICATION_TRACE_RETENTION_DAYS = int(os.environ.get('PUBLICATION_TRACE_RETENTION_DAYS', '14'))
+    PUBLICATION_TRACE_OTLP_ENDPOINT = os.environ.get('PUBLICATION_TRACE_OTLP_ENDPOINT', '')
+    PUBLICATION_TRACE_SERVICE_NAME = os.environ.get('PUBLICATION_TRACE_SERVICE_NAME', 'realty-publisher')
+    
+    # Нагрузочный стенд (см. loadtest/): TELETHON_SENDER=stub подменяет клиент Telethon
+    # заглушкой app/utils/telethon/telethon_stub.py, которая отправляет "сообщения" в TELETHON_STUB_URL
+    TELETHON_SENDER = os.environ.get('TELETHON_SENDER', 'telethon')
+    TELETHON_STUB_URL = os.environ.get('TELETHON_STUB_URL', 'http://127.0.0.1:8081').rstrip('/')
+    
+    # Кеш пользователей в jwt_required (см. app/utils/auth_cache.py): LRU на процесс,
+    # сброс через Redis pub/sub; TTL ограничивает устаревание при пропущенной инвалидации
+    AUTH_USER_CACHE_SECONDS = int(os.environ.get('AUTH_USER_CACHE_SECONDS', '60'))
+    AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE', '1024'))
+    
+    # Варианты фото объектов (см. app/utils/photos.py): JPEG для Telegram и WebP-миниатюра для веба
+    PHOTO_TELEGRAM_MAX_SIDE = int(os.environ.get('PHOTO_TELEGRAM_MAX_SIDE', '1280'))
+    PHOTO_TELEGRAM_QUALITY = int(os.environ.get('PHOTO_TELEGRAM_QUALITY', '85'))
+    PHOTO_THUMB_MAX_SIDE = int(os.environ.get('PHOTO_THUMB_MAX_SIDE', '400'))
+    PHOTO_THUMB_QUALITY = int(os.environ.get('PHOTO_THUMB_QUALITY', '72'))
+    PHOTO_MAX_PIXELS = int(os.environ.get('PHOTO_MAX_PIXELS', str(80 * 1000 * 1000)))
+    
+    # Хранилище фото по SHA-256 (см. app/utils/photo_storage.py): файлы без ссылок удаляются
+    # сборщиком мусора через PHOTO_GC_GRACE_HOURS, не больше PHOTO_GC_BATCH_SIZE за запуск
+    PHOTO_GC_GRACE_HOURS = int(os.environ.get('PHOTO_GC_GRACE_HOURS', '72'))
+    PHOTO_GC_BATCH_SIZE = int(os.environ.get('PHOTO_GC_BATCH_SIZE', '5000'))
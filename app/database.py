@@ -1,11 +1,14 @@
 """
 Database configuration and initialization
 """
+import logging
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.pool import NullPool
 
 db = SQLAlchemy()
+logger = logging.getLogger(__name__)
 
 
 def init_db():
@@ -14,5 +17,28 @@ def init_db():
         User, Object, TelegramAccount, Chat, PublicationQueue,
         PublicationHistory, ActionLog, Statistics, BotWebCode, SystemSetting
     )
+    # Расширения, от которых зависят индексы моделей (триграммный поиск объектов и логов)
+    with db.engine.begin() as connection:
+        connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
     db.create_all()
+    ensure_current_history_partitions()
+
+
+def ensure_current_history_partitions():
+    """
+    Партиции publication_history текущего и следующего месяца
+    Логика: create_all создаёт партиционированную таблицу без партиций и без DEFAULT -
+    до ночной задачи ensure_publication_history_partitions любая запись истории падала бы.
+    init_db выполняется при старте веба, бота и воркеров, поэтому партиции есть сразу.
+    """
+    from app.utils.partitioning import add_months, ensure_monthly_partitions, is_partitioned
+
+    now = datetime.utcnow()
+    try:
+        with db.engine.begin() as connection:
+            if is_partitioned(connection, 'publication_history'):
+                ensure_monthly_partitions(connection, 'publication_history', now, add_months(now, 1))
+    except Exception as e:
+        # Параллельный старт процессов: партицию мог успеть создать соседний процесс
+        logger.warning(f"Could not ensure publication_history partitions: {e}")
 
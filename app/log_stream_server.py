@@ -0,0 +1,213 @@
+"""
+Асинхронный сервер SSE-потока логов (отдельный сервис log_stream)
+Логика: nginx направляет /api/logs/stream и /system/logs-viewer/*/stream сюда, а не
+в gunicorn: открытая вкладка администратора держит только корутину в asyncio-цикле,
+а не синхронный воркер web. Хвост файла читается блоками с конца, новые строки
+приходят по inotify (app/utils/log_tail.py). Проверка JWT и роли администратора -
+как в app.routes.logs_viewer.stream_logs, в пуле потоков, чтобы не блокировать цикл.
+
+Запуск: python -m app.log_stream_server
+"""
+import asyncio
+import json
+import logging
+import os
+from urllib.parse import urlsplit, parse_qs
+from app import app
+from app.config import Config
+from app.utils.log_tail import (
+    STREAM_LOG_FILES, LineFilter, LogFollower, tail_lines,
+    position_from_event_id, position_to_event_id, sse_event
+)
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATHS = ('/api/logs/stream', '/system/logs-viewer/stream', '/system/logs-viewer/legacy/stream')
+
+_MAX_HEADER_LINES = 100
+_HEARTBEAT_SECONDS = 15
+_MAX_TAIL_LINES = 5000
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden',
+            404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class _QueryArgs(dict):
+    """Параметры запроса с интерфейсом request.args.get (для LineFilter.from_args)"""
+
+    def get(self, key, default=None, type=None):
+        values = super().get(key)
+        if not values:
+            return default
+        if type is None:
+            return values[0]
+        try:
+            return type(values[0])
+        except ValueError:
+            return default
+
+
+def _authorize(token: str) -> int:
+    """HTTP-статус проверки токена: 200 - администратор"""
+    from app.utils.jwt import verify_token
+    from app.models.user import User
+    if not token:
+        return 401
+    with app.app_context():
+        try:
+            payload = verify_token(token)
+            if not payload:
+                return 401
+            user = User.query.get(payload.get('user_id'))
+            if not user or user.web_role != 'admin':
+                return 403
+            return 200
+        except Exception as e:
+            logger.error(f"Auth error in log stream: {e}")
+            return 401
+
+
+async def _read_request(reader):
+    request_line = (await reader.readline()).decode('latin-1').strip()
+    parts = request_line.split(' ')
+    if len(parts) != 3:
+        return None, None, {}
+    headers = {}
+    for _ in range(_MAX_HEADER_LINES):
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return parts[0], parts[1], headers
+
+
+async def _send_head(writer, status: int):
+    writer.write(
+        (
+            f'HTTP/1.1 {status} {_REASONS.get(status, "Error")}\r\n'
+            'Content-Type: text/event-stream; charset=utf-8\r\n'
+            'Cache-Control: no-cache\r\n'
+            'X-Accel-Buffering: no\r\n'
+            'Connection: close\r\n'
+            '\r\n'
+        ).encode('utf-8')
+    )
+    await writer.drain()
+
+
+async def _send_error(writer, status: int, message: str):
+    await _send_head(writer, status)
+    writer.write(sse_event(json.dumps({'error': message})).encode('utf-8'))
+    await writer.drain()
+
+
+async def _follow(writer, follower: LogFollower):
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    fd = follower.fileno()
+    if fd is not None:
+        loop.add_reader(fd, changed.set)
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    changed.wait(), timeout=_HEARTBEAT_SECONDS if fd is not None else follower.poll_interval
+                )
+                timed_out = False
+            except asyncio.TimeoutError:
+                timed_out = True
+            changed.clear()
+            if fd is not None and not timed_out and not follower.read_events():
+                continue
+
+            lines = follower.read_new()
+            if timed_out:
+                lines.extend(follower.flush_filtered())
+            if lines:
+                event_id = position_to_event_id(follower.position)
+                writer.write(''.join(
+                    sse_event(json.dumps({'line': line}), event_id) for line in lines
+                ).encode('utf-8'))
+            elif timed_out and fd is not None:
+                # Комментарий SSE: держит соединение через nginx и обнаруживает закрытую вкладку
+                writer.write(b': ping\n\n')
+            await writer.drain()
+    finally:
+        if fd is not None:
+            loop.remove_reader(fd)
+
+
+async def handle_client(reader, writer):
+    try:
+        method, target, headers = await _read_request(reader)
+        if method is None:
+            return
+        url = urlsplit(target)
+        if url.path == '/health':
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nhealthy\n')
+            await writer.drain()
+            return
+        if url.path.rstrip('/') not in STREAM_PATHS:
+            await _send_error(writer, 404, 'Not Found')
+            return
+        if method != 'GET':
+            await _send_error(writer, 405, 'Method Not Allowed')
+            return
+
+        args = _QueryArgs(parse_qs(url.query))
+        token = args.get('token') or headers.get('authorization', '').replace('Bearer ', '')
+        status = await asyncio.to_thread(_authorize, token)
+        if status != 200:
+            await _send_error(writer, status, 'Forbidden' if status == 403 else 'Unauthorized')
+            return
+
+        log_type = args.get('type', 'app')
+        count = min(max(args.get('lines', 100, type=int), 0), _MAX_TAIL_LINES)
+        try:
+            line_filter = LineFilter.from_args(args)
+        except ValueError as e:
+            await _send_error(writer, 400, str(e))
+            return
+
+        filename = STREAM_LOG_FILES.get(log_type)
+        log_file = os.path.join(Config.LOG_FOLDER, filename) if filename else None
+        if not log_file or not os.path.exists(log_file):
+            await _send_error(writer, 200, 'Log file not found')
+            return
+
+        await _send_head(writer, 200)
+        writer.write(b'retry: 3000\n\n')
+
+        # Переподключение EventSource: продолжаем с Last-Event-ID без повторной выдачи хвоста
+        position = position_from_event_id(headers.get('last-event-id') or args.get('last_event_id'))
+        if position is None:
+            lines, position = await asyncio.to_thread(tail_lines, log_file, count, line_filter)
+            event_id = position_to_event_id(position)
+            writer.write(''.join(
+                sse_event(json.dumps({'line': line}), event_id) for line in lines
+            ).encode('utf-8'))
+            await writer.drain()
+
+        follower = LogFollower(log_file, position, line_filter)
+        try:
+            await _follow(writer, follower)
+        finally:
+            follower.close()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    except Exception as e:
+        logger.error(f"Log stream error: {e}", exc_info=True)
+    finally:
+        writer.close()
+
+
+async def main():
+    server = await asyncio.start_server(handle_client, Config.LOG_STREAM_HOST, Config.LOG_STREAM_PORT)
+    logger.info(f"Log stream server listening on {Config.LOG_STREAM_HOST}:{Config.LOG_STREAM_PORT}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -3,11 +3,14 @@ Database models
 """
 from app.models.user import User
 from app.models.object import Object
+from app.models.object_id_sequence import ObjectIdSequence
+from app.models.id_prefix import IdPrefix
 from app.models.telegram_account import TelegramAccount
 from app.models.chat import Chat
 from app.models.publication_queue import PublicationQueue
 from app.models.publication_history import PublicationHistory
 from app.models.action_log import ActionLog
+from app.models.action_log_action import ActionLogAction
 from app.models.statistics import Statistics
 from app.models.bot_web_code import BotWebCode
 from app.models.system_setting import SystemSetting
@@ -17,16 +20,22 @@ from app.models.chat_group import ChatGroup
 from app.models.chat_subscription_task import ChatSubscriptionTask
 from app.models.account_publication_queue import AccountPublicationQueue
 from app.models.telegram_account_chat import TelegramAccountChat
+from app.models.publication_queue_archive import PublicationQueueArchive, AccountPublicationQueueArchive
+from app.models.publication_trace import PublicationTrace
+from app.models.photo_blob import PhotoBlob
 
 __all__ = [
     'User',
     'Object',
+    'ObjectIdSequence',
+    'IdPrefix',
     'TelegramAccount',
     'Chat',
     'PublicationQueue',
     'AccountPublicationQueue',
     'PublicationHistory',
     'ActionLog',
+    'ActionLogAction',
     'Statistics',
     'BotWebCode',
     'SystemSetting',
@@ -35,5 +44,9 @@ __all__ = [
     'ChatGroup',
     'ChatSubscriptionTask',
     'TelegramAccountChat',
+    'PublicationQueueArchive',
+    'AccountPublicationQueueArchive',
+    'PublicationTrace',
+    'PhotoBlob',
 ]
 
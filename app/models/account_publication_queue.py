@@ -3,7 +3,7 @@ AccountPublicationQueue model - Очереди публикаций для Teleg
 """
 from app.database import db
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import relationship
 
 
@@ -19,12 +19,35 @@ class AccountPublicationQueue(db.Model):
     status = Column(String(20), default='pending', nullable=False)  # pending/processing/completed/failed/retrying/flood_wait
     scheduled_time = Column(DateTime, nullable=False, index=True)  # Время публикации (UTC)
     started_at = Column(DateTime, nullable=True)
+    lease_until = Column(DateTime, nullable=True)  # До какого момента строка принадлежит воркеру (см. app/utils/queue_leases.py)
+    worker_id = Column(String(100), nullable=True)  # host:pid воркера, взявшего строку
     completed_at = Column(DateTime, nullable=True)
     attempts = Column(Integer, default=0, nullable=False)
     error_message = Column(Text, nullable=True)
     message_id = Column(String(50), nullable=True)  # Telegram message ID
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
+    # Индексы под форму горячих запросов (миграции add_queue_leases, add_query_shaped_indexes)
+    __table_args__ = (
+        # process_account_autopublish: account_id = ? AND status = 'pending' AND scheduled_time <= now ORDER BY scheduled_time
+        Index(
+            'ix_account_publication_queues_pending_account',
+            'account_id', 'scheduled_time',
+            postgresql_where=text("status = 'pending'")
+        ),
+        # Счётчики готовых задач (мониторинг, process_account_autopublish): status = 'pending' AND scheduled_time <= now
+        Index(
+            'ix_account_publication_queues_pending_scheduled',
+            'scheduled_time',
+            postgresql_where=text("status = 'pending'")
+        ),
+        Index(
+            'ix_account_publication_queues_processing_lease_until',
+            'lease_until',
+            postgresql_where=text("status = 'processing'")
+        ),
+    )
+    
     # Relationships
     object = relationship('Object', back_populates='account_publication_queues')
     chat = relationship('Chat', back_populates='account_publication_queues')
@@ -45,6 +68,8 @@ class AccountPublicationQueue(db.Model):
             'status': self.status,
             'scheduled_time': self.scheduled_time.isoformat() if self.scheduled_time else None,
             'started_at': self.started_at.isoformat() if self.started_at else None,
+            'lease_until': self.lease_until.isoformat() if self.lease_until else None,
+            'worker_id': self.worker_id,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
             'attempts': self.attempts,
             'error_message': self.error_message,
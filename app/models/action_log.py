@@ -3,7 +3,8 @@ ActionLog model - Логи действий
 """
 from app.database import db
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
 
@@ -14,11 +15,25 @@ class ActionLog(db.Model):
     log_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.user_id'), nullable=True, index=True)
     action = Column(String(100), nullable=False, index=True)
-    details_json = Column(JSON, nullable=True)
+    details_json = Column(JSONB, nullable=True)  # JSONB: фильтры details_json @> {...} идут по GIN-индексу
     ip_address = Column(String(45), nullable=True)
     user_agent = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     
+    # Поиск и фильтры журнала (app/utils/action_log_search.py): ILIKE/префикс по action,
+    # ip_address, user_agent - триграммы pg_trgm; details - jsonb_path_ops; пользователь + период
+    __table_args__ = (
+        Index('ix_action_logs_action_trgm', 'action', postgresql_using='gin',
+              postgresql_ops={'action': 'gin_trgm_ops'}),
+        Index('ix_action_logs_ip_address_trgm', 'ip_address', postgresql_using='gin',
+              postgresql_ops={'ip_address': 'gin_trgm_ops'}),
+        Index('ix_action_logs_user_agent_trgm', 'user_agent', postgresql_using='gin',
+              postgresql_ops={'user_agent': 'gin_trgm_ops'}),
+        Index('ix_action_logs_details_json', 'details_json', postgresql_using='gin',
+              postgresql_ops={'details_json': 'jsonb_path_ops'}),
+        Index('ix_action_logs_user_created', 'user_id', 'created_at'),
+    )
+    
     # Relationships
     user = relationship('User', back_populates='action_logs')
     
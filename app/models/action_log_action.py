@@ -0,0 +1,27 @@
+"""
+ActionLogAction model - Словарь действий журнала
+Логика: по строке на каждое встреченное значение action_logs.action; пополняется
+автоматически при вставке логов (app/utils/action_log_search.py), поэтому список
+действий для фильтров не требует SELECT DISTINCT по всей action_logs.
+"""
+from app.database import db
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime
+
+
+class ActionLogAction(db.Model):
+    """ActionLogAction model - Уникальные действия журнала"""
+    __tablename__ = 'action_log_actions'
+    
+    action = Column(String(100), primary_key=True)
+    first_seen_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<ActionLogAction {self.action}>'
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'action': self.action,
+            'first_seen_at': self.first_seen_at.isoformat() if self.first_seen_at else None,
+        }
@@ -0,0 +1,22 @@
+"""
+IdPrefix model - Реестр префиксов ID объектов
+Логика: каждый префикс (три заглавные кириллические буквы) занят не более одного раза
+и закреплён за пользователем; дублирует users.settings_json['id_prefix'] ради уникального
+индекса и выдачи свободного префикса одним запросом (app/utils/id_prefixes.py).
+Префиксы без пользователя (WEB, префиксы удалённых пользователей) остаются занятыми.
+"""
+from app.database import db
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+
+
+class IdPrefix(db.Model):
+    """IdPrefix model - Занятый префикс ID объектов"""
+    __tablename__ = 'id_prefixes'
+    
+    prefix = Column(String(20), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.user_id', ondelete='SET NULL'), nullable=True, unique=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<IdPrefix {self.prefix} (user: {self.user_id})>'
@@ -3,8 +3,19 @@ Object model - Объекты недвижимости
 """
 from app.database import db
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Float, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Float, Boolean, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
+
+
+# Поисковый вектор объекта (русская морфология): адрес и ЖК - вес A, районы - B, комментарий - C.
+# Выражение generated-колонки должно совпадать с миграцией add_object_search (там же вариант для jsonb)
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(address, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(residential_complex, '')), 'A') || "
+    "setweight(json_to_tsvector('russian', coalesce(districts_json, '[]'::json), '[\"string\"]'), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(comment, '')), 'C')"
+)
 
 
 class Object(db.Model):
@@ -35,6 +46,18 @@ class Object(db.Model):
     publication_date = Column(DateTime, nullable=True)
     creation_date = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Вычисляется PostgreSQL (GENERATED ALWAYS ... STORED); deferred - не читается обычными выборками
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
+    
+    # Поиск объектов (app/utils/object_search.py): полнотекстовый по search_vector,
+    # подстрочный (ILIKE) по object_id и address через триграммы pg_trgm
+    __table_args__ = (
+        Index('ix_objects_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_objects_object_id_trgm', 'object_id', postgresql_using='gin',
+              postgresql_ops={'object_id': 'gin_trgm_ops'}),
+        Index('ix_objects_address_trgm', 'address', postgresql_using='gin',
+              postgresql_ops={'address': 'gin_trgm_ops'}),
+    )
     
     # Relationships
     user = relationship('User', back_populates='objects')
@@ -0,0 +1,18 @@
+"""
+ObjectIdSequence model - Счётчики номеров объектов по префиксу
+Логика: object_id = префикс пользователя + номер; следующий номер выдаётся атомарным
+UPDATE ... RETURNING по строке префикса (app/utils/object_ids.py), без поиска по objects.
+"""
+from app.database import db
+from sqlalchemy import Column, Integer, String
+
+
+class ObjectIdSequence(db.Model):
+    """ObjectIdSequence model - Следующий свободный номер объекта для префикса"""
+    __tablename__ = 'object_id_sequences'
+    
+    prefix = Column(String(20), primary_key=True)
+    next_value = Column(Integer, nullable=False, default=1)
+    
+    def __repr__(self):
+        return f'<ObjectIdSequence {self.prefix}: {self.next_value}>'
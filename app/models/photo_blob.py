@@ -0,0 +1,31 @@
+"""
+PhotoBlob model - Файл фото в контентно-адресуемом хранилище
+Логика: оригинал хранится один раз по SHA-256 содержимого
+(UPLOAD_FOLDER/ab/cd/<sha256>.<ext>, варианты рядом - <sha256>.tg.jpg, <sha256>.thumb.webp);
+ref_count - число объектов, в photos_json которых есть этот файл. Счётчик ведут
+ORM-события Object в той же транзакции (app/utils/photo_storage.py); файлы с нулевым
+счётчиком удаляются задачей collect_photo_garbage через PHOTO_GC_GRACE_HOURS.
+"""
+from app.database import db
+from datetime import datetime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Index, text
+
+
+class PhotoBlob(db.Model):
+    """PhotoBlob model - Уникальный файл фото"""
+    __tablename__ = 'photo_blobs'
+
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String(255), nullable=False)  # Путь оригинала как в photos_json (uploads/ab/cd/<sha256>.jpg)
+    size_bytes = Column(BigInteger, nullable=False, default=0)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    unreferenced_since = Column(DateTime, nullable=True)  # Когда счётчик стал нулевым (NULL - есть ссылки)
+
+    __table_args__ = (
+        # Кандидаты на удаление для сборщика мусора
+        Index('ix_photo_blobs_unreferenced', 'unreferenced_since', postgresql_where=text('ref_count = 0')),
+    )
+
+    def __repr__(self):
+        return f'<PhotoBlob {self.sha256[:12]} (refs: {self.ref_count})>'
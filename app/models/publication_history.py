@@ -1,9 +1,12 @@
 """
 PublicationHistory model - История публикаций
+Таблица партиционирована по месяцу published_at (миграция partition_publication_history);
+партиции текущего и следующего месяца создаёт init_db при старте процесса,
+будущие заранее создаёт задача ensure_publication_history_partitions.
 """
 from app.database import db
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 
@@ -12,16 +15,31 @@ class PublicationHistory(db.Model):
     __tablename__ = 'publication_history'
     
     history_id = Column(Integer, primary_key=True, autoincrement=True)
-    queue_id = Column(Integer, ForeignKey('publication_queues.queue_id'), nullable=True, index=True)
-    object_id = Column(String(50), ForeignKey('objects.object_id'), nullable=False, index=True)
+    # Без внешнего ключа: завершённые строки очереди переносятся в publication_queues_archive
+    queue_id = Column(Integer, nullable=True, index=True)
+    object_id = Column(String(50), ForeignKey('objects.object_id'), nullable=False)
     chat_id = Column(Integer, ForeignKey('chats.chat_id'), nullable=False, index=True)
     account_id = Column(Integer, ForeignKey('telegram_accounts.account_id'), nullable=True)
-    published_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # Ключ партиционирования: входит в первичный ключ таблицы (требование PostgreSQL)
+    published_at = Column(DateTime, default=datetime.utcnow, nullable=False, primary_key=True)
     message_id = Column(String(50), nullable=True)  # Telegram message ID
     deleted = Column(Boolean, default=False, nullable=False)
     deleted_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
+    __table_args__ = (
+        # Проверка дневного лимита аккаунта: account_id = ? AND published_at >= today AND deleted = false
+        Index('ix_publication_history_account_published', 'account_id', 'published_at'),
+        # Проверка дубликатов (app/utils/duplicate_checker.py): object_id = ? AND chat_id = ? AND published_at >= ?
+        Index('ix_publication_history_object_chat_published', 'object_id', 'chat_id', 'published_at'),
+        # Диапазонные выборки по времени (счётчики, очистка): BRIN крошечный, а published_at растёт монотонно
+        Index('ix_publication_history_published_at_brin', 'published_at', postgresql_using='brin'),
+        {'postgresql_partition_by': 'RANGE (published_at)'},
+    )
+    
+    # Для ORM строка по-прежнему идентифицируется только history_id
+    __mapper_args__ = {'primary_key': [history_id]}
+    
     # Relationships
     object = relationship('Object', back_populates='publication_history')
     chat = relationship('Chat', back_populates='publication_history')
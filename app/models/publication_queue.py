@@ -3,7 +3,7 @@ PublicationQueue model - Очереди публикаций
 """
 from app.database import db
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Index, text
 from sqlalchemy.orm import relationship
 
 
@@ -18,15 +18,36 @@ class PublicationQueue(db.Model):
     user_id = Column(Integer, ForeignKey('users.user_id'), nullable=True, index=True)
     type = Column(String(10), nullable=False)  # bot/user
     mode = Column(String(20), nullable=False)  # immediate/scheduled/autopublish
+    priority = Column(String(20), default='autopublish', server_default='autopublish', nullable=False, index=True)  # interactive/scheduled/autopublish
     status = Column(String(20), default='pending', nullable=False)  # pending/processing/completed/failed/retrying
     scheduled_time = Column(DateTime, nullable=True)
     started_at = Column(DateTime, nullable=True)
+    lease_until = Column(DateTime, nullable=True)  # До какого момента строка принадлежит воркеру (см. app/utils/queue_leases.py)
+    worker_id = Column(String(100), nullable=True)  # host:pid воркера, взявшего строку
     completed_at = Column(DateTime, nullable=True)
     attempts = Column(Integer, default=0, nullable=False)
     error_message = Column(Text, nullable=True)
+    attempt_history_json = Column(JSON, nullable=True)  # [{at, outcome, error, retry_after, delay_seconds}]
     message_id = Column(String(50), nullable=True)  # Telegram message ID
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
+    # Индексы под форму горячих запросов (миграции add_queue_leases, add_query_shaped_indexes).
+    # Частичные: в индекс попадают только pending/processing-строки, а не вся история очереди
+    __table_args__ = (
+        # dispatch_due_publications: priority = ? AND status = 'pending' ORDER BY scheduled_time, created_at
+        Index(
+            'ix_publication_queues_pending_dispatch',
+            'priority', 'scheduled_time', 'created_at',
+            postgresql_where=text("status = 'pending'")
+        ),
+        # reap_expired_leases: status = 'processing' AND lease_until < now
+        Index(
+            'ix_publication_queues_processing_lease_until',
+            'lease_until',
+            postgresql_where=text("status = 'processing'")
+        ),
+    )
+    
     # Relationships
     object = relationship('Object', back_populates='publication_queues')
     chat = relationship('Chat', back_populates='publication_queues')
@@ -46,12 +67,16 @@ class PublicationQueue(db.Model):
             'user_id': self.user_id,
             'type': self.type,
             'mode': self.mode,
+            'priority': self.priority,
             'status': self.status,
             'scheduled_time': self.scheduled_time.isoformat() if self.scheduled_time else None,
             'started_at': self.started_at.isoformat() if self.started_at else None,
+            'lease_until': self.lease_until.isoformat() if self.lease_until else None,
+            'worker_id': self.worker_id,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
             'attempts': self.attempts,
             'error_message': self.error_message,
+            'attempt_history': self.attempt_history_json or [],
             'message_id': self.message_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
         }
@@ -0,0 +1,127 @@
+"""
+Архив очередей публикаций - завершённые строки publication_queues и account_publication_queues
+Логика: горячие таблицы очередей хранят только активные сутки; строки в финальном статусе
+(completed/failed/flood_wait) старше Config.PUBLICATION_ARCHIVE_AFTER_HOURS переносятся сюда
+задачей archive_finished_publication_queues (см. app/utils/queue_archive.py).
+Таблицы партиционированы по месяцу created_at; внешних ключей нет, чтобы удаление
+объектов/чатов не упиралось в архив.
+"""
+from app.database import db
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
+
+
+class PublicationQueueArchive(db.Model):
+    """Архивные строки PublicationQueue (бот)"""
+    __tablename__ = 'publication_queues_archive'
+
+    queue_id = Column(Integer, primary_key=True)
+    object_id = Column(String(50), nullable=False)
+    chat_id = Column(Integer, nullable=False)
+    account_id = Column(Integer, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    type = Column(String(10), nullable=False)
+    mode = Column(String(20), nullable=False)
+    priority = Column(String(20), nullable=False, server_default='autopublish')
+    status = Column(String(20), nullable=False)
+    scheduled_time = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+    worker_id = Column(String(100), nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, server_default='0')
+    error_message = Column(Text, nullable=True)
+    attempt_history_json = Column(JSON, nullable=True)
+    message_id = Column(String(50), nullable=True)
+    # Ключ партиционирования входит в первичный ключ (требование PostgreSQL)
+    created_at = Column(DateTime, primary_key=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index('ix_publication_queues_archive_object_created', 'object_id', 'created_at'),
+        Index('ix_publication_queues_archive_status_created', 'status', 'created_at'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+    def __repr__(self):
+        return f'<PublicationQueueArchive {self.queue_id} (status: {self.status})>'
+
+    def to_dict(self):
+        """Convert to dictionary (те же ключи, что у PublicationQueue.to_dict + archived)"""
+        return {
+            'queue_id': self.queue_id,
+            'object_id': self.object_id,
+            'chat_id': self.chat_id,
+            'account_id': self.account_id,
+            'user_id': self.user_id,
+            'type': self.type,
+            'mode': self.mode,
+            'priority': self.priority,
+            'status': self.status,
+            'scheduled_time': self.scheduled_time.isoformat() if self.scheduled_time else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'lease_until': self.lease_until.isoformat() if self.lease_until else None,
+            'worker_id': self.worker_id,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'attempts': self.attempts,
+            'error_message': self.error_message,
+            'attempt_history': self.attempt_history_json or [],
+            'message_id': self.message_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'archived': True,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None,
+        }
+
+
+class AccountPublicationQueueArchive(db.Model):
+    """Архивные строки AccountPublicationQueue (аккаунты)"""
+    __tablename__ = 'account_publication_queues_archive'
+
+    queue_id = Column(Integer, primary_key=True)
+    object_id = Column(String(50), nullable=False)
+    chat_id = Column(Integer, nullable=False)
+    account_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=True)
+    status = Column(String(20), nullable=False)
+    scheduled_time = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+    worker_id = Column(String(100), nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, server_default='0')
+    error_message = Column(Text, nullable=True)
+    message_id = Column(String(50), nullable=True)
+    created_at = Column(DateTime, primary_key=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index('ix_account_publication_queues_archive_object_created', 'object_id', 'created_at'),
+        Index('ix_account_publication_queues_archive_account_created', 'account_id', 'created_at'),
+        Index('ix_account_publication_queues_archive_status_created', 'status', 'created_at'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+    def __repr__(self):
+        return f'<AccountPublicationQueueArchive {self.queue_id} (account: {self.account_id}, status: {self.status})>'
+
+    def to_dict(self):
+        """Convert to dictionary (те же ключи, что у AccountPublicationQueue.to_dict + archived)"""
+        return {
+            'queue_id': self.queue_id,
+            'object_id': self.object_id,
+            'chat_id': self.chat_id,
+            'account_id': self.account_id,
+            'user_id': self.user_id,
+            'status': self.status,
+            'scheduled_time': self.scheduled_time.isoformat() if self.scheduled_time else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'lease_until': self.lease_until.isoformat() if self.lease_until else None,
+            'worker_id': self.worker_id,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'attempts': self.attempts,
+            'error_message': self.error_message,
+            'message_id': self.message_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'archived': True,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None,
+        }
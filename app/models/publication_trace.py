@@ -0,0 +1,55 @@
+"""
+PublicationTrace model - Разбивка времени одной попытки публикации по этапам
+Логика: строка пишется по завершении publish_to_telegram (source='bot') или обработки
+строки в process_account_autopublish (source='account'); stages_json - {этап: мс}
+(см. app/utils/publication_trace.py). Внешних ключей нет: строки очередей архивируются
+и удаляются раньше трасс; хранение ограничено Config.PUBLICATION_TRACE_RETENTION_DAYS.
+"""
+from app.database import db
+from datetime import datetime
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, JSON, Index
+
+
+class PublicationTrace(db.Model):
+    """PublicationTrace model - Трасса попытки публикации"""
+    __tablename__ = 'publication_traces'
+
+    trace_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    source = Column(String(10), nullable=False)  # bot/account
+    queue_id = Column(Integer, nullable=False)
+    object_id = Column(String(50), nullable=True)
+    chat_id = Column(Integer, nullable=True)
+    account_id = Column(Integer, nullable=True)
+    priority = Column(String(20), nullable=True)  # Только для source='bot'
+    outcome = Column(String(20), nullable=False)  # completed/failed/flood_wait/rescheduled/...
+    planned_at = Column(DateTime, nullable=True)  # scheduled_time (или created_at) на момент захвата
+    started_at = Column(DateTime, nullable=False)  # Начало выполнения задачи
+    finished_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    total_ms = Column(Integer, nullable=False)  # От planned_at (или started_at) до finished_at
+    stages_json = Column(JSON, nullable=False)
+
+    __table_args__ = (
+        Index('ix_publication_traces_finished_at', 'finished_at'),
+        Index('ix_publication_traces_source_queue', 'source', 'queue_id'),
+    )
+
+    def __repr__(self):
+        return f'<PublicationTrace {self.trace_id} ({self.source}:{self.queue_id} {self.outcome})>'
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'trace_id': self.trace_id,
+            'source': self.source,
+            'queue_id': self.queue_id,
+            'object_id': self.object_id,
+            'chat_id': self.chat_id,
+            'account_id': self.account_id,
+            'priority': self.priority,
+            'outcome': self.outcome,
+            'planned_at': self.planned_at.isoformat() if self.planned_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'total_ms': self.total_ms,
+            'stages': self.stages_json or {},
+        }
@@ -12,7 +12,8 @@ from app.models.chat_group import ChatGroup
 from app.models.action_log import ActionLog
 from app.utils.decorators import jwt_required, role_required
 from app.utils.logger import log_action, log_error
-from sqlalchemy import func, desc
+from app.utils.queue_leases import expired_lease_filter, reap_expired_leases
+from sqlalchemy import func, desc, or_, and_
 from datetime import datetime, timedelta
 import logging
 
@@ -113,9 +114,15 @@ def admin_account_autopublish_monitor(current_user):
             AccountPublicationQueue.scheduled_time <= now
         ).order_by(AccountPublicationQueue.scheduled_time.asc()).limit(20).all()
 
+        # Зависшие: истекла аренда воркера либо обработка идёт дольше порога из запроса
         stuck_queues = db.session.query(AccountPublicationQueue).filter(
-            AccountPublicationQueue.status == 'processing',
-            AccountPublicationQueue.started_at < stuck_threshold
+            or_(
+                expired_lease_filter(AccountPublicationQueue, now),
+                and_(
+                    AccountPublicationQueue.status == 'processing',
+                    AccountPublicationQueue.started_at < stuck_threshold
+                )
+            )
         ).order_by(AccountPublicationQueue.started_at.asc()).all()
 
         enabled_configs = db.session.query(AutopublishConfig).filter_by(enabled=True).count()
@@ -229,37 +236,24 @@ def admin_account_autopublish_reset_stuck(current_user):
     try:
         now = datetime.utcnow()
         stuck_threshold = now - timedelta(minutes=threshold_minutes)
-        stuck_queues = db.session.query(AccountPublicationQueue).filter(
-            AccountPublicationQueue.status == 'processing',
-            AccountPublicationQueue.started_at < stuck_threshold
-        ).all()
-
-        reset_to_pending = 0
-        marked_failed = 0
-        changed = []
-
-        for q in stuck_queues:
-            q.attempts = (q.attempts or 0) + 1
-            if q.attempts >= max_attempts:
-                q.status = 'failed'
-                q.error_message = q.error_message or 'Task timeout - exceeded processing threshold'
-                marked_failed += 1
-            else:
-                q.status = 'pending'
-                q.started_at = None
-                q.error_message = None
-                reset_to_pending += 1
-
-            changed.append({
-                'queue_id': q.queue_id,
-                'status': q.status,
-                'attempts': q.attempts,
-                'object_id': q.object_id,
-                'account_id': q.account_id,
-                'chat_id': q.chat_id,
-            })
+        # Один UPDATE ... RETURNING вместо цикла по строкам (см. app/utils/queue_leases.py)
+        rows = reap_expired_leases(
+            db.session,
+            AccountPublicationQueue,
+            max_attempts=max_attempts,
+            stuck_before=stuck_threshold
+        )
 
-        db.session.commit()
+        changed = [{
+            'queue_id': row.queue_id,
+            'status': row.status,
+            'attempts': row.attempts,
+            'object_id': row.object_id,
+            'account_id': row.account_id,
+            'chat_id': row.chat_id,
+        } for row in rows]
+        marked_failed = sum(1 for row in rows if row.status == 'failed')
+        reset_to_pending = len(rows) - marked_failed
 
         log_action(
             action='admin_reset_stuck_account_queues',
@@ -267,7 +261,7 @@ def admin_account_autopublish_reset_stuck(current_user):
             details={
                 'threshold_minutes': threshold_minutes,
                 'max_attempts': max_attempts,
-                'total_found': len(stuck_queues),
+                'total_found': len(rows),
                 'reset_to_pending': reset_to_pending,
                 'marked_failed': marked_failed,
             },
@@ -277,7 +271,7 @@ def admin_account_autopublish_reset_stuck(current_user):
             'success': True,
             'threshold_minutes': threshold_minutes,
             'max_attempts': max_attempts,
-            'total_found': len(stuck_queues),
+            'total_found': len(rows),
             'reset_to_pending': reset_to_pending,
             'marked_failed': marked_failed,
             'queues': changed,
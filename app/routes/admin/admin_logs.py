@@ -5,8 +5,13 @@ Admin logs routes
 from flask import Blueprint, request, jsonify, render_template
 from app.models.action_log import ActionLog
 from app.utils.decorators import jwt_required, role_required
+from app.utils.pagination import CursorError, paginate_keyset, paginate_page, estimate_total
+from app.utils.action_log_search import apply_action_log_filters
+from app.utils.log_index import QUERYABLE_LOG_FILES, make_token, normalize_timestamp, query_logs
+from app.config import Config
 from sqlalchemy import desc
 import logging
+import re
 
 admin_logs_bp = Blueprint('admin_logs', __name__)
 logger = logging.getLogger(__name__)
@@ -27,26 +32,85 @@ def admin_logs_data(current_user):
     """Get logs data"""
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 50, type=int)
-    action = request.args.get('action')
-    user_id = request.args.get('user_id', type=int)
+    cursor = request.args.get('cursor')
     
-    query = ActionLog.query
+    # Filters: action, action_prefix, user_id, ip, date_from, date_to, details.<key>, search
+    query = apply_action_log_filters(ActionLog.query, request.args)
     
-    if action:
-        query = query.filter(ActionLog.action == action)
-    if user_id:
-        query = query.filter(ActionLog.user_id == user_id)
+    # Order by date (newest first by default)
+    sort_order = 'asc' if request.args.get('sort_order') == 'asc' else 'desc'
     
-    query = query.order_by(desc(ActionLog.created_at))
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Paginate: keyset by cursor (next_cursor in response) or legacy page/per_page
+    if cursor is not None:
+        try:
+            keyset_page = paginate_keyset(query, ActionLog.created_at, ActionLog.log_id, 'created_at', sort_order,
+                                          per_page=per_page, cursor=cursor)
+        except CursorError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'logs': [log.to_dict() for log in keyset_page.items],
+            'pagination': {
+                'per_page': per_page,
+                'total': estimate_total(query, ActionLog.__tablename__),
+                'next_cursor': keyset_page.next_cursor,
+                'has_more': keyset_page.has_more
+            }
+        })
+    
+    if sort_order == 'desc':
+        query = query.order_by(desc(ActionLog.created_at), desc(ActionLog.log_id))
+    else:
+        query = query.order_by(ActionLog.created_at.asc(), ActionLog.log_id.asc())
+    pagination = paginate_page(query, ActionLog.__tablename__, page, per_page)
     
     return jsonify({
-        'logs': [log.to_dict() for log in pagination.items],
+        'logs': [log.to_dict() for log in pagination['items']],
         'pagination': {
             'page': page,
             'per_page': per_page,
-            'total': pagination.total,
-            'pages': pagination.pages
+            'total': pagination['total'],
+            'pages': pagination['pages']
         }
     })
 
+
+@admin_logs_bp.route('/dashboard/logs/files/query', methods=['GET'])
+@jwt_required
+@role_required('admin')
+def admin_log_files_query(current_user):
+    """
+    Поиск по текстовым логам (включая сжатые ротации) через индекс app/utils/log_index.py
+    Параметры: files=app,errors (по умолчанию app), from/to (ISO, время как в файлах),
+    queue_id, object_id, user_id, grep (regex), limit
+    """
+    log_types = [name.strip() for name in (request.args.get('files') or 'app').split(',') if name.strip()]
+    unknown = [name for name in log_types if name not in QUERYABLE_LOG_FILES]
+    if unknown:
+        return jsonify({'error': f'Unknown log files: {", ".join(unknown)}',
+                        'available': list(QUERYABLE_LOG_FILES.keys())}), 400
+    
+    since = normalize_timestamp(request.args.get('from'))
+    until = normalize_timestamp(request.args.get('to'))
+    if (request.args.get('from') and not since) or (request.args.get('to') and not until):
+        return jsonify({'error': 'Invalid from/to, expected ISO datetime'}), 400
+    
+    tokens = [
+        make_token(kind, request.args.get(f'{kind}_id'))
+        for kind in ('queue', 'object', 'user')
+        if request.args.get(f'{kind}_id')
+    ]
+    
+    pattern = None
+    if request.args.get('grep'):
+        try:
+            pattern = re.compile(request.args.get('grep'))
+        except re.error as e:
+            return jsonify({'error': f'Invalid grep pattern: {e}'}), 400
+    
+    # Без времени и токенов пришлось бы читать все ротации целиком
+    if not since and not until and not tokens:
+        return jsonify({'error': 'Specify from/to or queue_id/object_id/user_id'}), 400
+    
+    limit = min(max(request.args.get('limit', 500, type=int), 1), Config.LOG_QUERY_MAX_RECORDS)
+    result = query_logs(log_types, since=since, until=until, tokens=tokens, pattern=pattern, limit=limit)
+    return jsonify(result)
@@ -11,7 +11,12 @@ from app.models.chat import Chat
 from app.models.telegram_account import TelegramAccount
 from app.models.user import User
 from app.utils.decorators import jwt_required, role_required
-from sqlalchemy import desc
+from app.utils.publication_priority import get_priority_latency_stats
+from app.utils.publication_trace import get_stage_latency_stats
+from app.models.publication_trace import PublicationTrace
+from app.utils.queue_archive import archive_model_for, fetch_with_archive, queue_sort_key
+from app.utils.pagination import CursorError, decode_cursor, encode_cursor, keyset_filter, estimate_total
+from sqlalchemy import literal
 import logging
 
 admin_publication_queues_bp = Blueprint('admin_publication_queues', __name__)
@@ -42,8 +47,9 @@ def _format_bot_queue(queue):
         'phone': account.phone if account else None,
     } if account else None
     
-    if queue.user:
-        user = queue.user
+    # Через user_id, а не relationship: у архивных строк связей нет
+    user = User.query.get(queue.user_id) if queue.user_id else None
+    if user:
         queue_dict['user'] = {
             'user_id': user.user_id,
             'username': user.username,
@@ -86,66 +92,183 @@ def _format_account_queue(queue):
     return queue_dict
 
 
+# Источники списка очередей: (модель, форматтер, ранг). Ранг разделяет строки бота и аккаунтов
+# с одинаковым created_at в общем порядке (created_at, ранг, queue_id) и входит в курсор
+_QUEUE_SOURCES = {
+    'bot': (PublicationQueue, _format_bot_queue, 1),
+    'account': (AccountPublicationQueue, _format_account_queue, 0),
+}
+
+
+def _queue_source_queries(source, queue_type, status):
+    """Отфильтрованные запросы к горячей и архивной части источника"""
+    model, _, _ = _QUEUE_SOURCES[source]
+    query = model.query
+    archive_query = archive_model_for(model).query
+    
+    if source == 'bot' and queue_type == 'bot':
+        query = query.filter_by(type='bot')
+        archive_query = archive_query.filter_by(type='bot')
+    
+    if status != 'all':
+        query = query.filter_by(status=status)
+        archive_query = archive_query.filter_by(status=status)
+    
+    return query, archive_query
+
+
 @admin_publication_queues_bp.route('/dashboard/publication-queues', methods=['GET'])
 @jwt_required
 @role_required('admin')
 def admin_publication_queues_data(current_user):
-    """Get publication queues data (both PublicationQueue and AccountPublicationQueue)"""
+    """
+    Get publication queues data (both PublicationQueue and AccountPublicationQueue)
+    Пагинация: с параметром cursor - keyset по (created_at, тип очереди, queue_id), ответ содержит
+    next_cursor; иначе limit/offset. total - оценка (pg_class.reltuples или кешированный COUNT)
+    """
     queue_type = request.args.get('type', 'all')  # 'bot', 'account', 'all'
     status = request.args.get('status', 'all')  # 'pending', 'processing', 'completed', 'failed', 'all'
     limit = request.args.get('limit', 100, type=int)
     offset = request.args.get('offset', 0, type=int)
+    cursor = request.args.get('cursor')
+    # Завершённые строки старше суток лежат в *_archive (см. app/utils/queue_archive.py)
+    include_archive = request.args.get('include_archive', 'false').lower() in ('1', 'true', 'yes')
     
     try:
-        queue_data = []
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor, 'created_at', 'desc')
+            except CursorError as e:
+                return jsonify({'error': str(e)}), 400
+            if len(after) != 3:
+                return jsonify({'error': 'Invalid cursor'}), 400
         
-        # Получаем задачи из PublicationQueue (бот)
-        if queue_type in ('all', 'bot'):
-            query = PublicationQueue.query
-            
-            if queue_type == 'bot':
-                query = query.filter_by(type='bot')
-            elif queue_type == 'user':
-                query = query.filter_by(type='user')
-            
-            if status != 'all':
-                query = query.filter_by(status=status)
-            
-            query = query.order_by(desc(PublicationQueue.created_at))
-            queues = query.offset(offset).limit(limit).all()
-            
-            for queue in queues:
-                queue_data.append(_format_bot_queue(queue))
+        # В режиме курсора читаем на строку больше - так видно, есть ли следующая страница
+        window = limit + 1 if cursor is not None else offset + limit
+        rows = []
+        total = 0
         
-        # Получаем задачи из AccountPublicationQueue (аккаунты)
-        if queue_type in ('all', 'account'):
-            query = AccountPublicationQueue.query
+        for source in ('bot', 'account'):
+            if queue_type not in ('all', source):
+                continue
+            model, formatter, rank = _QUEUE_SOURCES[source]
+            archive_model = archive_model_for(model)
+            query, archive_query = _queue_source_queries(source, queue_type, status)
             
-            if status != 'all':
-                query = query.filter_by(status=status)
+            total += estimate_total(query, model.__tablename__)
+            if include_archive:
+                total += estimate_total(archive_query, archive_model.__tablename__)
             
-            query = query.order_by(desc(AccountPublicationQueue.created_at))
-            account_queues = query.offset(offset).limit(limit).all()
+            if after is not None:
+                query = query.filter(keyset_filter([model.created_at, literal(rank), model.queue_id], after, True))
+                archive_query = archive_query.filter(
+                    keyset_filter([archive_model.created_at, literal(rank), archive_model.queue_id], after, True)
+                )
             
-            for queue in account_queues:
-                queue_data.append(_format_account_queue(queue))
-        
-        # Сортируем все очереди по created_at desc
-        queue_data.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+            # Из каждого источника берём window строк: пагинация применяется к объединённому списку
+            queues = fetch_with_archive(query, archive_query, window, 0, include_archive)
+            rows.extend((queue, formatter, rank) for queue in queues)
         
-        # Применяем пагинацию к объединенному списку
-        total = len(queue_data)
-        queue_data = queue_data[offset:offset+limit]
+        # Общий порядок: created_at desc, затем тип очереди и queue_id (как в keyset-условии)
+        rows.sort(key=lambda item: queue_sort_key(item[0])[:2] + (item[2], item[0].queue_id), reverse=True)
         
-        return jsonify({
+        response = {
             'success': True,
-            'queues': queue_data,
             'total': total,
-            'offset': offset,
-            'limit': limit
-        }), 200
+            'limit': limit,
+            'include_archive': include_archive
+        }
+        if cursor is not None:
+            page_rows = rows[:limit]
+            next_cursor = None
+            if len(rows) > limit:
+                last, _, last_rank = page_rows[-1]
+                next_cursor = encode_cursor([last.created_at, last_rank, last.queue_id], 'created_at', 'desc')
+            response['next_cursor'] = next_cursor
+            response['has_more'] = next_cursor is not None
+        else:
+            page_rows = rows[offset:offset + limit]
+            response['offset'] = offset
+        
+        # Форматируем (с запросами к объектам/чатам) только страницу
+        response['queues'] = [formatter(queue) for queue, formatter, _ in page_rows]
+        return jsonify(response), 200
         
     except Exception as e:
         logger.error(f"Error getting publication queues: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+
+
+@admin_publication_queues_bp.route('/dashboard/publication-queues/latency', methods=['GET'])
+@jwt_required
+@role_required('admin')
+def admin_publication_queues_latency(current_user):
+    """Сквозная задержка публикаций бота по классам приоритета (interactive/scheduled/autopublish)"""
+    hours = request.args.get('hours', 24, type=int)
+    
+    try:
+        stats = get_priority_latency_stats(db.session, hours=hours)
+        return jsonify({
+            'success': True,
+            'hours': hours,
+            'priorities': stats
+        }), 200
+    except Exception as e:
+        logger.error(f"Error getting publication latency stats: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_publication_queues_bp.route('/dashboard/publication-queues/traces/stats', methods=['GET'])
+@jwt_required
+@role_required('admin')
+def admin_publication_traces_stats(current_user):
+    """
+    Перцентили длительности этапов публикации (queue_wait, pickup, claim, db_load, render,
+    rate_limit_wait, connect, upload, api_call, commit, total) в миллисекундах
+    Параметры: hours, source (bot/account), group_by (stage/account/chat), limit
+    """
+    hours = request.args.get('hours', 24, type=int)
+    source = request.args.get('source') or None
+    group_by = request.args.get('group_by', 'stage')
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    
+    try:
+        groups = get_stage_latency_stats(db.session, hours=hours, source=source, group_by=group_by, limit=limit)
+        return jsonify({
+            'success': True,
+            'hours': hours,
+            'source': source,
+            'group_by': group_by,
+            'groups': groups
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting publication trace stats: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_publication_queues_bp.route('/dashboard/publication-queues/<source>/<int:queue_id>/traces', methods=['GET'])
+@jwt_required
+@role_required('admin')
+def admin_publication_queue_traces(current_user, source, queue_id):
+    """Трассы всех попыток одной строки очереди (source: bot/account) - почему публикация ушла позже плана"""
+    if source not in ('bot', 'account'):
+        return jsonify({'error': 'source must be bot or account'}), 400
+    
+    try:
+        traces = PublicationTrace.query.filter_by(
+            source=source,
+            queue_id=queue_id
+        ).order_by(PublicationTrace.started_at.asc()).all()
+        return jsonify({
+            'success': True,
+            'source': source,
+            'queue_id': queue_id,
+            'traces': [trace.to_dict() for trace in traces]
+        }), 200
+    except Exception as e:
+        logger.error(f"Error getting traces for {source} queue {queue_id}: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
@@ -1,12 +1,13 @@
 """
 Admin settings routes
-Логика: управление системными настройками (дубликаты, обход ограничения времени)
+Логика: управление системными настройками (дубликаты, обход ограничения времени, профиль логирования)
 """
 from flask import Blueprint, request, jsonify
 from app.database import db
 from app.models.system_setting import SystemSetting
 from app.utils.decorators import jwt_required, role_required
 from app.utils.logger import log_action, log_error
+from app.utils.log_pipeline import PROFILES, PROFILE_SETTING_KEY, default_profile, get_pipeline, publish_profile
 import logging
 
 admin_settings_bp = Blueprint('admin_settings', __name__)
@@ -35,6 +36,13 @@ def admin_settings_data(current_user):
         else:
             settings['admin_bypass_time_limit'] = False
         
+        # Профиль логирования (production/diagnose/trace)
+        profile_setting = SystemSetting.query.filter_by(key=PROFILE_SETTING_KEY).first()
+        if profile_setting and isinstance(profile_setting.value_json, dict):
+            settings['logging_profile'] = profile_setting.value_json.get('profile', default_profile())
+        else:
+            settings['logging_profile'] = default_profile()
+        
         return jsonify({
             'success': True,
             'settings': settings
@@ -127,3 +135,66 @@ def admin_settings_bypass_time_limit(current_user):
         log_error(e, 'admin_settings_update_failed', current_user.user_id, {'setting': 'admin_bypass_time_limit'})
         return jsonify({'error': str(e)}), 500
 
+
+@admin_settings_bp.route('/dashboard/settings/logging-profile', methods=['GET'])
+@jwt_required
+@role_required('admin')
+def admin_settings_logging_profile(current_user):
+    """Available logging profiles and the active one"""
+    return jsonify({
+        'success': True,
+        'active': get_pipeline().profile,
+        'profiles': {
+            name: {
+                'description': profile['description'],
+                'sampling': profile['sampling']
+            }
+            for name, profile in PROFILES.items()
+        }
+    })
+
+
+@admin_settings_bp.route('/dashboard/settings/logging-profile', methods=['PUT'])
+@jwt_required
+@role_required('admin')
+def admin_settings_update_logging_profile(current_user):
+    """Switch logging profile for all processes without restart"""
+    try:
+        data = request.get_json() or {}
+        profile = data.get('profile')
+        if profile not in PROFILES:
+            return jsonify({'error': f'Unknown profile, expected one of: {", ".join(PROFILES)}'}), 400
+        
+        setting = SystemSetting.query.filter_by(key=PROFILE_SETTING_KEY).first()
+        if not setting:
+            setting = SystemSetting(
+                key=PROFILE_SETTING_KEY,
+                value_json={'profile': profile},
+                description='Профиль логирования (production/diagnose/trace)',
+                updated_by=current_user.user_id
+            )
+            db.session.add(setting)
+        else:
+            setting.value_json = {'profile': profile}
+            setting.updated_by = current_user.user_id
+        
+        db.session.commit()
+        
+        # Остальные процессы (web, бот, Celery) подхватят профиль за LOG_PROFILE_POLL_SECONDS
+        publish_profile(profile)
+        
+        log_action(
+            action='admin_settings_updated',
+            user_id=current_user.user_id,
+            details={'setting': PROFILE_SETTING_KEY, 'profile': profile}
+        )
+        
+        return jsonify({
+            'success': True,
+            'message': 'Setting updated successfully'
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error updating logging profile: {e}", exc_info=True)
+        log_error(e, 'admin_settings_update_failed', current_user.user_id, {'setting': PROFILE_SETTING_KEY})
+        return jsonify({'error': str(e)}), 500
@@ -12,6 +12,7 @@ from app.models.chat_group import ChatGroup
 from app.models.action_log import ActionLog
 from app.utils.decorators import jwt_required, role_required
 from app.utils.logger import log_action, log_error
+from app.utils.photos import PHOTO_VARIANT_TELEGRAM, photo_full_path, photo_variant_path
 from sqlalchemy import func, desc
 from datetime import datetime, timedelta
 import logging
@@ -77,32 +78,13 @@ def admin_publish_object_to_chat(chat_id, current_user):
             # Берем первое фото (только одно фото разрешено)
             photo_data = photos_json[0]
             
-            # Извлекаем путь к файлу - всегда используем путь к файлу на сервере
-            photo_path = None
-            if isinstance(photo_data, dict):
-                # Если это объект - берем path
-                photo_path = photo_data.get('path', '')
-            elif isinstance(photo_data, str):
-                # Если это строка - это путь к файлу
-                photo_path = photo_data
+            # Путь к файлу на сервере: вариант для Telegram, пока его нет - оригинал
+            photo_path = photo_variant_path(photo_data, PHOTO_VARIANT_TELEGRAM)
             
             # Загружаем файл с сервера и отправляем
             if photo_path:
                 import os
-                from app.config import Config
-                
-                # Используем Config.UPLOAD_FOLDER напрямую
-                # photo_path может быть "uploads/filename.jpg" или просто "filename.jpg"
-                if photo_path.startswith('uploads/'):
-                    # Убираем префикс "uploads/" и используем Config.UPLOAD_FOLDER
-                    filename = photo_path.replace('uploads/', '', 1)
-                    full_path = os.path.join(Config.UPLOAD_FOLDER, filename)
-                elif photo_path.startswith('/'):
-                    # Абсолютный путь
-                    full_path = photo_path
-                else:
-                    # Относительный путь - используем Config.UPLOAD_FOLDER
-                    full_path = os.path.join(Config.UPLOAD_FOLDER, photo_path)
+                full_path = photo_full_path(photo_path)
                 
                 if os.path.exists(full_path):
                     url = f'https://api.telegram.org/bot{BOT_TOKEN}/sendPhoto'
@@ -621,7 +621,7 @@ def admin_fetch_bot_chats(current_user):
     bot_container_name = os.getenv('BOT_CONTAINER_NAME', 'realty_bot')
     
     try:
-        from bot.config import BOT_TOKEN
+        from bot.config import BOT_TOKEN, TELEGRAM_BOT_API_URL
         import requests
         
         # Check if we should stop the bot
@@ -657,7 +657,7 @@ def admin_fetch_bot_chats(current_user):
         
         # First, try to get updates with offset=-1 to check for conflicts
         # This will fail immediately if bot is running
-        test_url = f'https://api.telegram.org/bot{BOT_TOKEN}/getUpdates'
+        test_url = f'{TELEGRAM_BOT_API_URL}/bot{BOT_TOKEN}/getUpdates'
         test_params = {'offset': -1, 'timeout': 1, 'limit': 1}
         
         try:
@@ -684,7 +684,7 @@ def admin_fetch_bot_chats(current_user):
         chats_dict = {}
         
         # Get bot info to get bot user ID
-        bot_info_url = f'https://api.telegram.org/bot{BOT_TOKEN}/getMe'
+        bot_info_url = f'{TELEGRAM_BOT_API_URL}/bot{BOT_TOKEN}/getMe'
         bot_user_id = None
         try:
             bot_info_response = requests.get(bot_info_url, timeout=5)
@@ -696,7 +696,7 @@ def admin_fetch_bot_chats(current_user):
             logger.warning(f"Could not get bot info: {e}")
         
         # Get updates using Telegram API - get ALL updates from history
-        url = f'https://api.telegram.org/bot{BOT_TOKEN}/getUpdates'
+        url = f'{TELEGRAM_BOT_API_URL}/bot{BOT_TOKEN}/getUpdates'
         offset = 0
         max_iterations = 100  # Increased to get more history
         processed_updates = 0
@@ -823,7 +823,7 @@ def admin_fetch_bot_chats(current_user):
         groups_to_check = [c for c in chats_dict.values() if c['type'] in ['group', 'supergroup', 'channel']]
         logger.info(f"Checking admin status for {len(groups_to_check)} groups/supergroups/channels")
         
-        get_chat_member_url = f'https://api.telegram.org/bot{BOT_TOKEN}/getChatMember'
+        get_chat_member_url = f'{TELEGRAM_BOT_API_URL}/bot{BOT_TOKEN}/getChatMember'
         checked_count = 0
         for chat_data in groups_to_check:
             try:
@@ -5,8 +5,10 @@ from flask import Blueprint, request, jsonify
 from app.database import db
 from app.models.action_log import ActionLog
 from app.utils.decorators import jwt_required, role_required
+from app.utils.pagination import CursorError, paginate_keyset, paginate_page, estimate_total
+from app.utils.action_log_search import apply_action_log_filters, list_known_actions
 from datetime import datetime, timedelta
-from sqlalchemy import desc, or_
+from sqlalchemy import desc
 
 logs_bp = Blueprint('logs', __name__)
 
@@ -19,57 +21,44 @@ def list_logs(current_user):
     # Get query parameters
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 50, type=int)
-    action = request.args.get('action')
-    user_id = request.args.get('user_id', type=int)
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
-    search = request.args.get('search')
+    cursor = request.args.get('cursor')
     
-    # Build query
-    query = ActionLog.query
+    # Filters: action, action_prefix, user_id, ip, date_from, date_to, details.<key>, search
+    query = apply_action_log_filters(ActionLog.query, request.args)
     
-    # Apply filters
-    if action:
-        query = query.filter(ActionLog.action == action)
+    # Order by date (newest first by default)
+    sort_order = 'asc' if request.args.get('sort_order') == 'asc' else 'desc'
     
-    if user_id:
-        query = query.filter(ActionLog.user_id == user_id)
-    
-    if date_from:
-        try:
-            date_from_dt = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
-            query = query.filter(ActionLog.created_at >= date_from_dt)
-        except ValueError:
-            pass
-    
-    if date_to:
+    # Paginate: keyset by cursor (next_cursor in response) or legacy page/per_page
+    if cursor is not None:
         try:
-            date_to_dt = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
-            query = query.filter(ActionLog.created_at <= date_to_dt)
-        except ValueError:
-            pass
-    
-    if search:
-        search_filter = or_(
-            ActionLog.action.ilike(f'%{search}%'),
-            ActionLog.ip_address.ilike(f'%{search}%'),
-            ActionLog.user_agent.ilike(f'%{search}%')
-        )
-        query = query.filter(search_filter)
-    
-    # Order by date (newest first)
-    query = query.order_by(desc(ActionLog.created_at))
+            keyset_page = paginate_keyset(query, ActionLog.created_at, ActionLog.log_id, 'created_at', sort_order,
+                                          per_page=per_page, cursor=cursor)
+        except CursorError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'logs': [log.to_dict() for log in keyset_page.items],
+            'pagination': {
+                'per_page': per_page,
+                'total': estimate_total(query, ActionLog.__tablename__),
+                'next_cursor': keyset_page.next_cursor,
+                'has_more': keyset_page.has_more
+            }
+        })
     
-    # Paginate
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    if sort_order == 'desc':
+        query = query.order_by(desc(ActionLog.created_at), desc(ActionLog.log_id))
+    else:
+        query = query.order_by(ActionLog.created_at.asc(), ActionLog.log_id.asc())
+    pagination = paginate_page(query, ActionLog.__tablename__, page, per_page)
     
     return jsonify({
-        'logs': [log.to_dict() for log in pagination.items],
+        'logs': [log.to_dict() for log in pagination['items']],
         'pagination': {
             'page': page,
             'per_page': per_page,
-            'total': pagination.total,
-            'pages': pagination.pages
+            'total': pagination['total'],
+            'pages': pagination['pages']
         }
     })
 
@@ -79,9 +68,9 @@ def list_logs(current_user):
 @role_required('admin')
 def list_actions(current_user):
     """Get list of unique actions (admin only)"""
-    actions = db.session.query(ActionLog.action).distinct().all()
+    # Словарь action_log_actions вместо SELECT DISTINCT по всему журналу
     return jsonify({
-        'actions': [action[0] for action in actions]
+        'actions': list_known_actions()
     })
 
 
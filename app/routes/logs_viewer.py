@@ -8,6 +8,11 @@ import os
 import time
 import logging
 from app.config import Config
+from app.utils.log_files import send_log_file, zip_response
+from app.utils.log_tail import (
+    STREAM_LOG_FILES, LineFilter, LogFollower, tail_lines,
+    position_from_event_id, position_to_event_id, sse_event
+)
 
 logs_viewer_bp = Blueprint('logs_viewer', __name__)
 logger = logging.getLogger(__name__)
@@ -46,42 +51,48 @@ def stream_logs():
         )
     
     log_type = request.args.get('type', 'app')  # app, errors, bot
-    lines = request.args.get('lines', 100, type=int)
+    lines = min(max(request.args.get('lines', 100, type=int), 0), 5000)
+    try:
+        line_filter = LineFilter.from_args(request.args)
+    except ValueError as e:
+        return Response(
+            f"data: {json.dumps({'error': str(e)})}\n\n",
+            mimetype='text/event-stream',
+            status=400
+        )
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
     
     def generate():
         """Generate log lines"""
-        log_files = {
-            'app': os.path.join(Config.LOG_FOLDER, 'app.log'),
-            'errors': os.path.join(Config.LOG_FOLDER, 'errors.log'),
-            'bot': os.path.join(Config.LOG_FOLDER, 'bot.log'),
-            'bot_errors': os.path.join(Config.LOG_FOLDER, 'bot_errors.log')
-        }
-        
-        log_file = log_files.get(log_type)
+        filename = STREAM_LOG_FILES.get(log_type)
+        log_file = os.path.join(Config.LOG_FOLDER, filename) if filename else None
         if not log_file or not os.path.exists(log_file):
             yield f"data: {json.dumps({'error': 'Log file not found'})}\n\n"
             return
         
-        # Read last N lines
+        # Основной путь - сервис log_stream (app/log_stream_server.py). Здесь слежение
+        # ограничено LOG_STREAM_SYNC_MAX_SECONDS: EventSource переподключится с Last-Event-ID
         try:
-            with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-                # Read last N lines
-                all_lines = f.readlines()
-                last_lines = all_lines[-lines:] if len(all_lines) > lines else all_lines
-                
-                # Send initial lines
+            yield 'retry: 1000\n\n'
+            position = position_from_event_id(last_event_id)
+            if position is None:
+                # Хвост читается блоками с конца файла, а не readlines() всего app.log
+                last_lines, position = tail_lines(log_file, lines, line_filter)
+                event_id = position_to_event_id(position)
                 for line in last_lines:
-                    if line.strip():
-                        yield f"data: {json.dumps({'line': line.rstrip()})}\n\n"
-                
-                # Stream new lines
-                f.seek(0, os.SEEK_END)
-                while True:
-                    line = f.readline()
-                    if line:
-                        yield f"data: {json.dumps({'line': line.rstrip()})}\n\n"
-                    else:
-                        time.sleep(0.5)  # Wait for new content
+                    yield sse_event(json.dumps({'line': line}), event_id)
+            
+            follower = LogFollower(log_file, position, line_filter)
+            try:
+                deadline = time.monotonic() + Config.LOG_STREAM_SYNC_MAX_SECONDS
+                while time.monotonic() < deadline:
+                    follower.wait(deadline - time.monotonic())
+                    new_lines = follower.read_new()
+                    event_id = position_to_event_id(follower.position)
+                    for line in new_lines:
+                        yield sse_event(json.dumps({'line': line}), event_id)
+            finally:
+                follower.close()
         except Exception as e:
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
     
@@ -133,55 +144,26 @@ def view_logs_page(current_user):
 @role_required('admin')
 def download_logs(current_user):
     """Download all logs as ZIP archive"""
-    import zipfile
-    import io
     from datetime import datetime
-    from flask import send_file
     
     try:
-        # Create in-memory ZIP file
-        zip_buffer = io.BytesIO()
-        
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            # Get all log files
-            log_files = {
-                'app.log': os.path.join(Config.LOG_FOLDER, 'app.log'),
-                'errors.log': os.path.join(Config.LOG_FOLDER, 'errors.log'),
-                'bot.log': os.path.join(Config.LOG_FOLDER, 'bot.log'),
-                'bot_errors.log': os.path.join(Config.LOG_FOLDER, 'bot_errors.log')
-            }
-            
-            files_added = 0
-            for log_filename, log_path in log_files.items():
-                if os.path.exists(log_path):
-                    try:
-                        # Read file and add to ZIP
-                        with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                            zip_file.writestr(log_filename, content)
-                        files_added += 1
-                        logger.info(f"Added {log_filename} to download archive")
-                    except Exception as e:
-                        logger.warning(f"Failed to add {log_filename} to archive: {e}")
+        log_files = [
+            (log_filename, os.path.join(Config.LOG_FOLDER, log_filename))
+            for log_filename in ('app.log', 'errors.log', 'bot.log', 'bot_errors.log')
+        ]
+        # Архив сжимается и отдаётся по кускам, файлы не читаются в память целиком
+        log_files = [(name, path) for name, path in log_files if os.path.exists(path)]
         
-        if files_added == 0:
+        if not log_files:
             return jsonify({'error': 'No log files found'}), 404
         
-        # Reset buffer position to beginning
-        zip_buffer.seek(0)
-        
         # Create filename with timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'realty_logs_{timestamp}.zip'
         
-        logger.info(f"Downloading logs archive: {filename} ({files_added} files)")
+        logger.info(f"Downloading logs archive: {filename} ({len(log_files)} files)")
         
-        return send_file(
-            zip_buffer,
-            mimetype='application/zip',
-            as_attachment=True,
-            download_name=filename
-        )
+        return zip_response(log_files, filename)
         
     except Exception as e:
         logger.error(f"Error creating logs archive: {e}", exc_info=True)
@@ -191,7 +173,6 @@ def download_logs(current_user):
 @logs_viewer_bp.route('/file/<log_type>', methods=['GET'])
 def download_log_file(log_type):
     """Download specific log file - supports both JWT and LOGS_DOWNLOAD_TOKEN"""
-    from flask import send_file
     from app.utils.jwt import verify_token
     
     # Check authentication - either JWT (for web) or LOGS_DOWNLOAD_TOKEN (for scripts)
@@ -255,13 +236,10 @@ def download_log_file(log_type):
         return jsonify({'error': f'Log file {log_filename} not found'}), 404
     
     try:
-        logger.info(f"Downloading log file: {log_filename}")
-        return send_file(
-            log_path,
-            mimetype='text/plain',
-            as_attachment=True,
-            download_name=log_filename
-        )
+        # Range/ETag: download_logs.py --incremental докачивает только дописанные байты
+        if not request.headers.get('Range'):
+            logger.info(f"Downloading log file: {log_filename}")
+        return send_log_file(log_path, log_filename)
     except Exception as e:
         logger.error(f"Error sending log file {log_filename}: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
@@ -270,9 +248,6 @@ def download_log_file(log_type):
 @logs_viewer_bp.route('/test', methods=['GET'])
 def download_test_logs():
     """Download all test logs (for AI analysis) - uses LOGS_DOWNLOAD_TOKEN"""
-    from flask import send_file
-    import zipfile
-    import io
     from datetime import datetime
     
     # Check LOGS_DOWNLOAD_TOKEN
@@ -282,45 +257,22 @@ def download_test_logs():
         return jsonify({'error': 'Unauthorized. Use LOGS_DOWNLOAD_TOKEN'}), 401
     
     try:
-        # Create in-memory ZIP file with test logs only
-        zip_buffer = io.BytesIO()
-        
-        test_log_files = {
-            'test_app.log': os.path.join(Config.LOG_FOLDER, 'test_app.log'),
-            'test_errors.log': os.path.join(Config.LOG_FOLDER, 'test_errors.log'),
-            'test_database.log': os.path.join(Config.LOG_FOLDER, 'test_database.log'),
-            'test_api.log': os.path.join(Config.LOG_FOLDER, 'test_api.log'),
-            'test_celery.log': os.path.join(Config.LOG_FOLDER, 'test_celery.log'),
-            'test_bot.log': os.path.join(Config.LOG_FOLDER, 'test_bot.log'),
-            'test_bot_errors.log': os.path.join(Config.LOG_FOLDER, 'test_bot_errors.log'),
-            'test_telethon.log': os.path.join(Config.LOG_FOLDER, 'test_telethon.log')
-        }
-        
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            files_added = 0
-            for log_filename, log_path in test_log_files.items():
-                if os.path.exists(log_path):
-                    try:
-                        with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                            zip_file.writestr(log_filename, content)
-                        files_added += 1
-                    except Exception as e:
-                        logger.warning(f"Failed to add {log_filename} to archive: {e}")
+        test_log_files = [
+            (log_filename, os.path.join(Config.LOG_FOLDER, log_filename))
+            for log_filename in (
+                'test_app.log', 'test_errors.log', 'test_database.log', 'test_api.log',
+                'test_celery.log', 'test_bot.log', 'test_bot_errors.log', 'test_telethon.log'
+            )
+        ]
+        test_log_files = [(name, path) for name, path in test_log_files if os.path.exists(path)]
         
-        if files_added == 0:
+        if not test_log_files:
             return jsonify({'error': 'No test log files found'}), 404
         
-        zip_buffer.seek(0)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'realty_test_logs_{timestamp}.zip'
         
-        return send_file(
-            zip_buffer,
-            mimetype='application/zip',
-            as_attachment=True,
-            download_name=filename
-        )
+        return zip_response(test_log_files, filename)
         
     except Exception as e:
         logger.error(f"Error creating test logs archive: {e}", exc_info=True)
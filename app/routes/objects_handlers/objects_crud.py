@@ -7,23 +7,44 @@ from app.database import db
 from app.models.object import Object
 from app.utils.decorators import jwt_required, role_required
 from app.utils.logger import log_action, log_error
+from app.utils.pagination import CursorError, paginate_keyset, paginate_page, estimate_total
+from app.utils.object_search import apply_object_search, search_rank_expression, search_details
+from app.utils.object_ids import allocate_object_id
+from app.utils.id_prefixes import ensure_user_id_prefix
+from app.utils.photos import needs_processing
+from app.utils.photo_storage import store_photo_stream
 from sqlalchemy import or_, and_
 import logging
 
 objects_crud_bp = Blueprint('objects_crud', __name__)
 logger = logging.getLogger(__name__)
 
+def _objects_with_search_details(objects, search):
+    """Словари объектов страницы; при поиске - с релевантностью (search_rank) и подсветкой (highlight)"""
+    details = search_details([obj.object_id for obj in objects], search) if search else {}
+    result = []
+    for obj in objects:
+        obj_dict = obj.to_dict()
+        if search:
+            obj_dict.update(details.get(obj.object_id, {'search_rank': 0.0, 'highlight': {}}))
+        result.append(obj_dict)
+    return result
+
+
 @objects_crud_bp.route('/', methods=['GET'])
 @jwt_required
 def list_objects(current_user):
     """
     Получение списка объектов недвижимости пользователя
     Логика: фильтрация, поиск, сортировка, пагинация - все действия логируются
+    Пагинация: с параметром cursor - keyset (ответ содержит next_cursor), иначе page/per_page
+    Поиск: search + sort_by=relevance - сортировка по релевантности (только page/per_page)
     """
     try:
         # Получаем параметры запроса
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
+        cursor = request.args.get('cursor')
         status = request.args.get('status')
         rooms_type = request.args.get('rooms_type')
         search = request.args.get('search')
@@ -42,27 +63,65 @@ def list_objects(current_user):
         if rooms_type:
             query = query.filter(Object.rooms_type == rooms_type)
         
-        # Поиск по ID, адресу или комментарию
+        # Поиск: полнотекстовый по адресу/ЖК/районам/комментарию, подстрока - по ID и адресу
         if search:
-            search_filter = or_(
-                Object.object_id.ilike(f'%{search}%'),
-                Object.address.ilike(f'%{search}%'),
-                Object.comment.ilike(f'%{search}%')
-            )
-            query = query.filter(search_filter)
+            query = apply_object_search(query, search)
         
         # Применяем сортировку
-        if sort_by == 'price':
-            order_by = Object.price.desc() if sort_order == 'desc' else Object.price.asc()
+        if sort_by == 'relevance' and search:
+            if cursor is not None:
+                return jsonify({'error': 'Sorting by relevance is supported only with page/per_page'}), 400
+            sort_column = search_rank_expression(search)
+        elif sort_by == 'price':
+            sort_column = Object.price
         elif sort_by == 'publication_date':
-            order_by = Object.publication_date.desc() if sort_order == 'desc' else Object.publication_date.asc()
+            sort_column = Object.publication_date
         else:  # creation_date (по умолчанию)
-            order_by = Object.creation_date.desc() if sort_order == 'desc' else Object.creation_date.asc()
+            sort_by = 'creation_date'
+            sort_column = Object.creation_date
+        sort_order = 'asc' if sort_order == 'asc' else 'desc'
         
-        query = query.order_by(order_by)
+        if cursor is not None:
+            # Keyset-пагинация: стоимость не зависит от глубины страницы
+            try:
+                keyset_page = paginate_keyset(query, sort_column, Object.object_id, sort_by, sort_order,
+                                              per_page=per_page, cursor=cursor)
+            except CursorError as e:
+                return jsonify({'error': str(e)}), 400
+            total = estimate_total(query, Object.__tablename__)
+            
+            # Логируем успешное получение списка
+            log_action(
+                action='objects_list_viewed',
+                user_id=current_user.user_id,
+                details={
+                    'cursor': cursor,
+                    'per_page': per_page,
+                    'total': total,
+                    'filters': {
+                        'status': status,
+                        'rooms_type': rooms_type,
+                        'search': search,
+                        'sort_by': sort_by,
+                        'sort_order': sort_order
+                    }
+                }
+            )
+            
+            return jsonify({
+                'objects': _objects_with_search_details(keyset_page.items, search),
+                'total': total,
+                'per_page': per_page,
+                'next_cursor': keyset_page.next_cursor,
+                'has_more': keyset_page.has_more
+            })
+        
+        pk_order = Object.object_id.desc() if sort_order == 'desc' else Object.object_id.asc()
+        order_by = sort_column.desc() if sort_order == 'desc' else sort_column.asc()
+        query = query.order_by(order_by, pk_order)
         
-        # Пагинация
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Пагинация (режим совместимости page/per_page)
+        pagination = paginate_page(query, Object.__tablename__, page, per_page)
         
         # Логируем успешное получение списка
         log_action(
@@ -71,7 +130,7 @@ def list_objects(current_user):
             details={
                 'page': page,
                 'per_page': per_page,
-                'total': pagination.total,
+                'total': pagination['total'],
                 'filters': {
                     'status': status,
                     'rooms_type': rooms_type,
@@ -83,11 +142,11 @@ def list_objects(current_user):
         )
         
         return jsonify({
-            'objects': [obj.to_dict() for obj in pagination.items],
-            'total': pagination.total,
+            'objects': _objects_with_search_details(pagination['items'], search),
+            'total': pagination['total'],
             'page': page,
             'per_page': per_page,
-            'pages': pagination.pages
+            'pages': pagination['pages']
         })
     except Exception as e:
         logger.error(f"Error listing objects for user {current_user.user_id}: {e}", exc_info=True)
@@ -148,7 +207,6 @@ def create_object(current_user):
     Все создания объектов логируются для аудита
     """
     from werkzeug.utils import secure_filename
-    import os
     import json
     
     # Check if form data (file upload) or JSON
@@ -183,19 +241,10 @@ def create_object(current_user):
         if 'photo_0' in request.files:
             file = request.files['photo_0']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                # Create unique filename
-                from datetime import datetime
-                timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')
-                filename = f"{timestamp}_{filename}"
-                from app.config import Config
-                filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                file.save(filepath)
-                
+                # Content-addressed storage: the same photo is stored once (app/utils/photo_storage.py)
                 # Always store only path to file on server
                 # Bot will load file from server when needed
-                photos_json.append(f"uploads/{filename}")
+                photos_json.append(store_photo_stream(db.session, file.stream, secure_filename(file.filename)))
     else:
         # Handle JSON data
         data = request.get_json()
@@ -223,28 +272,12 @@ def create_object(current_user):
     # Generate object_id (proper logic from bot)
     prefix = current_user.settings_json.get('id_prefix', 'WEB') if current_user.settings_json else 'WEB'
     if not prefix:
-        # Generate prefix if not exists
-        from bot.utils import generate_next_id_prefix
-        prefix = generate_next_id_prefix()
-        if not current_user.settings_json:
-            current_user.settings_json = {}
-        current_user.settings_json['id_prefix'] = prefix
+        # Generate prefix if not exists (reserved in id_prefixes registry, synced to settings_json)
+        prefix = ensure_user_id_prefix(db.session, current_user.load())
         db.session.commit()
     
-    # Get next number for user
-    last_obj = Object.query.filter(
-        Object.object_id.like(f'{prefix}%')
-    ).order_by(Object.object_id.desc()).first()
-    
-    if last_obj:
-        try:
-            num = int(last_obj.object_id[len(prefix):]) + 1
-        except:
-            num = 1
-    else:
-        num = 1
-    
-    object_id = f"{prefix}{num:03d}"
+    # Next number for prefix: atomic counter in object_id_sequences (shared with the bot)
+    object_id = allocate_object_id(db.session, prefix)
     
     # Create object
     obj = Object(
@@ -275,6 +308,11 @@ def create_object(current_user):
         db.session.add(obj)
         db.session.commit()
         
+        # Варианты фото (JPEG для Telegram, миниатюра для веба) строятся в Celery
+        if any(needs_processing(entry) for entry in obj.photos_json or []):
+            from workers.tasks.tasks_media import enqueue_photo_processing
+            enqueue_photo_processing(object_id)
+        
         # Log creation with districts
         log_action(
             action='object_created',
@@ -369,6 +407,10 @@ def update_object(object_id, current_user):
         old_status = obj.status
         db.session.commit()
         
+        if 'photos_json' in data and any(needs_processing(entry) for entry in obj.photos_json or []):
+            from workers.tasks.tasks_media import enqueue_photo_processing
+            enqueue_photo_processing(object_id)
+        
         # Log update
         log_action(
             action='object_updated',
@@ -645,16 +687,7 @@ def publish_object_via_account(current_user):
 @jwt_required
 def publish_object_via_bot(current_user):
     """Publish object via bot"""
-    import requests
-    import time
     from bot.config import BOT_TOKEN
-    from app.models.chat import Chat
-    from app.models.publication_history import PublicationHistory
-    from bot.utils import (
-        format_publication_text, get_districts_config, get_price_ranges,
-        get_moscow_time, format_moscow_datetime
-    )
-    from bot.models import User as BotUser, Object as BotObject
     from app.database import db
     
     data = request.get_json()
@@ -683,294 +716,18 @@ def publish_object_via_bot(current_user):
         return jsonify({'error': 'BOT_TOKEN is not configured'}), 500
     
     try:
-        # Get bot user (try to find by web user's telegram_id if linked)
-        bot_user = None
-        # Try to find bot user by telegram_id if web user has it
-        if hasattr(current_user, 'telegram_id') and current_user.telegram_id:
-            bot_user = db.session.query(BotUser).filter_by(telegram_id=int(current_user.telegram_id)).first()
-        
-        # Get bot object
-        bot_obj = db.session.query(BotObject).filter_by(object_id=object_id).first()
-        if not bot_obj:
-                # Create bot object from web object
-                bot_obj = BotObject(
-                    object_id=obj.object_id,
-                    user_id=bot_user.user_id if bot_user else None,
-                    rooms_type=obj.rooms_type,
-                    price=obj.price,
-                    districts_json=obj.districts_json,
-                    region=obj.region,
-                    city=obj.city,
-                    photos_json=obj.photos_json,
-                    area=obj.area,
-                    floor=obj.floor,
-                    address=obj.address,
-                    residential_complex=obj.residential_complex,
-                    renovation=obj.renovation,
-                    comment=obj.comment,
-                    contact_name=obj.contact_name,
-                    show_username=obj.show_username,
-                    phone_number=obj.phone_number,
-                    contact_name_2=obj.contact_name_2,
-                    phone_number_2=obj.phone_number_2,
-                    status=obj.status,
-                    source='web'
-                )
-                db.session.add(bot_obj)
-                db.session.commit()
+        # Ручная публикация идёт через interactive-очередь: HTTP-запрос только ставит задачи,
+        # отправку выполняют зарезервированные воркеры publish_interactive
+        from app.utils.bot_publication_utils import enqueue_manual_bot_publication
+        queue_ids = enqueue_manual_bot_publication(obj, current_user.user_id)
         
-        # Получаем формат публикации из конфигурации автопубликации
-        publication_format = 'default'
-        from app.models.autopublish_config import AutopublishConfig
-        autopublish_cfg = AutopublishConfig.query.filter_by(
-            object_id=object_id
-        ).first()
-        if autopublish_cfg and autopublish_cfg.accounts_config_json:
-            accounts_cfg = autopublish_cfg.accounts_config_json
-            if isinstance(accounts_cfg, dict):
-                publication_format = accounts_cfg.get('publication_format', 'default')
-        
-        # Format publication text
-        publication_text = format_publication_text(bot_obj, bot_user, is_preview=False, publication_format=publication_format)
-        
-        # Get target chats (reuse logic from bot)
-        target_chats = []
-        chats = db.session.query(Chat).filter_by(owner_type='bot', is_active=True).all()
-        
-        rooms_type = obj.rooms_type or ""
-        districts = obj.districts_json or []
-        price = obj.price or 0
-        
-        districts_config = get_districts_config()
-        
-        # Add parent districts
-        all_districts = set(districts)
-        for district in districts:
-            if isinstance(district, str) and district in districts_config:
-                parent_districts = districts_config[district]
-                if isinstance(parent_districts, list):
-                    all_districts.update(parent_districts)
-        
-        for chat in chats:
-            matches = False
-            filters = chat.filters_json or {}
-            
-            # Проверка типа привязки "общий" - такой чат получает все посты
-            binding_type = filters.get('binding_type')
-            if binding_type == 'common':
-                # Map bot chat_id to web chat_id
-                web_chat = Chat.query.filter_by(telegram_chat_id=chat.telegram_chat_id, owner_type='bot').first()
-                if web_chat and web_chat.chat_id not in target_chats:
-                    target_chats.append(web_chat.chat_id)
-                continue  # Пропускаем проверку фильтров для "общего" чата
-            
-            # Check if filters_json is used
-            has_filters_json = bool(filters.get('rooms_types') or filters.get('districts') or 
-                                   filters.get('price_min') is not None or filters.get('price_max') is not None)
-            
-            if has_filters_json:
-                rooms_match = True
-                districts_match = True
-                price_match = True
-                
-                if filters.get('rooms_types'):
-                    rooms_match = rooms_type in filters['rooms_types']
-                
-                if filters.get('districts'):
-                    chat_districts = set(filters['districts'])
-                    districts_match = bool(chat_districts.intersection(all_districts))
-                
-                price_min = filters.get('price_min')
-                price_max = filters.get('price_max')
-                if price_min is not None or price_max is not None:
-                    price_min = price_min or 0
-                    price_max = price_max if price_max is not None else float('inf')
-                    price_match = price_min <= price < price_max
-                
-                if rooms_match and districts_match and price_match:
-                    matches = True
-            else:
-                # Legacy category support
-                category = chat.category or ""
-                
-                if category.startswith("rooms_") and category.replace("rooms_", "") == rooms_type:
-                    matches = True
-                
-                if category.startswith("district_"):
-                    district_name = category.replace("district_", "")
-                    if district_name in all_districts:
-                        matches = True
-                
-                if category.startswith("price_"):
-                    try:
-                        parts = category.replace("price_", "").split("_")
-                        if len(parts) == 2:
-                            min_price = float(parts[0])
-                            max_price = float(parts[1])
-                            if min_price <= price < max_price:
-                                matches = True
-                    except:
-                        pass
-            
-            if matches and chat.chat_id not in target_chats:
-                target_chats.append(chat.chat_id)
-        
-        if not target_chats:
+        if not queue_ids:
             return jsonify({
                 'error': 'No matching chats',
                 'details': 'No active chats match the object parameters'
             }), 400
         
-        # Publish to each chat
-        published_count = 0
-        errors = []
-        url = f'https://api.telegram.org/bot{BOT_TOKEN}'
-        
-        for chat_id in target_chats:
-            try:
-                # Check publication history for this specific chat
-                chat = Chat.query.filter_by(chat_id=chat_id).first()
-                if not chat:
-                    continue
-                
-                telegram_chat_id = chat.telegram_chat_id
-                
-                # Send message - всегда отправляем фото если оно есть
-                # Поддерживаем несколько форматов photos_json:
-                # - строка с путем к файлу
-                # - dict с 'path' (новый формат)
-                # - dict только с 'file_id' (legacy для старых объектов бота)
-                photos_json = obj.photos_json or []
-                
-                if photos_json and len(photos_json) > 0:
-                    # Берем первое фото (только одно фото разрешено)
-                    raw_photo = photos_json[0]
-                    photo_path = None
-                    photo_file_id = None
-                    
-                    if isinstance(raw_photo, dict):
-                        # Сначала пробуем новый формат с path
-                        photo_path = raw_photo.get('path') or ''
-                        # Если path нет, используем legacy file_id
-                        if not photo_path:
-                            photo_file_id = raw_photo.get('file_id') or None
-                    elif isinstance(raw_photo, str):
-                        # Строка - путь к файлу
-                        photo_path = raw_photo
-                    
-                    # Пытаемся отправить по локальному пути к файлу
-                    if isinstance(photo_path, str) and photo_path:
-                        from app.config import Config
-                        import os
-                        # Используем Config.UPLOAD_FOLDER напрямую
-                        if photo_path.startswith('uploads/'):
-                            # Убираем префикс "uploads/" и используем Config.UPLOAD_FOLDER
-                            filename = photo_path.replace('uploads/', '', 1)
-                            full_path = os.path.join(Config.UPLOAD_FOLDER, filename)
-                        elif photo_path.startswith('/'):
-                            # Абсолютный путь
-                            full_path = photo_path
-                        else:
-                            # Относительный путь - используем Config.UPLOAD_FOLDER
-                            full_path = os.path.join(Config.UPLOAD_FOLDER, photo_path)
-                        
-                        if os.path.exists(full_path):
-                            send_url = f'{url}/sendPhoto'
-                            with open(full_path, 'rb') as photo_file:
-                                files = {'photo': photo_file}
-                                payload = {
-                                    'chat_id': telegram_chat_id,
-                                    'caption': publication_text,
-                                    'parse_mode': 'HTML'
-                                }
-                                response = requests.post(send_url, files=files, data=payload, timeout=30)
-                        else:
-                            logger.warning(f"Photo file not found: {full_path}, sending text only or using legacy file_id if available")
-                            if photo_file_id:
-                                # Падаем обратно на отправку по file_id, если он есть
-                                send_url = f'{url}/sendPhoto'
-                                payload = {
-                                    'chat_id': telegram_chat_id,
-                                    'photo': photo_file_id,
-                                    'caption': publication_text,
-                                    'parse_mode': 'HTML'
-                                }
-                                response = requests.post(send_url, data=payload, timeout=30)
-                            else:
-                                send_url = f'{url}/sendMessage'
-                                payload = {
-                                    'chat_id': telegram_chat_id,
-                                    'text': publication_text,
-                                    'parse_mode': 'HTML'
-                                }
-                                response = requests.post(send_url, json=payload, timeout=10)
-                    elif photo_file_id:
-                        # Нет локального пути, но есть legacy file_id – используем его напрямую
-                        send_url = f'{url}/sendPhoto'
-                        payload = {
-                            'chat_id': telegram_chat_id,
-                            'photo': photo_file_id,
-                            'caption': publication_text,
-                            'parse_mode': 'HTML'
-                        }
-                        response = requests.post(send_url, data=payload, timeout=30)
-                    else:
-                        # Ничего не известно о фото – отправляем только текст
-                        send_url = f'{url}/sendMessage'
-                        payload = {
-                            'chat_id': telegram_chat_id,
-                            'text': publication_text,
-                            'parse_mode': 'HTML'
-                        }
-                        response = requests.post(send_url, json=payload, timeout=10)
-                else:
-                    # Если фото нет - отправляем только текст
-                    send_url = f'{url}/sendMessage'
-                    payload = {
-                        'chat_id': telegram_chat_id,
-                        'text': publication_text,
-                        'parse_mode': 'HTML'
-                    }
-                    response = requests.post(send_url, json=payload, timeout=10)
-                response.raise_for_status()
-                result = response.json()
-                
-                if not result.get('ok'):
-                    error_description = result.get('description', 'Unknown error')
-                    errors.append(f"Chat {chat.title}: {error_description}")
-                    continue
-                
-                # Update chat statistics and create publication history
-                chat.total_publications = (chat.total_publications or 0) + 1
-                chat.last_publication = datetime.utcnow()
-                
-                history = PublicationHistory(
-                    object_id=object_id,
-                    chat_id=chat_id,
-                    account_id=None,  # Bot publication
-                    published_at=datetime.utcnow(),
-                    message_id=result.get('result', {}).get('message_id'),
-                    deleted=False
-                )
-                db.session.add(history)
-                
-                published_count += 1
-                
-                # Rate limit: 20 messages per minute
-                if published_count % 20 == 0:
-                    time.sleep(60)
-                else:
-                    time.sleep(3)  # 3 seconds between messages
-                
-            except Exception as e:
-                logger.error(f"Error publishing to chat {chat_id}: {e}", exc_info=True)
-                errors.append(f"Chat {chat_id}: {str(e)}")
-                continue
-        
-        # Update object status
-        obj.status = "опубликовано"
-        obj.publication_date = datetime.utcnow()
-        db.session.commit()
+        # Статус "опубликовано" выставляет publish_to_telegram после первой успешной отправки
         
         # Log action
         log_action(
@@ -978,17 +735,17 @@ def publish_object_via_bot(current_user):
             user_id=current_user.user_id,
             details={
                 'object_id': object_id,
-                'chats_count': len(target_chats),
-                'published_count': published_count,
-                'errors': errors
+                'chats_count': len(queue_ids),
+                'queue_ids': queue_ids,
+                'priority': 'interactive'
             }
         )
         
         return jsonify({
             'success': True,
-            'published_count': published_count,
-            'total_chats': len(target_chats),
-            'errors': errors if errors else None
+            'queued_count': len(queue_ids),
+            'total_chats': len(queue_ids),
+            'queue_ids': queue_ids
         }), 200
         
     except Exception as e:
@@ -8,6 +8,7 @@ from app.models.object import Object
 from app.models.publication_history import PublicationHistory
 from app.utils.decorators import jwt_required
 from app.utils.logger import log_action, log_error
+from app.utils.publication_priority import PRIORITY_INTERACTIVE, priority_for_mode
 from datetime import datetime, timedelta
 import logging
 
@@ -33,6 +34,9 @@ def create_publication(current_user):
     if not obj:
         return jsonify({'error': 'Object not found'}), 404
     
+    # Класс приоритета определяет Celery-очередь: immediate -> interactive lane
+    priority = priority_for_mode(mode)
+    
     # Create queue entries
     queue_ids = []
     for chat_id in chat_ids:
@@ -43,9 +47,11 @@ def create_publication(current_user):
             user_id=current_user.user_id,
             type='user' if account_id else 'bot',
             mode=mode,
+            priority=priority,
             status='pending'
         )
         db.session.add(queue)
+        db.session.flush()  # Нужен queue_id до commit
         queue_ids.append(queue.queue_id)
     
     try:
@@ -60,14 +66,17 @@ def create_publication(current_user):
                 'chat_count': len(chat_ids),
                 'account_id': account_id,
                 'mode': mode,
+                'priority': priority,
                 'queue_ids': queue_ids
             }
         )
         
-        # Добавляем задачи в Celery очередь
-        from workers.tasks import publish_to_telegram
-        for queue_id in queue_ids:
-            publish_to_telegram.delay(queue_id)
+        # Ручные публикации сразу уходят в свою Celery-очередь; запланированные
+        # дожидаются scheduled_time и ставятся диспетчером process_scheduled_publications
+        if priority == PRIORITY_INTERACTIVE:
+            from workers.tasks.tasks_publication import enqueue_publication
+            for queue_id in queue_ids:
+                enqueue_publication(queue_id, priority)
         
         return jsonify({
             'success': True,
@@ -14,6 +14,7 @@ from app.models.autopublish_config import AutopublishConfig
 from app.models.chat_group import ChatGroup
 from app.utils.decorators import jwt_required
 from app.utils.logger import log_action, log_error
+from app.utils.duplicate_checker import check_duplicates_many, load_allow_duplicates_setting
 from sqlalchemy import func
 from datetime import datetime
 import logging
@@ -21,6 +22,23 @@ import logging
 user_autopublish_bp = Blueprint('user_autopublish', __name__)
 logger = logging.getLogger(__name__)
 
+
+def _published_today(object_id: str, chat_ids: list, account_id, publication_type: str,
+                     user_id: int, allow_duplicates_setting: dict) -> dict:
+    """
+    Чаты, куда объект уже публиковался в текущий календарный день МСК - то же правило,
+    что у schedule_daily_autopublish (одна пакетная проверка на список чатов)
+    """
+    from app.utils.time_utils import get_moscow_time, msk_to_utc
+    today_start_utc = msk_to_utc(get_moscow_time().replace(hour=0, minute=0, second=0, microsecond=0))
+    return check_duplicates_many(
+        object_id, chat_ids, account_id,
+        publication_type=publication_type,
+        user_id=user_id,
+        allow_duplicates_setting=allow_duplicates_setting,
+        since=today_start_utc
+    )
+
 @user_autopublish_bp.route('/dashboard/autopublish', methods=['GET'])
 @jwt_required
 def get_autopublish_config(current_user):
@@ -388,7 +406,14 @@ def create_or_update_autopublish_config(current_user):
                 db.session.commit()
             
             bot_chats = _get_matching_bot_chats_for_object(db.session, bot_obj)
+            allow_duplicates_setting = load_allow_duplicates_setting()
+            recent = _published_today(
+                object_id, [bot_chat.chat_id for bot_chat in bot_chats], None,
+                'autopublish_bot', current_user.user_id, allow_duplicates_setting
+            )
             for bot_chat in bot_chats:
+                if bot_chat.chat_id in recent:
+                    continue
                 # Находим соответствующий чат в веб-базе
                 web_chat = WebChat.query.filter_by(
                     telegram_chat_id=bot_chat.telegram_chat_id,
@@ -439,7 +464,13 @@ def create_or_update_autopublish_config(current_user):
                     if account_id and chat_ids:
                         account = TelegramAccount.query.get(account_id)
                         if account and account.owner_id == current_user.user_id and account.is_active:
+                            recent = _published_today(
+                                object_id, chat_ids, account_id,
+                                'autopublish_account', current_user.user_id, allow_duplicates_setting
+                            )
                             for chat_id in chat_ids:
+                                if chat_id in recent:
+                                    continue
                                 chat = WebChat.query.get(chat_id)
                                 if not chat or chat.owner_type != 'user':
                                     continue
@@ -628,7 +659,14 @@ def update_autopublish_config(object_id, current_user):
                 db.session.commit()
             
             bot_chats = _get_matching_bot_chats_for_object(db.session, bot_obj)
+            allow_duplicates_setting = load_allow_duplicates_setting()
+            recent = _published_today(
+                object_id, [bot_chat.chat_id for bot_chat in bot_chats], None,
+                'autopublish_bot', current_user.user_id, allow_duplicates_setting
+            )
             for bot_chat in bot_chats:
+                if bot_chat.chat_id in recent:
+                    continue
                 # Находим соответствующий чат в веб-базе
                 web_chat = WebChat.query.filter_by(
                     telegram_chat_id=bot_chat.telegram_chat_id,
@@ -679,7 +717,13 @@ def update_autopublish_config(object_id, current_user):
                     if account_id and chat_ids:
                         account = TelegramAccount.query.get(account_id)
                         if account and account.owner_id == current_user.user_id and account.is_active:
+                            recent = _published_today(
+                                object_id, chat_ids, account_id,
+                                'autopublish_account', current_user.user_id, allow_duplicates_setting
+                            )
                             for chat_id in chat_ids:
+                                if chat_id in recent:
+                                    continue
                                 chat = WebChat.query.get(chat_id)
                                 if not chat or chat.owner_type != 'user':
                                     continue
@@ -14,8 +14,10 @@ from app.models.autopublish_config import AutopublishConfig
 from app.models.chat_group import ChatGroup
 from app.utils.decorators import jwt_required
 from app.utils.logger import log_action, log_error
+from app.utils.pagination import CursorError, paginate_keyset, paginate_page, estimate_total
+from app.utils.object_search import apply_object_search, search_rank_expression, search_details
+from app.utils.photos import PHOTO_VARIANT_TELEGRAM, photo_file_id_of, photo_full_path, photo_variant_path
 from sqlalchemy import func
-from datetime import datetime
 import logging
 
 user_objects_bp = Blueprint('user_objects', __name__)
@@ -34,6 +36,7 @@ def user_objects_list(current_user):
     """Get list of user's objects"""
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor')
     status = request.args.get('status')
     rooms_type = request.args.get('rooms_type')
     district = request.args.get('district')
@@ -54,46 +57,68 @@ def user_objects_list(current_user):
         # Use JSONB contains operator for array filtering
         query = query.filter(Object.districts_json.contains([district]))
     if search:
-        from sqlalchemy import or_
-        search_filter = or_(
-            Object.object_id.ilike(f'%{search}%'),
-            Object.address.ilike(f'%{search}%'),
-            Object.comment.ilike(f'%{search}%')
-        )
-        query = query.filter(search_filter)
+        # Full-text search (Russian stemming) + trigram substring match on object_id/address
+        query = apply_object_search(query, search)
     
     # Apply sorting
-    if sort_by == 'price':
-        order_by = Object.price.desc() if sort_order == 'desc' else Object.price.asc()
-    elif sort_by == 'creation_date':
-        order_by = Object.creation_date.desc() if sort_order == 'desc' else Object.creation_date.asc()
+    if sort_by == 'relevance' and search:
+        if cursor is not None:
+            return jsonify({'error': 'Sorting by relevance is supported only with page/per_page'}), 400
+        sort_column = search_rank_expression(search)
+    elif sort_by == 'price':
+        sort_column = Object.price
     elif sort_by == 'publication_date':
-        order_by = Object.publication_date.desc() if sort_order == 'desc' else Object.publication_date.asc()
+        sort_column = Object.publication_date
     else:  # default to creation_date
-        order_by = Object.creation_date.desc() if sort_order == 'desc' else Object.creation_date.asc()
-    
-    query = query.order_by(order_by)
+        sort_by = 'creation_date'
+        sort_column = Object.creation_date
+    sort_order = 'asc' if sort_order == 'asc' else 'desc'
     
-    # Paginate
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Paginate: keyset by cursor (next_cursor in response) or legacy page/per_page
+    if cursor is not None:
+        try:
+            keyset_page = paginate_keyset(query, sort_column, Object.object_id, sort_by, sort_order,
+                                          per_page=per_page, cursor=cursor)
+        except CursorError as e:
+            return jsonify({'error': str(e)}), 400
+        items = keyset_page.items
+        page_info = {
+            'total': estimate_total(query, Object.__tablename__),
+            'per_page': per_page,
+            'next_cursor': keyset_page.next_cursor,
+            'has_more': keyset_page.has_more
+        }
+    else:
+        pk_order = Object.object_id.desc() if sort_order == 'desc' else Object.object_id.asc()
+        order_by = sort_column.desc() if sort_order == 'desc' else sort_column.asc()
+        pagination = paginate_page(query.order_by(order_by, pk_order), Object.__tablename__, page, per_page)
+        items = pagination['items']
+        page_info = {
+            'total': pagination['total'],
+            'page': page,
+            'per_page': per_page,
+            'pages': pagination['pages']
+        }
     
     # Add can_publish info for each object
     # Проверка не применяется для админов (они могут публиковать без ограничений)
+    details = search_details([obj.object_id for obj in items], search) if search else {}
     objects_list = []
-    for obj in pagination.items:
+    for obj in items:
         obj_dict = obj.to_dict()
         
         # Всегда разрешаем публикацию
         obj_dict['can_publish'] = True
         
+        # Релевантность и подсвеченные фрагменты при поиске
+        if search:
+            obj_dict.update(details.get(obj.object_id, {'search_rank': 0.0, 'highlight': {}}))
+        
         objects_list.append(obj_dict)
     
     return jsonify({
         'objects': objects_list,
-        'total': pagination.total,
-        'page': page,
-        'per_page': per_page,
-        'pages': pagination.pages
+        **page_info
     })
 
 
@@ -128,16 +153,7 @@ def user_get_object(object_id, current_user):
 @jwt_required
 def user_publish_object_via_bot(current_user):
     """Publish object via bot"""
-    import requests
-    import time
     from bot.config import BOT_TOKEN
-    from app.models.chat import Chat
-    from app.models.publication_history import PublicationHistory
-    from bot.utils import (
-        format_publication_text, get_districts_config, get_price_ranges
-    )
-    from bot.models import User as BotUser, Object as BotObject
-    from datetime import timedelta
     
     data = request.get_json()
     object_id = data.get('object_id')
@@ -165,299 +181,18 @@ def user_publish_object_via_bot(current_user):
         return jsonify({'error': 'BOT_TOKEN is not configured'}), 500
     
     try:
-        # Get bot user (try to find by web user's telegram_id if linked)
-        bot_user = None
-        if hasattr(current_user, 'telegram_id') and current_user.telegram_id:
-            bot_user = db.session.query(BotUser).filter_by(telegram_id=int(current_user.telegram_id)).first()
-        
-        # Get bot object
-        bot_obj = db.session.query(BotObject).filter_by(object_id=object_id).first()
-        if not bot_obj:
-                # Create bot object from web object
-                bot_obj = BotObject(
-                    object_id=obj.object_id,
-                    user_id=bot_user.user_id if bot_user else None,
-                    rooms_type=obj.rooms_type,
-                    price=obj.price,
-                    districts_json=obj.districts_json,
-                    region=obj.region,
-                    city=obj.city,
-                    photos_json=obj.photos_json,
-                    area=obj.area,
-                    floor=obj.floor,
-                    address=obj.address,
-                    residential_complex=obj.residential_complex,
-                    renovation=obj.renovation,
-                    comment=obj.comment,
-                    contact_name=obj.contact_name,
-                    show_username=obj.show_username,
-                    phone_number=obj.phone_number,
-                    contact_name_2=obj.contact_name_2,
-                    phone_number_2=obj.phone_number_2,
-                    status=obj.status,
-                    source='web'
-                )
-                db.session.add(bot_obj)
-                db.session.commit()
-        
-        # Получаем формат публикации из конфигурации автопубликации
-        publication_format = 'default'
-        from app.models.autopublish_config import AutopublishConfig
-        autopublish_cfg = AutopublishConfig.query.filter_by(
-            object_id=object_id,
-            user_id=current_user.user_id
-        ).first()
-        if autopublish_cfg and autopublish_cfg.accounts_config_json:
-            accounts_cfg = autopublish_cfg.accounts_config_json
-            if isinstance(accounts_cfg, dict):
-                publication_format = accounts_cfg.get('publication_format', 'default')
-        
-        # Format publication text
-        publication_text = format_publication_text(bot_obj, bot_user, is_preview=False, publication_format=publication_format)
-        
-        # Get target chats (reuse logic from bot)
-        target_chats = []
-        from bot.models import Chat as BotChat
-        chats = db.session.query(BotChat).filter_by(owner_type='bot', is_active=True).all()
-        
-        rooms_type = obj.rooms_type or ""
-        districts = obj.districts_json or []
-        price = obj.price or 0
-        
-        districts_config = get_districts_config()
-        
-        # Add parent districts
-        all_districts = set(districts)
-        for district in districts:
-            if isinstance(district, str) and district in districts_config:
-                parent_districts = districts_config[district]
-                if isinstance(parent_districts, list):
-                    all_districts.update(parent_districts)
-        
-        for chat in chats:
-            matches = False
-            filters = chat.filters_json or {}
-            
-            # Проверка типа привязки "общий" - такой чат получает все посты
-            binding_type = filters.get('binding_type')
-            if binding_type == 'common':
-                # Map bot chat_id to web chat_id
-                web_chat = Chat.query.filter_by(telegram_chat_id=chat.telegram_chat_id, owner_type='bot').first()
-                if web_chat and web_chat.chat_id not in target_chats:
-                    target_chats.append(web_chat.chat_id)
-                continue  # Пропускаем проверку фильтров для "общего" чата
-            
-            # Check if filters_json is used
-            has_filters_json = bool(filters.get('rooms_types') or filters.get('districts') or 
-                                   filters.get('price_min') is not None or filters.get('price_max') is not None)
-            
-            if has_filters_json:
-                rooms_match = True
-                districts_match = True
-                price_match = True
-                
-                if filters.get('rooms_types'):
-                    rooms_match = rooms_type in filters['rooms_types']
-                
-                if filters.get('districts'):
-                    chat_districts = set(filters['districts'])
-                    districts_match = bool(chat_districts.intersection(all_districts))
-                
-                price_min = filters.get('price_min')
-                price_max = filters.get('price_max')
-                if price_min is not None or price_max is not None:
-                    price_min = price_min or 0
-                    price_max = price_max if price_max is not None else float('inf')
-                    price_match = price_min <= price < price_max
-                
-                if rooms_match and districts_match and price_match:
-                    matches = True
-            else:
-                # Legacy category support
-                category = chat.category or ""
-                
-                if category.startswith("rooms_") and category.replace("rooms_", "") == rooms_type:
-                    matches = True
-                
-                if category.startswith("district_"):
-                    district_name = category.replace("district_", "")
-                    if district_name in all_districts:
-                        matches = True
-                
-                if category.startswith("price_"):
-                    try:
-                        parts = category.replace("price_", "").split("_")
-                        if len(parts) == 2:
-                            min_price = float(parts[0])
-                            max_price = float(parts[1])
-                            if min_price <= price < max_price:
-                                matches = True
-                    except:
-                        pass
-            
-            if matches:
-                # Map bot chat_id to web chat_id
-                web_chat = Chat.query.filter_by(telegram_chat_id=chat.telegram_chat_id, owner_type='bot').first()
-                if web_chat and web_chat.chat_id not in target_chats:
-                    target_chats.append(web_chat.chat_id)
+        # Ручная публикация идёт через interactive-очередь: HTTP-запрос только ставит задачи,
+        # отправку выполняют зарезервированные воркеры publish_interactive
+        from app.utils.bot_publication_utils import enqueue_manual_bot_publication
+        queue_ids = enqueue_manual_bot_publication(obj, current_user.user_id)
         
-        if not target_chats:
+        if not queue_ids:
             return jsonify({
                 'error': 'No matching chats',
                 'details': 'No active chats match the object parameters'
             }), 400
         
-        # Publish to each chat
-        published_count = 0
-        errors = []
-        url = f'https://api.telegram.org/bot{BOT_TOKEN}'
-        
-        for chat_id in target_chats:
-            try:
-                # Check publication history for this specific chat
-                chat = Chat.query.filter_by(chat_id=chat_id).first()
-                if not chat:
-                    continue
-                
-                telegram_chat_id = chat.telegram_chat_id
-                
-                # Send message - всегда отправляем фото если оно есть
-                # Поддерживаем несколько форматов photos_json:
-                # - строка с путем к файлу
-                # - dict с 'path' (новый формат)
-                # - dict только с 'file_id' (legacy для старых объектов бота)
-                photos_json = obj.photos_json or []
-                
-                if photos_json and len(photos_json) > 0:
-                    # Берем первое фото (только одно фото разрешено)
-                    raw_photo = photos_json[0]
-                    photo_path = None
-                    photo_file_id = None
-                    
-                    if isinstance(raw_photo, dict):
-                        # Сначала пробуем новый формат с path
-                        photo_path = raw_photo.get('path') or ''
-                        # Если path нет, используем legacy file_id
-                        if not photo_path:
-                            photo_file_id = raw_photo.get('file_id') or None
-                    elif isinstance(raw_photo, str):
-                        # Строка - путь к файлу
-                        photo_path = raw_photo
-                    
-                    # Пытаемся отправить по локальному пути к файлу
-                    if isinstance(photo_path, str) and photo_path:
-                        from app.config import Config
-                        import os
-                        # Используем Config.UPLOAD_FOLDER напрямую
-                        if photo_path.startswith('uploads/'):
-                            # Убираем префикс "uploads/" и используем Config.UPLOAD_FOLDER
-                            filename = photo_path.replace('uploads/', '', 1)
-                            full_path = os.path.join(Config.UPLOAD_FOLDER, filename)
-                        elif photo_path.startswith('/'):
-                            # Абсолютный путь
-                            full_path = photo_path
-                        else:
-                            # Относительный путь - используем Config.UPLOAD_FOLDER
-                            full_path = os.path.join(Config.UPLOAD_FOLDER, photo_path)
-                        
-                        if os.path.exists(full_path):
-                            send_url = f'{url}/sendPhoto'
-                            with open(full_path, 'rb') as photo_file:
-                                files = {'photo': photo_file}
-                                payload = {
-                                    'chat_id': telegram_chat_id,
-                                    'caption': publication_text,
-                                    'parse_mode': 'HTML'
-                                }
-                                response = requests.post(send_url, files=files, data=payload, timeout=30)
-                        else:
-                            logger.warning(f"Photo file not found: {full_path}, sending text only or using legacy file_id if available")
-                            if photo_file_id:
-                                # Падаем обратно на отправку по file_id
-                                send_url = f'{url}/sendPhoto'
-                                payload = {
-                                    'chat_id': telegram_chat_id,
-                                    'photo': photo_file_id,
-                                    'caption': publication_text,
-                                    'parse_mode': 'HTML'
-                                }
-                                response = requests.post(send_url, data=payload, timeout=30)
-                            else:
-                                send_url = f'{url}/sendMessage'
-                                payload = {
-                                    'chat_id': telegram_chat_id,
-                                    'text': publication_text,
-                                    'parse_mode': 'HTML'
-                                }
-                                response = requests.post(send_url, json=payload, timeout=10)
-                    elif photo_file_id:
-                        # Нет локального пути, но есть legacy file_id – используем его напрямую
-                        send_url = f'{url}/sendPhoto'
-                        payload = {
-                            'chat_id': telegram_chat_id,
-                            'photo': photo_file_id,
-                            'caption': publication_text,
-                            'parse_mode': 'HTML'
-                        }
-                        response = requests.post(send_url, data=payload, timeout=30)
-                    else:
-                        # Ничего не известно о фото – отправляем только текст
-                        send_url = f'{url}/sendMessage'
-                        payload = {
-                            'chat_id': telegram_chat_id,
-                            'text': publication_text,
-                            'parse_mode': 'HTML'
-                        }
-                        response = requests.post(send_url, json=payload, timeout=10)
-                else:
-                    # Если фото нет - отправляем только текст
-                    send_url = f'{url}/sendMessage'
-                    payload = {
-                        'chat_id': telegram_chat_id,
-                        'text': publication_text,
-                        'parse_mode': 'HTML'
-                    }
-                    response = requests.post(send_url, json=payload, timeout=10)
-                
-                response.raise_for_status()
-                result = response.json()
-                
-                if not result.get('ok'):
-                    error_description = result.get('description', 'Unknown error')
-                    errors.append(f"Chat {chat.title}: {error_description}")
-                    continue
-                
-                # Update chat statistics and create publication history
-                chat.total_publications = (chat.total_publications or 0) + 1
-                chat.last_publication = datetime.utcnow()
-                
-                history = PublicationHistory(
-                    object_id=object_id,
-                    chat_id=chat_id,
-                    account_id=None,  # Bot publication
-                    published_at=datetime.utcnow(),
-                    message_id=result.get('result', {}).get('message_id'),
-                    deleted=False
-                )
-                db.session.add(history)
-                
-                published_count += 1
-                
-                # Rate limit: 20 messages per minute
-                if published_count % 20 == 0:
-                    time.sleep(60)
-                else:
-                    time.sleep(3)  # 3 seconds between messages
-                
-            except Exception as e:
-                logger.error(f"Error publishing to chat {chat_id}: {e}", exc_info=True)
-                errors.append(f"Chat {chat_id}: {str(e)}")
-                continue
-        
-        # Update object status
-        obj.status = "опубликовано"
-        obj.publication_date = datetime.utcnow()
-        db.session.commit()
+        # Статус "опубликовано" выставляет publish_to_telegram после первой успешной отправки
         
         # Log action
         log_action(
@@ -465,18 +200,18 @@ def user_publish_object_via_bot(current_user):
             user_id=current_user.user_id,
             details={
                 'object_id': object_id,
-                'chats_count': len(target_chats),
-                'published_count': published_count,
-                'errors': errors
+                'chats_count': len(queue_ids),
+                'queue_ids': queue_ids,
+                'priority': 'interactive'
             }
         )
         
         return jsonify({
             'success': True,
-            'published_count': published_count,
-            'total_chats': len(target_chats),
-            'errors': errors if errors else None,
-            'message': f'Объект успешно опубликован в {published_count} из {len(target_chats)} чатов'
+            'queued_count': len(queue_ids),
+            'total_chats': len(queue_ids),
+            'queue_ids': queue_ids,
+            'message': f'Объект поставлен в очередь публикации в {len(queue_ids)} чатов'
         }), 200
         
     except Exception as e:
@@ -572,35 +307,15 @@ def user_preview_object_in_bot(object_id, current_user):
             # Берем первое фото (только одно фото разрешено)
             raw_photo = photos_json[0]
             
-            photo_path = None
-            photo_file_id = None
-            if isinstance(raw_photo, dict):
-                # Новый формат: path
-                photo_path = raw_photo.get('path') or ''
-                # Legacy: file_id
-                if not photo_path:
-                    photo_file_id = raw_photo.get('file_id') or None
-            elif isinstance(raw_photo, str):
-                # Строка - путь к файлу
-                photo_path = raw_photo
+            # Путь к файлу: вариант для Telegram (пока его нет - оригинал);
+            # legacy file_id используется, только если пути нет
+            photo_path = photo_variant_path(raw_photo, PHOTO_VARIANT_TELEGRAM)
+            photo_file_id = None if photo_path else photo_file_id_of(raw_photo)
             
             # Загружаем файл с сервера и отправляем
             if photo_path:
                 import os
-                from app.config import Config
-                
-                # Используем Config.UPLOAD_FOLDER напрямую
-                # photo_path может быть "uploads/filename.jpg" или просто "filename.jpg"
-                if photo_path.startswith('uploads/'):
-                    # Убираем префикс "uploads/" и используем Config.UPLOAD_FOLDER
-                    filename = photo_path.replace('uploads/', '', 1)
-                    full_path = os.path.join(Config.UPLOAD_FOLDER, filename)
-                elif photo_path.startswith('/'):
-                    # Абсолютный путь
-                    full_path = photo_path
-                else:
-                    # Относительный путь - используем Config.UPLOAD_FOLDER
-                    full_path = os.path.join(Config.UPLOAD_FOLDER, photo_path)
+                full_path = photo_full_path(photo_path)
                 
                 logger.info(f"Trying to send photo: photo_path={photo_path}, full_path={full_path}, exists={os.path.exists(full_path)}")
                 if os.path.exists(full_path):
@@ -62,6 +62,8 @@ def get_user_settings(current_user):
 def update_user_settings(current_user):
     """Update user settings"""
     data = request.get_json()
+    # Нужна сама модель: flag_modified/refresh не работают с ленивым CurrentUser
+    current_user = current_user.load()
     
     # Validate phone number format if provided
     if 'phone' in data and data['phone']:
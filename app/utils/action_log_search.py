@@ -0,0 +1,147 @@
+"""
+Поиск и структурные фильтры журнала действий (action_logs)
+Логика: каждый фильтр API ложится на свой индекс ActionLog.__table_args__:
+- action / action_prefix / search по action, ip / search по ip_address, search по user_agent -
+  триграммные GIN-индексы pg_trgm (равенство, LIKE 'prefix%' и ILIKE '%term%');
+- details.<ключ>=значение - details_json @> {ключ: значение} по GIN jsonb_path_ops;
+- user_id + date_from/date_to - составной индекс (user_id, created_at) или индекс created_at.
+
+Список действий хранится в словаре action_log_actions: новое значение action
+добавляется в той же транзакции, что и строка лога (событие after_insert).
+"""
+import json
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import event, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, object_session
+from app.models.action_log import ActionLog
+from app.models.action_log_action import ActionLogAction
+
+logger = logging.getLogger(__name__)
+
+# Параметры запроса вида details.object_id=ABC001
+DETAILS_PARAM_PREFIX = 'details.'
+
+# Действия, уже подтверждённые в словаре (на процесс): повторные вставки не выполняются
+_known_actions = set()
+_events_registered = False
+
+
+def _like_escape(term: str) -> str:
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def parse_datetime_param(value: str):
+    """ISO-время из параметра запроса в naive UTC (как хранится created_at); None при ошибке"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _details_condition(key: str, raw_value: str):
+    # Значение из URL - строка; "123"/"true" ищем и как JSON-значение, и как строку
+    condition = ActionLog.details_json.contains({key: raw_value})
+    try:
+        parsed = json.loads(raw_value)
+    except ValueError:
+        return condition
+    if parsed != raw_value and not isinstance(parsed, (dict, list)):
+        condition = or_(condition, ActionLog.details_json.contains({key: parsed}))
+    return condition
+
+
+def apply_action_log_filters(query, args):
+    """
+    Применить фильтры журнала из параметров запроса.
+
+    Args:
+        query: запрос по ActionLog
+        args: request.args - action, action_prefix, user_id, ip, date_from, date_to,
+            details.<ключ>, search
+    """
+    action = args.get('action')
+    if action:
+        query = query.filter(ActionLog.action == action)
+
+    action_prefix = args.get('action_prefix')
+    if action_prefix:
+        query = query.filter(ActionLog.action.like(f'{_like_escape(action_prefix)}%', escape='\\'))
+
+    user_id = args.get('user_id', type=int)
+    if user_id:
+        query = query.filter(ActionLog.user_id == user_id)
+
+    ip = args.get('ip')
+    if ip:
+        query = query.filter(ActionLog.ip_address == ip)
+
+    date_from = parse_datetime_param(args.get('date_from'))
+    if date_from:
+        query = query.filter(ActionLog.created_at >= date_from)
+
+    date_to = parse_datetime_param(args.get('date_to'))
+    if date_to:
+        query = query.filter(ActionLog.created_at <= date_to)
+
+    for param, value in args.items(multi=True):
+        if param.startswith(DETAILS_PARAM_PREFIX) and len(param) > len(DETAILS_PARAM_PREFIX) and value != '':
+            query = query.filter(_details_condition(param[len(DETAILS_PARAM_PREFIX):], value))
+
+    search = (args.get('search') or '').strip()
+    if search:
+        pattern = f'%{_like_escape(search)}%'
+        query = query.filter(or_(
+            ActionLog.action.ilike(pattern, escape='\\'),
+            ActionLog.ip_address.ilike(pattern, escape='\\'),
+            ActionLog.user_agent.ilike(pattern, escape='\\')
+        ))
+
+    return query
+
+
+def list_known_actions() -> list:
+    """Все действия журнала из словаря (по алфавиту)"""
+    return [row.action for row in ActionLogAction.query.order_by(ActionLogAction.action.asc()).all()]
+
+
+def _after_insert(mapper, connection, target):
+    action = target.action
+    if not action or action in _known_actions:
+        return
+    # Вставка в той же транзакции: словарь не расходится с логом при откате
+    connection.execute(
+        insert(ActionLogAction.__table__)
+        .values(action=action, first_seen_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=['action'])
+    )
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('action_log_actions', set()).add(action)
+
+
+def _after_commit(session):
+    actions = session.info.pop('action_log_actions', None)
+    if actions:
+        _known_actions.update(actions)
+
+
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop('action_log_actions', None)
+
+
+def register_action_dictionary_events() -> None:
+    """Подписать словарь действий на вставки action_logs (вызывается из create_app)"""
+    global _events_registered
+    if _events_registered:
+        return
+    event.listen(ActionLog, 'after_insert', _after_insert)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_soft_rollback', _after_soft_rollback)
+    _events_registered = True
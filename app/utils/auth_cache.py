@@ -0,0 +1,293 @@
+"""
+Кеш пользователей для jwt_required/role_required
+Логика: на каждый запрос SPA декоратор раньше делал User.query.get. Теперь он берёт
+из кеша процесса (LRU с TTL) только поля авторизации - user_id, telegram_id, web_role и
+версию настроек, а полная модель User загружается лениво, если обработчик обращается
+к остальным атрибутам (CurrentUser).
+
+Инвалидация: изменение web_role/telegram_id/settings_json или удаление пользователя
+(ORM-события User) после commit публикуется в канал Redis; фоновый поток каждого
+процесса подписан на канал и выбрасывает запись. Если подписка обрывалась, кеш
+очищается целиком (сообщения могли быть пропущены); TTL - страховка на случай
+изменений в обход ORM.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.config import Config
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'auth:user_invalidated'
+
+# Поля, изменение которых должно сбросить кеш во всех процессах
+_WATCHED_FIELDS = ('web_role', 'telegram_id', 'settings_json')
+
+
+def settings_version(settings) -> int:
+    """Версия настроек пользователя: контрольная сумма канонического JSON (одинакова во всех процессах)"""
+    raw = json.dumps(settings or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return zlib.crc32(raw.encode())
+
+
+class AuthUser:
+    """Неизменяемый снимок полей авторизации"""
+    __slots__ = ('user_id', 'telegram_id', 'web_role', 'settings_version')
+
+    def __init__(self, user_id: int, telegram_id: int, web_role: str, settings_version: int):
+        object.__setattr__(self, 'user_id', user_id)
+        object.__setattr__(self, 'telegram_id', telegram_id)
+        object.__setattr__(self, 'web_role', web_role)
+        object.__setattr__(self, 'settings_version', settings_version)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('AuthUser is immutable')
+
+    def __repr__(self):
+        return f'<AuthUser {self.user_id} ({self.web_role})>'
+
+
+class AuthUserCache:
+    """LRU с TTL; потокобезопасный (gunicorn с потоками, фоновый подписчик)"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            snapshot, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return snapshot
+
+    def put(self, snapshot: AuthUser):
+        with self._lock:
+            self._entries[snapshot.user_id] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(snapshot.user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CurrentUser:
+    """
+    Пользователь запроса (kwargs['current_user'], g.current_user).
+    user_id, telegram_id, web_role и settings_version отдаются из снимка без обращения к БД;
+    любой другой атрибут (и запись атрибутов) загружает модель User текущей сессии.
+    Для операций, которым нужен сам ORM-объект (flag_modified, refresh), - load().
+    """
+    __slots__ = ('_snapshot', '_user')
+
+    def __init__(self, snapshot: AuthUser):
+        object.__setattr__(self, '_snapshot', snapshot)
+        object.__setattr__(self, '_user', None)
+
+    @property
+    def user_id(self) -> int:
+        return self._snapshot.user_id
+
+    @property
+    def telegram_id(self) -> int:
+        return self._snapshot.telegram_id
+
+    @property
+    def web_role(self) -> str:
+        if self._user is not None:
+            return self._user.web_role
+        return self._snapshot.web_role
+
+    @property
+    def settings_version(self) -> int:
+        return self._snapshot.settings_version
+
+    def load(self) -> User:
+        """Полная модель User (один запрос за время жизни объекта)"""
+        if self._user is None:
+            user = User.query.get(self._snapshot.user_id)
+            if user is None:
+                # Удалён после того, как снимок попал в кеш
+                _cache.invalidate(self._snapshot.user_id)
+                raise LookupError(f'User {self._snapshot.user_id} no longer exists')
+            object.__setattr__(self, '_user', user)
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
+
+    def __repr__(self):
+        return f'<CurrentUser {self._snapshot.user_id} ({self._snapshot.web_role})>'
+
+
+_cache = AuthUserCache(Config.AUTH_USER_CACHE_SIZE, Config.AUTH_USER_CACHE_SECONDS)
+
+
+def get_auth_user(user_id) -> AuthUser:
+    """Снимок полей авторизации из кеша или одним узким запросом; None - пользователя нет"""
+    if user_id is None:
+        return None
+    _ensure_subscriber()
+    snapshot = _cache.get(user_id)
+    if snapshot is not None:
+        return snapshot
+    from app.database import db
+    row = db.session.query(
+        User.user_id, User.telegram_id, User.web_role, User.settings_json
+    ).filter(User.user_id == user_id).first()
+    if row is None:
+        return None
+    snapshot = AuthUser(row.user_id, row.telegram_id, row.web_role, settings_version(row.settings_json))
+    _cache.put(snapshot)
+    return snapshot
+
+
+# ---------- Инвалидация ----------
+
+def publish_invalidation(user_ids) -> None:
+    """Сбросить записи здесь и разослать остальным процессам"""
+    user_ids = [int(user_id) for user_id in dict.fromkeys(user_ids) if user_id is not None]
+    for user_id in user_ids:
+        _cache.invalidate(user_id)
+    if not user_ids:
+        return
+    from app.utils.redis_client import get_redis
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.publish(INVALIDATION_CHANNEL, user_id)
+        pipe.execute()
+    except Exception as e:
+        # Остальные процессы увидят изменение не позже чем через TTL
+        logger.warning(f"Failed to publish auth cache invalidation for users {user_ids}: {e}")
+
+
+def _collect_pending(session):
+    return session.info.setdefault('auth_cache_invalidate', set())
+
+
+def _after_update(mapper, connection, target):
+    from sqlalchemy.orm import object_session
+    session = object_session(target)
+    if session is None:
+        return
+    attrs = inspect(target).attrs
+    if any(attrs[field].history.has_changes() for field in _WATCHED_FIELDS):
+        _collect_pending(session).add(target.user_id)
+
+
+def _after_delete(mapper, connection, target):
+    from sqlalchemy.orm import object_session
+    session = object_session(target)
+    if session is not None:
+        _collect_pending(session).add(target.user_id)
+
+
+def _after_commit(session):
+    pending = session.info.pop('auth_cache_invalidate', None)
+    if pending:
+        publish_invalidation(pending)
+
+
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop('auth_cache_invalidate', None)
+
+
+_events_registered = False
+
+
+def register_auth_cache_events() -> None:
+    """Подписать кеш на изменения User (вызывается из create_app)"""
+    global _events_registered
+    if _events_registered:
+        return
+    event.listen(User, 'after_update', _after_update)
+    event.listen(User, 'after_delete', _after_delete)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_soft_rollback', _after_soft_rollback)
+    _events_registered = True
+
+
+# ---------- Подписчик процесса ----------
+
+_subscriber = None
+_subscriber_lock = threading.Lock()
+
+
+def _ensure_subscriber():
+    """Запустить поток подписки при первом обращении к кешу в процессе (в том числе после fork)"""
+    global _subscriber
+    if _subscriber is not None and _subscriber.is_alive():
+        return
+    with _subscriber_lock:
+        if _subscriber is None or not _subscriber.is_alive():
+            _subscriber = threading.Thread(target=_listen_invalidations, name='auth-cache-subscriber', daemon=True)
+            _subscriber.start()
+
+
+def _listen_invalidations():
+    import redis
+    delay = 1.0
+    while True:
+        pubsub = None
+        try:
+            # Отдельное соединение без socket_timeout: общий клиент обрывал бы ожидание через 2с
+            client = redis.Redis.from_url(
+                Config.REDIS_URL, decode_responses=True, socket_connect_timeout=2, health_check_interval=30
+            )
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Пока подписки не было, сообщения могли пройти мимо
+            _cache.clear()
+            delay = 1.0
+            while True:
+                message = pubsub.get_message(timeout=30)
+                if message and message.get('type') == 'message':
+                    try:
+                        _cache.invalidate(int(message['data']))
+                    except (TypeError, ValueError):
+                        _cache.clear()
+        except Exception as e:
+            logger.debug(f"Auth cache subscription lost: {e}")
+            _cache.clear()
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+def _reset_after_fork():
+    # Поток и записи родителя в потомке недействительны (gunicorn preload, Celery prefork)
+    global _subscriber
+    _subscriber = None
+    _cache.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
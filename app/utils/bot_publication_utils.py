@@ -0,0 +1,57 @@
+"""
+Утилиты для ручной публикации через бота
+Логика: ручная публикация не отправляет сообщения внутри HTTP-запроса, а создаёт
+строки publication_queues класса interactive и ставит их в отдельную Celery-очередь
+"""
+from datetime import datetime
+import logging
+from app.database import db
+from app.models.publication_queue import PublicationQueue
+from app.utils.publication_priority import PRIORITY_INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_manual_bot_publication(obj, user_id: int) -> list:
+    """
+    Поставить объект в очередь публикации во все подходящие чаты бота.
+    Подбор чатов тот же, что и у автопубликации (_get_matching_bot_chats_for_object).
+
+    Returns:
+        Список queue_id созданных задач (пустой, если подходящих чатов нет)
+    """
+    from workers.tasks.tasks_autopublish import _get_matching_bot_chats_for_object
+    from workers.tasks.tasks_publication import enqueue_publication
+
+    chats = _get_matching_bot_chats_for_object(db.session, obj)
+    if not chats:
+        return []
+
+    queue_ids = []
+    for chat in chats:
+        queue = PublicationQueue(
+            object_id=obj.object_id,
+            chat_id=chat.chat_id,
+            account_id=None,
+            user_id=user_id,
+            type='bot',
+            mode='immediate',
+            priority=PRIORITY_INTERACTIVE,
+            status='pending',
+            created_at=datetime.utcnow(),
+        )
+        db.session.add(queue)
+        db.session.flush()  # Нужен queue_id до commit
+        queue_ids.append(queue.queue_id)
+
+    # Commit до постановки в Celery: воркер должен увидеть строки
+    db.session.commit()
+
+    for queue_id in queue_ids:
+        try:
+            enqueue_publication(queue_id, PRIORITY_INTERACTIVE)
+        except Exception as enqueue_error:
+            # Строка остаётся pending: process_scheduled_publications подберёт её повторно
+            logger.error(f"Failed to enqueue interactive publication {queue_id}: {enqueue_error}", exc_info=True)
+
+    return queue_ids
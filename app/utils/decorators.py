@@ -4,7 +4,7 @@ Decorators for authentication and authorization
 from functools import wraps
 from flask import request, jsonify
 from app.utils.jwt import verify_token, get_user_from_token
-from app.models.user import User
+from app.utils.auth_cache import CurrentUser, get_auth_user
 
 
 def jwt_required(f):
@@ -32,12 +32,17 @@ def jwt_required(f):
         if not payload:
             return jsonify({'error': 'Invalid or expired token'}), 401
         
-        # Add user to kwargs and request context
-        user = User.query.get(payload.get('user_id'))
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
+        # Add user to kwargs and request context.
+        # Auth fields come from the per-process cache (app/utils/auth_cache.py);
+        # the full User row is loaded lazily on first access to other attributes.
         from flask import g
+        user = g.get('current_user')
+        if user is None or user.user_id != payload.get('user_id'):
+            snapshot = get_auth_user(payload.get('user_id'))
+            if not snapshot:
+                return jsonify({'error': 'User not found'}), 404
+            user = CurrentUser(snapshot)
+        
         g.current_user = user
         g.current_user_id = user.user_id
         kwargs['current_user'] = user
@@ -6,11 +6,43 @@
 - авто бот
 - авто аккаунт
 + отдельный переключатель для админа
+
+История недавних публикаций читается из журнала в Redis (app/utils/publication_ledger.py),
+при непрогретом журнале - одним запросом к publication_history.
 """
 from datetime import datetime, timedelta
-from app.database import db
-from app.models.publication_history import PublicationHistory
 from app.models.user import User
+from app.utils.publication_ledger import check_many
+
+
+def load_allow_duplicates_setting() -> dict:
+    """Настройки разрешения дубликатов из SystemSetting (по умолчанию дубликаты запрещены)"""
+    from app.models.system_setting import SystemSetting
+    setting = SystemSetting.query.filter_by(key='allow_duplicates').first()
+    if setting and isinstance(setting.value_json, dict):
+        return setting.value_json
+    # По умолчанию все правила включены (дубликаты запрещены)
+    return {
+        'manual_bot': False,
+        'manual_account': False,
+        'autopublish_bot': False,
+        'autopublish_account': False,
+        'admin_bypass': False
+    }
+
+
+def _duplicates_allowed(publication_type: str, user_id: int, allow_duplicates_setting: dict):
+    """Причина, по которой правило не применяется, или None"""
+    # Проверка прав админа
+    if user_id and allow_duplicates_setting.get('admin_bypass', False):
+        user = User.query.get(user_id)
+        if user and user.web_role == 'admin':
+            return "Админ может публиковать без ограничений"
+
+    # Проверяем, разрешены ли дубликаты для этого типа публикации
+    if allow_duplicates_setting.get(publication_type, False):
+        return "Дубликаты разрешены для этого типа публикации"
+    return None
 
 
 def check_duplicate_publication(
@@ -44,53 +76,48 @@ def check_duplicate_publication(
     """
     # Если настройки не переданы, получаем из БД
     if allow_duplicates_setting is None:
-        from app.models.system_setting import SystemSetting
-        setting = SystemSetting.query.filter_by(key='allow_duplicates').first()
-        if setting and isinstance(setting.value_json, dict):
-            allow_duplicates_setting = setting.value_json
-        else:
-            # По умолчанию все правила включены (дубликаты запрещены)
-            allow_duplicates_setting = {
-                'manual_bot': False,
-                'manual_account': False,
-                'autopublish_bot': False,
-                'autopublish_account': False,
-                'admin_bypass': False
-            }
-    
-    # Проверка прав админа
-    if user_id and allow_duplicates_setting.get('admin_bypass', False):
-        user = User.query.get(user_id)
-        if user and user.web_role == 'admin':
-            return True, "Админ может публиковать без ограничений"
+        allow_duplicates_setting = load_allow_duplicates_setting()
     
-    # Проверяем, разрешены ли дубликаты для этого типа публикации
-    allow_duplicates = allow_duplicates_setting.get(publication_type, False)
-    if allow_duplicates:
-        return True, "Дубликаты разрешены для этого типа публикации"
+    reason = _duplicates_allowed(publication_type, user_id, allow_duplicates_setting)
+    if reason:
+        return True, reason
     
     # Проверяем историю публикаций за последние 24 часа
+    # (для аккаунтов - один объект в один чат через один аккаунт, для бота - account_id NULL)
     yesterday = datetime.utcnow() - timedelta(days=1)
+    recent = check_many(object_id, [chat_id], account_id, since=yesterday)
     
-    query = PublicationHistory.query.filter(
-        PublicationHistory.object_id == object_id,
-        PublicationHistory.chat_id == chat_id,
-        PublicationHistory.published_at >= yesterday,
-        PublicationHistory.deleted == False
-    )
-    
-    # Для аккаунтов проверяем также account_id (один объект в один чат через один аккаунт)
-    if account_id is not None:
-        query = query.filter(PublicationHistory.account_id == account_id)
-    else:
-        # Для бота проверяем, что account_id NULL
-        query = query.filter(PublicationHistory.account_id.is_(None))
-    
-    recent_publication = query.first()
-    
-    if recent_publication:
-        published_at_msk = recent_publication.published_at.strftime('%Y-%m-%d %H:%M:%S UTC')
+    if chat_id in recent:
+        published_at_msk = recent[chat_id].strftime('%Y-%m-%d %H:%M:%S UTC')
         return False, f"Объект уже был опубликован в этот чат {published_at_msk} (менее 24 часов назад)"
     
     return True, "Публикация разрешена"
 
+
+def check_duplicates_many(
+    object_id: str,
+    chat_ids: list,
+    account_id: int = None,
+    publication_type: str = 'autopublish_bot',
+    user_id: int = None,
+    allow_duplicates_setting: dict = None,
+    since: datetime = None
+) -> dict:
+    """
+    Пакетная проверка дубликатов для списка чатов (планировщики, массовая публикация).
+    Настройки и пользователь читаются один раз, история - одним обращением к журналу.
+    
+    Args:
+        since: начало окна (по умолчанию последние 24 часа)
+    
+    Returns:
+        {chat_id: published_at} для чатов, куда публиковать нельзя
+    """
+    if allow_duplicates_setting is None:
+        allow_duplicates_setting = load_allow_duplicates_setting()
+    
+    if _duplicates_allowed(publication_type, user_id, allow_duplicates_setting):
+        return {}
+    
+    since = since or datetime.utcnow() - timedelta(days=1)
+    return check_many(object_id, chat_ids, account_id, since=since)
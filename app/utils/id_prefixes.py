@@ -0,0 +1,93 @@
+"""
+Выдача префиксов ID объектов через реестр id_prefixes
+Логика: свободный префикс - первая по алфавиту комбинация ААА..ЯЯЯ, которой нет в реестре;
+выбор и резервирование - один INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING по
+уникальному индексу. При гонке двух выдач проигравшая получает пустой результат и повторяет.
+users.settings_json['id_prefix'] обновляется вместе с реестром.
+"""
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.orm.attributes import flag_modified
+
+# Алфавит префиксов - как в прежнем генераторе: буквы А..Я подряд по кодам Unicode (32 буквы, без Ё)
+_FIRST_LETTER = ord('А')
+_LETTERS = ord('Я') - ord('А') + 1
+_MAX_ATTEMPTS = 5
+
+_ALLOCATE_SQL = text(
+    f"""
+    INSERT INTO id_prefixes (prefix, user_id, created_at)
+    SELECT candidate, :user_id, :now
+    FROM (
+        SELECT n,
+               chr({_FIRST_LETTER} + n / {_LETTERS * _LETTERS})
+               || chr({_FIRST_LETTER} + (n / {_LETTERS}) % {_LETTERS})
+               || chr({_FIRST_LETTER} + n % {_LETTERS}) AS candidate
+        FROM generate_series(0, {_LETTERS ** 3 - 1}) AS n
+    ) AS candidates
+    WHERE NOT EXISTS (SELECT 1 FROM id_prefixes p WHERE p.prefix = candidates.candidate)
+    ORDER BY n
+    LIMIT 1
+    ON CONFLICT DO NOTHING
+    RETURNING prefix
+    """
+)
+
+_USER_PREFIX_SQL = text("SELECT prefix FROM id_prefixes WHERE user_id = :user_id")
+
+_REGISTER_SQL = text(
+    "INSERT INTO id_prefixes (prefix, user_id, created_at) VALUES (:prefix, :user_id, :now) "
+    "ON CONFLICT (prefix) DO UPDATE SET user_id = EXCLUDED.user_id "
+    "WHERE id_prefixes.user_id IS NULL OR id_prefixes.user_id = EXCLUDED.user_id"
+)
+
+
+def allocate_id_prefix(db_session, user_id: int = None) -> str:
+    """
+    Зарезервировать первый свободный префикс (за пользователем или без владельца).
+
+    Raises:
+        RuntimeError: свободных префиксов нет
+    """
+    for _ in range(_MAX_ATTEMPTS):
+        prefix = db_session.execute(_ALLOCATE_SQL, {'user_id': user_id, 'now': datetime.utcnow()}).scalar()
+        if prefix:
+            return prefix
+        if user_id is not None:
+            # Конфликт мог быть по user_id: префикс уже выдан этому пользователю параллельно
+            existing = db_session.execute(_USER_PREFIX_SQL, {'user_id': user_id}).scalar()
+            if existing:
+                return existing
+    raise RuntimeError('No free ID prefixes left')
+
+
+def _sync_settings(user, prefix: str) -> None:
+    settings = dict(user.settings_json or {})
+    if settings.get('id_prefix') != prefix:
+        settings['id_prefix'] = prefix
+        user.settings_json = settings
+        flag_modified(user, 'settings_json')
+
+
+def assign_id_prefix(db_session, user, prefix: str) -> None:
+    """
+    Закрепить префикс за пользователем (реестр + settings_json).
+    Префикс другого пользователя не перехватывается - он остаётся общим, как было до реестра.
+    """
+    # Прежний префикс остаётся занятым (по нему уже выданы ID объектов), но без владельца
+    db_session.execute(
+        text("UPDATE id_prefixes SET user_id = NULL WHERE user_id = :user_id AND prefix <> :prefix"),
+        {'user_id': user.user_id, 'prefix': prefix}
+    )
+    db_session.execute(_REGISTER_SQL, {'prefix': prefix, 'user_id': user.user_id, 'now': datetime.utcnow()})
+    _sync_settings(user, prefix)
+
+
+def ensure_user_id_prefix(db_session, user) -> str:
+    """Префикс пользователя; если его нет - выдать свободный и сохранить в settings_json"""
+    prefix = (user.settings_json or {}).get('id_prefix')
+    if prefix:
+        return prefix
+    prefix = allocate_id_prefix(db_session, user.user_id)
+    _sync_settings(user, prefix)
+    return prefix
@@ -0,0 +1,191 @@
+"""
+Отдача файлов логов: потоковый ZIP и диапазоны байт
+Логика: архив собирается zipfile'ом в небуферизуемый поток (дескрипторы данных
+вместо перемотки) и отдаётся кусками по мере сжатия - память не зависит от размера
+логов. Отдельный файл отдаётся с ETag/Last-Modified и поддержкой Range, чтобы клиент
+(download_logs.py --incremental) докачивал только дописанные байты. Идентичность файла
+(inode) передаётся в X-Log-File-Id: если клиент прислал другой id - файл ротирован
+или пересоздан, Range игнорируется и отдаётся файл целиком (как If-Range).
+gzip применяется только к ответу целиком: диапазон байт сжатого на лету тела не определён,
+поэтому 206 отдаётся без Content-Encoding.
+"""
+import io
+import os
+import zipfile
+import zlib
+from flask import Response, request
+from werkzeug.http import http_date, parse_range_header
+
+_CHUNK_SIZE = 64 * 1024
+
+# Меньшие куски не сжимаем: заголовки gzip дороже выигрыша
+_GZIP_MIN_BYTES = 1024
+
+FILE_ID_HEADER = 'X-Log-File-Id'
+
+
+class _ZipStream(io.RawIOBase):
+    """Приёмник для zipfile: накапливает записанные байты до очередного drain()"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip_stream(files):
+    """
+    ZIP-архив кусками по мере сжатия.
+
+    Args:
+        files: [(имя в архиве, путь)] - файлы должны существовать; берётся размер
+            на момент начала чтения (дописанное позже в архив не попадает)
+    """
+    stream = _ZipStream()
+    # Поток без seek/tell: zipfile пишет размеры в дескрипторы данных после каждого файла
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for arcname, path in files:
+            try:
+                source = open(path, 'rb')
+            except OSError:
+                continue
+            with source:
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                remaining = os.fstat(source.fileno()).st_size
+                with archive.open(info, 'w') as target:
+                    while remaining > 0:
+                        chunk = source.read(min(_CHUNK_SIZE, remaining))
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        remaining -= len(chunk)
+                        data = stream.drain()
+                        if data:
+                            yield data
+            yield stream.drain()
+    yield stream.drain()
+
+
+def zip_response(files, download_name: str) -> Response:
+    """Потоковый ответ с ZIP-архивом файлов [(имя в архиве, путь)]"""
+    return Response(
+        iter_zip_stream(files),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename="{download_name}"',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+def file_id(stat) -> str:
+    """Идентичность файла: меняется при ротации/пересоздании, но не при дописывании"""
+    return f'{stat.st_dev:x}-{stat.st_ino:x}'
+
+
+def file_etag(stat) -> str:
+    return f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _iter_file_range(f, start: int, length: int, compress: bool):
+    """Отдать length байт с start из уже открытого файла (тот же inode, что описан в заголовках)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31 - формат gzip
+    with f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            if compressor is None:
+                yield chunk
+                continue
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def _accepts_gzip() -> bool:
+    return 'gzip' in (request.headers.get('Accept-Encoding') or '').lower()
+
+
+def send_log_file(path: str, download_name: str) -> Response:
+    """
+    Файл лога с поддержкой If-None-Match, Range (один диапазон) и gzip.
+
+    Размер фиксируется на момент запроса: строки, дописанные во время отдачи,
+    клиент получит следующим диапазоном. Файл открывается один раз и stat берётся
+    с дескриптора: ротация между stat и чтением не подменит отдаваемый inode.
+    """
+    f = open(path, 'rb')
+    try:
+        return _send_open_file(f, download_name)
+    except Exception:
+        f.close()
+        raise
+
+
+def _send_open_file(f, download_name: str) -> Response:
+    stat = os.fstat(f.fileno())
+    size = stat.st_size
+    etag = file_etag(stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+        FILE_ID_HEADER: file_id(stat),
+        'Content-Disposition': f'attachment; filename="{download_name}"'
+    }
+
+    if etag in [tag.strip() for tag in (request.headers.get('If-None-Match') or '').split(',')]:
+        f.close()
+        return Response(status=304, headers=headers)
+
+    start, length, status = 0, size, 200
+    byte_range = parse_range_header(request.headers.get('Range'))
+    if_range = request.headers.get('If-Range')
+    client_file_id = request.headers.get(FILE_ID_HEADER)
+    # Диапазон относится к другой версии файла - отдаём файл целиком
+    range_valid = (not if_range or if_range == etag) and (not client_file_id or client_file_id == headers[FILE_ID_HEADER])
+    if byte_range is not None and range_valid:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            headers['Content-Range'] = f'bytes */{size}'
+            f.close()
+            return Response(status=416, headers=headers)
+        start, stop = bounds
+        length = stop - start
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+
+    # Диапазоны - только identity: Content-Range описывает байты исходного файла
+    compress = status == 200 and length >= _GZIP_MIN_BYTES and _accepts_gzip()
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    else:
+        headers['Content-Length'] = str(length)
+
+    return Response(
+        _iter_file_range(f, start, length, compress),
+        status=status,
+        mimetype='text/plain',
+        headers=headers,
+        direct_passthrough=True
+    )
@@ -0,0 +1,489 @@
+"""
+Индекс текстовых логов по времени и идентификаторам
+Логика: файл лога делится на блоки ~Config.LOG_INDEX_BLOCK_BYTES, начинающиеся с
+записи (строки с временем). Для каждого блока хранится контрольная точка
+(время первой записи, смещение в файле), для токенов queue:/object:/user: - список
+блоков, где они встречаются. Запрос "с 10:02 до 10:05 по очереди 12345" бинарным
+поиском выбирает блоки по времени, пересекает их с блоками токенов и читает только
+эти диапазоны байт.
+
+Ротация только переименовывает файлы (RotatingLogFileHandler): app.log пишут несколько
+процессов, и удаление ротированного файла отправило бы их записи в удалённый inode.
+Закрытые поколения (app.log.N, не менявшиеся _COMPRESS_QUIET_SECONDS) сжимает задача
+index_log_files: поблочный gzip, каждый блок - отдельный gzip-member, поэтому блок
+читается и распаковывается независимо (смещения контрольных точек - в сжатом файле).
+Ротация и сжатие сериализуются flock на LOG_FOLDER/.index/rotation.lock.
+
+Индексы лежат в LOG_FOLDER/.index/<dev>-<inode>.json: переименование ротаций inode
+не меняет. Активные файлы доиндексируются инкрементально (фоновая задача
+workers.tasks.index_log_files и перед каждым запросом).
+"""
+import gzip
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import re
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+from app.config import Config
+
+try:
+    import fcntl
+except ImportError:  # не POSIX - без блокировки, как и прежняя ротация
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Файлы логов, доступные для запроса (type -> базовое имя в LOG_FOLDER)
+QUERYABLE_LOG_FILES = {
+    'app': 'app.log',
+    'errors': 'errors.log',
+    'bot': 'bot.log',
+    'bot_errors': 'bot_errors.log',
+    'test_app': 'test_app.log',
+    'test_errors': 'test_errors.log',
+    'test_database': 'test_database.log',
+    'test_api': 'test_api.log',
+    'test_celery': 'test_celery.log',
+    'test_bot': 'test_bot.log',
+    'test_bot_errors': 'test_bot_errors.log',
+    'test_telethon': 'test_telethon.log'
+}
+
+INDEX_DIR_NAME = '.index'
+TOKEN_KINDS = ('queue', 'object', 'user')
+
+# Время записи в обоих форматах app/utils/log_formatters.py (с "[" и без)
+_TS_RE = re.compile(rb'^\[?(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)')
+# "queue 12345", "queue_id=12345", "object АБВ001", "user: 42"
+_TOKEN_RE = re.compile(r'\b(queue|object|user)(?:_id)?\b[\s=:#\'"]*([0-9A-Za-zА-Яа-яЁё]*\d+)\b', re.IGNORECASE)
+# app.log, app.log.3, app.log.3.gz
+_LOG_NAME_RE = re.compile(r'^(?P<base>.+\.log)(?:\.(?P<generation>\d+))?(?P<gz>\.gz)?$')
+
+_READ_CHUNK = 1024 * 1024
+_HEAD_BYTES = 256
+
+# Поколение сжимается, только если в него давно не писали: процесс, не заметивший
+# чужую ротацию, может дописать запись в уже переименованный файл
+_COMPRESS_QUIET_SECONDS = 300
+_ROTATION_LOCK_NAME = 'rotation.lock'
+
+
+def make_token(kind: str, value) -> str:
+    """Токен индекса: queue:12345, object:АБВ001, user:42"""
+    return f'{kind.lower()}:{str(value).strip().upper()}'
+
+
+def line_tokens(line: str) -> set:
+    return {make_token(kind, value) for kind, value in _TOKEN_RE.findall(line)}
+
+
+def normalize_timestamp(value: str):
+    """ISO-время из запроса -> 'YYYY-MM-DD HH:MM:SS' (как в логах); None при ошибке"""
+    from datetime import datetime
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('T', ' ').replace('Z', ''))
+    except ValueError:
+        return None
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _index_path(folder: str, stat) -> str:
+    return os.path.join(folder, INDEX_DIR_NAME, f'{stat.st_dev:x}-{stat.st_ino:x}.json')
+
+
+def _file_head(path: str) -> str:
+    # Защита от повторного использования inode другим файлом
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read(_HEAD_BYTES)).hexdigest()
+
+
+def _load_index(index_path: str):
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_index(index_path: str, index: dict):
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    tmp_path = f'{index_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    # Индекс читают web и воркеры: заменяем атомарно
+    os.replace(tmp_path, index_path)
+
+
+def _new_index(path: str, compressed: bool) -> dict:
+    return {
+        'name': os.path.basename(path),
+        'compressed': compressed,
+        'head': None,
+        'size': 0,
+        'last_ts': None,
+        'blocks': [],
+        'tokens': {}
+    }
+
+
+class _BlockBuilder:
+    """Разбиение потока строк на блоки с контрольными точками и токенами"""
+
+    def __init__(self, index: dict, block_bytes: int):
+        self.index = index
+        self.block_bytes = block_bytes
+        blocks = index['blocks']
+        self.block_start = blocks[-1][1] if blocks else 0
+
+    def add_line(self, raw: bytes, offset: int):
+        index = self.index
+        match = _TS_RE.match(raw)
+        ts = match.group(1).decode('ascii') if match else None
+        blocks = index['blocks']
+        # Новый блок начинается только с записи: продолжения трейсбека остаются со своей строкой
+        if not blocks or (ts and offset - self.block_start >= self.block_bytes):
+            blocks.append([ts or index['last_ts'], offset])
+            self.block_start = offset
+        elif blocks[-1][0] is None and ts:
+            blocks[-1][0] = ts
+        if ts:
+            index['last_ts'] = ts
+
+        block_number = len(blocks) - 1
+        for token in line_tokens(raw.decode('utf-8', errors='replace')):
+            numbers = index['tokens'].setdefault(token, [])
+            if not numbers or numbers[-1] != block_number:
+                numbers.append(block_number)
+
+
+def _index_plain(path: str, index: dict, block_bytes: int) -> bool:
+    """Доиндексировать несжатый файл с index['size']; True, если индекс изменился"""
+    builder = _BlockBuilder(index, block_bytes)
+    changed = False
+    with open(path, 'rb') as f:
+        f.seek(index['size'])
+        offset = index['size']
+        pending = b''
+        while True:
+            chunk = f.read(_READ_CHUNK)
+            if not chunk:
+                break
+            data = pending + chunk
+            lines = data.split(b'\n')
+            # Незавершённую строку проиндексируем в следующий раз
+            pending = lines.pop()
+            for line in lines:
+                builder.add_line(line, offset)
+                offset += len(line) + 1
+                changed = True
+    index['size'] = offset
+    return changed
+
+
+def _index_foreign_gzip(path: str, index: dict):
+    # gzip не нашего формата: смещения внутри не адресуемы - один блок на весь файл
+    builder = _BlockBuilder(index, float('inf'))
+    with gzip.open(path, 'rb') as f:
+        for line in f:
+            builder.add_line(line.rstrip(b'\n'), 0)
+    index['size'] = os.path.getsize(path)
+
+
+def update_index(path: str, block_bytes: int = None) -> dict:
+    """
+    Индекс файла лога (с доиндексацией дописанных строк).
+    Усечённый (deploy.sh) или пересозданный файл индексируется заново.
+    """
+    block_bytes = block_bytes or Config.LOG_INDEX_BLOCK_BYTES
+    folder = os.path.dirname(path)
+    stat = os.stat(path)
+    index_path = _index_path(folder, stat)
+    compressed = path.endswith('.gz')
+    head = _file_head(path) if stat.st_size else None
+
+    index = _load_index(index_path)
+    if (index is None or index.get('compressed') != compressed or index.get('size', 0) > stat.st_size
+            or (index.get('head') and index['head'] != head)):
+        index = _new_index(path, compressed)
+    elif compressed or index['size'] == stat.st_size:
+        return index
+
+    index['name'] = os.path.basename(path)
+    index['head'] = head
+    if compressed:
+        _index_foreign_gzip(path, index)
+        changed = True
+    else:
+        changed = _index_plain(path, index, block_bytes)
+    if changed or not os.path.exists(index_path):
+        _save_index(index_path, index)
+    return index
+
+
+@contextmanager
+def _rotation_lock(folder: str):
+    """Межпроцессная блокировка ротации и сжатия поколений одного каталога логов"""
+    if fcntl is None:
+        yield
+        return
+    lock_dir = os.path.join(folder, INDEX_DIR_NAME)
+    os.makedirs(lock_dir, exist_ok=True)
+    with open(os.path.join(lock_dir, _ROTATION_LOCK_NAME), 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _remove_generation(path: str):
+    for candidate in (path, f'{path}.gz'):
+        if os.path.exists(candidate):
+            os.remove(candidate)
+
+
+class RotatingLogFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler, который сдвигает и несжатые (app.log.N), и сжатые (app.log.N.gz)
+    поколения. Ротация - только переименование под _rotation_lock; сжатие выполняет
+    compress_closed_generations.
+    """
+
+    def doRollover(self):
+        if self.backupCount <= 0:
+            super().doRollover()
+            return
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        base = self.baseFilename
+        with _rotation_lock(os.path.dirname(base)):
+            for generation in range(self.backupCount - 1, 0, -1):
+                for suffix in ('', '.gz'):
+                    source = f'{base}.{generation}{suffix}'
+                    if os.path.exists(source):
+                        _remove_generation(f'{base}.{generation + 1}')
+                        os.rename(source, f'{base}.{generation + 1}{suffix}')
+            _remove_generation(f'{base}.1')
+            if os.path.exists(base):
+                os.rename(base, f'{base}.1')
+        if not self.delay:
+            self.stream = self._open()
+
+
+def _compress_generation(path: str):
+    """
+    app.log.N -> app.log.N.gz поблочным gzip; индекс переносится на сжатый файл
+    со смещениями members. Вызывать под _rotation_lock.
+    """
+    dest = f'{path}.gz'
+    index = update_index(path)
+    blocks = index['blocks']
+    new_blocks = []
+    tmp_path = f'{dest}.{os.getpid()}.tmp'
+    try:
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as out:
+            for number, (ts, offset) in enumerate(blocks):
+                end = blocks[number + 1][1] if number + 1 < len(blocks) else index['size']
+                src.seek(offset)
+                new_blocks.append([ts, out.tell()])
+                out.write(gzip.compress(src.read(end - offset), compresslevel=6, mtime=0))
+            src.seek(index['size'])
+            tail = src.read()
+            if tail:
+                new_blocks.append([index['last_ts'], out.tell()])
+                out.write(gzip.compress(tail, compresslevel=6, mtime=0))
+        os.replace(tmp_path, dest)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    dest_stat = os.stat(dest)
+    compressed_index = dict(index, name=os.path.basename(dest), compressed=True,
+                            head=_file_head(dest), size=dest_stat.st_size, blocks=new_blocks)
+    _save_index(_index_path(os.path.dirname(dest), dest_stat), compressed_index)
+
+    source_index = _index_path(os.path.dirname(path), os.stat(path))
+    os.remove(path)
+    if os.path.exists(source_index):
+        os.remove(source_index)
+
+
+def compress_closed_generations(folder: str) -> int:
+    """Сжать ротированные поколения (app.log.N), в которые давно не писали; число сжатых"""
+    compressed = 0
+    with _rotation_lock(folder):
+        for name in sorted(os.listdir(folder)):
+            match = _LOG_NAME_RE.match(name)
+            if not match or not match.group('generation') or match.group('gz'):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                if time.time() - os.stat(path).st_mtime < _COMPRESS_QUIET_SECONDS:
+                    continue
+                _compress_generation(path)
+                compressed += 1
+            except OSError as e:
+                # Несжатое поколение остаётся рабочим - повторим при следующем запуске
+                logger.warning(f"Failed to compress rotated log {name}: {e}")
+    return compressed
+
+
+def log_generations(folder: str, base_name: str) -> list:
+    """Файлы лога от старых ротаций к активному: app.log.10.gz, ..., app.log.1.gz, app.log"""
+    generations = []
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return []
+    for name in names:
+        match = _LOG_NAME_RE.match(name)
+        if match and match.group('base') == base_name:
+            generations.append((int(match.group('generation') or 0), name))
+    return [os.path.join(folder, name) for _, name in sorted(generations, reverse=True)]
+
+
+def index_log_folder(folder: str = None) -> dict:
+    """Сжать закрытые ротации, доиндексировать все логи каталога и удалить индексы исчезнувших файлов"""
+    folder = folder or Config.LOG_FOLDER
+    stats = {'files': 0, 'removed_indexes': 0, 'compressed': compress_closed_generations(folder)}
+    live_indexes = set()
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if not _LOG_NAME_RE.match(name) or not os.path.isfile(path):
+            continue
+        try:
+            update_index(path)
+            live_indexes.add(os.path.basename(_index_path(folder, os.stat(path))))
+            stats['files'] += 1
+        except OSError as e:
+            # Файл ротирован или удалён между listdir и чтением
+            logger.debug(f"Skipping log {name} during indexing: {e}")
+
+    index_dir = os.path.join(folder, INDEX_DIR_NAME)
+    if os.path.isdir(index_dir):
+        for name in os.listdir(index_dir):
+            if name.endswith('.json') and name not in live_indexes:
+                try:
+                    os.remove(os.path.join(index_dir, name))
+                    stats['removed_indexes'] += 1
+                except OSError:
+                    pass
+    return stats
+
+
+def _candidate_blocks(index: dict, since: str, until: str, tokens) -> list:
+    blocks = index['blocks']
+    if not blocks:
+        return []
+    starts = [block[0] or '' for block in blocks]
+    first = max(bisect_right(starts, since) - 1, 0) if since else 0
+    # +1 блок: записи нескольких процессов в один файл могут идти не строго по времени
+    last = min(bisect_right(starts, until) + 1, len(blocks)) if until else len(blocks)
+    candidates = set(range(first, last))
+    for token in tokens:
+        candidates &= set(index['tokens'].get(token, ()))
+    return sorted(candidates)
+
+
+def _read_block(f, index: dict, number: int) -> bytes:
+    blocks = index['blocks']
+    start = blocks[number][1]
+    end = blocks[number + 1][1] if number + 1 < len(blocks) else index['size']
+    if index['compressed'] and len(blocks) == 1 and start == 0 and end == index['size']:
+        f.seek(0)
+        with gzip.GzipFile(fileobj=f) as archive:
+            return archive.read()
+    f.seek(start)
+    data = f.read(end - start)
+    return gzip.decompress(data) if index['compressed'] else data
+
+
+def _iter_records(data: bytes, fallback_ts):
+    """(время, строки) записей блока: строки без времени относятся к предыдущей записи"""
+    ts, lines = fallback_ts, []
+    for raw in data.split(b'\n'):
+        if not raw.strip():
+            continue
+        match = _TS_RE.match(raw)
+        if match and lines:
+            yield ts, lines
+            lines = []
+        if match:
+            ts = match.group(1).decode('ascii')
+        lines.append(raw.decode('utf-8', errors='replace').rstrip('\r'))
+    if lines:
+        yield ts, lines
+
+
+def query_logs(log_types, since: str = None, until: str = None, tokens=(), pattern=None,
+               limit: int = 500, folder: str = None) -> dict:
+    """
+    Записи логов в интервале [since, until] со всеми токенами (и regex pattern).
+
+    Args:
+        log_types: ключи QUERYABLE_LOG_FILES
+        since, until: 'YYYY-MM-DD HH:MM:SS' (время как в файлах логов)
+        tokens: make_token(...) - запись должна содержать все
+        pattern: скомпилированное регулярное выражение или None
+
+    Returns:
+        {'records': [{'file', 'timestamp', 'text'}], 'truncated', 'stats'} - при усечении
+        по limit остаются самые новые записи (файлы и блоки читаются от новых к старым)
+    """
+    folder = folder or Config.LOG_FOLDER
+    tokens = list(tokens)
+    records = []
+    truncated = False
+    stats = {'files_scanned': 0, 'blocks_read': 0, 'bytes_read': 0}
+
+    for log_type in log_types:
+        found = 0
+        # От новых к старым; в records - в прямом порядке (сортировка ниже устойчива)
+        type_records = []
+        for path in reversed(log_generations(folder, QUERYABLE_LOG_FILES[log_type])):
+            if found >= limit:
+                truncated = True
+                break
+            try:
+                index = update_index(path)
+                blocks = _candidate_blocks(index, since, until, tokens)
+                if not blocks:
+                    continue
+                stats['files_scanned'] += 1
+                with open(path, 'rb') as f:
+                    for number in reversed(blocks):
+                        data = _read_block(f, index, number)
+                        stats['blocks_read'] += 1
+                        stats['bytes_read'] += len(data)
+                        for ts, lines in reversed(list(_iter_records(data, index['blocks'][number][0]))):
+                            if (since and (ts or '') < since) or (until and (ts or '') > until):
+                                continue
+                            text = '\n'.join(lines)
+                            if tokens and not set(tokens) <= line_tokens(text):
+                                continue
+                            if pattern is not None and not pattern.search(text):
+                                continue
+                            type_records.append({'file': os.path.basename(path), 'timestamp': ts, 'text': text})
+                            found += 1
+                            if found >= limit:
+                                truncated = True
+                                break
+                        if found >= limit:
+                            break
+            except (OSError, EOFError, gzip.BadGzipFile) as e:
+                # Файл ротирован во время чтения - пропускаем, данные найдутся в следующей ротации
+                logger.warning(f"Failed to read log {path}: {e}")
+        records.extend(reversed(type_records))
+
+    records.sort(key=lambda record: record['timestamp'] or '')
+    if len(records) > limit:
+        records = records[-limit:]
+        truncated = True
+    return {'records': records, 'truncated': truncated, 'stats': stats}
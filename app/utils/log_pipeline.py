@@ -0,0 +1,276 @@
+"""
+Неблокирующий конвейер логирования и профили детализации
+Логика: логгеры получают один QueueHandler - поток запроса/отправки только кладёт
+запись в очередь, а форматирование и запись в файлы выполняет единственный поток
+QueueListener процесса. Маршрут записи к файлу задаётся фильтром по имени логгера
+(test_database.log - только sqlalchemy.engine и app.database и т.п.).
+
+Профили (production, diagnose, trace) задают уровни логгеров и долю сохраняемых
+записей шумных логгеров (сэмплирование только ниже WARNING, до постановки в очередь).
+Профиль хранится в SystemSetting 'logging_profile' и дублируется в Redis; фоновый
+поток каждого процесса периодически сверяет его - переключение без перезапуска.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SETTING_KEY = 'logging_profile'
+_PROFILE_REDIS_KEY = 'logging:profile'
+
+PROFILES = {
+    'production': {
+        'description': 'Штатная работа: без SQL-запросов и отладки библиотек',
+        'levels': {
+            '': logging.INFO,
+            'sqlalchemy.engine': logging.WARNING,
+            'app.database': logging.INFO,
+            'app.requests': logging.INFO,
+            'celery': logging.INFO,
+            'telethon': logging.INFO,
+            'app.utils.telethon_client': logging.INFO,
+            'telegram': logging.INFO,
+            'httpx': logging.WARNING,
+            'werkzeug': logging.INFO,
+        },
+        'sampling': {},
+    },
+    'diagnose': {
+        'description': 'Отладка приложения; SQL и трафик Telethon - выборочно',
+        'levels': {
+            '': logging.DEBUG,
+            'sqlalchemy.engine': logging.INFO,
+            'app.database': logging.DEBUG,
+            'app.requests': logging.DEBUG,
+            'celery': logging.DEBUG,
+            'telethon': logging.DEBUG,
+            'app.utils.telethon_client': logging.DEBUG,
+            'telegram': logging.INFO,
+            'httpx': logging.INFO,
+            'werkzeug': logging.INFO,
+        },
+        # Доля сохраняемых записей ниже WARNING
+        'sampling': {
+            'sqlalchemy.engine': 0.1,
+            'telethon': 0.2,
+        },
+    },
+    'trace': {
+        'description': 'Всё подряд: каждый SQL-запрос и весь DEBUG Telethon',
+        'levels': {
+            '': logging.DEBUG,
+            'sqlalchemy.engine': logging.INFO,
+            'app.database': logging.DEBUG,
+            'app.requests': logging.DEBUG,
+            'celery': logging.DEBUG,
+            'telethon': logging.DEBUG,
+            'app.utils.telethon_client': logging.DEBUG,
+            'telegram': logging.DEBUG,
+            'httpx': logging.DEBUG,
+            'werkzeug': logging.DEBUG,
+        },
+        'sampling': {},
+    },
+}
+
+DEFAULT_PROFILE = 'production'
+
+
+def _name_matches(name: str, prefixes) -> bool:
+    return any(not prefix or name == prefix or name.startswith(f'{prefix}.') for prefix in prefixes)
+
+
+class LoggerRouteFilter(logging.Filter):
+    """Пропускает записи логгеров include (и их потомков), кроме exclude"""
+
+    def __init__(self, include=None, exclude=None):
+        super().__init__()
+        self.include = tuple(include or ())
+        self.exclude = tuple(exclude or ())
+
+    def filter(self, record):
+        if self.include and not _name_matches(record.name, self.include):
+            return False
+        return not (self.exclude and _name_matches(record.name, self.exclude))
+
+
+class SamplingFilter(logging.Filter):
+    """Сэмплирование шумных логгеров: {префикс логгера: доля сохраняемых записей}"""
+
+    def __init__(self):
+        super().__init__()
+        self.rates = {}
+
+    def filter(self, record):
+        if not self.rates or record.levelno >= logging.WARNING:
+            return True
+        # Самый длинный подходящий префикс: 'telethon.network' точнее 'telethon'
+        rate = None
+        matched = -1
+        for prefix, prefix_rate in self.rates.items():
+            if len(prefix) > matched and _name_matches(record.name, (prefix,)):
+                rate, matched = prefix_rate, len(prefix)
+        return rate is None or random.random() < rate
+
+
+class LogPipeline:
+    """Очередь записей, поток записи в файлы и текущий профиль процесса"""
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = logging.handlers.QueueHandler(self.queue)
+        self.sampling = SamplingFilter()
+        self.queue_handler.addFilter(self.sampling)
+        self.handlers = []
+        self.listener = None
+        self.profile = None
+        self._watcher = None
+        self._watcher_stop = threading.Event()
+
+    def add_route(self, handler, include=None, exclude=None):
+        """Добавить обработчик на стороне потока записи (с маршрутом по имени логгера)"""
+        if include or exclude:
+            handler.addFilter(LoggerRouteFilter(include, exclude))
+        self.handlers.append(handler)
+        if self.listener is not None:
+            # Поток записи читает кортеж обработчиков на каждую запись - замена атомарна
+            self.listener.handlers = tuple(self.handlers)
+
+    def reset_routes(self):
+        """Снять все обработчики потока записи (повторный setup_logging)"""
+        handlers, self.handlers = self.handlers, []
+        if self.listener is not None:
+            self.listener.handlers = ()
+        for handler in handlers:
+            handler.close()
+
+    def attach(self, target_logger):
+        """Подключить логгер к очереди (для логгеров с propagate=False)"""
+        if self.queue_handler not in target_logger.handlers:
+            target_logger.addHandler(self.queue_handler)
+
+    def start(self):
+        if self.listener is None:
+            self.listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+            self.listener.start()
+        if self._watcher is None:
+            self._watcher_stop.clear()
+            self._watcher = threading.Thread(target=self._watch_profile, name='log-profile-watcher', daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        """Дописать очередь в файлы (atexit)"""
+        self._watcher_stop.set()
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def reinit_after_fork(self):
+        # Потоки не переживают fork: очередь и потоки процесса-потомка создаются заново
+        self.queue = queue.SimpleQueue()
+        self.queue_handler.queue = self.queue
+        self.listener = None
+        self._watcher = None
+        self._watcher_stop = threading.Event()
+        self.start()
+
+    def apply_profile(self, name: str) -> bool:
+        """Применить профиль к логгерам процесса; False - неизвестный профиль"""
+        profile = PROFILES.get(name)
+        if profile is None:
+            return False
+        for logger_name, level in profile['levels'].items():
+            logging.getLogger(logger_name or None).setLevel(level)
+        self.sampling.rates = dict(profile['sampling'])
+        if self.profile != name:
+            previous, self.profile = self.profile, name
+            if previous is not None:
+                logger.info(f"Logging profile switched: {previous} -> {name}")
+        return True
+
+    def _watch_profile(self):
+        stop = self._watcher_stop
+        while True:
+            try:
+                name = read_shared_profile()
+                if name and name != self.profile:
+                    self.apply_profile(name)
+            except Exception as e:
+                logger.debug(f"Logging profile check failed: {e}")
+            if stop.wait(Config.LOG_PROFILE_POLL_SECONDS):
+                return
+
+
+_pipeline = None
+
+
+def default_profile() -> str:
+    return Config.LOG_PROFILE if Config.LOG_PROFILE in PROFILES else DEFAULT_PROFILE
+
+
+def get_pipeline() -> LogPipeline:
+    """Конвейер процесса (создаётся и запускается при первом обращении)"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LogPipeline()
+        _pipeline.apply_profile(default_profile())
+        _pipeline.start()
+        atexit.register(_pipeline.stop)
+        os.register_at_fork(after_in_child=_pipeline.reinit_after_fork)
+    return _pipeline
+
+
+def read_shared_profile():
+    """Профиль из Redis; при отсутствии ключа - из SystemSetting (и обратно в Redis)"""
+    from app.utils.redis_client import get_redis
+    try:
+        name = get_redis().get(_PROFILE_REDIS_KEY)
+        if name:
+            return name
+    except Exception:
+        name = None
+    # Профиль ещё не выбирали в админке - общий профиль по умолчанию из Config
+    name = _read_profile_from_db() or default_profile()
+    try:
+        get_redis().set(_PROFILE_REDIS_KEY, name)
+    except Exception:
+        pass
+    return name
+
+
+_profile_engine = None
+
+
+def _read_profile_from_db():
+    # Отдельный engine без пула: поток наблюдателя работает вне контекста Flask
+    global _profile_engine
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.pool import NullPool
+    if _profile_engine is None:
+        _profile_engine = create_engine(Config.SQLALCHEMY_DATABASE_URI, poolclass=NullPool)
+    with _profile_engine.connect() as conn:
+        value = conn.execute(
+            text("SELECT value_json FROM system_settings WHERE key = :key"), {'key': PROFILE_SETTING_KEY}
+        ).scalar()
+    if isinstance(value, dict) and value.get('profile') in PROFILES:
+        return value['profile']
+    return None
+
+
+def publish_profile(name: str):
+    """
+    Разослать профиль процессам (после сохранения SystemSetting) и применить в текущем.
+    Остальные процессы подхватят его за Config.LOG_PROFILE_POLL_SECONDS.
+    """
+    from app.utils.redis_client import get_redis
+    try:
+        get_redis().set(_PROFILE_REDIS_KEY, name)
+    except Exception as e:
+        logger.warning(f"Failed to publish logging profile to Redis: {e}")
+    get_pipeline().apply_profile(name)
@@ -0,0 +1,427 @@
+"""
+Чтение хвоста и слежение за файлами логов (SSE-поток логов)
+Логика: последние N строк читаются блоками с конца файла - стоимость зависит от N,
+а не от размера app.log. Слежение продолжается с позиции (inode, смещение): новые
+данные ждём через inotify на каталоге логов (Linux, через ctypes), без inotify -
+опросом. Ротация RotatingFileHandler (app.log -> app.log.1) распознаётся по смене
+inode: старый файл дочитывается через уже открытый дескриптор, затем открывается новый.
+Фильтрация (regex и минимальный уровень) выполняется на сервере по записям целиком:
+строки трейсбека без уровня относятся к предыдущей записи. Запись, которую фильтр ещё
+держит (ждёт продолжений), не входит в id события - после переподключения она перечитывается.
+"""
+import ctypes
+import ctypes.util
+import glob
+import os
+import re
+import select
+import struct
+import time
+from collections import namedtuple
+
+# Файлы, доступные для потока логов (type -> имя файла в Config.LOG_FOLDER)
+STREAM_LOG_FILES = {
+    'app': 'app.log',
+    'errors': 'errors.log',
+    'bot': 'bot.log',
+    'bot_errors': 'bot_errors.log'
+}
+
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+# Уровень в обоих форматах app/utils/log_formatters.py: "... | WARNING  | ..."
+_LEVEL_RE = re.compile(r'\|\s*(DEBUG|INFO|WARNING|ERROR|CRITICAL)\s*\|')
+
+_BLOCK_SIZE = 64 * 1024
+_MAX_PATTERN_LENGTH = 500
+
+# Позиция в потоке: inode файла и смещение сразу после последней отданной строки
+LogPosition = namedtuple('LogPosition', ['inode', 'offset'])
+
+
+def position_to_event_id(position: LogPosition) -> str:
+    """Позиция -> id события SSE (браузер вернёт его в Last-Event-ID при переподключении)"""
+    return f'{position.inode}:{position.offset}'
+
+
+def position_from_event_id(event_id: str):
+    """id события SSE -> LogPosition; None, если id пустой или не разбирается"""
+    if not event_id:
+        return None
+    try:
+        inode, offset = event_id.split(':', 1)
+        return LogPosition(int(inode), int(offset))
+    except ValueError:
+        return None
+
+
+def sse_event(payload: str, event_id: str = None) -> str:
+    """Одно событие SSE (payload - уже сериализованный JSON)"""
+    if event_id:
+        return f'id: {event_id}\ndata: {payload}\n\n'
+    return f'data: {payload}\n\n'
+
+
+def record_level(line: str):
+    """Уровень записи лога или None для строки-продолжения (трейсбек, многострочное сообщение)"""
+    match = _LEVEL_RE.search(line[:200])
+    return match.group(1) if match else None
+
+
+class LineFilter:
+    """
+    Серверный фильтр записей лога.
+
+    Args:
+        pattern: регулярное выражение (ищется в любой строке записи)
+        min_level: минимальный уровень (DEBUG..CRITICAL)
+
+    Raises:
+        ValueError: некорректное выражение или уровень
+    """
+
+    def __init__(self, pattern: str = None, min_level: str = None):
+        self.regex = None
+        if pattern:
+            if len(pattern) > _MAX_PATTERN_LENGTH:
+                raise ValueError('Pattern is too long')
+            try:
+                self.regex = re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f'Invalid pattern: {e}')
+        self.min_rank = 0
+        if min_level:
+            level = min_level.upper()
+            if level not in LEVELS:
+                raise ValueError(f'Invalid level, expected one of: {", ".join(LEVELS)}')
+            self.min_rank = LEVELS.index(level)
+
+    @classmethod
+    def from_args(cls, args):
+        """Фильтр из параметров запроса grep и level; None, если фильтров нет"""
+        pattern = (args.get('grep') or '').strip()
+        level = (args.get('level') or '').strip()
+        if not pattern and not level:
+            return None
+        return cls(pattern or None, level or None)
+
+    def accepts(self, record_lines) -> bool:
+        """Подходит ли запись (первая строка - заголовок с уровнем)"""
+        if self.min_rank:
+            level = record_level(record_lines[0])
+            if level is None or LEVELS.index(level) < self.min_rank:
+                return False
+        if self.regex is not None:
+            return any(self.regex.search(line) for line in record_lines)
+        return True
+
+
+class _RecordFilter:
+    """
+    Потоковое применение LineFilter: продолжения наследуют решение по своей записи.
+    start - позиция начала ещё не решённой записи: id события не должен её перескакивать,
+    иначе после переподключения запись, удержанная фильтром, потеряется.
+    """
+
+    def __init__(self, line_filter: LineFilter, position: LogPosition):
+        self.line_filter = line_filter
+        self._pending = []
+        self._last = position
+        self.start = position
+
+    def reset(self, position: LogPosition):
+        """Файл открыт заново с position (накопленная запись к нему не относится)"""
+        self._pending = []
+        self._last = self.start = position
+
+    def feed(self, entries) -> list:
+        """entries - [(строка, позиция сразу после неё)]"""
+        # Запись отдаётся, когда пришёл заголовок следующей: до этого у неё могут быть продолжения
+        accepted = []
+        for line, position in entries:
+            if record_level(line) is not None and self._pending:
+                accepted.extend(self._flush())
+            if not self._pending:
+                self.start = self._last
+            self._pending.append(line)
+            self._last = position
+        return accepted
+
+    def flush(self) -> list:
+        return self._flush()
+
+    def _flush(self) -> list:
+        record, self._pending = self._pending, []
+        self.start = self._last
+        if record and self.line_filter.accepts(record):
+            return record
+        return []
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode('utf-8', errors='replace').rstrip('\r')
+
+
+def _reverse_lines(f, end: int):
+    """Строки файла от end к началу (байтовые, без перевода строки)"""
+    position = end
+    remainder = b''
+    while position > 0:
+        size = min(_BLOCK_SIZE, position)
+        position -= size
+        f.seek(position)
+        block = f.read(size) + remainder
+        lines = block.split(b'\n')
+        # Первая строка блока может начинаться в предыдущем блоке
+        remainder = lines.pop(0)
+        for line in reversed(lines):
+            yield line
+    if remainder:
+        yield remainder
+
+
+def tail_lines(path: str, count: int, line_filter: LineFilter = None):
+    """
+    Последние count строк файла (с фильтром - строк подходящих записей).
+
+    Returns:
+        (lines, LogPosition): строки в прямом порядке и позиция для продолжения слежения
+    """
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        end = stat.st_size
+        # Незавершённую последнюю строку не отдаём: её допишет слежение
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b'\n':
+                f.seek(max(end - _BLOCK_SIZE, 0))
+                chunk = f.read(end - f.tell())
+                newline = chunk.rfind(b'\n')
+                end = end - len(chunk) + newline + 1 if newline >= 0 else 0
+
+        result = []
+        pending = []
+        for raw in _reverse_lines(f, end):
+            if len(result) >= count:
+                break
+            line = _decode(raw)
+            if not line.strip():
+                continue
+            if line_filter is None:
+                result.append(line)
+                continue
+            # При обратном чтении продолжения записи приходят раньше её заголовка
+            pending.append(line)
+            if record_level(line) is not None:
+                record = list(reversed(pending))
+                pending = []
+                if line_filter.accepts(record):
+                    result.extend(reversed(record))
+
+    lines = list(reversed(result[:count]))
+    return lines, LogPosition(stat.st_ino, end)
+
+
+class _Inotify:
+    """Минимальная обёртка inotify через libc (без сторонних зависимостей)"""
+
+    _IN_MODIFY = 0x00000002
+    _IN_CLOSE_WRITE = 0x00000008
+    _IN_MOVED_FROM = 0x00000040
+    _IN_MOVED_TO = 0x00000080
+    _IN_CREATE = 0x00000100
+    _IN_DELETE = 0x00000200
+    _EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, directory: str):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        mask = (self._IN_MODIFY | self._IN_CLOSE_WRITE | self._IN_MOVED_FROM
+                | self._IN_MOVED_TO | self._IN_CREATE | self._IN_DELETE)
+        # Следим за каталогом, а не за файлом: после ротации файл с тем же именем - новый inode
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, 'inotify_add_watch failed')
+
+    def read_names(self) -> set:
+        """Имена файлов из накопившихся событий (пустое множество, если событий нет)"""
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            if not data:
+                return names
+            offset = 0
+            while offset + self._EVENT_HEADER.size <= len(data):
+                _, _, _, length = self._EVENT_HEADER.unpack_from(data, offset)
+                offset += self._EVENT_HEADER.size
+                names.add(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+                offset += length
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class LogFollower:
+    """
+    Слежение за файлом лога с позиции position.
+
+    read_new() возвращает новые (отфильтрованные) полные строки; ожидание данных -
+    wait() для синхронного кода или fileno() + read_events() для asyncio.
+    """
+
+    def __init__(self, path: str, position: LogPosition, line_filter: LineFilter = None,
+                 poll_interval: float = 1.0):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.poll_interval = poll_interval
+        self._file = None
+        self._inode = None
+        self._buffer = b''
+        self._open_at(position)
+        self._filter = _RecordFilter(line_filter, self._read_position()) if line_filter else None
+        try:
+            self._inotify = _Inotify(os.path.dirname(path) or '.')
+        except (OSError, AttributeError):
+            # Не Linux или исчерпан лимит inotify - работаем опросом
+            self._inotify = None
+
+    @property
+    def position(self) -> LogPosition:
+        """
+        Позиция для id события SSE: после последней полной строки, а с фильтром -
+        начало записи, которую фильтр ещё держит (её перечитают после переподключения)
+        """
+        if self._filter is not None:
+            return self._filter.start
+        return self._read_position()
+
+    def _read_position(self) -> LogPosition:
+        if self._file is None:
+            return LogPosition(0, 0)
+        return LogPosition(self._inode, self._file.tell() - len(self._buffer))
+
+    def _open_at(self, position: LogPosition):
+        current = self._stat(self.path)
+        if current is None:
+            return
+        if position is not None and position.inode != current.st_ino:
+            # Позиция в файле, который уже ротирован: дочитываем его под новым именем
+            for rotated in sorted(glob.glob(f'{glob.escape(self.path)}.*')):
+                stat = self._stat(rotated)
+                if stat is not None and stat.st_ino == position.inode:
+                    self._open(rotated, min(position.offset, stat.st_size))
+                    return
+            position = None
+        offset = 0
+        if position is not None:
+            # Файл усечён после выдачи позиции - начинаем сначала
+            offset = position.offset if position.offset <= current.st_size else 0
+        self._open(self.path, offset)
+
+    def _open(self, path: str, offset: int):
+        try:
+            self._file = open(path, 'rb')
+        except OSError:
+            self._file = None
+            return
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._file.seek(offset)
+        self._buffer = b''
+
+    @staticmethod
+    def _stat(path: str):
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    def _read_available(self) -> list:
+        """Новые полные строки: [(строка, позиция сразу после неё)]"""
+        entries = []
+        while True:
+            chunk = self._file.read(_BLOCK_SIZE)
+            if not chunk:
+                break
+            data = self._buffer + chunk
+            offset = self._file.tell() - len(data)
+            lines = data.split(b'\n')
+            self._buffer = lines.pop()
+            for line in lines:
+                offset += len(line) + 1
+                if line.strip():
+                    entries.append((_decode(line), LogPosition(self._inode, offset)))
+        return entries
+
+    def read_new(self) -> list:
+        """Новые строки с прошлого вызова (с учётом ротации и усечения файла)"""
+        if self._file is None:
+            self._open_at(None)
+            if self._file is None:
+                return []
+            if self._filter is not None:
+                self._filter.reset(self._read_position())
+
+        entries = self._read_available()
+        current = self._stat(self.path)
+        if current is not None and current.st_ino != self._inode:
+            # Ротация: старый inode дочитан выше через открытый дескриптор
+            if self._buffer.strip():
+                entries.append((_decode(self._buffer), LogPosition(self._inode, self._file.tell())))
+            self._file.close()
+            self._open(self.path, 0)
+            if self._file is not None:
+                entries.extend(self._read_available())
+        elif current is not None and current.st_size < self._file.tell():
+            self._file.seek(0)
+            self._buffer = b''
+            if self._filter is not None:
+                self._filter.reset(self._read_position())
+            entries.extend(self._read_available())
+
+        if self._filter is not None:
+            return self._filter.feed(entries)
+        return [line for line, _ in entries]
+
+    def flush_filtered(self) -> list:
+        """Последняя накопленная фильтром запись (при простое потока)"""
+        return self._filter.flush() if self._filter is not None else []
+
+    def fileno(self):
+        """Дескриптор inotify для loop.add_reader; None - только опрос"""
+        return self._inotify.fd if self._inotify is not None else None
+
+    def read_events(self) -> bool:
+        """Разобрать события inotify; True, если они касаются отслеживаемого файла"""
+        if self._inotify is None:
+            return True
+        return any(name == self.name or name.startswith(f'{self.name}.') for name in self._inotify.read_names())
+
+    def wait(self, timeout: float) -> bool:
+        """Синхронно дождаться изменений файла (не дольше timeout); True - есть изменения"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self._inotify is None:
+                time.sleep(min(self.poll_interval, remaining))
+                return True
+            ready, _, _ = select.select([self._inotify.fd], [], [], remaining)
+            if ready and self.read_events():
+                return True
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
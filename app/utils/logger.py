@@ -11,6 +11,8 @@ from flask import request, g, has_request_context
 from app.database import db
 from app.models.action_log import ActionLog
 from app.config import Config
+from app.utils.log_index import RotatingLogFileHandler
+from app.utils.log_pipeline import get_pipeline
 
 
 class DatabaseLogHandler(logging.Handler):
@@ -51,13 +53,16 @@ class DatabaseLogHandler(logging.Handler):
 
 
 def setup_logging():
-    """Setup centralized logging system with test logs"""
+    """
+    Setup centralized logging system with test logs
+    Логика: файловые обработчики работают в потоке QueueListener (app/utils/log_pipeline.py),
+    логгеры только ставят записи в очередь; уровни задаёт профиль логирования
+    """
     # Create logs directory if it doesn't exist
     os.makedirs(Config.LOG_FOLDER, exist_ok=True)
     
     # Root logger
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.DEBUG)
     
     # Clear existing handlers
     root_logger.handlers.clear()
@@ -66,6 +71,9 @@ def setup_logging():
     from app.utils.log_formatters import get_log_formatters
     detailed_formatter, simple_formatter = get_log_formatters()
     
+    # Логгеры с propagate=False: их записи не должны попадать в общие файлы
+    isolated_loggers = ('sqlalchemy.engine', 'app.database')
+    
     # Console handler (INFO and above)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
@@ -75,7 +83,7 @@ def setup_logging():
     
     # File handler - all logs (rotating, 10MB, 10 files)
     all_logs_file = os.path.join(Config.LOG_FOLDER, 'app.log')
-    file_handler = logging.handlers.RotatingFileHandler(
+    file_handler = RotatingLogFileHandler(
         all_logs_file,
         maxBytes=10 * 1024 * 1024,  # 10MB
         backupCount=10,
@@ -83,10 +91,11 @@ def setup_logging():
     )
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(detailed_formatter)
+    # Ротация только переименовывает; сжатие и индекс ротаций - задача index_log_files
     
     # Error handler - only errors (rotating, 5MB, 5 files)
     error_logs_file = os.path.join(Config.LOG_FOLDER, 'errors.log')
-    error_handler = logging.handlers.RotatingFileHandler(
+    error_handler = RotatingLogFileHandler(
         error_logs_file,
         maxBytes=5 * 1024 * 1024,  # 5MB
         backupCount=5,
@@ -97,118 +106,61 @@ def setup_logging():
     
     # ========== TEST LOGS (cleared on deploy, for AI analysis) ==========
     
-    # Test logs - cleared on each deploy, fresh start for testing
-    test_logs_file = os.path.join(Config.LOG_FOLDER, 'test_app.log')
-    test_file_handler = logging.FileHandler(
-        test_logs_file,
-        mode='a',  # Append mode (will be cleared by deploy.sh)
-        encoding='utf-8'
-    )
-    test_file_handler.setLevel(logging.DEBUG)
-    test_file_handler.setFormatter(detailed_formatter)
+    def test_log_handler(filename, level):
+        # Test logs - cleared on each deploy; между деплоями ограничены по размеру
+        handler = RotatingLogFileHandler(
+            os.path.join(Config.LOG_FOLDER, filename),
+            mode='a',  # Append mode (will be cleared by deploy.sh)
+            maxBytes=Config.TEST_LOG_MAX_BYTES,
+            backupCount=Config.TEST_LOG_BACKUP_COUNT,
+            encoding='utf-8'
+        )
+        handler.setLevel(level)
+        handler.setFormatter(detailed_formatter)
+        return handler
     
-    # Test errors log
-    test_errors_file = os.path.join(Config.LOG_FOLDER, 'test_errors.log')
-    test_error_handler = logging.FileHandler(
-        test_errors_file,
-        mode='a',  # Append mode (will be cleared by deploy.sh)
-        encoding='utf-8'
-    )
-    test_error_handler.setLevel(logging.ERROR)
-    test_error_handler.setFormatter(detailed_formatter)
+    test_file_handler = test_log_handler('test_app.log', logging.DEBUG)
+    test_error_handler = test_log_handler('test_errors.log', logging.ERROR)
     
     # ========== EXTENDED LOGGING ==========
     
-    # Database operations logger (SQLAlchemy queries)
-    db_logs_file = os.path.join(Config.LOG_FOLDER, 'test_database.log')
-    db_file_handler = logging.FileHandler(
-        db_logs_file,
-        mode='a',
-        encoding='utf-8'
-    )
-    db_file_handler.setLevel(logging.INFO)
-    db_file_handler.setFormatter(detailed_formatter)
-    
-    # SQLAlchemy engine logger (SQL queries)
-    sqlalchemy_logger = logging.getLogger('sqlalchemy.engine')
-    sqlalchemy_logger.addHandler(db_file_handler)
-    sqlalchemy_logger.setLevel(logging.INFO)
-    sqlalchemy_logger.propagate = False  # Don't propagate to root
-    
-    # Custom database logger for app.database
-    db_logger = logging.getLogger('app.database')
-    db_logger.addHandler(db_file_handler)
-    db_logger.setLevel(logging.DEBUG)
-    db_logger.propagate = False
+    # Database operations: SQLAlchemy queries + app.database
+    db_file_handler = test_log_handler('test_database.log', logging.INFO)
     
     # API requests/responses logger (detailed)
-    api_logger = logging.getLogger('app.requests')
-    api_logs_file = os.path.join(Config.LOG_FOLDER, 'test_api.log')
-    api_file_handler = logging.FileHandler(
-        api_logs_file,
-        mode='a',
-        encoding='utf-8'
-    )
-    api_file_handler.setLevel(logging.DEBUG)
-    api_file_handler.setFormatter(detailed_formatter)
-    api_logger.addHandler(api_file_handler)
-    api_logger.setLevel(logging.DEBUG)
-    api_logger.propagate = True  # Also propagate to root
+    api_file_handler = test_log_handler('test_api.log', logging.DEBUG)
     
     # Celery tasks logger
-    celery_logger = logging.getLogger('celery')
-    celery_logs_file = os.path.join(Config.LOG_FOLDER, 'test_celery.log')
-    celery_file_handler = logging.FileHandler(
-        celery_logs_file,
-        mode='a',
-        encoding='utf-8'
-    )
-    celery_file_handler.setLevel(logging.DEBUG)
-    celery_file_handler.setFormatter(detailed_formatter)
-    celery_logger.addHandler(celery_file_handler)
-    celery_logger.setLevel(logging.DEBUG)
-    celery_logger.propagate = True
+    celery_file_handler = test_log_handler('test_celery.log', logging.DEBUG)
     
-    # Telethon logger (for user account connections)
-    telethon_logger = logging.getLogger('telethon')
-    telethon_logs_file = os.path.join(Config.LOG_FOLDER, 'test_telethon.log')
-    telethon_file_handler = logging.FileHandler(
-        telethon_logs_file,
-        mode='a',
-        encoding='utf-8'
-    )
-    telethon_file_handler.setLevel(logging.DEBUG)
-    telethon_file_handler.setFormatter(detailed_formatter)
-    telethon_logger.addHandler(telethon_file_handler)
-    telethon_logger.setLevel(logging.DEBUG)
-    telethon_logger.propagate = True  # Also propagate to root for test_app.log
+    # Telethon logger (for user account connections) + app.utils.telethon_client
+    telethon_file_handler = test_log_handler('test_telethon.log', logging.DEBUG)
     
-    # Also add app.utils.telethon_client logger to test_telethon.log
-    telethon_client_logger = logging.getLogger('app.utils.telethon_client')
-    telethon_client_logger.addHandler(telethon_file_handler)
-    telethon_client_logger.setLevel(logging.DEBUG)
-    telethon_client_logger.propagate = True  # Also propagate to root
+    pipeline = get_pipeline()
+    pipeline.reset_routes()
+    pipeline.add_route(console_handler, exclude=isolated_loggers)
+    pipeline.add_route(file_handler, exclude=isolated_loggers)
+    pipeline.add_route(error_handler, exclude=isolated_loggers)
+    pipeline.add_route(test_file_handler, exclude=isolated_loggers)
+    pipeline.add_route(test_error_handler, exclude=isolated_loggers)
+    pipeline.add_route(db_file_handler, include=isolated_loggers)
+    pipeline.add_route(api_file_handler, include=('app.requests',))
+    pipeline.add_route(celery_file_handler, include=('celery',))
+    pipeline.add_route(telethon_file_handler, include=('telethon', 'app.utils.telethon_client'))
     
-    # Database handler for errors
+    pipeline.attach(root_logger)
+    for name in isolated_loggers:
+        isolated_logger = logging.getLogger(name)
+        isolated_logger.propagate = False  # Don't propagate to root
+        pipeline.attach(isolated_logger)
+    
+    # Database handler for errors: пишет в БД из контекста запроса, поэтому остаётся синхронным
     db_handler = DatabaseLogHandler()
     db_handler.setLevel(logging.ERROR)
-    
-    # Add handlers to root logger
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(error_handler)
-    root_logger.addHandler(test_file_handler)
-    root_logger.addHandler(test_error_handler)
     root_logger.addHandler(db_handler)
     
-    # Set levels for third-party libraries
-    # Note: sqlalchemy.engine is handled separately above with test_database.log handler
-    logging.getLogger('werkzeug').setLevel(logging.INFO)  # Changed to INFO for more details
+    # Levels for third-party libraries come from the logging profile (production/diagnose/trace)
     logging.getLogger('sqlalchemy').setLevel(logging.WARNING)  # General SQLAlchemy (warnings only)
-    logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)  # SQL queries go to test_database.log
-    logging.getLogger('telegram').setLevel(logging.INFO)  # Changed to INFO for bot details
-    logging.getLogger('telethon').setLevel(logging.DEBUG)  # DEBUG level for Telethon (user accounts)
-    logging.getLogger('httpx').setLevel(logging.INFO)
     logging.getLogger('asyncio').setLevel(logging.WARNING)
     
     return root_logger
@@ -0,0 +1,317 @@
+"""
+Метрики Prometheus приложения (GET /metrics у web, порт METRICS_PORT у воркеров Celery)
+Логика: gunicorn и Celery работают несколькими процессами, поэтому при заданном
+PROMETHEUS_MULTIPROC_DIR значения пишутся в mmap-файлы каталога, а при отдаче
+MultiProcessCollector суммирует их по всем процессам (мёртвые процессы
+помечаются в child_exit gunicorn и worker_process_shutdown Celery).
+
+Глубина очередей и возраст самой старой готовой строки не накапливаются в процессах,
+а считаются одним GROUP BY при запросе /metrics (с кешем METRICS_QUEUE_CACHE_SECONDS).
+
+Метки ограничены: endpoint - шаблон маршрута Flask, а не путь; метод Bot API - имя
+метода из URL; аккаунт - account_id (их единицы-десятки); обработчик бота - имя функции.
+
+Бот - один процесс без PROMETHEUS_MULTIPROC_DIR, метрики отдаёт на METRICS_PORT.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Интервалы для вызовов API: от быстрых ответов до таймаута requests (30с)
+_API_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Задержка диспетчеризации: секунды (ручные) - десятки минут (ожидание аккаунта/лимитов)
+_LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Время обработки HTTP-запроса',
+    ['method', 'endpoint', 'status']
+)
+CELERY_TASK_DURATION = Histogram(
+    'celery_task_duration_seconds', 'Время выполнения задачи Celery',
+    ['task', 'outcome'], buckets=_API_BUCKETS + (120.0, 300.0)
+)
+CELERY_TASKS = Counter(
+    'celery_tasks_total', 'Завершённые задачи Celery по исходу',
+    ['task', 'outcome']
+)
+DISPATCH_LAG = Histogram(
+    'publication_dispatch_lag_seconds', 'Задержка начала публикации относительно scheduled_time',
+    ['queue'], buckets=_LAG_BUCKETS
+)
+BOT_API_DURATION = Histogram(
+    'telegram_bot_api_request_duration_seconds', 'Время запроса к Bot API',
+    ['method', 'status'], buckets=_API_BUCKETS
+)
+TELETHON_DURATION = Histogram(
+    'telethon_request_duration_seconds', 'Время запроса Telethon (MTProto)',
+    ['method', 'outcome'], buckets=_API_BUCKETS
+)
+FLOOD_WAITS = Counter(
+    'telegram_flood_wait_total', 'Ответы 429 Bot API и FloodWaitError Telethon',
+    ['client', 'method']
+)
+DB_QUERIES = Counter(
+    'db_queries_total', 'SQL-запросы к PostgreSQL (нагрузочный стенд делит их на число публикаций)'
+)
+BOT_HANDLER_DURATION = Histogram(
+    'bot_handler_duration_seconds', 'Время обработчика обновления бота',
+    ['handler', 'outcome'], buckets=_API_BUCKETS
+)
+BOT_UPDATES_WAITING = Gauge(
+    'bot_updates_waiting', 'Обновления бота в ожидании: user - предыдущего обновления того же '
+    'пользователя, slot - свободного слота BOT_CONCURRENT_UPDATES',
+    ['stage'], multiprocess_mode='livesum'
+)
+BOT_UPDATES_RUNNING = Gauge(
+    'bot_updates_running', 'Обновления бота в обработке', multiprocess_mode='livesum'
+)
+
+# Пути, которые не измеряем (как и в log_request/log_response)
+_SKIP_PATH_PREFIXES = ('/static/', '/assets/')
+_SKIP_PATHS = ('/metrics', '/health')
+
+
+def multiprocess_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or None
+
+
+def prepare_multiprocess_dir():
+    """Очистить каталог значений при старте мастер-процесса (gunicorn on_starting, Celery worker_init)"""
+    path = multiprocess_dir()
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith('.db'):
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+
+
+def mark_process_dead(pid: int):
+    """Убрать live-значения завершившегося процесса (счётчики и гистограммы сохраняются)"""
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(pid)
+
+
+def build_registry() -> CollectorRegistry:
+    """Реестр для отдачи: сумма по процессам либо реестр текущего процесса"""
+    if not multiprocess_dir():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+# ---------- HTTP ----------
+
+def register_http_metrics(app):
+    """Гистограмма времени запросов Flask по шаблону маршрута"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop('metrics_started', None)
+        path = request.path or ''
+        if started is None or path in _SKIP_PATHS or path.startswith(_SKIP_PATH_PREFIXES):
+            return response
+        # Шаблон маршрута, а не путь: /system/objects/<object_id> - одна серия
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_DURATION.labels(request.method, endpoint, str(response.status_code)).observe(
+            time.perf_counter() - started
+        )
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        from flask import Response
+        body = generate_latest(build_registry()) + generate_latest(_queue_registry)
+        return Response(body, mimetype=CONTENT_TYPE_LATEST)
+
+
+# ---------- База данных ----------
+
+def _count_db_query(*args, **kwargs):
+    DB_QUERIES.inc()
+
+
+def register_db_query_metrics():
+    """Счётчик запросов всех engine процесса (before_cursor_execute на классе Engine)"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    if not event.contains(Engine, 'before_cursor_execute', _count_db_query):
+        event.listen(Engine, 'before_cursor_execute', _count_db_query)
+
+
+# ---------- Celery ----------
+
+_task_started = {}
+
+
+def task_started(task_id: str):
+    if task_id:
+        _task_started[task_id] = time.perf_counter()
+
+
+def task_finished(task_id: str, task_name: str, state: str):
+    started = _task_started.pop(task_id, None)
+    outcome = (state or 'UNKNOWN').lower()
+    CELERY_TASKS.labels(task_name or 'unknown', outcome).inc()
+    if started is not None:
+        CELERY_TASK_DURATION.labels(task_name or 'unknown', outcome).observe(time.perf_counter() - started)
+
+
+def start_worker_metrics_server(port: int):
+    """HTTP-сервер метрик в главном процессе воркера Celery (дочерние процессы пишут в каталог)"""
+    from prometheus_client import start_http_server
+    start_http_server(port, registry=build_registry())
+    logger.info(f"Celery metrics server listening on :{port}")
+
+
+# ---------- Бот ----------
+
+def start_bot_metrics_server(port: int):
+    """HTTP-сервер метрик бота (очередь обновлений - сумма bot_updates_waiting по stage)"""
+    from prometheus_client import start_http_server
+    start_http_server(port, registry=build_registry())
+    logger.info(f"Bot metrics server listening on :{port}")
+
+
+# ---------- Публикации ----------
+
+def observe_dispatch_lag(queue: str, scheduled_time, now: datetime = None):
+    """Сколько строка ждала после scheduled_time (или created_at для немедленных) до захвата воркером"""
+    if scheduled_time is None:
+        return
+    lag = ((now or datetime.utcnow()) - scheduled_time).total_seconds()
+    DISPATCH_LAG.labels(queue).observe(max(lag, 0.0))
+
+
+def bot_api_method(url: str) -> str:
+    # https://api.telegram.org/bot<token>/sendPhoto -> sendPhoto (токен в метку не попадает)
+    return urlsplit(url).path.rsplit('/', 1)[-1] or 'unknown'
+
+
+def observe_bot_api_response(response):
+    """Длительность и код ответа Bot API (response.elapsed - до получения заголовков)"""
+    method = bot_api_method(response.request.url if response.request is not None else '')
+    BOT_API_DURATION.labels(method, str(response.status_code)).observe(response.elapsed.total_seconds())
+    if response.status_code == 429:
+        FLOOD_WAITS.labels('bot_api', method).inc()
+
+
+def instrument_telethon_client(client):
+    """
+    Обернуть client._call: через него проходит каждый запрос (client(request),
+    send_message, get_entity...). FloodWait ниже flood_sleep_threshold Telethon
+    пересыпает внутри вызова - он попадает в длительность, а не в счётчик.
+    """
+    from telethon.errors import FloodWaitError
+    original_call = client._call
+
+    async def _call(sender, request, ordered=False, flood_sleep_threshold=None):
+        method = type(request).__name__
+        started = time.perf_counter()
+        outcome = 'ok'
+        try:
+            return await original_call(sender, request, ordered=ordered, flood_sleep_threshold=flood_sleep_threshold)
+        except FloodWaitError:
+            outcome = 'flood_wait'
+            FLOOD_WAITS.labels('telethon', method).inc()
+            raise
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            TELETHON_DURATION.labels(method, outcome).observe(time.perf_counter() - started)
+
+    client._call = _call
+    return client
+
+
+# ---------- Глубина очередей (считается при отдаче) ----------
+
+_QUEUE_DEPTH_SQL = """
+    SELECT 'publication_queues' AS source, status, mode, COALESCE(account_id::text, '') AS account,
+           COUNT(*) AS depth,
+           EXTRACT(EPOCH FROM (:now - MIN(COALESCE(scheduled_time, created_at))
+               FILTER (WHERE status = 'pending' AND COALESCE(scheduled_time, created_at) <= :now))) AS oldest_due
+    FROM publication_queues
+    WHERE status NOT IN ('completed', 'failed')
+    GROUP BY status, mode, account_id
+    UNION ALL
+    SELECT 'account_publication_queues', status, 'account', account_id::text,
+           COUNT(*),
+           EXTRACT(EPOCH FROM (:now - MIN(scheduled_time)
+               FILTER (WHERE status = 'pending' AND scheduled_time <= :now)))
+    FROM account_publication_queues
+    WHERE status NOT IN ('completed', 'failed')
+    GROUP BY status, account_id
+"""
+
+
+class QueueDepthCollector:
+    """Глубина очередей по status/mode/account и возраст самой старой готовой pending-строки"""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._rows = []
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch(self):
+        from sqlalchemy import text
+        from app.database import db
+        result = db.session.execute(text(_QUEUE_DEPTH_SQL), {'now': datetime.utcnow()}).fetchall()
+        db.session.rollback()  # только чтение: не оставляем транзакцию открытой
+        return result
+
+    def _cached_rows(self):
+        with self._lock:
+            if time.monotonic() - self._fetched_at >= self.ttl:
+                try:
+                    self._rows = self._fetch()
+                except Exception as e:
+                    logger.warning(f"Queue depth metrics query failed: {e}")
+                self._fetched_at = time.monotonic()
+            return self._rows
+
+    def collect(self):
+        depth = GaugeMetricFamily(
+            'publication_queue_depth', 'Незавершённые строки очередей публикаций',
+            labels=['source', 'status', 'mode', 'account']
+        )
+        oldest = GaugeMetricFamily(
+            'publication_queue_oldest_due_seconds', 'Сколько ждёт самая старая готовая pending-строка',
+            labels=['source', 'mode']
+        )
+        oldest_by_mode = {}
+        for source, status, mode, account, count, oldest_due in self._cached_rows():
+            depth.add_metric([source, status, mode, account], count)
+            if oldest_due is not None:
+                key = (source, mode)
+                oldest_by_mode[key] = max(oldest_by_mode.get(key, 0.0), float(oldest_due))
+        for (source, mode), seconds in oldest_by_mode.items():
+            oldest.add_metric([source, mode], seconds)
+        yield depth
+        yield oldest
+
+
+# Отдельный реестр: значения не пишутся в файлы процессов, а считаются при запросе
+_queue_registry = CollectorRegistry(auto_describe=False)
+_queue_registry.register(QueueDepthCollector(Config.METRICS_QUEUE_CACHE_SECONDS))
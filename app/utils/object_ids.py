@@ -0,0 +1,65 @@
+"""
+Выдача ID объектов недвижимости (префикс + номер)
+Логика: номер берётся из object_id_sequences одним UPDATE ... RETURNING - строка префикса
+блокируется до конца транзакции, поэтому параллельные создания из бота и веба получают
+разные номера. Первая выдача для префикса засевает счётчик максимумом существующих номеров.
+Вызывающий код вставляет объект и коммитит в той же транзакции.
+"""
+from sqlalchemy import text
+
+_INCREMENT_SQL = text(
+    "UPDATE object_id_sequences SET next_value = next_value + 1 "
+    "WHERE prefix = :prefix RETURNING next_value - 1"
+)
+
+# Максимальный числовой суффикс среди существующих объектов префикса (только для засева)
+_MAX_EXISTING_SQL = text(
+    """
+    SELECT MAX(CAST(substring(object_id FROM :suffix_start) AS INTEGER))
+    FROM objects
+    WHERE object_id LIKE :pattern ESCAPE '\\'
+      AND substring(object_id FROM :suffix_start) ~ '^[0-9]+$'
+    """
+)
+
+_SEED_SQL = text(
+    "INSERT INTO object_id_sequences (prefix, next_value) VALUES (:prefix, :next_value) "
+    "ON CONFLICT (prefix) DO NOTHING"
+)
+
+
+def format_object_id(prefix: str, number: int) -> str:
+    """ID объекта: префикс + номер минимум из трёх цифр (АБВ001, АБВ1000)"""
+    return f"{prefix}{number:03d}"
+
+
+def _max_existing_number(db_session, prefix: str) -> int:
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    value = db_session.execute(_MAX_EXISTING_SQL, {
+        'pattern': f'{escaped}%',
+        'suffix_start': len(prefix) + 1,
+    }).scalar()
+    return value or 0
+
+
+def allocate_object_number(db_session, prefix: str) -> int:
+    """
+    Выдать следующий номер объекта для префикса.
+
+    Returns:
+        Номер, уникальный для префикса (строка счётчика заблокирована до commit/rollback)
+    """
+    number = db_session.execute(_INCREMENT_SQL, {'prefix': prefix}).scalar()
+    if number is None:
+        # Первый объект префикса после миграции: засеваем счётчик по существующим объектам
+        db_session.execute(_SEED_SQL, {
+            'prefix': prefix,
+            'next_value': _max_existing_number(db_session, prefix) + 1,
+        })
+        number = db_session.execute(_INCREMENT_SQL, {'prefix': prefix}).scalar()
+    return number
+
+
+def allocate_object_id(db_session, prefix: str) -> str:
+    """Выдать следующий ID объекта для префикса"""
+    return format_object_id(prefix, allocate_object_number(db_session, prefix))
@@ -0,0 +1,79 @@
+"""
+Поиск объектов недвижимости
+Логика: слова запроса ищутся полнотекстово по Object.search_vector (русская морфология,
+GIN-индекс), подстрока - по object_id и address через ILIKE, который обслуживают
+триграммные GIN-индексы pg_trgm. Релевантность и подсвеченные фрагменты считаются
+отдельным запросом только для строк текущей страницы.
+"""
+from sqlalchemy import func, literal, or_
+from app.database import db
+from app.models.object import Object
+
+SEARCH_CONFIG = 'russian'
+
+# Подсветка совпадений: <mark>...</mark>, до двух фрагментов по ~20 слов
+_HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5, FragmentDelimiter=" … "'
+
+
+def _ts_query(term: str):
+    # websearch_to_tsquery понимает "фразы", OR и -исключения и не падает на произвольном вводе
+    return func.websearch_to_tsquery(SEARCH_CONFIG, term)
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def apply_object_search(query, term: str):
+    """Отфильтровать запрос объектов по строке поиска"""
+    term = (term or '').strip()
+    if not term:
+        return query
+    pattern = _like_pattern(term)
+    return query.filter(or_(
+        Object.search_vector.op('@@')(_ts_query(term)),
+        Object.object_id.ilike(pattern, escape='\\'),
+        Object.address.ilike(pattern, escape='\\')
+    ))
+
+
+def search_rank_expression(term: str):
+    """
+    Релевантность объекта: ts_rank_cd по поисковому вектору плюс триграммное
+    сходство с object_id/address (точный ID объекта поднимается наверх)
+    """
+    term = (term or '').strip()
+    return func.ts_rank_cd(Object.search_vector, _ts_query(term)) + func.greatest(
+        func.similarity(Object.object_id, literal(term)),
+        func.similarity(func.coalesce(Object.address, ''), literal(term))
+    )
+
+
+def search_details(object_ids, term: str) -> dict:
+    """
+    Релевантность и подсвеченные фрагменты для объектов страницы.
+
+    Returns:
+        {object_id: {'search_rank': float, 'highlight': {'address': str, 'comment': str}}}
+    """
+    term = (term or '').strip()
+    object_ids = list(object_ids)
+    if not term or not object_ids:
+        return {}
+
+    ts_query = _ts_query(term)
+    rows = db.session.query(
+        Object.object_id,
+        search_rank_expression(term),
+        func.ts_headline(SEARCH_CONFIG, func.coalesce(Object.address, ''), ts_query, _HEADLINE_OPTIONS),
+        func.ts_headline(SEARCH_CONFIG, func.coalesce(Object.comment, ''), ts_query, _HEADLINE_OPTIONS),
+    ).filter(Object.object_id.in_(object_ids)).all()
+
+    return {
+        object_id: {
+            'search_rank': round(float(rank or 0), 4),
+            'highlight': {'address': address_headline, 'comment': comment_headline},
+        }
+        for object_id, rank, address_headline, comment_headline in rows
+    }
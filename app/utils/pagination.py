@@ -0,0 +1,232 @@
+"""
+Keyset (cursor) пагинация списков и оценка общего количества строк
+Логика: вместо OFFSET + COUNT(*) следующая страница выбирается условием
+"строго после последней строки" по (ключ сортировки, первичный ключ); курсор -
+непрозрачная base64-строка с этими значениями. Глубина страницы не влияет на
+стоимость запроса. Общее количество оценивается: без фильтров - по pg_class.reltuples,
+с фильтрами - COUNT(*) с кешированием в Redis на Config.PAGINATION_COUNT_CACHE_SECONDS.
+
+Старый режим page/per_page сохранён (paginate_page): OFFSET остаётся, но COUNT(*)
+заменён той же оценкой.
+"""
+import base64
+import hashlib
+import json
+import logging
+from datetime import datetime, date
+from sqlalchemy import and_, or_, true, false, text
+from app.config import Config
+from app.database import db
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_COUNT_CACHE_PREFIX = 'pagecount:'
+
+
+class CursorError(ValueError):
+    """Курсор повреждён или выдан для другой сортировки"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+
+def encode_cursor(values, sort_key: str, direction: str) -> str:
+    """Курсор из значений ключей последней строки страницы (+ сортировка, для которой он выдан)"""
+    payload = {'k': [_encode_value(value) for value in values], 's': sort_key, 'o': direction}
+    raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort_key: str, direction: str) -> list:
+    """
+    Значения ключей из курсора.
+
+    Raises:
+        CursorError: курсор не разбирается или выдан для другой сортировки
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw.decode('utf-8'))
+        values = [_decode_value(value) for value in payload['k']]
+    except Exception:
+        raise CursorError('Invalid cursor')
+    if payload.get('s') != sort_key or payload.get('o') != direction:
+        raise CursorError('Cursor was issued for a different sort order')
+    return values
+
+
+def _strictly_after(column, value, descending: bool):
+    # Порядок NULL - как у PostgreSQL по умолчанию: ASC NULLS LAST, DESC NULLS FIRST
+    if value is None:
+        return column.isnot(None) if descending else false()
+    if descending:
+        return column < value
+    return or_(column > value, column.is_(None))
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def keyset_filter(columns, values, descending: bool):
+    """
+    Условие "строка идёт строго после (values)" для сортировки по columns
+    в одном направлении: c1 > v1 OR (c1 = v1 AND (c2 > v2 OR ...)).
+    Последней колонкой должен быть уникальный ключ.
+    """
+    condition = None
+    for column, value in reversed(list(zip(columns, values))):
+        after = _strictly_after(column, value, descending)
+        condition = after if condition is None else or_(after, and_(_equal(column, value), condition))
+    return condition if condition is not None else true()
+
+
+def keyset_order_by(columns, descending: bool) -> list:
+    return [column.desc() if descending else column.asc() for column in columns]
+
+
+class KeysetPage:
+    """Страница keyset-пагинации"""
+
+    def __init__(self, items, next_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+def paginate_keyset(query, sort_column, pk_column, sort_key: str, direction: str = 'desc',
+                    per_page: int = 20, cursor: str = None) -> KeysetPage:
+    """
+    Страница query после cursor (первая страница - cursor пустой).
+
+    Args:
+        query: отфильтрованный запрос без order_by
+        sort_column: колонка сортировки (может содержать NULL)
+        pk_column: первичный ключ - разрешает равенство значений сортировки
+        sort_key: имя сортировки из запроса (курсор к ней привязан)
+        direction: 'asc' или 'desc'
+        per_page: размер страницы
+
+    Raises:
+        CursorError: некорректный курсор
+    """
+    descending = direction != 'asc'
+    direction = 'desc' if descending else 'asc'
+    columns = [sort_column, pk_column]
+
+    if cursor:
+        values = decode_cursor(cursor, sort_key, direction)
+        if len(values) != len(columns):
+            raise CursorError('Invalid cursor')
+        query = query.filter(keyset_filter(columns, values, descending))
+
+    # Лишняя строка показывает, есть ли следующая страница, без COUNT
+    rows = query.order_by(*keyset_order_by(columns, descending)).limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            [getattr(last, column.key) for column in columns], sort_key, direction
+        )
+    return KeysetPage(rows, next_cursor, per_page)
+
+
+def estimate_table_rows(table_name: str):
+    """Оценка числа строк таблицы по статистике планировщика (None, если ANALYZE ещё не было)"""
+    row = db.session.execute(
+        text(
+            """
+            SELECT c.relkind, c.reltuples,
+                   (SELECT SUM(GREATEST(p.reltuples, 0))
+                    FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhrelid
+                    WHERE i.inhparent = c.oid)
+            FROM pg_class c
+            WHERE c.relname = :table AND c.relkind IN ('r', 'p')
+            """
+        ),
+        {'table': table_name}
+    ).first()
+    if row is None:
+        return None
+    relkind, reltuples, partitions_reltuples = row
+    # У партиционированной таблицы статистика ведётся по партициям (autovacuum родителя не анализирует)
+    if relkind == 'p':
+        return int(partitions_reltuples or 0)
+    if reltuples is None or reltuples < 0:
+        return None
+    return int(reltuples)
+
+
+def cached_count(query, ttl: int = None) -> int:
+    """COUNT(*) запроса с кешированием в Redis по тексту запроса и параметрам"""
+    ttl = ttl or Config.PAGINATION_COUNT_CACHE_SECONDS
+    statement = query.statement.compile(dialect=db.engine.dialect)
+    digest = hashlib.sha1(
+        (str(statement) + repr(sorted(statement.params.items(), key=lambda item: item[0]))).encode('utf-8')
+    ).hexdigest()
+    key = f'{_COUNT_CACHE_PREFIX}{digest}'
+
+    try:
+        cached = get_redis().get(key)
+        if cached is not None:
+            return int(cached)
+    except Exception as e:
+        logger.debug(f"Count cache unavailable: {e}")
+
+    total = query.order_by(None).count()
+    try:
+        get_redis().set(key, total, ex=ttl)
+    except Exception as e:
+        logger.debug(f"Count cache unavailable: {e}")
+    return total
+
+
+def estimate_total(query, table_name: str) -> int:
+    """
+    Оценка общего количества строк списка.
+    Без фильтров - pg_class.reltuples (мгновенно, точность до последнего autovacuum/ANALYZE),
+    с фильтрами - кешированный COUNT(*).
+    """
+    if query.whereclause is None:
+        estimate = estimate_table_rows(table_name)
+        if estimate is not None:
+            return estimate
+    return cached_count(query)
+
+
+def paginate_page(query, table_name: str, page: int, per_page: int) -> dict:
+    """
+    Режим совместимости page/per_page: OFFSET-страница и оценка total вместо COUNT(*).
+    query должен быть уже отсортирован.
+
+    Returns:
+        {'items', 'total', 'pages'}
+    """
+    page = max(page, 1)
+    per_page = max(per_page, 1)
+    items = query.limit(per_page).offset((page - 1) * per_page).all()
+    total = estimate_total(query, table_name)
+    # Оценка может отставать от реальности - не показываем меньше, чем уже видно
+    total = max(total, (page - 1) * per_page + len(items))
+    pages = (total + per_page - 1) // per_page if total else 0
+    return {'items': items, 'total': total, 'pages': pages}
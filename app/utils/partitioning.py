@@ -0,0 +1,84 @@
+"""
+Помесячное партиционирование таблиц PostgreSQL (PARTITION BY RANGE по дате)
+Логика: партиция на каждый календарный месяц с именем <table>_yYYYYmMM.
+Партиции создаются заранее (CREATE TABLE IF NOT EXISTS ... PARTITION OF), поэтому
+вставка в родительскую таблицу никогда не упирается в отсутствующий диапазон.
+Используется архивом очередей публикаций и publication_history.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+def month_start(value: datetime) -> datetime:
+    """Начало месяца, в который попадает value"""
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Начало месяца, отстоящего от месяца value на months (может быть отрицательным)"""
+    index = value.year * 12 + (value.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    """Имя месячной партиции: publication_history_y2026m10"""
+    return f'{table}_y{month.year:04d}m{month.month:02d}'
+
+
+def list_partitions(connection, table: str) -> list:
+    """Имена существующих партиций таблицы (по pg_inherits)"""
+    rows = connection.execute(text(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :table
+        ORDER BY child.relname
+        """
+    ), {'table': table})
+    return [row[0] for row in rows]
+
+
+def is_partitioned(connection, table: str) -> bool:
+    """Таблица существует и объявлена PARTITION BY (до миграции она может быть обычной)"""
+    return connection.execute(text(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table
+            JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+            WHERE pg_class.relname = :table
+        )
+        """
+    ), {'table': table}).scalar()
+
+
+def ensure_monthly_partitions(connection, table: str, start: datetime, end: datetime) -> list:
+    """
+    Создать недостающие месячные партиции, покрывающие [month_start(start), month_start(end)] включительно.
+
+    Returns:
+        Список имён созданных партиций
+    """
+    existing = set(list_partitions(connection, table))
+    created = []
+
+    month = month_start(start)
+    last = month_start(end)
+    while month <= last:
+        name = partition_name(table, month)
+        if name not in existing:
+            next_month = add_months(month, 1)
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+            ))
+            created.append(name)
+        month = add_months(month, 1)
+
+    if created:
+        logger.info(f"Created {len(created)} partitions for {table}: {', '.join(created)}")
+    return created
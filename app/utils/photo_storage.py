@@ -0,0 +1,383 @@
+"""
+Контентно-адресуемое хранилище фото объектов
+Логика: загруженный файл хешируется (SHA-256) и кладётся в UPLOAD_FOLDER/ab/cd/<sha256>.<ext>;
+повторная загрузка того же фото (копия объявления, повторная отправка в бот) не создаёт
+новый файл. photos_json хранит путь uploads/ab/cd/<sha256>.<ext>; варианты из
+app/utils/photos.py лежат рядом (<sha256>.tg.jpg, <sha256>.thumb.webp) и общие для всех
+объектов с этим фото.
+
+Ссылки: photo_blobs.ref_count - число объектов, у которых фото в photos_json. Счётчик
+меняется ORM-событиями Object в той же транзакции, что и сам объект (старое значение
+photos_json читается из БД до UPDATE/DELETE, поэтому неважно, как оно менялось в сессии).
+Сборщик мусора (collect_photo_garbage) сверяет счётчики с objects, удаляет файлы,
+на которые нет ссылок дольше PHOTO_GC_GRACE_HOURS, и файлы без строки в photo_blobs
+(загрузки, чей объект так и не сохранился; старые плоские файлы без ссылок).
+"""
+import hashlib
+import logging
+import os
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, event, text
+from app.config import Config
+from app.utils.photos import PHOTO_VARIANT_TELEGRAM, PHOTO_VARIANT_THUMB, photo_full_path, photo_original_path
+
+logger = logging.getLogger(__name__)
+
+_UPLOADS_PREFIX = 'uploads/'
+_TMP_DIR = '.tmp'
+_SHA_NAME = re.compile(r'^([0-9a-f]{64})\.')
+_BLOB_PATH = re.compile(r'(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})\.[a-z0-9]+$')
+_SHARD = re.compile(r'^[0-9a-f]{2}$')
+_ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.heic', '.bmp', '.tif', '.tiff'}
+_CHUNK = 1024 * 1024
+
+_REGISTER_SQL = text(
+    "INSERT INTO photo_blobs (sha256, path, size_bytes, ref_count, created_at, unreferenced_since) "
+    "VALUES (:sha256, :path, :size, 0, :now, :now) "
+    # Повторная загрузка файла без ссылок откладывает его удаление сборщиком
+    "ON CONFLICT (sha256) DO UPDATE SET unreferenced_since = CASE "
+    "WHEN photo_blobs.ref_count = 0 THEN EXCLUDED.unreferenced_since ELSE NULL END"
+)
+
+_INCREMENT_SQL = text(
+    "UPDATE photo_blobs SET ref_count = ref_count + 1, unreferenced_since = NULL "
+    "WHERE sha256 IN :shas"
+).bindparams(bindparam('shas', expanding=True))
+
+_DECREMENT_SQL = text(
+    "UPDATE photo_blobs SET ref_count = GREATEST(ref_count - 1, 0), "
+    "unreferenced_since = CASE WHEN ref_count <= 1 THEN :now ELSE unreferenced_since END "
+    "WHERE sha256 IN :shas"
+).bindparams(bindparam('shas', expanding=True))
+
+_STORED_PHOTOS_SQL = text("SELECT photos_json FROM objects WHERE object_id = :object_id")
+
+
+# ---------- Пути ----------
+
+def blob_sha256(photo_path: str):
+    """SHA-256 из пути фото в хранилище (None - путь старого формата)"""
+    match = _BLOB_PATH.search(photo_path or '')
+    return match.group(3) if match else None
+
+
+def blob_relative_path(sha256: str, ext: str) -> str:
+    """Путь оригинала для photos_json: uploads/ab/cd/<sha256>.<ext>"""
+    return f'{_UPLOADS_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}'
+
+
+def normalize_extension(filename: str) -> str:
+    _, ext = os.path.splitext(filename or '')
+    ext = ext.lower()
+    if ext == '.jpeg':
+        ext = '.jpg'
+    return ext if ext in _ALLOWED_EXTENSIONS else '.jpg'
+
+
+def new_temp_path(ext: str = '.jpg') -> str:
+    """Временный файл для загрузки - на том же диске, что и хранилище (os.replace без копирования)"""
+    tmp_dir = os.path.join(Config.UPLOAD_FOLDER, _TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    return os.path.join(tmp_dir, f'{uuid.uuid4().hex}{ext}')
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _existing_original(sha256: str):
+    """Уже сохранённый оригинал с этим хешем (расширение могло быть другим)"""
+    shard_dir = os.path.dirname(photo_full_path(blob_relative_path(sha256, '')))
+    try:
+        names = os.listdir(shard_dir)
+    except FileNotFoundError:
+        return None
+    for name in names:
+        # Оригинал - <sha256>.<ext>; варианты - <sha256>.tg.jpg / <sha256>.thumb.webp
+        if name.startswith(sha256 + '.') and name.count('.') == 1:
+            return f'{_UPLOADS_PREFIX}{sha256[:2]}/{sha256[2:4]}/{name}'
+    return None
+
+
+# ---------- Сохранение ----------
+
+def store_photo_file(session, src_path: str, filename: str = None) -> str:
+    """
+    Переместить временный файл в хранилище и зарегистрировать его в photo_blobs
+    (без commit - строка сохраняется вместе с объектом). Возвращает путь для photos_json.
+    Если такой файл уже есть, временный удаляется.
+    """
+    sha256 = _file_sha256(src_path)
+    size = os.path.getsize(src_path)
+    path = _existing_original(sha256) or blob_relative_path(sha256, normalize_extension(filename or src_path))
+    # Строка блокируется до commit: сборщик мусора не удалит файл, который мы сейчас используем
+    session.execute(_REGISTER_SQL, {'sha256': sha256, 'path': path, 'size': size, 'now': datetime.utcnow()})
+    full_path = photo_full_path(path)
+    if os.path.exists(full_path):
+        os.remove(src_path)
+    else:
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(src_path, full_path)
+    return path
+
+
+def store_photo_stream(session, stream, filename: str) -> str:
+    """Сохранить загрузку (werkzeug FileStorage.stream и т.п.) в хранилище"""
+    tmp_path = new_temp_path(normalize_extension(filename))
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(_CHUNK), b''):
+                f.write(chunk)
+        return store_photo_file(session, tmp_path, filename)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# ---------- Счётчики ссылок ----------
+
+def photo_refs(photos) -> set:
+    """Хеши файлов хранилища в photos_json (пути старого формата не учитываются)"""
+    refs = set()
+    for entry in photos or []:
+        sha256 = blob_sha256(photo_original_path(entry))
+        if sha256:
+            refs.add(sha256)
+    return refs
+
+
+def _apply_ref_delta(connection, added: set, removed: set):
+    if added:
+        connection.execute(_INCREMENT_SQL, {'shas': sorted(added)})
+    if removed:
+        connection.execute(_DECREMENT_SQL, {'shas': sorted(removed), 'now': datetime.utcnow()})
+
+
+def _stored_refs(connection, object_id) -> set:
+    return photo_refs(connection.execute(_STORED_PHOTOS_SQL, {'object_id': object_id}).scalar())
+
+
+def _after_insert(mapper, connection, target):
+    _apply_ref_delta(connection, photo_refs(target.photos_json), set())
+
+
+def _before_update(mapper, connection, target):
+    from sqlalchemy import inspect
+    if not inspect(target).attrs.photos_json.history.has_changes():
+        return
+    old_refs = _stored_refs(connection, target.object_id)
+    new_refs = photo_refs(target.photos_json)
+    _apply_ref_delta(connection, new_refs - old_refs, old_refs - new_refs)
+
+
+def _before_delete(mapper, connection, target):
+    _apply_ref_delta(connection, set(), _stored_refs(connection, target.object_id))
+
+
+_events_registered = False
+
+
+def register_photo_storage_events() -> None:
+    """Вести photo_blobs.ref_count по изменениям objects.photos_json (вызывается из create_app)"""
+    global _events_registered
+    if _events_registered:
+        return
+    from app.models.object import Object
+    event.listen(Object, 'after_insert', _after_insert)
+    event.listen(Object, 'before_update', _before_update)
+    event.listen(Object, 'before_delete', _before_delete)
+    _events_registered = True
+
+
+# ---------- Сборка мусора ----------
+
+def _scan_references(connection):
+    """
+    Все ссылки из objects.photos_json одним проходом:
+    {sha256: число объектов} и множество путей старого формата (вместе с вариантами)
+    """
+    counts = {}
+    legacy_paths = set()
+    result = connection.execution_options(stream_results=True).execute(
+        text("SELECT photos_json FROM objects WHERE photos_json IS NOT NULL")
+    )
+    for (photos,) in result:
+        if not isinstance(photos, list):
+            continue
+        for sha256 in photo_refs(photos):
+            counts[sha256] = counts.get(sha256, 0) + 1
+        for entry in photos:
+            original = photo_original_path(entry)
+            if original and not blob_sha256(original):
+                legacy_paths.add(original)
+                if isinstance(entry, dict):
+                    for variant in (PHOTO_VARIANT_TELEGRAM, PHOTO_VARIANT_THUMB):
+                        if entry.get(variant):
+                            legacy_paths.add(entry[variant])
+    return counts, legacy_paths
+
+
+def reconcile_ref_counts(session, now: datetime, counts: dict) -> int:
+    """
+    Привести ref_count к фактическим ссылкам (страховка от изменений в обход ORM).
+    Строка обновляется, только если счётчик не менялся с момента чтения.
+    """
+    fixed = 0
+    rows = session.execute(text("SELECT sha256, ref_count FROM photo_blobs")).fetchall()
+    known = set()
+    for sha256, ref_count in rows:
+        known.add(sha256)
+        actual = counts.get(sha256, 0)
+        if actual != ref_count:
+            fixed += session.execute(
+                text(
+                    "UPDATE photo_blobs SET ref_count = :actual, unreferenced_since = CASE "
+                    "WHEN :actual = 0 THEN COALESCE(unreferenced_since, :now) ELSE NULL END "
+                    "WHERE sha256 = :sha256 AND ref_count = :old"
+                ),
+                {'actual': actual, 'now': now, 'sha256': sha256, 'old': ref_count}
+            ).rowcount
+    # Файлы хранилища, на которые есть ссылки, но нет строки (сохранены до регистрации)
+    for sha256 in set(counts) - known:
+        path = _existing_original(sha256)
+        if path is None:
+            continue
+        session.execute(
+            text(
+                "INSERT INTO photo_blobs (sha256, path, size_bytes, ref_count, created_at) "
+                "VALUES (:sha256, :path, :size, :refs, :now) ON CONFLICT (sha256) DO NOTHING"
+            ),
+            {'sha256': sha256, 'path': path, 'size': os.path.getsize(photo_full_path(path)),
+             'refs': counts[sha256], 'now': now}
+        )
+        fixed += 1
+    session.commit()
+    return fixed
+
+
+def _remove_blob_files(sha256: str) -> int:
+    """Удалить оригинал и варианты; возвращает освобождённые байты"""
+    shard_dir = os.path.dirname(photo_full_path(blob_relative_path(sha256, '')))
+    freed = 0
+    try:
+        names = os.listdir(shard_dir)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        if name.startswith(sha256 + '.'):
+            full_path = os.path.join(shard_dir, name)
+            try:
+                freed += os.path.getsize(full_path)
+                os.remove(full_path)
+            except FileNotFoundError:
+                pass
+    return freed
+
+
+def _delete_unreferenced_blobs(session, cutoff: datetime, batch_size: int):
+    candidates = [
+        row[0] for row in session.execute(
+            text(
+                "SELECT sha256 FROM photo_blobs WHERE ref_count = 0 AND unreferenced_since < :cutoff "
+                "ORDER BY unreferenced_since LIMIT :limit"
+            ),
+            {'cutoff': cutoff, 'limit': batch_size}
+        )
+    ]
+    if not candidates:
+        return 0, 0
+    # Ссылки перепроверяются по objects непосредственно перед удалением
+    counts, _ = _scan_references(session.connection())
+    candidates = [sha256 for sha256 in candidates if sha256 not in counts]
+    if not candidates:
+        session.rollback()
+        return 0, 0
+    deleted = session.execute(
+        text(
+            "DELETE FROM photo_blobs WHERE sha256 IN :shas AND ref_count = 0 AND unreferenced_since < :cutoff "
+            "RETURNING sha256"
+        ).bindparams(bindparam('shas', expanding=True)),
+        {'shas': candidates, 'cutoff': cutoff}
+    ).fetchall()
+    # Файлы удаляются до commit: пока строки заблокированы, параллельная загрузка того же
+    # фото ждёт на photo_blobs и после commit вернёт файл на место сама
+    freed = sum(_remove_blob_files(row[0]) for row in deleted)
+    session.commit()
+    return len(deleted), freed
+
+
+def _sweep_orphan_files(session, cutoff_ts: float, legacy_paths: set):
+    """
+    Файлы без строки в photo_blobs старше периода ожидания: временные, плоские файлы
+    старого формата без ссылок и файлы хранилища, чья регистрация откатилась
+    """
+    known = {row[0] for row in session.execute(text("SELECT sha256 FROM photo_blobs"))}
+    session.rollback()
+    # Пути старого формата ("uploads/x.jpg", "x.jpg", абсолютные) сравниваются как полные пути
+    # файловой системы через тот же photo_full_path, что и у читателей фото
+    legacy_files = {os.path.realpath(photo_full_path(path)) for path in legacy_paths}
+    root = Config.UPLOAD_FOLDER
+    removed = 0
+    freed = 0
+
+    def _remove_if_stale(full_path):
+        nonlocal removed, freed
+        try:
+            stat = os.stat(full_path)
+            if stat.st_mtime < cutoff_ts:
+                os.remove(full_path)
+                removed += 1
+                freed += stat.st_size
+        except FileNotFoundError:
+            pass
+
+    try:
+        top_entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return 0, 0
+    for entry in top_entries:
+        if entry.name.startswith('.') and entry.name != _TMP_DIR:
+            continue
+        if entry.is_file():
+            if os.path.realpath(entry.path) not in legacy_files:
+                _remove_if_stale(entry.path)
+        elif entry.name == _TMP_DIR:
+            for tmp_entry in os.scandir(entry.path):
+                if tmp_entry.is_file():
+                    _remove_if_stale(tmp_entry.path)
+        elif _SHARD.match(entry.name):
+            for shard in os.scandir(entry.path):
+                if not (shard.is_dir() and _SHARD.match(shard.name)):
+                    continue
+                for blob in os.scandir(shard.path):
+                    match = _SHA_NAME.match(blob.name)
+                    if blob.is_file() and match and match.group(1) not in known:
+                        _remove_if_stale(blob.path)
+    return removed, freed
+
+
+def collect_garbage(session, now: datetime = None) -> dict:
+    """Сверка счётчиков, удаление файлов без ссылок и осиротевших файлов"""
+    now = now or datetime.utcnow()
+    grace = timedelta(hours=Config.PHOTO_GC_GRACE_HOURS)
+    counts, legacy_paths = _scan_references(session.connection())
+    session.rollback()
+
+    stats = {'reconciled': reconcile_ref_counts(session, now, counts)}
+    stats['deleted_blobs'], stats['freed_bytes'] = _delete_unreferenced_blobs(
+        session, now - grace, Config.PHOTO_GC_BATCH_SIZE
+    )
+    stats['orphan_files'], orphan_bytes = _sweep_orphan_files(
+        session, time.time() - grace.total_seconds(), legacy_paths
+    )
+    stats['freed_bytes'] += orphan_bytes
+    stats['stored_bytes'] = int(session.execute(text("SELECT COALESCE(SUM(size_bytes), 0) FROM photo_blobs")).scalar())
+    session.rollback()
+    return stats
@@ -0,0 +1,218 @@
+"""
+Фото объектов: варианты для Telegram и веба
+Логика: загруженный файл (веб или бот) сохраняется как есть в хранилище
+(app/utils/photo_storage.py), затем Celery-задача process_object_photos строит варианты:
+- telegram - JPEG не больше PHOTO_TELEGRAM_MAX_SIDE по длинной стороне (Telegram всё равно
+  пережимает фото до 1280px, отправлять оригинал в десятки мегабайт незачем);
+- thumb - маленький WebP для списков и карточек в вебе.
+Ориентация по EXIF применяется к пикселям (в вариантах EXIF не остаётся).
+
+Элемент photos_json после обработки:
+    {"path": "uploads/ab/cd/<sha256>.jpg", "telegram": "uploads/ab/cd/<sha256>.tg.jpg",
+     "thumb": "uploads/ab/cd/<sha256>.thumb.webp", "width": 4032, "height": 3024}
+Необработанные элементы (строка с путём, dict только с path или legacy file_id) остаются
+рабочими: photo_variant_path откатывается к оригиналу, пока варианта нет.
+"""
+import logging
+import os
+import shutil
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+PHOTO_VARIANT_ORIGINAL = 'path'
+PHOTO_VARIANT_TELEGRAM = 'telegram'
+PHOTO_VARIANT_THUMB = 'thumb'
+
+_UPLOADS_PREFIX = 'uploads/'
+
+
+def photo_full_path(photo_path: str) -> str:
+    """
+    Абсолютный путь файла по пути из photos_json
+    photo_path может быть "uploads/filename.jpg", просто "filename.jpg" или абсолютным
+    """
+    if photo_path.startswith(_UPLOADS_PREFIX):
+        return os.path.join(Config.UPLOAD_FOLDER, photo_path[len(_UPLOADS_PREFIX):])
+    if photo_path.startswith('/'):
+        return photo_path
+    return os.path.join(Config.UPLOAD_FOLDER, photo_path)
+
+
+def photo_original_path(entry) -> str:
+    """Путь оригинала из элемента photos_json ('' - пути нет, например legacy file_id)"""
+    if isinstance(entry, dict):
+        return entry.get(PHOTO_VARIANT_ORIGINAL) or ''
+    if isinstance(entry, str):
+        return entry
+    return ''
+
+
+def photo_variant_path(entry, variant: str = PHOTO_VARIANT_ORIGINAL) -> str:
+    """
+    Путь к варианту фото; если варианта нет (ещё не обработано, файл удалён) - путь оригинала
+    """
+    if isinstance(entry, dict) and variant != PHOTO_VARIANT_ORIGINAL:
+        variant_path = entry.get(variant)
+        if variant_path and os.path.exists(photo_full_path(variant_path)):
+            return variant_path
+    return photo_original_path(entry)
+
+
+def photo_file_id_of(entry):
+    """Legacy file_id Telegram из элемента photos_json"""
+    if isinstance(entry, dict):
+        return entry.get('file_id') or None
+    return None
+
+
+def needs_processing(entry) -> bool:
+    """Есть локальный оригинал, но варианты ещё не построены"""
+    if not photo_original_path(entry):
+        return False
+    return not (isinstance(entry, dict) and entry.get(PHOTO_VARIANT_TELEGRAM))
+
+
+def _variant_relative_path(original_path: str, suffix: str) -> str:
+    stem, _ = os.path.splitext(original_path)
+    return f'{stem}.{suffix}'
+
+
+def _flatten_to_rgb(image):
+    """JPEG без альфа-канала: прозрачность заливаем белым, как это делает Telegram"""
+    from PIL import Image
+    if image.mode == 'RGB':
+        return image
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _save_atomic(image, full_path: str, image_format: str, **options) -> int:
+    """Запись через временный файл: отправка, читающая вариант параллельно, не увидит половину файла"""
+    tmp_path = f'{full_path}.tmp'
+    image.save(tmp_path, image_format, **options)
+    os.replace(tmp_path, full_path)
+    return os.path.getsize(full_path)
+
+
+def process_photo_entry(entry):
+    """
+    Построить варианты одного фото
+    Возвращает новый элемент photos_json или None (файла нет / не изображение) -
+    тогда элемент остаётся прежним и публикации используют оригинал.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    original_path = photo_original_path(entry)
+    full_path = photo_full_path(original_path)
+    if not os.path.exists(full_path):
+        logger.warning(f"Photo file not found for processing: {full_path}")
+        return None
+
+    telegram_path = _variant_relative_path(original_path, 'tg.jpg')
+    thumb_path = _variant_relative_path(original_path, 'thumb.webp')
+
+    Image.MAX_IMAGE_PIXELS = Config.PHOTO_MAX_PIXELS
+    max_side = Config.PHOTO_TELEGRAM_MAX_SIDE
+    try:
+        from app.utils.photo_storage import blob_sha256
+        if (blob_sha256(original_path) and os.path.exists(photo_full_path(telegram_path))
+                and os.path.exists(photo_full_path(thumb_path))):
+            # Файл хранилища уже обработан для другого объекта - варианты общие, перекодировать незачем
+            with Image.open(full_path) as source:
+                width, height = source.size
+                orientation = source.getexif().get(0x0112, 1)
+            return _processed_entry(entry, original_path, telegram_path, thumb_path, width, height, orientation)
+
+        with Image.open(full_path) as source:
+            width, height = source.size
+            source_format = source.format
+            orientation = source.getexif().get(0x0112, 1)
+            if source_format == 'JPEG':
+                # Декодирование сразу в уменьшенном масштабе (1/2..1/8): в разы быстрее и меньше памяти
+                source.draft('RGB', (max_side, max_side))
+            image = _flatten_to_rgb(ImageOps.exif_transpose(source))
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+            telegram_full = photo_full_path(telegram_path)
+            telegram_size = _save_atomic(
+                image, telegram_full, 'JPEG',
+                quality=Config.PHOTO_TELEGRAM_QUALITY, optimize=True, progressive=True, subsampling='4:2:0'
+            )
+            # Уже подходящий JPEG без поворота, который меньше пережатого, отправляем как есть
+            # (жёсткая ссылка: вариант остаётся на своём месте и места на диске не занимает)
+            if (source_format == 'JPEG' and orientation == 1 and max(width, height) <= max_side
+                    and os.path.getsize(full_path) <= telegram_size):
+                os.remove(telegram_full)
+                try:
+                    os.link(full_path, telegram_full)
+                except OSError:
+                    shutil.copyfile(full_path, telegram_full)
+
+            thumb = image.copy()
+            thumb_side = Config.PHOTO_THUMB_MAX_SIDE
+            thumb.thumbnail((thumb_side, thumb_side), Image.LANCZOS)
+            _save_atomic(thumb, photo_full_path(thumb_path), 'WEBP', quality=Config.PHOTO_THUMB_QUALITY, method=4)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        logger.warning(f"Cannot process photo {full_path}: {e}")
+        return None
+
+    return _processed_entry(entry, original_path, telegram_path, thumb_path, width, height, orientation)
+
+
+def _processed_entry(entry, original_path: str, telegram_path: str, thumb_path: str,
+                     width: int, height: int, orientation: int) -> dict:
+    if orientation in (5, 6, 7, 8):
+        # Повёрнутые на 90° - размеры после применения ориентации
+        width, height = height, width
+    processed = dict(entry) if isinstance(entry, dict) else {PHOTO_VARIANT_ORIGINAL: original_path}
+    processed.update({
+        PHOTO_VARIANT_TELEGRAM: telegram_path,
+        PHOTO_VARIANT_THUMB: thumb_path,
+        'width': width,
+        'height': height,
+    })
+    return processed
+
+
+def process_object_photos(session, object_id: str) -> int:
+    """
+    Построить варианты для необработанных фото объекта и записать их в photos_json
+    Картинки обрабатываются вне транзакции; строка объекта блокируется только на запись,
+    и заменяются лишь элементы, чей оригинал всё ещё в photos_json (фото могли заменить,
+    пока шла обработка). Возвращает число обновлённых элементов.
+    """
+    from sqlalchemy.orm.attributes import flag_modified
+    from app.models.object import Object
+
+    photos = session.query(Object.photos_json).filter(Object.object_id == object_id).scalar()
+    session.rollback()
+    processed = {}
+    for entry in photos or []:
+        if needs_processing(entry):
+            result = process_photo_entry(entry)
+            if result is not None:
+                processed[photo_original_path(entry)] = result
+    if not processed:
+        return 0
+
+    obj = session.query(Object).filter(Object.object_id == object_id).with_for_update().first()
+    if obj is None:
+        session.rollback()
+        return 0
+    updated = 0
+    new_photos = []
+    for entry in obj.photos_json or []:
+        result = processed.get(photo_original_path(entry)) if needs_processing(entry) else None
+        if result is not None:
+            updated += 1
+        new_photos.append(result or entry)
+    if updated:
+        obj.photos_json = new_photos
+        flag_modified(obj, 'photos_json')
+    session.commit()
+    return updated
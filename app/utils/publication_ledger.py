@@ -0,0 +1,255 @@
+"""
+Журнал недавних публикаций в Redis (recent-publication ledger)
+Логика: на каждый объект - один hash publedger:<object_id>, поле "<chat_id>:<account_id|bot>"
+хранит время последней публикации (unix-время). Запись делается автоматически после commit
+каждой новой строки publication_history (события SQLAlchemy), ключ живёт 2 окна дубликатов.
+Проверка одного чата или сотни чатов плана - один HMGET, без запросов к БД.
+
+Пока журнал не прогрет (после сброса Redis или сбоя записи) проверки идут в publication_history
+одним запросом; задача warm_publication_ledger заполняет журнал из истории за окно.
+"""
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from app.config import Config
+from app.database import db
+from app.models.publication_history import PublicationHistory
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = 'publedger:'
+# Маркер "журнал полный": ставится прогревом, снимается при любом сбое записи
+_WARM_KEY = 'publedger:warm'
+_BOT = 'bot'
+
+_events_registered = False
+
+
+def _key(object_id: str) -> str:
+    return f'{_KEY_PREFIX}{object_id}'
+
+
+def _field(chat_id: int, account_id: int = None) -> str:
+    return f'{chat_id}:{account_id if account_id is not None else _BOT}'
+
+
+def _ttl_seconds() -> int:
+    return Config.PUBLICATION_DUPLICATE_WINDOW_HOURS * 2 * 3600
+
+
+def _default_since() -> datetime:
+    return datetime.utcnow() - timedelta(hours=Config.PUBLICATION_DUPLICATE_WINDOW_HOURS)
+
+
+def _epoch(value: datetime) -> int:
+    return int((value - datetime(1970, 1, 1)).total_seconds())
+
+
+def _from_epoch(value) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(seconds=int(value))
+
+
+def record_publications(entries) -> bool:
+    """
+    Записать публикации в журнал одним pipeline.
+
+    Args:
+        entries: итерируемое (object_id, chat_id, account_id, published_at)
+
+    Returns:
+        False, если запись не удалась (журнал помечен непрогретым)
+    """
+    entries = list(entries)
+    if not entries:
+        return True
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for object_id, chat_id, account_id, published_at in entries:
+            key = _key(object_id)
+            pipe.hset(key, _field(chat_id, account_id), _epoch(published_at or datetime.utcnow()))
+            pipe.expire(key, _ttl_seconds())
+        pipe.execute()
+        return True
+    except Exception as e:
+        # Журнал стал неполным - до следующего прогрева проверки пойдут в БД
+        logger.warning(f"Failed to record {len(entries)} publications in ledger: {e}")
+        _mark_cold()
+        return False
+
+
+def forget_publications(entries) -> None:
+    """Убрать публикации из журнала (сообщение удалено - дубликатом больше не считается)"""
+    entries = list(entries)
+    if not entries:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for object_id, chat_id, account_id in entries:
+            pipe.hdel(_key(object_id), _field(chat_id, account_id))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to forget {len(entries)} publications in ledger: {e}")
+        _mark_cold()
+
+
+def _mark_cold() -> None:
+    try:
+        get_redis().delete(_WARM_KEY)
+    except Exception:
+        pass
+
+
+def _check_many_db(object_id: str, chat_ids, account_id: int, since: datetime) -> dict:
+    """Запасной путь: один запрос к publication_history на весь список чатов"""
+    query = db.session.query(
+        PublicationHistory.chat_id,
+        func.max(PublicationHistory.published_at)
+    ).filter(
+        PublicationHistory.object_id == object_id,
+        PublicationHistory.chat_id.in_(chat_ids),
+        PublicationHistory.published_at >= since,
+        PublicationHistory.deleted == False
+    )
+    if account_id is not None:
+        query = query.filter(PublicationHistory.account_id == account_id)
+    else:
+        query = query.filter(PublicationHistory.account_id.is_(None))
+    return dict(query.group_by(PublicationHistory.chat_id).all())
+
+
+def check_many(object_id: str, chat_ids, account_id: int = None, since: datetime = None) -> dict:
+    """
+    Какие из чатов уже получали этот объект (через этот аккаунт или бота) начиная с since.
+
+    Args:
+        object_id: ID объекта
+        chat_ids: ID чатов (chats.chat_id)
+        account_id: ID аккаунта; None - публикации бота
+        since: начало окна (по умолчанию now - PUBLICATION_DUPLICATE_WINDOW_HOURS)
+
+    Returns:
+        {chat_id: published_at} только для чатов с публикацией в окне
+    """
+    chat_ids = list(dict.fromkeys(chat_ids))
+    if not chat_ids:
+        return {}
+    since = since or _default_since()
+
+    try:
+        client = get_redis()
+        pipe = client.pipeline(transaction=False)
+        pipe.exists(_WARM_KEY)
+        pipe.hmget(_key(object_id), [_field(chat_id, account_id) for chat_id in chat_ids])
+        warm, values = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Ledger unavailable, checking duplicates in DB: {e}")
+        return _check_many_db(object_id, chat_ids, account_id, since)
+
+    if not warm:
+        return _check_many_db(object_id, chat_ids, account_id, since)
+
+    since_epoch = _epoch(since)
+    recent = {}
+    for chat_id, value in zip(chat_ids, values):
+        if value is not None and int(value) >= since_epoch:
+            recent[chat_id] = _from_epoch(value)
+    return recent
+
+
+def last_published_at(object_id: str, chat_id: int, account_id: int = None, since: datetime = None):
+    """Время публикации объекта в чат в окне или None (одиночная проверка)"""
+    return check_many(object_id, [chat_id], account_id, since).get(chat_id)
+
+
+def warm_ledger(db_session, batch_size: int = 5000) -> int:
+    """
+    Заполнить журнал из publication_history за окно дубликатов и поставить маркер прогрева.
+    Маркер снимается перед загрузкой, чтобы параллельные проверки шли в БД, пока журнал неполный.
+
+    Returns:
+        Количество загруженных публикаций
+    """
+    client = get_redis()
+    client.delete(_WARM_KEY)
+
+    since = _default_since()
+    query = db_session.query(
+        PublicationHistory.object_id,
+        PublicationHistory.chat_id,
+        PublicationHistory.account_id,
+        PublicationHistory.published_at
+    ).filter(
+        PublicationHistory.published_at >= since,
+        PublicationHistory.deleted == False
+    ).order_by(PublicationHistory.published_at.asc())
+
+    loaded = 0
+    complete = True
+    batch = []
+    for row in query.yield_per(batch_size):
+        batch.append(tuple(row))
+        if len(batch) >= batch_size:
+            complete = record_publications(batch) and complete
+            loaded += len(batch)
+            batch = []
+    if batch:
+        complete = record_publications(batch) and complete
+        loaded += len(batch)
+
+    if complete:
+        client.set(_WARM_KEY, datetime.utcnow().isoformat())
+    return loaded
+
+
+def is_warm() -> bool:
+    """Журнал прогрет и считается полным"""
+    try:
+        return bool(get_redis().exists(_WARM_KEY))
+    except Exception:
+        return False
+
+
+def _collect_pending(session):
+    return session.info.setdefault('publication_ledger', {'record': [], 'forget': []})
+
+
+def _after_insert(mapper, connection, target):
+    # Сессию берём из объекта: запись в Redis только после успешного commit
+    from sqlalchemy.orm import object_session
+    session = object_session(target)
+    if session is not None and not target.deleted:
+        _collect_pending(session)['record'].append(
+            (target.object_id, target.chat_id, target.account_id, target.published_at)
+        )
+
+
+def _after_update(mapper, connection, target):
+    from sqlalchemy.orm import object_session
+    session = object_session(target)
+    if session is not None and target.deleted:
+        _collect_pending(session)['forget'].append((target.object_id, target.chat_id, target.account_id))
+
+
+def _after_commit(session):
+    pending = session.info.pop('publication_ledger', None)
+    if pending:
+        record_publications(pending['record'])
+        forget_publications(pending['forget'])
+
+
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop('publication_ledger', None)
+
+
+def register_ledger_events() -> None:
+    """Подписать журнал на вставки/удаления publication_history (вызывается из create_app)"""
+    global _events_registered
+    if _events_registered:
+        return
+    event.listen(PublicationHistory, 'after_insert', _after_insert)
+    event.listen(PublicationHistory, 'after_update', _after_update)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_soft_rollback', _after_soft_rollback)
+    _events_registered = True
@@ -0,0 +1,119 @@
+"""
+Классы приоритета публикаций (priority lanes)
+Логика: каждая строка publication_queues относится к одному из классов
+(interactive / scheduled / autopublish). У каждого класса своя Celery-очередь
+и свои воркеры, поэтому ручная публикация не ждёт за тысячами автопубликаций.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import case, func
+
+PRIORITY_INTERACTIVE = 'interactive'  # Ручная публикация ("опубликовать сейчас")
+PRIORITY_SCHEDULED = 'scheduled'      # Публикация на конкретное время
+PRIORITY_AUTOPUBLISH = 'autopublish'  # Ежедневная автопубликация (фоновый поток)
+
+# Порядок важен: диспетчер всегда разбирает классы слева направо
+PRIORITY_ORDER = (PRIORITY_INTERACTIVE, PRIORITY_SCHEDULED, PRIORITY_AUTOPUBLISH)
+
+# Отдельная Celery-очередь на каждый класс (воркеры резервируются в docker-compose.yml)
+PRIORITY_CELERY_QUEUES = {
+    PRIORITY_INTERACTIVE: 'publish_interactive',
+    PRIORITY_SCHEDULED: 'publish_scheduled',
+    PRIORITY_AUTOPUBLISH: 'publish_autopublish',
+}
+
+# Очередь диспетчера срочных классов (process_scheduled_publications): её разбирает
+# тот же воркер, что и срочные классы, - диспетчер не ждёт за служебными задачами
+DISPATCH_CELERY_QUEUE = 'publish_dispatch'
+
+# Соответствие режима очереди (PublicationQueue.mode) классу приоритета
+_MODE_TO_PRIORITY = {
+    'immediate': PRIORITY_INTERACTIVE,
+    'scheduled': PRIORITY_SCHEDULED,
+    'autopublish': PRIORITY_AUTOPUBLISH,
+}
+
+
+def priority_for_mode(mode: str) -> str:
+    """Класс приоритета для режима публикации (неизвестный режим -> самый низкий класс)"""
+    return _MODE_TO_PRIORITY.get(mode, PRIORITY_AUTOPUBLISH)
+
+
+def celery_queue_for_priority(priority: str) -> str:
+    """Имя Celery-очереди для класса приоритета"""
+    return PRIORITY_CELERY_QUEUES.get(priority, PRIORITY_CELERY_QUEUES[PRIORITY_AUTOPUBLISH])
+
+
+def priority_rank(priority_column):
+    """
+    SQL-выражение ранга приоритета (0 = самый срочный) для ORDER BY.
+    Нужно, чтобы диспетчер выбирал сначала interactive, потом scheduled, потом autopublish.
+    """
+    return case(
+        {name: rank for rank, name in enumerate(PRIORITY_ORDER)},
+        value=priority_column,
+        else_=len(PRIORITY_ORDER),
+    )
+
+
+def get_priority_latency_stats(db_session, hours: int = 24) -> dict:
+    """
+    Сквозная задержка по классам приоритета за последние `hours` часов.
+
+    pickup — от плановой точки (scheduled_time или created_at) до начала обработки воркером;
+    end_to_end — от плановой точки до успешной отправки.
+    Возвращает {priority: {count, pending, pickup_p50, pickup_p95, end_to_end_p50, end_to_end_p95, end_to_end_max}} в секундах.
+    """
+    from app.models.publication_queue import PublicationQueue
+
+    since = datetime.utcnow() - timedelta(hours=hours)
+    planned_at = func.coalesce(PublicationQueue.scheduled_time, PublicationQueue.created_at)
+    pickup = func.extract('epoch', PublicationQueue.started_at - planned_at)
+    end_to_end = func.extract('epoch', PublicationQueue.completed_at - planned_at)
+
+    rows = db_session.query(
+        PublicationQueue.priority,
+        func.count(PublicationQueue.queue_id),
+        func.percentile_cont(0.5).within_group(pickup),
+        func.percentile_cont(0.95).within_group(pickup),
+        func.percentile_cont(0.5).within_group(end_to_end),
+        func.percentile_cont(0.95).within_group(end_to_end),
+        func.max(end_to_end),
+    ).filter(
+        PublicationQueue.status == 'completed',
+        PublicationQueue.completed_at >= since,
+    ).group_by(PublicationQueue.priority).all()
+
+    pending_rows = db_session.query(
+        PublicationQueue.priority,
+        func.count(PublicationQueue.queue_id),
+    ).filter(
+        PublicationQueue.status == 'pending',
+    ).group_by(PublicationQueue.priority).all()
+    pending = dict(pending_rows)
+
+    def _round(value):
+        return round(float(value), 2) if value is not None else None
+
+    stats = {
+        priority: {
+            'count': 0,
+            'pending': pending.get(priority, 0),
+            'pickup_p50': None,
+            'pickup_p95': None,
+            'end_to_end_p50': None,
+            'end_to_end_p95': None,
+            'end_to_end_max': None,
+        }
+        for priority in PRIORITY_ORDER
+    }
+    for priority, count, pickup_p50, pickup_p95, e2e_p50, e2e_p95, e2e_max in rows:
+        stats[priority or PRIORITY_AUTOPUBLISH] = {
+            'count': count,
+            'pending': pending.get(priority, 0),
+            'pickup_p50': _round(pickup_p50),
+            'pickup_p95': _round(pickup_p95),
+            'end_to_end_p50': _round(e2e_p50),
+            'end_to_end_p95': _round(e2e_p95),
+            'end_to_end_max': _round(e2e_max),
+        }
+    return stats
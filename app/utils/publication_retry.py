@@ -0,0 +1,172 @@
+"""
+Политика повторных попыток для публикаций через Bot API
+Логика: каждая ошибка отправки классифицируется как
+- rate_limited — 429 "Too Many Requests: retry after N" → повтор ровно через retry_after;
+- retryable — сетевые ошибки, таймауты, 5xx → повтор с экспоненциальной задержкой и jitter;
+- permanent — чат недоступен боту навсегда ("chat not found", "bot was kicked" и т.п.) →
+  задача проваливается сразу, а чат массово деактивируется и выпадает из подбора чатов.
+Бюджет попыток и границы задержки задаются в Config (PUBLICATION_RETRY_*); переносы
+по rate limit попыток не расходуют, но подряд их не больше PUBLICATION_RETRY_MAX_RATE_LIMITED.
+"""
+import random
+from datetime import datetime
+from app.config import Config
+
+ERROR_RATE_LIMITED = 'rate_limited'
+ERROR_RETRYABLE = 'retryable'
+ERROR_PERMANENT = 'permanent'
+
+# Фрагменты description Bot API, после которых чат бесполезен для бота.
+# Сравнение по lower-case подстроке: Telegram меняет префиксы ("Bad Request:", "Forbidden:")
+_CHAT_GONE_MARKERS = (
+    'chat not found',
+    'bot was kicked',
+    'bot is not a member',
+    'bot was blocked by the user',
+    'have no rights to send',
+    'not enough rights to send',
+    'need administrator rights',
+    'chat_write_forbidden',
+    'channel_private',
+    'group chat was upgraded to a supergroup',
+    'chat was deleted',
+    'user is deactivated',
+)
+
+# Ошибки запроса, которые не исправятся повтором, но чат при этом рабочий
+_PERMANENT_REQUEST_MARKERS = (
+    "can't parse entities",
+    'message caption is too long',
+    'message is too long',
+    'wrong file identifier',
+    'wrong remote file identifier',
+    'photo_invalid_dimensions',
+    'image_process_failed',
+)
+
+# Сколько записей истории попыток храним в строке очереди
+_MAX_HISTORY_ENTRIES = 20
+
+
+def classify_bot_api_error(status_code: int = None, description: str = None, retry_after: int = None) -> str:
+    """
+    Классифицировать ошибку Bot API.
+
+    Args:
+        status_code: HTTP-код / error_code из ответа (None для сетевых ошибок)
+        description: description из ответа Bot API или текст исключения
+        retry_after: parameters.retry_after из ответа (если есть)
+    """
+    text = (description or '').lower()
+
+    if status_code == 429 or retry_after:
+        return ERROR_RATE_LIMITED
+    if any(marker in text for marker in _CHAT_GONE_MARKERS):
+        return ERROR_PERMANENT
+    if any(marker in text for marker in _PERMANENT_REQUEST_MARKERS):
+        return ERROR_PERMANENT
+    if status_code in (400, 401, 403, 404):
+        # Прочие клиентские ошибки повтором не лечатся
+        return ERROR_PERMANENT
+    # 5xx, таймауты, обрывы соединения и всё неизвестное — пробуем ещё раз
+    return ERROR_RETRYABLE
+
+
+def is_chat_gone_error(description: str = None) -> bool:
+    """Ошибка означает, что бот больше не может писать в этот чат (нужна деактивация чата)"""
+    text = (description or '').lower()
+    return any(marker in text for marker in _CHAT_GONE_MARKERS)
+
+
+def compute_retry_delay(attempt: int, retry_after: int = None) -> float:
+    """
+    Задержка перед следующей попыткой в секундах.
+
+    При rate limit уважаем retry_after от Telegram (+ небольшой jitter, чтобы задачи
+    одного всплеска не вернулись одновременно). Иначе — capped exponential backoff
+    с full jitter: random(0, min(cap, base * 2^(attempt-1))).
+    """
+    if retry_after:
+        return float(retry_after) + random.uniform(0, Config.PUBLICATION_RETRY_JITTER_SECONDS)
+
+    exponent = max(attempt - 1, 0)
+    ceiling = min(
+        Config.PUBLICATION_RETRY_MAX_DELAY_SECONDS,
+        Config.PUBLICATION_RETRY_BASE_DELAY_SECONDS * (2 ** exponent)
+    )
+    # Нижняя граница — base, чтобы не уйти в немедленный повтор
+    return max(float(Config.PUBLICATION_RETRY_BASE_DELAY_SECONDS), random.uniform(0, ceiling))
+
+
+def has_retry_budget(attempts: int) -> bool:
+    """Остались ли попытки (attempts — уже выполненные неудачные попытки)"""
+    return attempts < Config.PUBLICATION_RETRY_MAX_ATTEMPTS
+
+
+def has_rate_limit_budget(history) -> bool:
+    """
+    Можно ли ещё раз перенести задачу по rate limit: считаются подряд идущие rate_limited
+    в конце истории попыток (чат, который отвечает 429 бесконечно, не должен висеть в очереди вечно)
+    """
+    consecutive = 0
+    for entry in reversed(history or []):
+        if entry.get('outcome') != ERROR_RATE_LIMITED:
+            break
+        consecutive += 1
+    return consecutive < Config.PUBLICATION_RETRY_MAX_RATE_LIMITED
+
+
+def append_attempt_history(history, outcome: str, error: str = None, retry_after: int = None,
+                           delay_seconds: float = None) -> list:
+    """
+    Добавить запись о попытке в историю (новый список — чтобы SQLAlchemy увидел изменение JSON).
+    Храним только последние _MAX_HISTORY_ENTRIES записей.
+    """
+    entry = {
+        'at': datetime.utcnow().isoformat(),
+        'outcome': outcome,
+    }
+    if error:
+        entry['error'] = error[:500]
+    if retry_after:
+        entry['retry_after'] = retry_after
+    if delay_seconds is not None:
+        entry['delay_seconds'] = round(delay_seconds, 1)
+
+    entries = list(history or [])
+    entries.append(entry)
+    return entries[-_MAX_HISTORY_ENTRIES:]
+
+
+def deactivate_chats_bulk(db_session, chat_ids, reason: str) -> int:
+    """
+    Массово деактивировать чаты, в которые бот больше не может писать,
+    и провалить их pending-задачи бота одним UPDATE на таблицу.
+    Деактивированные чаты не попадают в _get_matching_bot_chats_for_object.
+
+    Returns:
+        Количество деактивированных чатов
+    """
+    from app.models.chat import Chat
+    from app.models.publication_queue import PublicationQueue
+
+    chat_ids = list({chat_id for chat_id in chat_ids if chat_id is not None})
+    if not chat_ids:
+        return 0
+
+    deactivated = db_session.query(Chat).filter(
+        Chat.chat_id.in_(chat_ids),
+        Chat.is_active == True
+    ).update({'is_active': False}, synchronize_session=False)
+
+    db_session.query(PublicationQueue).filter(
+        PublicationQueue.chat_id.in_(chat_ids),
+        PublicationQueue.type == 'bot',
+        PublicationQueue.status == 'pending'
+    ).update({
+        'status': 'failed',
+        'error_message': f'Chat deactivated: {reason}'[:500]
+    }, synchronize_session=False)
+
+    db_session.commit()
+    return deactivated
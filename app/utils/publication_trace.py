@@ -0,0 +1,369 @@
+"""
+Трассировка публикаций по этапам
+Логика: задача отправки отмечает контрольные точки (trace.mark('db_load') и т.д.) - время
+с предыдущей точки относится к названному этапу, поэтому тело задачи не нужно оборачивать
+в блоки. Ожидание до начала задачи восстанавливается по меткам времени:
+    queue_wait - от scheduled_time/created_at до постановки в Celery (для аккаунтов - до задачи);
+    pickup     - от постановки в Celery до начала задачи (enqueued_at в аргументах задачи).
+Этапы внутри отправки: claim, db_load, render, rate_limit_wait, connect, upload, api_call, commit.
+
+Текущая трасса хранится в contextvar: send_object_message отмечает свои этапы через
+mark_stage(), не зная о вызывающей задаче (вызовы из админки трассу не пишут).
+По завершении в publication_traces пишется одна строка (INSERT ... SELECT из строки очереди:
+object/chat/account и итоговый статус берутся из неё же). При заданном
+PUBLICATION_TRACE_OTLP_ENDPOINT трассы дополнительно отправляются в OTLP/HTTP коллектор
+(JSON, фоновый поток, без зависимости от opentelemetry-sdk).
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+SOURCE_BOT = 'bot'
+SOURCE_ACCOUNT = 'account'
+
+_SOURCE_TABLES = {
+    SOURCE_BOT: ('publication_queues', 'q.priority'),
+    SOURCE_ACCOUNT: ('account_publication_queues', 'NULL'),
+}
+
+STAGES = (
+    'queue_wait', 'pickup', 'claim', 'db_load', 'render',
+    'rate_limit_wait', 'connect', 'upload', 'api_call', 'commit'
+)
+
+_current_trace = contextvars.ContextVar('publication_trace', default=None)
+
+
+def _epoch(value: datetime) -> float:
+    # Время в БД - наивное UTC
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+class TraceRecorder:
+    """Контрольные точки одной попытки публикации"""
+
+    def __init__(self, source: str, queue_id: int, enqueued_at: float = None):
+        self.source = source
+        self.queue_id = queue_id
+        self.enqueued_at = enqueued_at
+        self.started = time.time()
+        self.planned_at = None
+        self.stages = {}
+        self.spans = []  # [(этап, начало, конец)] в секундах epoch - для OTLP
+        self.discarded = False
+        self.token = None
+        self._last = self.started
+
+    def _add(self, stage: str, start: float, end: float):
+        end = max(end, start)
+        self.stages[stage] = self.stages.get(stage, 0.0) + (end - start) * 1000
+        self.spans.append((stage, start, end))
+
+    def set_planned(self, planned_at: datetime):
+        """Плановое время строки на момент захвата: даёт этапы queue_wait и pickup"""
+        if planned_at is None or self.planned_at is not None:
+            return
+        self.planned_at = planned_at
+        planned = _epoch(planned_at)
+        if self.enqueued_at:
+            enqueued = min(max(self.enqueued_at, planned), self.started)
+            self._add('queue_wait', planned, enqueued)
+            self._add('pickup', enqueued, self.started)
+        elif planned < self.started:
+            self._add('queue_wait', planned, self.started)
+
+    def mark(self, stage: str):
+        """Время с предыдущей контрольной точки относится к этапу stage"""
+        now = time.time()
+        self._add(stage, self._last, now)
+        self._last = now
+
+    def discard(self):
+        """Не сохранять трассу (строку уже обработал другой воркер)"""
+        self.discarded = True
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def mark_stage(stage: str):
+    """Отметить этап текущей трассы, если код выполняется внутри трассируемой публикации"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.mark(stage)
+
+
+def start_trace(source: str, queue_id: int, enqueued_at: float = None) -> TraceRecorder:
+    trace = TraceRecorder(source, queue_id, enqueued_at)
+    trace.token = _current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace: TraceRecorder):
+    """Сохранить трассу (нужен контекст приложения); ошибки записи не влияют на публикацию"""
+    _current_trace.reset(trace.token)
+    if trace.discarded or not trace.stages or not Config.PUBLICATION_TRACE_ENABLED:
+        return
+    try:
+        row = save_trace(trace)
+    except Exception as e:
+        logger.warning(f"Failed to save publication trace {trace.source}:{trace.queue_id}: {e}")
+        return
+    if row is not None and Config.PUBLICATION_TRACE_OTLP_ENDPOINT:
+        _get_exporter().submit(_otlp_span_batch(trace, row))
+
+
+def traced_publication(source: str):
+    """
+    Декоратор задачи отправки: трасса на время вызова, запись после выхода из задачи.
+    Задача принимает queue_id первым аргументом и необязательный enqueued_at
+    (он остаётся в сигнатуре самой задачи - по ней Celery проверяет аргументы).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(queue_id, *args, **kwargs):
+            trace = start_trace(source, queue_id, kwargs.get('enqueued_at'))
+            try:
+                return func(queue_id, *args, **kwargs)
+            finally:
+                from app import app
+                with app.app_context():
+                    finish_trace(trace)
+        return wrapper
+    return decorator
+
+
+_INSERT_SQL = """
+    INSERT INTO publication_traces (
+        source, queue_id, object_id, chat_id, account_id, priority, outcome,
+        planned_at, started_at, finished_at, total_ms, stages_json
+    )
+    SELECT :source, q.queue_id, q.object_id, q.chat_id, q.account_id, {priority},
+           CASE WHEN q.status = 'pending' THEN 'rescheduled' ELSE q.status END,
+           :planned_at, :started_at, :finished_at, :total_ms, CAST(:stages AS json)
+    FROM {table} q
+    WHERE q.queue_id = :queue_id
+    RETURNING trace_id, object_id, chat_id, account_id, outcome
+"""
+
+
+def save_trace(trace: TraceRecorder):
+    """Записать трассу отдельной транзакцией (сессия задачи может быть в любом состоянии)"""
+    from app.database import db
+    finished = time.time()
+    origin = _epoch(trace.planned_at) if trace.planned_at is not None else trace.started
+    table, priority = _SOURCE_TABLES[trace.source]
+    with db.engine.begin() as conn:
+        return conn.execute(text(_INSERT_SQL.format(table=table, priority=priority)), {
+            'source': trace.source,
+            'queue_id': trace.queue_id,
+            'planned_at': trace.planned_at,
+            'started_at': datetime.utcfromtimestamp(trace.started),
+            'finished_at': datetime.utcfromtimestamp(finished),
+            'total_ms': int(max(finished - origin, 0) * 1000),
+            'stages': json.dumps({stage: int(round(ms)) for stage, ms in trace.stages.items()}),
+        }).fetchone()
+
+
+def purge_old_traces(db_session, batch_size: int = 5000) -> int:
+    """Удалить трассы старше Config.PUBLICATION_TRACE_RETENTION_DAYS (батчами)"""
+    cutoff = datetime.utcnow() - timedelta(days=Config.PUBLICATION_TRACE_RETENTION_DAYS)
+    deleted = 0
+    while True:
+        result = db_session.execute(text("""
+            DELETE FROM publication_traces
+            WHERE trace_id IN (
+                SELECT trace_id FROM publication_traces WHERE finished_at < :cutoff LIMIT :batch
+            )
+        """), {'cutoff': cutoff, 'batch': batch_size})
+        db_session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+# ---------- Перцентили для админки ----------
+
+_GROUP_EXPRESSIONS = {
+    'stage': "'all'",
+    'account': "COALESCE(t.account_id::text, '')",
+    'chat': "COALESCE(t.chat_id::text, '')",
+}
+
+_STATS_SQL = """
+    WITH traces AS (
+        SELECT t.*, {group_expr} AS grp
+        FROM publication_traces t
+        WHERE t.finished_at >= :since {source_filter}
+    ),
+    samples AS (
+        SELECT grp, s.key AS stage, s.value::float AS ms
+        FROM traces CROSS JOIN LATERAL json_each_text(traces.stages_json) s
+        UNION ALL
+        SELECT grp, 'total', total_ms::float FROM traces
+    )
+    SELECT grp, stage, COUNT(*),
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY ms),
+           percentile_cont(0.95) WITHIN GROUP (ORDER BY ms),
+           percentile_cont(0.99) WITHIN GROUP (ORDER BY ms),
+           MAX(ms)
+    FROM samples
+    GROUP BY grp, stage
+"""
+
+
+def get_stage_latency_stats(db_session, hours: int = 24, source: str = None,
+                            group_by: str = 'stage', limit: int = 50) -> list:
+    """
+    Перцентили длительности этапов за последние `hours` часов.
+
+    group_by: stage (все трассы вместе), account или chat. Группы отсортированы
+    по p95 полного времени (самые медленные первыми).
+    Возвращает [{key, count, stages: {этап: {count, p50, p95, p99, max}}}] в миллисекундах.
+    """
+    if group_by not in _GROUP_EXPRESSIONS:
+        raise ValueError(f"group_by must be one of: {', '.join(_GROUP_EXPRESSIONS)}")
+    if source is not None and source not in _SOURCE_TABLES:
+        raise ValueError(f"source must be one of: {', '.join(_SOURCE_TABLES)}")
+
+    params = {'since': datetime.utcnow() - timedelta(hours=hours)}
+    source_filter = ''
+    if source:
+        source_filter = 'AND t.source = :source'
+        params['source'] = source
+    rows = db_session.execute(
+        text(_STATS_SQL.format(group_expr=_GROUP_EXPRESSIONS[group_by], source_filter=source_filter)),
+        params
+    ).fetchall()
+
+    def _round(value):
+        return round(float(value), 1) if value is not None else None
+
+    groups = {}
+    for key, stage, count, p50, p95, p99, max_ms in rows:
+        group = groups.setdefault(key, {'key': key, 'count': 0, 'stages': {}})
+        group['stages'][stage] = {
+            'count': count, 'p50': _round(p50), 'p95': _round(p95), 'p99': _round(p99), 'max': _round(max_ms)
+        }
+        if stage == 'total':
+            group['count'] = count
+
+    ordered = sorted(
+        groups.values(),
+        key=lambda group: (group['stages'].get('total') or {}).get('p95') or 0,
+        reverse=True
+    )
+    return ordered[:limit]
+
+
+# ---------- Экспорт OTLP ----------
+
+def _otlp_attribute(key: str, value):
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+def _nanos(seconds: float) -> str:
+    return str(int(seconds * 1_000_000_000))
+
+
+def _otlp_span_batch(trace: TraceRecorder, row) -> list:
+    """Корневой span попытки и дочерний span на каждый отмеченный отрезок этапа"""
+    trace_id = os.urandom(16).hex()
+    root_id = os.urandom(8).hex()
+    origin = _epoch(trace.planned_at) if trace.planned_at is not None else trace.started
+    end = max((span_end for _, _, span_end in trace.spans), default=trace.started)
+    attributes = [
+        _otlp_attribute('publication.source', trace.source),
+        _otlp_attribute('publication.queue_id', trace.queue_id),
+        _otlp_attribute('publication.outcome', row.outcome),
+    ]
+    for key, value in (('object_id', row.object_id), ('chat_id', row.chat_id), ('account_id', row.account_id)):
+        if value is not None:
+            attributes.append(_otlp_attribute(f'publication.{key}', value))
+    spans = [{
+        'traceId': trace_id,
+        'spanId': root_id,
+        'name': f'publication.{trace.source}',
+        'kind': 1,
+        'startTimeUnixNano': _nanos(origin),
+        'endTimeUnixNano': _nanos(end),
+        'attributes': attributes,
+        'status': {'code': 1 if row.outcome == 'completed' else 2},
+    }]
+    for stage, start, stop in trace.spans:
+        spans.append({
+            'traceId': trace_id,
+            'spanId': os.urandom(8).hex(),
+            'parentSpanId': root_id,
+            'name': stage,
+            'kind': 1,
+            'startTimeUnixNano': _nanos(start),
+            'endTimeUnixNano': _nanos(stop),
+        })
+    return spans
+
+
+class _OtlpExporter:
+    """Фоновая отправка span'ов пачками: задача отправки не ждёт коллектор"""
+
+    _MAX_BATCH_SPANS = 500
+    _MAX_PENDING = 10000
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.pid = os.getpid()
+        self.queue = queue.Queue(maxsize=self._MAX_PENDING)
+        self.thread = threading.Thread(target=self._run, name='publication-trace-otlp', daemon=True)
+        self.thread.start()
+
+    def submit(self, spans: list):
+        try:
+            self.queue.put_nowait(spans)
+        except queue.Full:
+            logger.debug("OTLP export queue is full, dropping publication trace")
+
+    def _run(self):
+        import requests
+        while True:
+            batch = list(self.queue.get())
+            while len(batch) < self._MAX_BATCH_SPANS:
+                try:
+                    batch.extend(self.queue.get(timeout=1))
+                except queue.Empty:
+                    break
+            payload = {'resourceSpans': [{
+                'resource': {'attributes': [_otlp_attribute('service.name', Config.PUBLICATION_TRACE_SERVICE_NAME)]},
+                'scopeSpans': [{'scope': {'name': __name__}, 'spans': batch}],
+            }]}
+            try:
+                response = requests.post(self.endpoint, json=payload, timeout=5)
+                if response.status_code >= 400:
+                    logger.warning(f"OTLP collector rejected {len(batch)} spans: HTTP {response.status_code}")
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"OTLP export failed ({len(batch)} spans dropped): {e}")
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def _get_exporter() -> _OtlpExporter:
+    # Поток не переживает fork воркера prefork - создаём заново в каждом процессе
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None or _exporter.pid != os.getpid():
+            _exporter = _OtlpExporter(Config.PUBLICATION_TRACE_OTLP_ENDPOINT)
+        return _exporter
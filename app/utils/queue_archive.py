@@ -0,0 +1,124 @@
+"""
+Разделение очередей публикаций на горячую и архивную части
+Логика: publication_queues и account_publication_queues хранят только рабочий
+набор (pending/processing и недавно завершённые строки). Строки в финальном статусе
+старше Config.PUBLICATION_ARCHIVE_AFTER_HOURS переносятся батчами в партиционированные
+*_archive таблицы одним запросом WITH moved AS (DELETE ... RETURNING) INSERT ... SELECT.
+Чтение истории (админка) объединяет обе части по запросу (include_archive).
+"""
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import func, text
+from app.config import Config
+from app.models.publication_queue import PublicationQueue
+from app.models.account_publication_queue import AccountPublicationQueue
+from app.models.publication_queue_archive import PublicationQueueArchive, AccountPublicationQueueArchive
+from app.utils.partitioning import ensure_monthly_partitions
+
+logger = logging.getLogger(__name__)
+
+# Финальные статусы: такие строки больше никогда не берутся воркерами
+TERMINAL_STATUSES = ('completed', 'failed', 'flood_wait')
+
+# Горячая таблица -> архивная
+ARCHIVE_MODELS = {
+    PublicationQueue: PublicationQueueArchive,
+    AccountPublicationQueue: AccountPublicationQueueArchive,
+}
+
+
+def archive_model_for(model):
+    """Архивная модель для модели очереди"""
+    return ARCHIVE_MODELS[model]
+
+
+def archive_finished_rows(db_session, model, older_than_hours: int = None,
+                          batch_size: int = None, max_batches: int = None) -> int:
+    """
+    Перенести завершённые строки очереди в архив.
+
+    Каждый батч - отдельная транзакция: DELETE выбирает строки через FOR UPDATE SKIP LOCKED,
+    поэтому архивация не мешает воркерам и не держит длинных блокировок.
+
+    Returns:
+        Количество перенесённых строк
+    """
+    archive_model = archive_model_for(model)
+    older_than_hours = older_than_hours or Config.PUBLICATION_ARCHIVE_AFTER_HOURS
+    batch_size = batch_size or Config.PUBLICATION_ARCHIVE_BATCH_SIZE
+    max_batches = max_batches or Config.PUBLICATION_ARCHIVE_MAX_BATCHES
+
+    now = datetime.utcnow()
+    cutoff = now - timedelta(hours=older_than_hours)
+    finished_at = func.coalesce(model.completed_at, model.created_at)
+
+    oldest = db_session.query(func.min(model.created_at)).filter(
+        model.status.in_(TERMINAL_STATUSES),
+        finished_at < cutoff
+    ).scalar()
+    if oldest is None:
+        return 0
+
+    # Партиции архива должны покрывать created_at всех переносимых строк
+    ensure_monthly_partitions(db_session.connection(), archive_model.__tablename__, oldest, now)
+    db_session.commit()
+
+    table = model.__tablename__
+    columns = ', '.join(column.name for column in model.__table__.columns)
+    move_sql = text(
+        f"""
+        WITH moved AS (
+            DELETE FROM {table}
+            WHERE queue_id IN (
+                SELECT queue_id FROM {table}
+                WHERE status = ANY(:statuses)
+                  AND COALESCE(completed_at, created_at) < :cutoff
+                ORDER BY queue_id
+                LIMIT :batch_size
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING {columns}
+        )
+        INSERT INTO {archive_model.__tablename__} ({columns}, archived_at)
+        SELECT {columns}, :archived_at FROM moved
+        """
+    )
+
+    moved_total = 0
+    for _ in range(max_batches):
+        result = db_session.execute(move_sql, {
+            'statuses': list(TERMINAL_STATUSES),
+            'cutoff': cutoff,
+            'batch_size': batch_size,
+            'archived_at': now,
+        })
+        db_session.commit()
+        moved_total += result.rowcount
+        if result.rowcount < batch_size:
+            break
+
+    if moved_total:
+        logger.info(f"Archived {moved_total} finished rows from {table} (older than {older_than_hours}h)")
+    return moved_total
+
+
+def queue_sort_key(row) -> tuple:
+    """Ключ сортировки строк очереди в Python, согласованный с ORDER BY created_at DESC, queue_id DESC"""
+    # PostgreSQL при DESC ставит NULL первыми
+    return (row.created_at is None, row.created_at or datetime.min, row.queue_id)
+
+
+def fetch_with_archive(hot_query, archive_query, limit: int, offset: int = 0, include_archive: bool = False) -> list:
+    """
+    Страница строк очереди (новые первыми) из горячей таблицы и, при include_archive, из архива.
+    Запросы должны быть уже отфильтрованы одинаково; сортировка по created_at desc, queue_id desc.
+    Из каждой части читается не больше offset + limit строк, затем части сливаются.
+    """
+    window = offset + limit
+    hot_entity = hot_query.column_descriptions[0]['entity']
+    rows = hot_query.order_by(hot_entity.created_at.desc(), hot_entity.queue_id.desc()).limit(window).all()
+    if include_archive:
+        archive_entity = archive_query.column_descriptions[0]['entity']
+        rows += archive_query.order_by(archive_entity.created_at.desc(), archive_entity.queue_id.desc()).limit(window).all()
+        rows.sort(key=queue_sort_key, reverse=True)
+    return rows[offset:offset + limit]
@@ -0,0 +1,189 @@
+"""
+Аренда (lease) задач очередей публикаций
+Логика: воркер, забравший строку очереди, получает аренду до lease_until и подписывает
+её своим worker_id. Долгие отправки продлевают аренду heartbeat-потоком. Если воркер
+упал, аренда истекает, и reap_expired_leases одним UPDATE возвращает такие строки
+в pending (или в failed, если попытки исчерпаны). Работает одинаково для
+publication_queues и account_publication_queues.
+"""
+import os
+import socket
+import threading
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_, and_, case
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Строки без lease_until (взяты до появления аренды) считаем зависшими по started_at
+LEGACY_STUCK_AFTER = timedelta(minutes=5)
+
+_worker_id = None
+
+
+def get_worker_id() -> str:
+    """Идентификатор текущего процесса-воркера: host:pid"""
+    global _worker_id
+    pid = os.getpid()
+    # После fork (Celery prefork) pid меняется - пересчитываем
+    if _worker_id is None or not _worker_id.endswith(f':{pid}'):
+        _worker_id = f'{socket.gethostname()}:{pid}'
+    return _worker_id
+
+
+def lease_deadline(now: datetime = None) -> datetime:
+    """Время окончания новой/продлённой аренды"""
+    return (now or datetime.utcnow()) + timedelta(seconds=Config.QUEUE_LEASE_SECONDS)
+
+
+def claim_values(now: datetime = None) -> dict:
+    """Значения полей для захвата строки: processing + аренда на текущий воркер"""
+    now = now or datetime.utcnow()
+    return {
+        'status': 'processing',
+        'started_at': now,
+        'lease_until': lease_deadline(now),
+        'worker_id': get_worker_id(),
+    }
+
+
+def expired_lease_filter(model, now: datetime = None):
+    """SQL-условие "строка в processing, но аренда истекла" (для reaper и мониторинга)"""
+    now = now or datetime.utcnow()
+    return and_(
+        model.status == 'processing',
+        or_(
+            model.lease_until < now,
+            and_(model.lease_until.is_(None), model.started_at < now - LEGACY_STUCK_AFTER)
+        )
+    )
+
+
+def extend_lease(connection, model, queue_id: int, worker_id: str) -> bool:
+    """Продлить аренду, только если строка всё ещё принадлежит этому воркеру"""
+    table = model.__table__
+    result = connection.execute(
+        update(table).where(
+            table.c.queue_id == queue_id,
+            table.c.status == 'processing',
+            table.c.worker_id == worker_id
+        ).values(lease_until=lease_deadline())
+    )
+    return result.rowcount > 0
+
+
+class LeaseHeartbeat:
+    """
+    Контекстный менеджер: пока идёт долгая отправка, фоновый поток продлевает аренду.
+    Использует собственное соединение из engine (сессия SQLAlchemy не потокобезопасна).
+
+    with LeaseHeartbeat(db.engine, PublicationQueue, queue.queue_id):
+        send(...)
+    """
+
+    def __init__(self, engine, model, queue_id: int, interval: float = None):
+        self.engine = engine
+        self.model = model
+        self.queue_id = queue_id
+        self.worker_id = get_worker_id()
+        self.interval = interval or max(Config.QUEUE_LEASE_SECONDS / 3.0, 1.0)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.engine.begin() as connection:
+                    if not extend_lease(connection, self.model, self.queue_id, self.worker_id):
+                        # Строку уже забрал reaper или другой воркер - продлевать нечего
+                        logger.warning(f"Lease for {self.model.__tablename__} {self.queue_id} lost by {self.worker_id}")
+                        return
+            except Exception as e:
+                logger.error(f"Failed to extend lease for {self.model.__tablename__} {self.queue_id}: {e}")
+
+    def __enter__(self):
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f'lease-heartbeat-{self.queue_id}',
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        return False
+
+
+def reap_expired_leases(db_session, model, max_attempts: int = None, stuck_before: datetime = None) -> list:
+    """
+    Вернуть зависшие строки в работу одним set-based UPDATE ... RETURNING.
+
+    Args:
+        model: PublicationQueue или AccountPublicationQueue
+        max_attempts: после стольких попыток строка помечается failed, а не pending
+            (по умолчанию PUBLICATION_RETRY_MAX_ATTEMPTS - тот же бюджет, что у политики повторов)
+        stuck_before: принудительный порог по started_at (ручной сброс из админки);
+            по умолчанию используется истечение аренды
+
+    Returns:
+        Список строк (queue_id, status, attempts, object_id, chat_id, account_id) изменённых задач
+    """
+    if max_attempts is None:
+        max_attempts = Config.PUBLICATION_RETRY_MAX_ATTEMPTS
+    now = datetime.utcnow()
+    if stuck_before is not None:
+        condition = and_(model.status == 'processing', model.started_at < stuck_before)
+    else:
+        condition = expired_lease_filter(model, now)
+
+    next_attempts = model.attempts + 1
+    exhausted = next_attempts >= max_attempts
+
+    stmt = update(model).where(condition).values(
+        status=case((exhausted, 'failed'), else_='pending'),
+        attempts=next_attempts,
+        error_message=case(
+            (exhausted, 'Task timeout - lease expired'),
+            else_='Lease expired - requeued'
+        ),
+        started_at=case((exhausted, model.started_at), else_=None),
+        lease_until=None,
+        worker_id=None,
+    ).returning(
+        model.queue_id, model.status, model.attempts,
+        model.object_id, model.chat_id, model.account_id
+    ).execution_options(synchronize_session=False)
+
+    rows = db_session.execute(stmt).all()
+    db_session.commit()
+
+    if rows:
+        failed = sum(1 for row in rows if row.status == 'failed')
+        logger.warning(
+            f"Reaped {len(rows)} expired {model.__tablename__} leases "
+            f"({len(rows) - failed} requeued, {failed} failed)"
+        )
+    return rows
+
+
+def release_worker_leases(db_session, model, worker_id: str = None) -> int:
+    """
+    Немедленно вернуть в pending все строки, захваченные этим воркером
+    (например, при SoftTimeLimitExceeded), не дожидаясь истечения аренды.
+    """
+    worker_id = worker_id or get_worker_id()
+    released = db_session.query(model).filter(
+        model.status == 'processing',
+        model.worker_id == worker_id
+    ).update({
+        'status': 'pending',
+        'started_at': None,
+        'lease_until': None,
+        'worker_id': None,
+    }, synchronize_session=False)
+    db_session.commit()
+    return released
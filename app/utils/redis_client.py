@@ -0,0 +1,27 @@
+"""
+Общий клиент Redis для приложения, бота и Celery-воркеров
+Логика: один пул соединений на процесс (пересоздаётся после fork), адрес из Config.REDIS_URL
+"""
+import os
+import redis
+from app.config import Config
+
+_client = None
+_client_pid = None
+
+
+def get_redis():
+    """Клиент Redis текущего процесса (decode_responses=True - строки вместо bytes)"""
+    global _client, _client_pid
+    pid = os.getpid()
+    # Пул соединений нельзя разделять между процессами (Celery prefork, gunicorn workers)
+    if _client is None or _client_pid != pid:
+        _client = redis.Redis.from_url(
+            Config.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=2,
+            socket_connect_timeout=2,
+            health_check_interval=30,
+        )
+        _client_pid = pid
+    return _client
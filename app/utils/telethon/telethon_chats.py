@@ -33,6 +33,7 @@ _session_locks_lock = threading.Lock()
 
 from app.utils.telethon.telethon_session import get_session_lock, get_session_path
 from app.utils.telethon.telethon_connection import create_client
+from app.utils.photos import PHOTO_VARIANT_TELEGRAM, photo_full_path, photo_variant_path
 
 async def get_chats(phone: str) -> Tuple[bool, Optional[List[Dict]], Optional[str]]:
     """
@@ -402,20 +403,9 @@ async def send_object_message(phone: str, chat_id: str, message_text: str, photo
         # Send message with photo if available - всегда отправляем фото если оно есть
         if photos and len(photos) > 0:
             # Берем первое фото (только одно фото разрешено)
-            photo_path = photos[0]
-            
-            # Если это словарь с путем, извлекаем путь
-            if isinstance(photo_path, dict):
-                photo_path = photo_path.get('path', '')
-            
-            # Подготавливаем путь к файлу
-            base_dir = os.path.dirname(os.path.dirname(__file__))
-            if photo_path.startswith('/'):
-                full_path = os.path.join(base_dir, photo_path.lstrip('/'))
-            elif photo_path.startswith('uploads/'):
-                full_path = os.path.join(base_dir, photo_path)
-            else:
-                full_path = os.path.join(base_dir, photo_path)
+            # Вариант для Telegram (≤1280px JPEG), пока его нет - оригинал; путь относительно UPLOAD_FOLDER
+            photo_path = photo_variant_path(photos[0], PHOTO_VARIANT_TELEGRAM)
+            full_path = photo_full_path(photo_path) if photo_path else ''
             
             if os.path.exists(full_path):
                 # Отправляем одно фото
@@ -23,6 +23,7 @@ from telethon.errors import (
 from telethon.tl.functions.messages import ImportChatInviteRequest
 from telethon.tl.types import Channel, Chat, User
 from app.config import Config
+from app.utils.metrics import instrument_telethon_client
 
 logger = logging.getLogger(__name__)
 telethon_logger = logging.getLogger('telethon')
@@ -49,6 +50,11 @@ def _is_connection_error(exc: Exception) -> bool:
 
 async def create_client(phone: str) -> TelegramClient:
     """Create Telethon client for phone number"""
+    if Config.TELETHON_SENDER == 'stub':
+        # Нагрузочный стенд: без сессий и MTProto, отправка в заглушку (loadtest/stub_telegram.py)
+        from app.utils.telethon.telethon_stub import StubTelegramClient
+        return StubTelegramClient(phone)
+    
     session_path = get_session_path(phone)
     logger.debug(f"Session path for {phone}: {session_path}")
     
@@ -66,6 +72,8 @@ async def create_client(phone: str) -> TelegramClient:
         Config.TELEGRAM_API_ID,
         Config.TELEGRAM_API_HASH
     )
+    # Длительность запросов по методам MTProto и счётчик FloodWait для Prometheus
+    instrument_telethon_client(client)
     
     return client
 
@@ -33,6 +33,8 @@ _session_locks_lock = threading.Lock()
 
 from app.utils.telethon.telethon_session import get_session_lock, get_session_path
 from app.utils.telethon.telethon_connection import create_client
+from app.utils.photos import PHOTO_VARIANT_TELEGRAM, photo_full_path, photo_variant_path
+from app.utils.publication_trace import mark_stage
 
 async def send_test_message(phone: str, chat_id: str, message: str = "Тестовое сообщение") -> Tuple[bool, Optional[str], Optional[int]]:
     """
@@ -143,6 +145,11 @@ async def send_test_message(phone: str, chat_id: str, message: str = "Тесто
                 pass
 
 
+def _mark_upload_done(sent_bytes: int, total_bytes: int):
+    if sent_bytes >= total_bytes:
+        mark_stage('upload')
+
+
 async def send_object_message(phone: str, chat_id: str, message_text: str, photos: Optional[List[str]] = None) -> Tuple[bool, Optional[str], Optional[int]]:
     """
     Send object publication message from Telegram account
@@ -175,6 +182,7 @@ async def send_object_message(phone: str, chat_id: str, message_text: str, photo
                 try:
                     # Apply rate limiting
                     wait_if_needed(phone)
+                    mark_stage('rate_limit_wait')
                     
                     client = await create_client(phone)
                     await client.connect()
@@ -237,6 +245,8 @@ async def send_object_message(phone: str, chat_id: str, message_text: str, photo
             else:
                 return (False, "Account not authorized. Please connect first.", None)
         
+        mark_stage('connect')
+        
         # ВАЖНО: Убрали защитную проверку validate_chat_peer из боевой логики.
         # Теперь всегда пробуем отправку, а любые проблемы Telegram видим "как есть".
         # validate_chat_peer используется только для диагностики в админке.
@@ -244,24 +254,16 @@ async def send_object_message(phone: str, chat_id: str, message_text: str, photo
         # Send message with photo if available - всегда отправляем фото если оно есть
         if photos and len(photos) > 0:
             # Берем первое фото (только одно фото разрешено)
-            photo_path = photos[0]
-            
-            # Если это словарь с путем, извлекаем путь
-            if isinstance(photo_path, dict):
-                photo_path = photo_path.get('path', '')
-            
-            # Подготавливаем путь к файлу
-            base_dir = os.path.dirname(os.path.dirname(__file__))
-            if photo_path.startswith('/'):
-                full_path = os.path.join(base_dir, photo_path.lstrip('/'))
-            elif photo_path.startswith('uploads/'):
-                full_path = os.path.join(base_dir, photo_path)
-            else:
-                full_path = os.path.join(base_dir, photo_path)
+            # Вариант для Telegram (≤1280px JPEG), пока его нет - оригинал; путь относительно UPLOAD_FOLDER
+            photo_path = photo_variant_path(photos[0], PHOTO_VARIANT_TELEGRAM)
+            full_path = photo_full_path(photo_path) if photo_path else ''
             
             if os.path.exists(full_path):
-                # Отправляем одно фото
-                sent_message = await client.send_file(int(chat_id), full_path, caption=message_text, parse_mode='html')
+                # Отправляем одно фото; окончание загрузки файла - граница этапов upload/api_call трассы
+                sent_message = await client.send_file(
+                    int(chat_id), full_path, caption=message_text, parse_mode='html',
+                    progress_callback=_mark_upload_done
+                )
                 message_id = sent_message.id
             else:
                 logger.warning(f"Photo file not found: {full_path} (original path: {photo_path}), sending text only")
@@ -273,6 +275,8 @@ async def send_object_message(phone: str, chat_id: str, message_text: str, photo
             sent_message = await client.send_message(int(chat_id), message_text, parse_mode='html')
             message_id = sent_message.id
         
+        mark_stage('api_call')
+        
         # Record message sent for rate limiting
         record_message_sent(phone)
         
@@ -0,0 +1,72 @@
+"""
+Заглушка клиента Telethon для нагрузочного стенда (TELETHON_SENDER=stub)
+Логика: create_client возвращает StubTelegramClient вместо TelegramClient, поэтому
+send_object_message проходит свой обычный путь (rate limiter, блокировка сессии,
+этапы трассы, разбор ошибок), но "отправка" - HTTP-запрос к заглушке
+loadtest/stub_telegram.py. Задержку, FloodWait и ошибки решает заглушка, общая
+с заглушкой Bot API, - один конфиг и одна статистика на весь прогон.
+"""
+import asyncio
+import logging
+import os
+import requests
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class StubFloodWaitError(Exception):
+    """FloodWait заглушки: текст разбирается так же, как ошибки аккаунтов (FLOOD_WAIT: N seconds)"""
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+        super().__init__(f"FLOOD_WAIT: {seconds} seconds (A wait of {seconds} seconds is required)")
+
+
+class StubMessage:
+    def __init__(self, message_id: int):
+        self.id = message_id
+
+
+class StubTelegramClient:
+    """Подмножество TelegramClient, которое использует send_object_message"""
+
+    def __init__(self, phone: str, base_url: str = None):
+        self.phone = phone
+        self.base_url = base_url or Config.TELETHON_STUB_URL
+        self._connected = False
+
+    async def connect(self):
+        self._connected = True
+
+    async def disconnect(self):
+        self._connected = False
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def is_user_authorized(self) -> bool:
+        return True
+
+    async def send_message(self, entity, message, parse_mode=None, **kwargs):
+        return await self._send('sendMessage', entity, message)
+
+    async def send_file(self, entity, file, caption=None, parse_mode=None, progress_callback=None, **kwargs):
+        # Файл не передаётся: размер нужен только для отметки окончания загрузки
+        size = os.path.getsize(file) if isinstance(file, str) and os.path.exists(file) else 0
+        if progress_callback is not None:
+            progress_callback(size, size)
+        return await self._send('sendFile', entity, caption, file_size=size)
+
+    async def _send(self, method: str, entity, text, file_size: int = 0):
+        payload = {'phone': self.phone, 'chat_id': str(entity), 'text_length': len(text or ''), 'file_size': file_size}
+        # requests блокирующий - уводим в поток, чтобы не держать цикл событий (как настоящий сетевой вызов)
+        response = await asyncio.to_thread(
+            requests.post, f'{self.base_url}/mtproto/{method}', json=payload, timeout=30
+        )
+        result = response.json()
+        if result.get('ok'):
+            return StubMessage(result['message_id'])
+        if result.get('flood_wait'):
+            raise StubFloodWaitError(int(result['flood_wait']))
+        raise RuntimeError(result.get('error') or f'Stub MTProto error {response.status_code}')
@@ -0,0 +1,3 @@
+"""
+Воспроизводимые бенчмарки горячих путей (запуск: python -m benchmarks.run)
+"""
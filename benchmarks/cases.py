@@ -0,0 +1,212 @@
+"""
+Сценарии бенчмарков горячих путей
+Логика: сценарий - функция prepare(ctx), зарегистрированная декоратором benchmark_case.
+Она один раз готовит входные данные (выборки объектов, чатов, пользователей) и возвращает
+run() - то, что замеряется на каждом повторе, - и при необходимости reset(), который
+возвращает базу в исходное состояние между повторами (вне замера).
+
+Выборки детерминированы: ORDER BY md5(ключ) на одном и том же наборе данных.
+"""
+import inspect
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import text
+
+from app import app
+from app.database import db
+from app.models.chat import Chat
+from app.models.object import Object
+from app.models.user import User
+
+CASES = {}
+
+
+class BenchmarkCase:
+    def __init__(self, name: str, description: str, prepare):
+        self.name = name
+        self.description = description
+        self.prepare = prepare
+
+
+def benchmark_case(name: str, description: str):
+    def decorator(prepare):
+        CASES[name] = BenchmarkCase(name, description, prepare)
+        return prepare
+    return decorator
+
+
+class BenchContext:
+    """Общие параметры прогона для сценариев"""
+
+    def __init__(self, seed: int = 42, sample_size: int = 50):
+        self.seed = seed
+        self.sample_size = sample_size
+        self.now = datetime.utcnow()
+
+    def sample_objects(self, limit: int = None) -> list:
+        return Object.query.filter(Object.status != 'архив').order_by(
+            text('md5(objects.object_id)')
+        ).limit(limit or self.sample_size).all()
+
+    def sample_bot_chat_ids(self, limit: int) -> list:
+        rows = db.session.query(Chat.chat_id).filter_by(owner_type='bot', is_active=True).order_by(
+            text('md5(chats.chat_id::text)')
+        ).limit(limit).all()
+        return [row[0] for row in rows]
+
+
+# ---------- Подбор чатов и планирование ----------
+
+@benchmark_case('matching.bot_chats', 'Подбор чатов бота для объекта (_get_matching_bot_chats_for_object)')
+def _matching_bot_chats(ctx: BenchContext):
+    from workers.tasks.tasks_autopublish import _get_matching_bot_chats_for_object
+    objects = ctx.sample_objects()
+
+    def run():
+        return sum(len(_get_matching_bot_chats_for_object(db.session, obj)) for obj in objects)
+
+    return run, None
+
+
+@benchmark_case('schedule.daily_autopublish', 'Ежедневное планирование автопубликации (schedule_daily_autopublish)')
+def _schedule_daily_autopublish(ctx: BenchContext):
+    from workers.tasks.tasks_autopublish import schedule_daily_autopublish
+    state = {}
+
+    def run():
+        state['started'] = datetime.utcnow()
+        # Вызов тела задачи напрямую, без брокера
+        return schedule_daily_autopublish()
+
+    def reset():
+        # Убираем созданные прогоном строки, чтобы следующий повтор планировал тот же объём
+        started = state.pop('started', None)
+        if started is None:
+            return
+        db.session.rollback()
+        for table in ('publication_queues', 'account_publication_queues'):
+            db.session.execute(text(f"DELETE FROM {table} WHERE created_at >= :started"), {'started': started})
+        db.session.commit()
+
+    return run, reset
+
+
+@benchmark_case('schedule.account_times', 'Расчёт расписания аккаунта по режимам (calculate_scheduled_times_for_account)')
+def _account_times(ctx: BenchContext):
+    from app.utils.account_publication_utils import calculate_scheduled_times_for_account
+    from bot.utils import get_moscow_time
+    start_time_msk = get_moscow_time().replace(hour=8, minute=0, second=0, microsecond=0)
+    modes = ('aggressive', 'normal', 'safe', 'smart', 'fix')
+
+    def run():
+        # Джиттер случайный - фиксируем зерно, чтобы каждый повтор считал одно и то же
+        random.seed(ctx.seed)
+        return sum(
+            len(calculate_scheduled_times_for_account(mode, 400, 200, start_time_msk, fix_interval=15))
+            for mode in modes
+        )
+
+    return run, None
+
+
+# ---------- Форматирование ----------
+
+@benchmark_case('render.publication_text', 'Текст публикации в форматах default и compact (format_publication_text)')
+def _publication_text(ctx: BenchContext):
+    from bot.utils import format_publication_text
+    objects = ctx.sample_objects(ctx.sample_size * 4)
+    users = {user.user_id: user for user in User.query.filter(
+        User.user_id.in_({obj.user_id for obj in objects})
+    ).all()}
+
+    def run():
+        total = 0
+        for obj in objects:
+            user = users.get(obj.user_id)
+            total += len(format_publication_text(obj, user, publication_format='default'))
+            total += len(format_publication_text(obj, user, publication_format='compact'))
+        return total
+
+    return run, None
+
+
+# ---------- Проверка дубликатов ----------
+
+@benchmark_case('duplicates.check_many', 'Пакетная проверка дубликатов (check_duplicates_many: журнал или БД)')
+def _check_duplicates_many(ctx: BenchContext):
+    from app.utils.duplicate_checker import check_duplicates_many, load_allow_duplicates_setting
+    allow_duplicates_setting = load_allow_duplicates_setting()
+    objects = ctx.sample_objects()
+    chat_ids = ctx.sample_bot_chat_ids(200)
+    since = ctx.now - timedelta(days=30)
+
+    def run():
+        return sum(
+            len(check_duplicates_many(
+                obj.object_id, chat_ids, None, user_id=obj.user_id,
+                allow_duplicates_setting=allow_duplicates_setting, since=since
+            ))
+            for obj in objects
+        )
+
+    return run, None
+
+
+@benchmark_case('duplicates.history_db', 'Проверка дубликатов по publication_history (_check_many_db)')
+def _check_many_db(ctx: BenchContext):
+    from app.utils.publication_ledger import _check_many_db
+    objects = ctx.sample_objects()
+    chat_ids = ctx.sample_bot_chat_ids(200)
+    since = ctx.now - timedelta(days=30)
+
+    def run():
+        return sum(len(_check_many_db(obj.object_id, chat_ids, None, since)) for obj in objects)
+
+    return run, None
+
+
+# ---------- Статистика дашбордов ----------
+
+def _unwrapped_view(view):
+    # Без jwt_required/role_required: замеряются запросы статистики, а не проверка токена
+    return inspect.unwrap(view)
+
+
+@benchmark_case('dashboard.admin_stats', 'Статистика админки (/system/admin/dashboard/stats)')
+def _admin_stats(ctx: BenchContext):
+    from app.routes.admin.admin_dashboard import admin_stats
+    view = _unwrapped_view(admin_stats)
+    admin = User.query.filter_by(web_role='admin').order_by(User.user_id).first()
+
+    def run():
+        with app.test_request_context('/system/admin/dashboard/stats'):
+            return view(admin).status_code
+
+    return run, None
+
+
+@benchmark_case('dashboard.user_stats', 'Статистика пользователя с наибольшим числом объектов (/system/user/dashboard/stats)')
+def _user_stats(ctx: BenchContext):
+    from sqlalchemy import func
+    from app.routes.user.user_dashboard import user_stats
+    view = _unwrapped_view(user_stats)
+    busiest_user_id = db.session.query(Object.user_id).group_by(Object.user_id).order_by(
+        func.count(Object.object_id).desc(), Object.user_id
+    ).limit(1).scalar()
+    user = User.query.get(busiest_user_id)
+
+    def run():
+        with app.test_request_context('/system/user/dashboard/stats'):
+            return view(user).status_code
+
+    return run, None
+
+
+@benchmark_case('dashboard.priority_latency', 'Задержки по классам приоритета за сутки (get_priority_latency_stats)')
+def _priority_latency(ctx: BenchContext):
+    from app.utils.publication_priority import get_priority_latency_stats
+
+    def run():
+        return len(get_priority_latency_stats(db.session, hours=24))
+
+    return run, None
@@ -0,0 +1,266 @@
+"""
+Генератор синтетических данных для бенчмарков
+Логика: все строки создаются INSERT ... SELECT FROM generate_series на стороне PostgreSQL
+(100k объектов и 1M строк истории - за десятки секунд, без передачи данных из Python).
+Распределения детерминированы: вместо random() - мультипликативный хеш номера строки,
+поэтому один и тот же scale даёт одинаковый набор данных на любой машине.
+
+Масштаб scale=1.0:
+    2 000 пользователей, 100 000 объектов (5% в архиве), 5 000 чатов бота с разными
+    filters_json (общие, legacy category, комбинации комнат/районов/цен),
+    300 аккаунтов (aggressive/normal/safe/smart/fix) и 3 000 их чатов,
+    2 000 конфигураций автопубликации, 50 000 строк очереди бота, 1 000 000 строк истории.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import text
+
+from app.utils.partitioning import add_months, ensure_monthly_partitions
+
+ROOMS = ('Студия', '1к', '2к', '3к', '4+к', 'Дом', 'евро1к', 'евро2к', 'евро3к')
+ACCOUNT_MODES = ('aggressive', 'normal', 'safe', 'smart', 'fix')
+DISTRICTS_COUNT = 60
+PARENT_DISTRICTS_COUNT = 8
+HISTORY_DAYS = 90
+
+# Таблицы набора данных в порядке удаления (зависимые первыми)
+TABLES = (
+    'publication_traces', 'publication_history', 'account_publication_queues', 'publication_queues',
+    'autopublish_configs', 'telegram_account_chats', 'chats', 'telegram_accounts',
+    'objects', 'users', 'system_settings',
+)
+
+# Счётчики с автоинкрементом: после вставки явных id выставляются на максимум,
+# иначе код под замером (schedule_daily_autopublish) упрётся в занятые ключи
+_SERIAL_COLUMNS = (
+    ('users', 'user_id'), ('telegram_accounts', 'account_id'), ('chats', 'chat_id'),
+    ('telegram_account_chats', 'id'), ('autopublish_configs', 'config_id'),
+    ('publication_queues', 'queue_id'), ('account_publication_queues', 'queue_id'),
+    ('publication_history', 'history_id'), ('system_settings', 'setting_id'),
+)
+
+
+def dataset_sizes(scale: float) -> dict:
+    """Размеры таблиц для масштаба scale (не меньше минимально осмысленных)"""
+    def size(base, minimum):
+        return max(int(base * scale), minimum)
+    return {
+        'users': size(2000, 10),
+        'objects': size(100000, 100),
+        'bot_chats': size(5000, 50),
+        'accounts': size(300, len(ACCOUNT_MODES)),
+        'user_chats': size(3000, 30),
+        'autopublish_configs': size(2000, 10),
+        'queue_rows': size(50000, 100),
+        'history_rows': size(1000000, 1000),
+    }
+
+
+def _h(expr: str, salt: int) -> str:
+    """Детерминированный псевдослучайный bigint из номера строки (умножение Кнута)"""
+    return f"((({expr})::bigint * 2654435761 + {salt * 40503}) % 4294967296)"
+
+
+def _cycle(values, expr: str) -> str:
+    """values[expr % len(values)] в SQL"""
+    array = ', '.join(f"'{value}'" for value in values)
+    return f"(ARRAY[{array}])[(1 + ({expr}) % {len(values)})::int]"
+
+
+def _pick(values, expr: str, salt: int) -> str:
+    return _cycle(values, _h(expr, salt))
+
+
+def _district(expr: str, salt: int) -> str:
+    return f"'Район ' || (1 + {_h(expr, salt)} % {DISTRICTS_COUNT})"
+
+
+def _seed_statements(sizes: dict):
+    rooms_a = _pick(ROOMS, 'g', 11)
+    rooms_b = _pick(ROOMS, 'g', 12)
+    return [
+        # Районы и их родительские округа - get_districts_config() читает их из SystemSetting
+        ("system_settings", f"""
+            INSERT INTO system_settings (key, value_json, description, updated_at)
+            SELECT 'districts_config',
+                   json_object_agg('Район ' || g, json_build_array('Округ ' || (1 + g % {PARENT_DISTRICTS_COUNT}))),
+                   'benchmark dataset', :now
+            FROM generate_series(1, {DISTRICTS_COUNT}) AS g
+        """),
+        ("users", """
+            INSERT INTO users (user_id, telegram_id, username, bot_role, web_role, settings_json,
+                               created_at, last_activity, total_publications)
+            SELECT g, 7000000000 + g, 'bench_user_' || g, 'premium',
+                   CASE WHEN g = 1 THEN 'admin' ELSE 'user' END,
+                   '{}'::json, CAST(:now AS timestamp) - INTERVAL '400 days', :now, 0
+            FROM generate_series(1, :users) AS g
+        """),
+        ("objects", f"""
+            INSERT INTO objects (object_id, user_id, rooms_type, price, districts_json, region, city,
+                                 photos_json, area, floor, address, residential_complex, renovation,
+                                 comment, contact_name, show_username, phone_number, status, source,
+                                 creation_date, updated_at)
+            SELECT 'БЕН' || lpad(g::text, 7, '0'),
+                   1 + {_h('g', 1)} % :users,
+                   {_pick(ROOMS, 'g', 2)},
+                   1500 + {_h('g', 3)} % 20000,
+                   CASE WHEN {_h('g', 4)} % 3 = 0
+                        THEN json_build_array({_district('g', 5)}, {_district('g', 6)})
+                        ELSE json_build_array({_district('g', 5)}) END,
+                   'Округ ' || (1 + {_h('g', 7)} % {PARENT_DISTRICTS_COUNT}), 'Город',
+                   CASE WHEN g % 4 = 0 THEN '[]'::json
+                        ELSE json_build_array(json_build_object('path', 'uploads/bench_' || (g % 500) || '.jpg')) END,
+                   25 + {_h('g', 8)} % 120,
+                   (1 + g % 17) || '/' || (17 + g % 8),
+                   'ул. Тестовая, ' || (1 + g % 250),
+                   CASE WHEN g % 5 = 0 THEN 'ЖК Бенчмарк ' || (g % 40) END,
+                   {_pick(('Без ремонта', 'Косметический', 'Евроремонт', 'Дизайнерский'), 'g', 9)},
+                   repeat('Светлая квартира, окна во двор, рядом школа и парк. ', 1 + g % 4),
+                   'Контакт ' || (g % 300), g % 2 = 0, '+7900' || lpad((g % 10000000)::text, 7, '0'),
+                   CASE WHEN g % 20 = 0 THEN 'архив' WHEN g % 20 = 1 THEN 'черновик' ELSE 'опубликовано' END,
+                   CASE WHEN g % 3 = 0 THEN 'web' ELSE 'bot' END,
+                   CAST(:now AS timestamp) - ({_h('g', 10)} % 365) * INTERVAL '1 day', :now
+            FROM generate_series(1, :objects) AS g
+        """),
+        ("telegram_accounts", f"""
+            INSERT INTO telegram_accounts (account_id, owner_id, phone, session_file, mode,
+                                           fix_interval_minutes, daily_limit, is_active, created_at)
+            SELECT g, 1 + g % :users, '+7999' || lpad(g::text, 7, '0'), 'sessions/bench_' || g,
+                   {_cycle(ACCOUNT_MODES, 'g')},
+                   CASE WHEN g % {len(ACCOUNT_MODES)} = {ACCOUNT_MODES.index('fix')} THEN 5 + g % 30 END,
+                   50 + {_h('g', 20)} % 200, g % 20 <> 0, CAST(:now AS timestamp) - INTERVAL '100 days'
+            FROM generate_series(1, :accounts) AS g
+        """),
+        # Чаты бота: 5% общих, 10% legacy category, остальные - разные сочетания фильтров
+        ("chats (bot)", f"""
+            INSERT INTO chats (chat_id, telegram_chat_id, title, type, category, filters_json, owner_type,
+                               is_active, members_count, added_date, total_publications)
+            SELECT g, '-100' || (1000000000 + g), 'Бенчмарк чат ' || g, 'supergroup',
+                   CASE WHEN g % 20 BETWEEN 1 AND 2 THEN 'rooms_' || {rooms_a}
+                        WHEN g % 20 = 3 THEN 'district_' || {_district('g', 13)}
+                        WHEN g % 20 = 4 THEN 'price_' || (({_h('g', 14)} % 10) * 1000) || '_' || (({_h('g', 14)} % 10) * 1000 + 5000)
+                   END,
+                   CASE WHEN g % 20 = 0 THEN '{{"binding_type": "common"}}'::json
+                        WHEN g % 20 BETWEEN 1 AND 4 THEN NULL
+                        ELSE json_strip_nulls(json_build_object(
+                            'rooms_types', CASE WHEN {_h('g', 15)} % 4 <> 0 THEN json_build_array({rooms_a}, {rooms_b}) END,
+                            'districts', CASE WHEN {_h('g', 16)} % 3 <> 0
+                                              THEN json_build_array({_district('g', 17)}, {_district('g', 18)}, 'Округ ' || (1 + g % {PARENT_DISTRICTS_COUNT})) END,
+                            'price_min', CASE WHEN {_h('g', 19)} % 2 = 0 THEN ({_h('g', 21)} % 8) * 1000 END,
+                            'price_max', CASE WHEN {_h('g', 19)} % 3 = 0 THEN 8000 + ({_h('g', 22)} % 12) * 1000 END
+                        ))
+                   END,
+                   'bot', g % 50 <> 0, {_h('g', 23)} % 50000, CAST(:now AS timestamp) - INTERVAL '200 days', 0
+            FROM generate_series(1, :bot_chats) AS g
+        """),
+        ("chats (accounts)", f"""
+            INSERT INTO chats (chat_id, telegram_chat_id, title, type, owner_type, owner_account_id,
+                               is_active, members_count, added_date, total_publications)
+            SELECT :bot_chats + g, '-100' || (2000000000 + g), 'Чат аккаунта ' || g, 'supergroup', 'user',
+                   1 + {_h('g', 30)} % :accounts, g % 40 <> 0, {_h('g', 31)} % 20000,
+                   CAST(:now AS timestamp) - INTERVAL '150 days', 0
+            FROM generate_series(1, :user_chats) AS g
+        """),
+        # Связи аккаунт-чат: владелец и ещё один аккаунт у каждого второго чата
+        ("telegram_account_chats", """
+            INSERT INTO telegram_account_chats (account_id, chat_id, created_at)
+            SELECT owner_account_id, chat_id, :now FROM chats WHERE owner_type = 'user'
+            UNION ALL
+            SELECT 1 + (owner_account_id + 7) % :accounts, chat_id, :now
+            FROM chats WHERE owner_type = 'user' AND chat_id % 2 = 0
+        """),
+        # Автопубликация: каждый N-й объект, по 1-2 аккаунта с их чатами (до 10 на аккаунт)
+        ("autopublish_configs", f"""
+            INSERT INTO autopublish_configs (user_id, object_id, enabled, bot_enabled, accounts_config_json,
+                                             created_at, updated_at)
+            SELECT o.user_id, o.object_id, TRUE, g % 3 <> 0,
+                   json_build_object(
+                       'publication_format', CASE WHEN g % 4 = 0 THEN 'compact' ELSE 'default' END,
+                       'accounts', (
+                           SELECT COALESCE(json_agg(json_build_object(
+                               'account_id', a.account_id,
+                               'chat_ids', (SELECT COALESCE(json_agg(c.chat_id), '[]'::json) FROM (
+                                   SELECT chat_id FROM chats
+                                   WHERE owner_account_id = a.account_id ORDER BY chat_id LIMIT 10
+                               ) AS c)
+                           )), '[]'::json)
+                           FROM telegram_accounts a
+                           WHERE a.account_id IN (1 + {_h('g', 40)} % :accounts,
+                                                  CASE WHEN g % 2 = 0 THEN 1 + {_h('g', 41)} % :accounts END)
+                       )
+                   ),
+                   :now, :now
+            FROM generate_series(1, :autopublish_configs) AS g
+            JOIN objects o ON o.object_id = 'БЕН' || lpad((1 + (g - 1) * (:objects / :autopublish_configs))::text, 7, '0')
+        """),
+        ("publication_queues", f"""
+            INSERT INTO publication_queues (queue_id, object_id, chat_id, user_id, type, mode, priority, status,
+                                            scheduled_time, started_at, completed_at, created_at, attempts)
+            SELECT g,
+                   'БЕН' || lpad((1 + {_h('g', 50)} % :objects)::text, 7, '0'),
+                   1 + {_h('g', 51)} % :bot_chats,
+                   1 + {_h('g', 52)} % :users,
+                   'bot',
+                   CASE WHEN g % 20 = 0 THEN 'immediate' WHEN g % 20 < 4 THEN 'scheduled' ELSE 'autopublish' END,
+                   CASE WHEN g % 20 = 0 THEN 'interactive' WHEN g % 20 < 4 THEN 'scheduled' ELSE 'autopublish' END,
+                   CASE WHEN g % 50 = 0 THEN 'pending' WHEN g % 50 = 1 THEN 'failed' ELSE 'completed' END,
+                   CAST(:now AS timestamp) - (g % 2880) * INTERVAL '1 minute',
+                   CAST(:now AS timestamp) - (g % 2880) * INTERVAL '1 minute' + (g % 90) * INTERVAL '1 second',
+                   CASE WHEN g % 50 > 1 THEN CAST(:now AS timestamp) - (g % 2880) * INTERVAL '1 minute' + (g % 120) * INTERVAL '1 second' END,
+                   CAST(:now AS timestamp) - (g % 2880) * INTERVAL '1 minute' - INTERVAL '1 hour',
+                   1
+            FROM generate_series(1, :queue_rows) AS g
+        """),
+        # История: 70% через бота (account_id NULL), равномерно за HISTORY_DAYS дней
+        ("publication_history", f"""
+            INSERT INTO publication_history (history_id, object_id, chat_id, account_id, published_at,
+                                             message_id, deleted, created_at)
+            SELECT g,
+                   'БЕН' || lpad((1 + {_h('g', 60)} % :objects)::text, 7, '0'),
+                   CASE WHEN g % 10 < 7 THEN 1 + {_h('g', 61)} % :bot_chats
+                        ELSE :bot_chats + 1 + {_h('g', 61)} % :user_chats END,
+                   CASE WHEN g % 10 < 7 THEN NULL ELSE 1 + {_h('g', 62)} % :accounts END,
+                   CAST(:now AS timestamp) - ({_h('g', 63)} % ({HISTORY_DAYS} * 1440)) * INTERVAL '1 minute',
+                   (g % 100000)::text, g % 40 = 0,
+                   CAST(:now AS timestamp) - ({_h('g', 63)} % ({HISTORY_DAYS} * 1440)) * INTERVAL '1 minute'
+            FROM generate_series(1, :history_rows) AS g
+        """),
+    ]
+
+
+def generate_dataset(connection, scale: float = 1.0, now: datetime = None, echo=print) -> dict:
+    """
+    Пересоздать набор данных в текущей базе (таблицы очищаются TRUNCATE).
+
+    Args:
+        connection: соединение SQLAlchemy в открытой транзакции
+        scale: множитель размеров (см. dataset_sizes)
+    Returns:
+        Фактические размеры таблиц
+    """
+    now = now or datetime.utcnow().replace(microsecond=0)
+    sizes = dataset_sizes(scale)
+    params = dict(sizes, now=now)
+
+    connection.execute(text(f"TRUNCATE {', '.join(TABLES)} CASCADE"))
+    # publication_history партиционирована по месяцам без DEFAULT-партиции
+    ensure_monthly_partitions(
+        connection, 'publication_history', now - timedelta(days=HISTORY_DAYS + 1), add_months(now, 1)
+    )
+
+    for title, statement in _seed_statements(sizes):
+        started = datetime.utcnow()
+        result = connection.execute(text(statement), params)
+        echo(f"  {title}: {result.rowcount} rows ({(datetime.utcnow() - started).total_seconds():.1f}s)")
+
+    for table, column in _SERIAL_COLUMNS:
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+            f"COALESCE((SELECT MAX({column}) FROM {table}), 0) + 1, false)"
+        ))
+    for table in TABLES:
+        connection.execute(text(f"ANALYZE {table}"))
+
+    return {
+        table: connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        for table in TABLES
+    }
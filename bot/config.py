@@ -4,6 +4,8 @@ Bot configuration
 import os
 
 BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
+# Адрес Bot API; нагрузочный стенд (loadtest/) подставляет сюда заглушку
+TELEGRAM_BOT_API_URL = os.getenv('TELEGRAM_BOT_API_URL', 'https://api.telegram.org').rstrip('/')
 ADMIN_ID = int(os.getenv('ADMIN_ID', '0'))
 CHANNEL_ID = int(os.getenv('CHANNEL_ID', '0'))
 
@@ -20,3 +22,9 @@ ROLE_PROTIME = "protime"
 TELEGRAM_MESSAGES_PER_MINUTE = 20
 TELEGRAM_MESSAGE_INTERVAL = 60 / TELEGRAM_MESSAGES_PER_MINUTE
 
+# Потоки для работы с БД из асинхронных обработчиков (см. bot/database.py run_db)
+BOT_DB_THREADS = int(os.getenv('BOT_DB_THREADS', '8'))
+
+# Обновления разных пользователей обрабатываются параллельно, одного - по очереди
+# (см. bot/update_processor.py); столько же соединений к Bot API в пуле
+BOT_CONCURRENT_UPDATES = int(os.getenv('BOT_CONCURRENT_UPDATES', '16'))
@@ -1,8 +1,26 @@
 """
 Database utilities for bot - унифицировано с app.database
 Использует единую БД через app.database
+
+Обработчики бота асинхронные, а SQLAlchemy синхронная: любой запрос в обработчике
+останавливает event loop и обновления всех пользователей. Поэтому работа с БД из
+обработчиков выполняется через run_db - в ограниченном пуле потоков BOT_DB_THREADS,
+каждый вызов со своим app_context и своей сессией (Flask-SQLAlchemy привязывает
+db.session к контексту приложения, при выходе из контекста сессия закрывается).
+Возвращённые ORM-объекты отсоединены от сессии: колонки доступны, ленивые связи - нет.
 """
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
 from app.database import db
+from bot.config import BOT_DB_THREADS
+
+logger = logging.getLogger(__name__)
+
+# Пул меньше пула соединений SQLAlchemy (5 + 10 overflow): потоки не ждут свободного соединения
+_executor = ThreadPoolExecutor(max_workers=BOT_DB_THREADS, thread_name_prefix='bot-db')
 
 
 def get_db():
@@ -15,3 +33,51 @@ def get_db():
     # Вне Flask контекста нужно использовать db.session напрямую
     return db.session
 
+
+def _run_in_session(func, args, kwargs):
+    """Выполнить func в отдельном app_context (своя сессия, закрывается после вызова)"""
+    from app import app as flask_app
+
+    with flask_app.app_context():
+        # Объекты уходят в event loop после закрытия сессии - значения после commit
+        # не должны сбрасываться, иначе чтение атрибута потребует сессию
+        db.session().expire_on_commit = False
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    Выполнить синхронную функцию работы с БД вне event loop
+    Логика: пул потоков BOT_DB_THREADS, отдельная сессия на вызов; исключения func
+    пробрасываются в обработчик (транзакция к этому моменту уже откатана)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _run_in_session, func, args, kwargs)
+
+
+def submit_db(func, *args, **kwargs):
+    """
+    Запустить функцию работы с БД в пуле без ожидания результата (журналы действий)
+    Ошибки только логируются - обработчик к этому моменту уже продолжил работу
+    """
+    future = _executor.submit(_run_in_session, func, args, kwargs)
+    future.add_done_callback(_log_failed_submit)
+    return future
+
+
+def _log_failed_submit(future):
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Background DB call failed: {error}", exc_info=error)
+
+
+def offloaded(func):
+    """Асинхронная версия синхронной функции работы с БД (await func_async(...) в обработчиках)"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+    return wrapper
@@ -3,15 +3,10 @@ Basic object editing handlers
 Логика: редактирование базовых полей (цена, площадь, этаж, комментарий, ЖК, ремонт)
 """
 import logging
-from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, CallbackQueryHandler, filters
-from bot.utils import (
-    get_user, get_object, update_object, get_districts_config, get_rooms_config
-)
-from app.database import db
-from bot.models import Object, ActionLog
-from app.models.publication_history import PublicationHistory
+from bot.utils import update_object_async
+from bot.utils_logger import log_bot_action
 from bot.handlers_object import (
     user_data, show_object_preview_with_menu, OBJECT_WAITING_AREA, OBJECT_WAITING_FLOOR,
     OBJECT_WAITING_COMMENT, OBJECT_WAITING_RENOVATION, OBJECT_WAITING_ADDRESS,
@@ -104,22 +99,10 @@ async def edit_price_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return OBJECT_WAITING_EDIT_PRICE
     
     object_id = user_data[user.id]["object_id"]
-    update_object(object_id, {"price": price})
+    await update_object_async(object_id, {"price": price})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_price_updated',
-                details_json={'object_id': object_id, 'price': price},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_price_updated', telegram_id=str(user.id), details={'object_id': object_id, 'price': price})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
@@ -163,22 +146,10 @@ async def edit_area_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return OBJECT_WAITING_EDIT_AREA
     
     object_id = user_data[user.id]["object_id"]
-    update_object(object_id, {"area": area})
+    await update_object_async(object_id, {"area": area})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_area_updated',
-                details_json={'object_id': object_id, 'area': area},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_area_updated', telegram_id=str(user.id), details={'object_id': object_id, 'area': area})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
@@ -214,22 +185,10 @@ async def edit_floor_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     floor = update.message.text.strip()
     object_id = user_data[user.id]["object_id"]
-    update_object(object_id, {"floor": floor})
+    await update_object_async(object_id, {"floor": floor})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_floor_updated',
-                details_json={'object_id': object_id, 'floor': floor},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_floor_updated', telegram_id=str(user.id), details={'object_id': object_id, 'floor': floor})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
@@ -265,22 +224,10 @@ async def edit_comment_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     comment = update.message.text.strip()
     object_id = user_data[user.id]["object_id"]
-    update_object(object_id, {"comment": comment})
+    await update_object_async(object_id, {"comment": comment})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_comment_updated',
-                details_json={'object_id': object_id, 'comment': comment[:100]},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_comment_updated', telegram_id=str(user.id), details={'object_id': object_id, 'comment': comment[:100]})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
@@ -316,22 +263,10 @@ async def residential_complex_input(update: Update, context: ContextTypes.DEFAUL
     
     residential_complex = update.message.text.strip()
     object_id = user_data[user.id]["object_id"]
-    update_object(object_id, {"residential_complex": residential_complex if residential_complex else None})
+    await update_object_async(object_id, {"residential_complex": residential_complex if residential_complex else None})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_residential_complex_updated',
-                details_json={'object_id': object_id, 'residential_complex': residential_complex},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_residential_complex_updated', telegram_id=str(user.id), details={'object_id': object_id, 'residential_complex': residential_complex})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
@@ -391,22 +326,10 @@ async def renovation_selected(update: Update, context: ContextTypes.DEFAULT_TYPE
     user_data[user.id]["object_id"] = object_id
     
     # Обновляем объект
-    update_object(object_id, {"renovation": renovation})
+    await update_object_async(object_id, {"renovation": renovation})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_renovation_updated',
-                details_json={'object_id': object_id, 'renovation': renovation},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_renovation_updated', telegram_id=str(user.id), details={'object_id': object_id, 'renovation': renovation})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
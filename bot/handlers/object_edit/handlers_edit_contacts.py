@@ -3,15 +3,12 @@ Contacts editing handlers
 Логика: редактирование контактов
 """
 import logging
-from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, CallbackQueryHandler, filters
 from bot.utils import (
-    get_user, get_object, update_object, get_districts_config, get_rooms_config
+    get_user_async, get_object_async, update_object_async, get_districts_config_async, get_rooms_config_async
 )
-from app.database import db
-from bot.models import Object, ActionLog
-from app.models.publication_history import PublicationHistory
+from bot.utils_logger import log_bot_action
 from bot.handlers_object import (
     user_data, show_object_preview_with_menu, OBJECT_WAITING_AREA, OBJECT_WAITING_FLOOR,
     OBJECT_WAITING_COMMENT, OBJECT_WAITING_RENOVATION, OBJECT_WAITING_ADDRESS,
@@ -77,8 +74,8 @@ async def edit_contacts_handler(update: Update, context: ContextTypes.DEFAULT_TY
     # Don't delete preview when editing contacts - keep it visible
     # await delete_preview_and_menu(context, user.id)
     
-    obj = get_object(object_id)
-    user_obj = get_user(str(user.id))
+    obj = await get_object_async(object_id)
+    user_obj = await get_user_async(str(user.id))
     
     phone = obj.phone_number if obj else None
     if not phone and user_obj:
@@ -161,7 +158,7 @@ async def edit_rooms_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     await delete_preview_and_menu(context, user.id)
     
-    rooms = get_rooms_config()
+    rooms = await get_rooms_config_async()
     keyboard = []
     row = []
     for i, room in enumerate(rooms):
@@ -189,22 +186,10 @@ async def edit_rooms_selected(update: Update, context: ContextTypes.DEFAULT_TYPE
         return ConversationHandler.END
     
     object_id = user_data[user.id]["object_id"]
-    update_object(object_id, {"rooms_type": rooms_type})
+    await update_object_async(object_id, {"rooms_type": rooms_type})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_rooms_updated',
-                details_json={'object_id': object_id, 'rooms_type': rooms_type},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_rooms_updated', telegram_id=str(user.id), details={'object_id': object_id, 'rooms_type': rooms_type})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
@@ -224,10 +209,10 @@ async def edit_district_handler(update: Update, context: ContextTypes.DEFAULT_TY
     
     await delete_preview_and_menu(context, user.id)
     
-    obj = get_object(object_id)
+    obj = await get_object_async(object_id)
     current_districts = obj.districts_json or [] if obj else []
     
-    districts = get_districts_config()
+    districts = await get_districts_config_async()
     keyboard = []
     for district in districts:
         is_selected = district in current_districts
@@ -253,7 +238,7 @@ async def edit_district_selected(update: Update, context: ContextTypes.DEFAULT_T
         return ConversationHandler.END
     
     object_id = user_data[user.id]["object_id"]
-    obj = get_object(object_id)
+    obj = await get_object_async(object_id)
     
     if not obj:
         await query.answer("Объект не найден.", show_alert=True)
@@ -266,22 +251,10 @@ async def edit_district_selected(update: Update, context: ContextTypes.DEFAULT_T
     else:
         current_districts.append(district)
     
-    update_object(object_id, {"districts_json": current_districts})
+    await update_object_async(object_id, {"districts_json": current_districts})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_districts_updated',
-                details_json={'object_id': object_id, 'districts': current_districts},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_districts_updated', telegram_id=str(user.id), details={'object_id': object_id, 'districts': current_districts})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
@@ -301,7 +274,7 @@ async def add_district_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     
     await delete_preview_and_menu(context, user.id)
     
-    districts = get_districts_config()
+    districts = await get_districts_config_async()
     keyboard = []
     for district in districts:
         keyboard.append([InlineKeyboardButton(district, callback_data=f"district_{district}")])
@@ -325,7 +298,7 @@ async def add_district_selected(update: Update, context: ContextTypes.DEFAULT_TY
         return ConversationHandler.END
     
     object_id = user_data[user.id]["object_id"]
-    obj = get_object(object_id)
+    obj = await get_object_async(object_id)
     
     if not obj:
         await query.answer("Объект не найден.", show_alert=True)
@@ -335,22 +308,10 @@ async def add_district_selected(update: Update, context: ContextTypes.DEFAULT_TY
     
     if district not in current_districts:
         current_districts.append(district)
-        update_object(object_id, {"districts_json": current_districts})
+        await update_object_async(object_id, {"districts_json": current_districts})
         
         # Log action
-        try:
-            user_obj = get_user(str(user.id))
-            if user_obj:
-                action_log = ActionLog(
-                    user_id=user_obj.user_id,
-                    action='bot_object_district_added',
-                    details_json={'object_id': object_id, 'district': district},
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(action_log)
-                db.session.commit()
-        except Exception as e:
-            logger.error(f"Failed to log action: {e}")
+        log_bot_action(action='bot_object_district_added', telegram_id=str(user.id), details={'object_id': object_id, 'district': district})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
@@ -430,22 +391,10 @@ async def contacts_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Check if waiting for contact name
     if user_data[user.id].get("waiting_contact_name"):
         user_data[user.id].pop("waiting_contact_name", None)
-        update_object(object_id, {"contact_name": text})
+        await update_object_async(object_id, {"contact_name": text})
         
         # Log action
-        try:
-            user_obj = get_user(str(user.id))
-            if user_obj:
-                action_log = ActionLog(
-                    user_id=user_obj.user_id,
-                    action='bot_object_contact_name_set',
-                    details_json={'object_id': object_id, 'name': text},
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(action_log)
-                db.session.commit()
-        except Exception as e:
-            logger.error(f"Failed to log action: {e}")
+        log_bot_action(action='bot_object_contact_name_set', telegram_id=str(user.id), details={'object_id': object_id, 'name': text})
     else:
         # Phone input - валидация формата 89693386969
         phone = text
@@ -455,22 +404,10 @@ async def contacts_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("❌ Некорректный номер телефона. Номер должен быть в формате 89693386969 (11 цифр, начинается с 8).")
             return OBJECT_WAITING_CONTACTS
         
-        update_object(object_id, {"phone_number": phone})
+        await update_object_async(object_id, {"phone_number": phone})
         
         # Log action
-        try:
-            user_obj = get_user(str(user.id))
-            if user_obj:
-                action_log = ActionLog(
-                    user_id=user_obj.user_id,
-                    action='bot_object_phone_set',
-                    details_json={'object_id': object_id, 'phone': phone},
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(action_log)
-                db.session.commit()
-        except Exception as e:
-            logger.error(f"Failed to log action: {e}")
+        log_bot_action(action='bot_object_phone_set', telegram_id=str(user.id), details={'object_id': object_id, 'phone': phone})
     
     # Show contacts menu again with updated values
     await edit_contacts_handler(update, context)
@@ -488,22 +425,10 @@ async def contact_name_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
     name = update.message.text.strip()
     object_id = user_data[user.id]["object_id"]
     
-    update_object(object_id, {"contact_name": name})
+    await update_object_async(object_id, {"contact_name": name})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_contact_name_set',
-                details_json={'object_id': object_id, 'name': name},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_contact_name_set', telegram_id=str(user.id), details={'object_id': object_id, 'name': name})
     
     # Show contacts menu again with updated values
     await edit_contacts_handler(update, context)
@@ -522,7 +447,7 @@ async def phone_from_settings_handler(update: Update, context: ContextTypes.DEFA
         user_data[user.id] = {}
     user_data[user.id]["object_id"] = object_id
     
-    user_obj = get_user(str(user.id))
+    user_obj = await get_user_async(str(user.id))
     if not user_obj:
         await query.answer("Ошибка: пользователь не найден.", show_alert=True)
         return OBJECT_WAITING_CONTACTS
@@ -541,20 +466,10 @@ async def phone_from_settings_handler(update: Update, context: ContextTypes.DEFA
         update_data['contact_name'] = contact_name
     update_data['show_username'] = show_username
     
-    update_object(object_id, update_data)
+    await update_object_async(object_id, update_data)
     
     # Log action
-    try:
-        action_log = ActionLog(
-            user_id=user_obj.user_id,
-            action='bot_object_contacts_from_settings',
-            details_json={'object_id': object_id},
-            created_at=datetime.utcnow()
-        )
-        db.session.add(action_log)
-        db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_contacts_from_settings', user_id=user_obj.user_id, details={'object_id': object_id})
     
     # Show contacts menu again with updated values
     await edit_contacts_handler(update, context)
@@ -615,25 +530,13 @@ async def toggle_username_handler(update: Update, context: ContextTypes.DEFAULT_
         user_data[user.id] = {}
     user_data[user.id]["object_id"] = object_id
     
-    obj = get_object(object_id)
+    obj = await get_object_async(object_id)
     if obj:
         current_value = obj.show_username or False
-        update_object(object_id, {"show_username": not current_value})
+        await update_object_async(object_id, {"show_username": not current_value})
         
         # Log action
-        try:
-            user_obj = get_user(str(user.id))
-            if user_obj:
-                action_log = ActionLog(
-                    user_id=user_obj.user_id,
-                    action='bot_object_show_username_toggled',
-                    details_json={'object_id': object_id, 'show_username': not current_value},
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(action_log)
-                db.session.commit()
-        except Exception as e:
-            logger.error(f"Failed to log action: {e}")
+        log_bot_action(action='bot_object_show_username_toggled', telegram_id=str(user.id), details={'object_id': object_id, 'show_username': not current_value})
     
     # Show contacts menu again with updated values
     await edit_contacts_handler(update, context)
@@ -3,15 +3,12 @@ Location editing handlers
 Логика: редактирование адреса, района, ЖК
 """
 import logging
-from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, CallbackQueryHandler, filters
 from bot.utils import (
-    get_user, get_object, update_object, get_districts_config, get_rooms_config
+    get_user_async, get_object_async, update_object_async, get_districts_config_async, get_rooms_config_async
 )
-from app.database import db
-from bot.models import Object, ActionLog
-from app.models.publication_history import PublicationHistory
+from bot.utils_logger import log_bot_action
 from bot.handlers_object import (
     user_data, show_object_preview_with_menu, OBJECT_WAITING_AREA, OBJECT_WAITING_FLOOR,
     OBJECT_WAITING_COMMENT, OBJECT_WAITING_RENOVATION, OBJECT_WAITING_ADDRESS,
@@ -61,22 +58,10 @@ async def address_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     address = update.message.text.strip()
     object_id = user_data[user.id]["object_id"]
-    update_object(object_id, {"address": address})
+    await update_object_async(object_id, {"address": address})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_address_updated',
-                details_json={'object_id': object_id, 'address': address},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_address_updated', telegram_id=str(user.id), details={'object_id': object_id, 'address': address})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
@@ -128,8 +113,8 @@ async def edit_contacts_handler(update: Update, context: ContextTypes.DEFAULT_TY
     # Don't delete preview when editing contacts - keep it visible
     # await delete_preview_and_menu(context, user.id)
     
-    obj = get_object(object_id)
-    user_obj = get_user(str(user.id))
+    obj = await get_object_async(object_id)
+    user_obj = await get_user_async(str(user.id))
     
     phone = obj.phone_number if obj else None
     if not phone and user_obj:
@@ -212,7 +197,7 @@ async def edit_rooms_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     await delete_preview_and_menu(context, user.id)
     
-    rooms = get_rooms_config()
+    rooms = await get_rooms_config_async()
     keyboard = []
     row = []
     for i, room in enumerate(rooms):
@@ -240,22 +225,10 @@ async def edit_rooms_selected(update: Update, context: ContextTypes.DEFAULT_TYPE
         return ConversationHandler.END
     
     object_id = user_data[user.id]["object_id"]
-    update_object(object_id, {"rooms_type": rooms_type})
+    await update_object_async(object_id, {"rooms_type": rooms_type})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_rooms_updated',
-                details_json={'object_id': object_id, 'rooms_type': rooms_type},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_rooms_updated', telegram_id=str(user.id), details={'object_id': object_id, 'rooms_type': rooms_type})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
@@ -275,10 +248,10 @@ async def edit_district_handler(update: Update, context: ContextTypes.DEFAULT_TY
     
     await delete_preview_and_menu(context, user.id)
     
-    obj = get_object(object_id)
+    obj = await get_object_async(object_id)
     current_districts = obj.districts_json or [] if obj else []
     
-    districts = get_districts_config()
+    districts = await get_districts_config_async()
     keyboard = []
     for district in districts:
         is_selected = district in current_districts
@@ -304,7 +277,7 @@ async def edit_district_selected(update: Update, context: ContextTypes.DEFAULT_T
         return ConversationHandler.END
     
     object_id = user_data[user.id]["object_id"]
-    obj = get_object(object_id)
+    obj = await get_object_async(object_id)
     
     if not obj:
         await query.answer("Объект не найден.", show_alert=True)
@@ -317,22 +290,10 @@ async def edit_district_selected(update: Update, context: ContextTypes.DEFAULT_T
     else:
         current_districts.append(district)
     
-    update_object(object_id, {"districts_json": current_districts})
+    await update_object_async(object_id, {"districts_json": current_districts})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_districts_updated',
-                details_json={'object_id': object_id, 'districts': current_districts},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_districts_updated', telegram_id=str(user.id), details={'object_id': object_id, 'districts': current_districts})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
@@ -352,7 +313,7 @@ async def add_district_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     
     await delete_preview_and_menu(context, user.id)
     
-    districts = get_districts_config()
+    districts = await get_districts_config_async()
     keyboard = []
     for district in districts:
         keyboard.append([InlineKeyboardButton(district, callback_data=f"district_{district}")])
@@ -376,7 +337,7 @@ async def add_district_selected(update: Update, context: ContextTypes.DEFAULT_TY
         return ConversationHandler.END
     
     object_id = user_data[user.id]["object_id"]
-    obj = get_object(object_id)
+    obj = await get_object_async(object_id)
     
     if not obj:
         await query.answer("Объект не найден.", show_alert=True)
@@ -386,22 +347,10 @@ async def add_district_selected(update: Update, context: ContextTypes.DEFAULT_TY
     
     if district not in current_districts:
         current_districts.append(district)
-        update_object(object_id, {"districts_json": current_districts})
+        await update_object_async(object_id, {"districts_json": current_districts})
         
         # Log action
-        try:
-            user_obj = get_user(str(user.id))
-            if user_obj:
-                action_log = ActionLog(
-                    user_id=user_obj.user_id,
-                    action='bot_object_district_added',
-                    details_json={'object_id': object_id, 'district': district},
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(action_log)
-                db.session.commit()
-        except Exception as e:
-            logger.error(f"Failed to log action: {e}")
+        log_bot_action(action='bot_object_district_added', telegram_id=str(user.id), details={'object_id': object_id, 'district': district})
     
     await show_object_preview_with_menu(update, context, object_id)
     return OBJECT_PREVIEW_MENU
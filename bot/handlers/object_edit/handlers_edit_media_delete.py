@@ -3,15 +3,10 @@ Media and delete handlers
 Логика: редактирование медиа, удаление объекта
 """
 import logging
-from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, CallbackQueryHandler, filters
-from bot.utils import (
-    get_user, get_object, update_object, get_districts_config, get_rooms_config
-)
-from app.database import db
-from bot.models import Object, ActionLog
-from app.models.publication_history import PublicationHistory
+from bot.utils import get_user_async, get_object_async, update_object_async, delete_object_async
+from bot.utils_logger import log_bot_action
 from bot.handlers_object import (
     user_data, show_object_preview_with_menu, OBJECT_WAITING_AREA, OBJECT_WAITING_FLOOR,
     OBJECT_WAITING_COMMENT, OBJECT_WAITING_RENOVATION, OBJECT_WAITING_ADDRESS,
@@ -105,22 +100,10 @@ async def contacts_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Check if waiting for contact name
     if user_data[user.id].get("waiting_contact_name"):
         user_data[user.id].pop("waiting_contact_name", None)
-        update_object(object_id, {"contact_name": text})
+        await update_object_async(object_id, {"contact_name": text})
         
         # Log action
-        try:
-            user_obj = get_user(str(user.id))
-            if user_obj:
-                action_log = ActionLog(
-                    user_id=user_obj.user_id,
-                    action='bot_object_contact_name_set',
-                    details_json={'object_id': object_id, 'name': text},
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(action_log)
-                db.session.commit()
-        except Exception as e:
-            logger.error(f"Failed to log action: {e}")
+        log_bot_action(action='bot_object_contact_name_set', telegram_id=str(user.id), details={'object_id': object_id, 'name': text})
     else:
         # Phone input - валидация формата 89693386969
         phone = text
@@ -130,22 +113,10 @@ async def contacts_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("❌ Некорректный номер телефона. Номер должен быть в формате 89693386969 (11 цифр, начинается с 8).")
             return OBJECT_WAITING_CONTACTS
         
-        update_object(object_id, {"phone_number": phone})
+        await update_object_async(object_id, {"phone_number": phone})
         
         # Log action
-        try:
-            user_obj = get_user(str(user.id))
-            if user_obj:
-                action_log = ActionLog(
-                    user_id=user_obj.user_id,
-                    action='bot_object_phone_set',
-                    details_json={'object_id': object_id, 'phone': phone},
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(action_log)
-                db.session.commit()
-        except Exception as e:
-            logger.error(f"Failed to log action: {e}")
+        log_bot_action(action='bot_object_phone_set', telegram_id=str(user.id), details={'object_id': object_id, 'phone': phone})
     
     # Show contacts menu again with updated values
     await edit_contacts_handler(update, context)
@@ -163,22 +134,10 @@ async def contact_name_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
     name = update.message.text.strip()
     object_id = user_data[user.id]["object_id"]
     
-    update_object(object_id, {"contact_name": name})
+    await update_object_async(object_id, {"contact_name": name})
     
     # Log action
-    try:
-        user_obj = get_user(str(user.id))
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_contact_name_set',
-                details_json={'object_id': object_id, 'name': name},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_contact_name_set', telegram_id=str(user.id), details={'object_id': object_id, 'name': name})
     
     # Show contacts menu again with updated values
     await edit_contacts_handler(update, context)
@@ -197,7 +156,7 @@ async def phone_from_settings_handler(update: Update, context: ContextTypes.DEFA
         user_data[user.id] = {}
     user_data[user.id]["object_id"] = object_id
     
-    user_obj = get_user(str(user.id))
+    user_obj = await get_user_async(str(user.id))
     if not user_obj:
         await query.answer("Ошибка: пользователь не найден.", show_alert=True)
         return OBJECT_WAITING_CONTACTS
@@ -216,20 +175,10 @@ async def phone_from_settings_handler(update: Update, context: ContextTypes.DEFA
         update_data['contact_name'] = contact_name
     update_data['show_username'] = show_username
     
-    update_object(object_id, update_data)
+    await update_object_async(object_id, update_data)
     
     # Log action
-    try:
-        action_log = ActionLog(
-            user_id=user_obj.user_id,
-            action='bot_object_contacts_from_settings',
-            details_json={'object_id': object_id},
-            created_at=datetime.utcnow()
-        )
-        db.session.add(action_log)
-        db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(action='bot_object_contacts_from_settings', user_id=user_obj.user_id, details={'object_id': object_id})
     
     # Show contacts menu again with updated values
     await edit_contacts_handler(update, context)
@@ -290,25 +239,13 @@ async def toggle_username_handler(update: Update, context: ContextTypes.DEFAULT_
         user_data[user.id] = {}
     user_data[user.id]["object_id"] = object_id
     
-    obj = get_object(object_id)
+    obj = await get_object_async(object_id)
     if obj:
         current_value = obj.show_username or False
-        update_object(object_id, {"show_username": not current_value})
+        await update_object_async(object_id, {"show_username": not current_value})
         
         # Log action
-        try:
-            user_obj = get_user(str(user.id))
-            if user_obj:
-                action_log = ActionLog(
-                    user_id=user_obj.user_id,
-                    action='bot_object_show_username_toggled',
-                    details_json={'object_id': object_id, 'show_username': not current_value},
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(action_log)
-                db.session.commit()
-        except Exception as e:
-            logger.error(f"Failed to log action: {e}")
+        log_bot_action(action='bot_object_show_username_toggled', telegram_id=str(user.id), details={'object_id': object_id, 'show_username': not current_value})
     
     # Show contacts menu again with updated values
     await edit_contacts_handler(update, context)
@@ -329,14 +266,14 @@ async def delete_object_handler(update: Update, context: ContextTypes.DEFAULT_TY
     object_id = query.data.replace("delete_object_", "")
     
     user = update.effective_user
-    obj = get_object(object_id)
+    obj = await get_object_async(object_id)
     
     if not obj:
         await query.answer("Объект не найден.", show_alert=True)
         return OBJECT_PREVIEW_MENU
     
     # Check ownership
-    user_obj = get_user(str(user.id))
+    user_obj = await get_user_async(str(user.id))
     if not user_obj or obj.user_id != user_obj.user_id:
         await query.answer("Вы можете удалять только свои объекты.", show_alert=True)
         return OBJECT_PREVIEW_MENU
@@ -384,42 +321,26 @@ async def confirm_delete_object_handler(update: Update, context: ContextTypes.DE
     object_id = query.data.replace("confirm_delete_", "")
     
     user = update.effective_user
-    obj = get_object(object_id)
+    obj = await get_object_async(object_id)
     
     if not obj:
         await query.answer("Объект не найден.", show_alert=True)
         return ConversationHandler.END
     
     # Check ownership
-    user_obj = get_user(str(user.id))
+    user_obj = await get_user_async(str(user.id))
     if not user_obj or obj.user_id != user_obj.user_id:
         await query.answer("Вы можете удалять только свои объекты.", show_alert=True)
         return ConversationHandler.END
     
     # Delete object
     try:
-        # First, delete all related publication_history records
-        # This prevents NOT NULL constraint violation
-        # Use db.session.query() instead of Model.query for proper session handling
-        db.session.query(PublicationHistory).filter_by(object_id=object_id).delete(synchronize_session=False)
-        db.session.commit()
-        
         # Log action before deletion
-        try:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_deleted',
-                details_json={'object_id': object_id},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-        except Exception as e:
-            logger.error(f"Failed to log delete action: {e}")
+        log_bot_action(action='bot_object_deleted', user_id=user_obj.user_id, details={'object_id': object_id})
         
-        # Delete the object
-        db.session.delete(obj)
-        db.session.commit()
+        # Delete the object together with publication_history records
+        # (this prevents NOT NULL constraint violation)
+        await delete_object_async(object_id)
         
         # Clean up user_data
         if user.id in user_data:
@@ -444,6 +365,5 @@ async def confirm_delete_object_handler(update: Update, context: ContextTypes.DE
         return ConversationHandler.END
     except Exception as e:
         logger.error(f"Error deleting object: {e}", exc_info=True)
-        db.session.rollback()
         await query.answer("Ошибка при удалении объекта.", show_alert=True)
         return OBJECT_PREVIEW_MENU
@@ -6,7 +6,7 @@ import logging
 import sys
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from bot.utils import get_user, update_user_activity, generate_web_code
+from bot.utils import get_user_async, update_user_activity_async, generate_web_code_async
 from bot.config import ADMIN_ID
 from bot.utils_logger import log_bot_action, log_bot_error
 
@@ -43,7 +43,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         logger.debug(f"[START_COMMAND] Step 1: Updating user activity for {telegram_id}")
         # Обновляем активность пользователя в БД
-        update_user_activity(telegram_id, user.username)
+        await update_user_activity_async(telegram_id, user.username)
         logger.debug(f"[START_COMMAND] Step 2: User activity updated")
         
         # Проверяем параметр start: если 'getcode', сразу генерируем код
@@ -147,13 +147,13 @@ async def getcode_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         # Генерируем код для веб-интерфейса
-        code = generate_web_code(telegram_id)
+        code = await generate_web_code_async(telegram_id)
         
         # Формируем сообщение с кодом (моноширинный шрифт для удобства копирования)
         text = f"Ваш код для входа в веб-интерфейс:\n\n<code>{code}</code>\n\nКод действителен 10 минут.\n\nНажмите на код, чтобы скопировать."
         
         # Логируем действие в БД и файл
-        user_obj = get_user(telegram_id)
+        user_obj = await get_user_async(telegram_id)
         log_bot_action(
             action='bot_getcode_requested',
             user_id=user_obj.user_id if user_obj else None,
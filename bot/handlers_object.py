@@ -2,18 +2,19 @@
 Object creation handlers for bot
 """
 import logging
-from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InputMediaVideo
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, CallbackQueryHandler, filters
 from bot.utils import (
-    get_user, update_user_activity, create_object, get_object, update_object,
-    get_user_id_prefix, set_user_id_prefix, generate_next_id_prefix,
-    format_publication_text, get_rooms_config, get_districts_config
+    get_user, create_object, get_object, update_object_async,
+    get_rooms_config_async, get_districts_config_async, get_object_publication_async
 )
+from bot.database import run_db
+from bot.utils_logger import log_bot_action
 from app.database import db
-from bot.models import Object, SystemSetting, ActionLog
+from bot.models import Object
+from app.utils.photos import PHOTO_VARIANT_TELEGRAM, photo_full_path, photo_variant_path
+from app.utils.photo_storage import new_temp_path, normalize_extension, store_photo_file
 from bot.config import ROLE_START, ROLE_BROKE, ROLE_BEGINNER
-from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +34,56 @@ OBJECT_WAITING_CONTACTS = 10
 user_data = {}
 
 
+# Работа с БД для обработчиков создания объекта - выполняется через run_db (вне event loop)
+
+def _discard_object(object_id: str):
+    """Удалить незавершённый объект"""
+    obj = get_object(object_id)
+    if obj:
+        db.session.delete(obj)
+        db.session.commit()
+
+
+def _start_object_creation(user_id_str: str, old_object_id: str = None):
+    """
+    Удалить прежний незавершённый объект, создать новый и повысить роль новичка
+    Возвращает (object_id, user_id пользователя в БД)
+    """
+    if old_object_id:
+        try:
+            _discard_object(old_object_id)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error deleting old object: {e}")
+
+    object_id = create_object(user_id_str)
+
+    # Update user role if needed
+    user_obj = get_user(user_id_str)
+    if user_obj and user_obj.bot_role in [ROLE_START, ROLE_BROKE]:
+        user_obj.bot_role = ROLE_BEGINNER
+        db.session.commit()
+    return object_id, user_obj.user_id if user_obj else None
+
+
+def _attach_photo(object_id: str, filepath: str, filename: str):
+    """
+    Перенести скачанное фото в хранилище и записать его в объект (разрешено одно фото)
+    Возвращает объект или None, если объекта уже нет
+    """
+    obj = db.session.query(Object).filter_by(object_id=object_id).first()
+    if not obj:
+        return None
+    # Store relative path - always use path, never file_id
+    photo_path = store_photo_file(db.session, filepath, filename)
+    obj.photos_json = [photo_path] if photo_path else []
+    db.session.commit()
+
+    # Варианты фото (JPEG для Telegram, миниатюра для веба) строятся в Celery
+    if photo_path:
+        from workers.tasks.tasks_media import enqueue_photo_processing
+        enqueue_photo_processing(object_id)
+    return obj
 
 
 async def add_object_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -44,21 +95,14 @@ async def add_object_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id_str = str(user.id)
     
     # Clear old user data if exists
+    old_object_id = None
     if user.id in user_data:
         old_object_id = user_data[user.id].get("object_id")
-        if old_object_id:
-            try:
-                obj = get_object(old_object_id)
-                if obj:
-                    db.session.delete(obj)
-                    db.session.commit()
-            except Exception as e:
-                logger.error(f"Error deleting old object: {e}")
         user_data.pop(user.id, None)
     
     # Create new object
     try:
-        object_id = create_object(user_id_str)
+        object_id, db_user_id = await run_db(_start_object_creation, user_id_str, old_object_id)
         
         # Initialize user data
         user_data[user.id] = {
@@ -66,29 +110,16 @@ async def add_object_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "districts": []
         }
         
-        # Update user role if needed
-        user_obj = get_user(user_id_str)
-        if user_obj:
-            if user_obj.bot_role in [ROLE_START, ROLE_BROKE]:
-                user_obj.bot_role = ROLE_BEGINNER
-                db.session.commit()
-        
         # Log action
-        try:
-            if user_obj:
-                action_log = ActionLog(
-                    user_id=user_obj.user_id,
-                    action='bot_object_creation_started',
-                    details_json={'object_id': object_id},
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(action_log)
-                db.session.commit()
-        except Exception as e:
-            logger.error(f"Failed to log action: {e}")
+        if db_user_id:
+            log_bot_action(
+                action='bot_object_creation_started',
+                user_id=db_user_id,
+                details={'object_id': object_id}
+            )
         
         # Step 1: Select rooms type
-        rooms = get_rooms_config()
+        rooms = await get_rooms_config_async()
         keyboard = []
         row = []
         for i, room in enumerate(rooms):
@@ -127,17 +158,10 @@ async def object_rooms_selected(update: Update, context: ContextTypes.DEFAULT_TY
     object_id = user_data[user.id]["object_id"]
     
     # Update object
-    db_session = get_db()
-    try:
-        obj = db_session.query(Object).filter_by(object_id=object_id).first()
-        if obj:
-            obj.rooms_type = rooms_type
-            db_session.commit()
-    finally:
-        db_session.close()
+    await update_object_async(object_id, {"rooms_type": rooms_type})
     
     # Step 2: Select districts
-    districts_config = get_districts_config()
+    districts_config = await get_districts_config_async()
     districts = list(districts_config.keys()) if districts_config else []
     
     if not districts:
@@ -183,14 +207,7 @@ async def object_district_selected(update: Update, context: ContextTypes.DEFAULT
     
     # Update object
     object_id = user_data[user.id]["object_id"]
-    db_session = get_db()
-    try:
-        obj = db_session.query(Object).filter_by(object_id=object_id).first()
-        if obj:
-            obj.districts_json = user_data[user.id]["districts"]
-            db_session.commit()
-    finally:
-        db_session.close()
+    await update_object_async(object_id, {"districts_json": list(user_data[user.id]["districts"])})
     
     # Go to price
     keyboard = [[InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]]
@@ -216,14 +233,7 @@ async def object_price_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
         
         # Update object
         object_id = user_data[user.id]["object_id"]
-        db_session = get_db()
-        try:
-            obj = db_session.query(Object).filter_by(object_id=object_id).first()
-            if obj:
-                obj.price = price
-                db.session.commit()
-        finally:
-            db_session.close()
+        await update_object_async(object_id, {"price": price})
         
         # Go to area
         keyboard = [[InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_menu")]]
@@ -253,19 +263,9 @@ async def object_area_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # Update object
         object_id = user_data[user.id]["object_id"]
-        db_session = get_db()
-        rooms_type = None
-        comment = None
-        try:
-            obj = db_session.query(Object).filter_by(object_id=object_id).first()
-            if obj:
-                # Get rooms_type and comment before closing session
-                rooms_type = obj.rooms_type
-                comment = obj.comment
-                obj.area = area
-                db.session.commit()
-        finally:
-            db_session.close()
+        obj = await update_object_async(object_id, {"area": area})
+        rooms_type = obj.rooms_type if obj else None
+        comment = obj.comment if obj else None
         
         # If comment exists, this is editing from menu - return to preview
         if comment:
@@ -308,16 +308,8 @@ async def object_floor_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     # Update object
     object_id = user_data[user.id]["object_id"]
-    db_session = get_db()
-    comment = None
-    try:
-        obj = db_session.query(Object).filter_by(object_id=object_id).first()
-        if obj:
-            comment = obj.comment
-            obj.floor = floor
-            db_session.commit()
-    finally:
-        db_session.close()
+    obj = await update_object_async(object_id, {"floor": floor})
+    comment = obj.comment if obj else None
     
     # If comment exists, this is editing from menu - return to preview
     if comment:
@@ -346,16 +338,8 @@ async def object_comment_input(update: Update, context: ContextTypes.DEFAULT_TYP
     
     # Update object
     object_id = user_data[user.id]["object_id"]
-    db_session = get_db()
-    photos_count = 0
-    try:
-        obj = db_session.query(Object).filter_by(object_id=object_id).first()
-        if obj:
-            obj.comment = comment
-            photos_count = len(obj.photos_json) if obj.photos_json else 0
-            db_session.commit()
-    finally:
-        db_session.close()
+    obj = await update_object_async(object_id, {"comment": comment})
+    photos_count = len(obj.photos_json) if obj and obj.photos_json else 0
     
     # If photos exist, this is editing from menu - return to preview
     if photos_count > 0:
@@ -382,82 +366,38 @@ async def object_media_received(update: Update, context: ContextTypes.DEFAULT_TY
         return ConversationHandler.END
     
     object_id = user_data[user.id]["object_id"]
-    db_session = get_db()
-    photos_json = []
-    try:
-        obj = db_session.query(Object).filter_by(object_id=object_id).first()
+    
+    # Get photos
+    if update.message.photo:
+        photos = update.message.photo
+        # Get largest photo
+        photo = photos[-1]
+        
+        # Download photo file from Telegram and save to disk
+        # Always save to server - this is the only way we store photos
+        try:
+            # Get file info from Telegram
+            file = await context.bot.get_file(photo.file_id)
+            
+            # Download to a temp file, then move into content-addressed storage
+            # (the same photo is stored once, see app/utils/photo_storage.py)
+            filepath = new_temp_path(normalize_extension(file.file_path))
+            await file.download_to_drive(filepath)
+            
+            # Хэширование, перенос файла и запись в БД - в пуле потоков
+            obj = await run_db(_attach_photo, object_id, filepath, file.file_path)
+        except Exception as e:
+            logger.error(f"Error downloading photo from Telegram: {e}", exc_info=True)
+            await update.message.reply_text("❌ Ошибка при сохранении фото. Попробуйте еще раз.")
+            return OBJECT_WAITING_MEDIA
         
         if not obj:
             await update.message.reply_text("Ошибка: объект не найден.")
             return ConversationHandler.END
         
-        # Get photos
-        if update.message.photo:
-            photos = update.message.photo
-            # Get largest photo
-            photo = photos[-1]
-            
-            # Download photo file from Telegram and save to disk
-            # Always save to server - this is the only way we store photos
-            photo_path = None
-            try:
-                # Get file info from Telegram
-                file = await context.bot.get_file(photo.file_id)
-                
-                # Generate unique filename
-                import os
-                from datetime import datetime
-                
-                # Get UPLOAD_FOLDER - try app.config first, fallback to default
-                try:
-                    from app.config import Config
-                    upload_folder = Config.UPLOAD_FOLDER
-                except (ImportError, AttributeError):
-                    # Fallback to default path
-                    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-                    upload_folder = os.path.join(base_dir, 'static', 'uploads')
-                
-                # Get file extension from file_path or use .jpg as default
-                file_ext = '.jpg'
-                if file.file_path:
-                    _, ext = os.path.splitext(file.file_path)
-                    if ext:
-                        file_ext = ext
-                
-                timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')
-                filename = f"{timestamp}_bot_photo{file_ext}"
-                
-                # Save to uploads folder
-                filepath = os.path.join(upload_folder, filename)
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                
-                # Download and save file
-                await file.download_to_drive(filepath)
-                
-                # Store relative path - always use path, never file_id
-                photo_path = f"uploads/{filename}"
-            except Exception as e:
-                logger.error(f"Error downloading photo from Telegram: {e}", exc_info=True)
-                await update.message.reply_text("❌ Ошибка при сохранении фото. Попробуйте еще раз.")
-                return OBJECT_WAITING_MEDIA
-            
-            # Save photo info - только одно фото разрешено
-            # Always store only path to file on server
-            if photo_path:
-                photos_json = [photo_path]
-            else:
-                photos_json = []
-            obj.photos_json = photos_json
-            db_session.commit()
-    finally:
-        db_session.close()
-    
-    # Handle photo response (outside of db session)
-    if update.message.photo:
         await update.message.reply_text("✅ Фото добавлено.")
         # Check if this is editing (comment exists) or creation
-        obj = get_object(object_id)
-        if obj and obj.comment:
+        if obj.comment:
             from bot.handlers.object_edit import OBJECT_PREVIEW_MENU
             await show_object_preview_with_menu(update, context, object_id)
             return OBJECT_PREVIEW_MENU
@@ -489,162 +429,111 @@ async def show_object_preview_with_menu(update: Update, context: ContextTypes.DE
             return ConversationHandler.END
         object_id = user_data[user.id]["object_id"]
     
-    # Get object and user
-    db_session = get_db()
-    try:
-        obj = db_session.query(Object).filter_by(object_id=object_id).first()
-        user_obj = get_user(user_id_str)
-        
-        if not obj:
-            if update.callback_query:
-                await update.callback_query.edit_message_text("Ошибка: объект не найден.")
-            else:
-                await update.message.reply_text("Ошибка: объект не найден.")
-            return ConversationHandler.END
-        
-        # Получаем формат публикации из конфигурации автопубликации
-        publication_format = 'default'
-        try:
-            from app.database import db as web_db
-            from app.models.autopublish_config import AutopublishConfig
-            web_cfg = web_db.session.query(AutopublishConfig).filter_by(
-                object_id=object_id
-            ).first()
-            if web_cfg and web_cfg.accounts_config_json:
-                accounts_cfg = web_cfg.accounts_config_json
-                if isinstance(accounts_cfg, dict):
-                    publication_format = accounts_cfg.get('publication_format', 'default')
-        except Exception:
-            # Если не удалось получить конфигурацию, используем формат по умолчанию
-            pass
-        
-        # Format text
-        text = format_publication_text(obj, user_obj, is_preview=True, publication_format=publication_format)
-        
-        # Add media count
-        photos_count = len(obj.photos_json) if obj.photos_json else 0
-        if photos_count > 0:
-            text += f"\n<b>Медиа:</b> {photos_count} файл(ов)\n"
-        
-        # Create menu keyboard
-        keyboard = [
-            [InlineKeyboardButton("Изменить стоимость", callback_data=f"edit_price_{object_id}")],
-            [InlineKeyboardButton("Выбрать фото", callback_data=f"add_media_{object_id}")],
-            [InlineKeyboardButton("Изменить комментарий", callback_data=f"edit_comment_{object_id}")],
-            [
-                InlineKeyboardButton("Добавить еще район", callback_data=f"add_district_{object_id}"),
-                InlineKeyboardButton("Изменить район", callback_data=f"edit_district_{object_id}")
-            ],
-            [
-                InlineKeyboardButton("Площадь", callback_data=f"edit_area_{object_id}"),
-                InlineKeyboardButton("Этаж", callback_data=f"edit_floor_{object_id}")
-            ],
-            [
-                InlineKeyboardButton("Изменить комнаты", callback_data=f"edit_rooms_{object_id}"),
-                InlineKeyboardButton("Состояние ремонта", callback_data=f"edit_renovation_{object_id}")
-            ],
-            [InlineKeyboardButton("Указать ЖК", callback_data=f"edit_residential_complex_{object_id}")],
-            [
-                InlineKeyboardButton("Адрес", callback_data=f"edit_address_{object_id}"),
-                InlineKeyboardButton("Контакты", callback_data=f"edit_contacts_{object_id}")
-            ],
-            [InlineKeyboardButton("Опубликовать сейчас", callback_data=f"publish_immediate_{object_id}")],
-            [InlineKeyboardButton("Автопубликация", callback_data=f"toggle_autopublish_{object_id}")],
-            [
-                InlineKeyboardButton("Удалить", callback_data=f"delete_object_{object_id}"),
-                InlineKeyboardButton("Мои объекты", callback_data="my_objects")
-            ],
-            [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Determine message source
-        if update.message:
-            message = update.message
-        elif update.callback_query:
-            message = update.callback_query.message
+    # Get object, user and publication text (формат из конфигурации автопубликации)
+    obj, user_obj, text = await get_object_publication_async(object_id, user_id_str, is_preview=True)
+    
+    if not obj:
+        if update.callback_query:
+            await update.callback_query.edit_message_text("Ошибка: объект не найден.")
         else:
-            return ConversationHandler.END
-        
-        # Send media if exists - всегда отправляем фото если оно есть
-        photos_json = obj.photos_json or []
-        preview_message = None
-        
-        if photos_json and len(photos_json) > 0:
-            try:
-                # Берем первое фото (только одно фото разрешено)
-                photo_data = photos_json[0]
-                photo_file = None
-                
-                # Извлекаем путь к файлу - всегда используем путь к файлу на сервере
-                photo_path = None
-                if isinstance(photo_data, dict):
-                    # Если это объект - берем path
-                    photo_path = photo_data.get('path', '')
-                elif isinstance(photo_data, str):
-                    # Если это строка - это путь к файлу
-                    photo_path = photo_data
+            await update.message.reply_text("Ошибка: объект не найден.")
+        return ConversationHandler.END
+    
+    # Add media count
+    photos_count = len(obj.photos_json) if obj.photos_json else 0
+    if photos_count > 0:
+        text += f"\n<b>Медиа:</b> {photos_count} файл(ов)\n"
+    
+    # Create menu keyboard
+    keyboard = [
+        [InlineKeyboardButton("Изменить стоимость", callback_data=f"edit_price_{object_id}")],
+        [InlineKeyboardButton("Выбрать фото", callback_data=f"add_media_{object_id}")],
+        [InlineKeyboardButton("Изменить комментарий", callback_data=f"edit_comment_{object_id}")],
+        [
+            InlineKeyboardButton("Добавить еще район", callback_data=f"add_district_{object_id}"),
+            InlineKeyboardButton("Изменить район", callback_data=f"edit_district_{object_id}")
+        ],
+        [
+            InlineKeyboardButton("Площадь", callback_data=f"edit_area_{object_id}"),
+            InlineKeyboardButton("Этаж", callback_data=f"edit_floor_{object_id}")
+        ],
+        [
+            InlineKeyboardButton("Изменить комнаты", callback_data=f"edit_rooms_{object_id}"),
+            InlineKeyboardButton("Состояние ремонта", callback_data=f"edit_renovation_{object_id}")
+        ],
+        [InlineKeyboardButton("Указать ЖК", callback_data=f"edit_residential_complex_{object_id}")],
+        [
+            InlineKeyboardButton("Адрес", callback_data=f"edit_address_{object_id}"),
+            InlineKeyboardButton("Контакты", callback_data=f"edit_contacts_{object_id}")
+        ],
+        [InlineKeyboardButton("Опубликовать сейчас", callback_data=f"publish_immediate_{object_id}")],
+        [InlineKeyboardButton("Автопубликация", callback_data=f"toggle_autopublish_{object_id}")],
+        [
+            InlineKeyboardButton("Удалить", callback_data=f"delete_object_{object_id}"),
+            InlineKeyboardButton("Мои объекты", callback_data="my_objects")
+        ],
+        [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    # Determine message source
+    if update.message:
+        message = update.message
+    elif update.callback_query:
+        message = update.callback_query.message
+    else:
+        return ConversationHandler.END
+    
+    # Send media if exists - всегда отправляем фото если оно есть
+    photos_json = obj.photos_json or []
+    preview_message = None
+    
+    if photos_json and len(photos_json) > 0:
+        try:
+            # Берем первое фото (только одно фото разрешено)
+            photo_data = photos_json[0]
+            photo_file = None
+            
+            # Путь к файлу на сервере: вариант для Telegram, пока его нет - оригинал
+            photo_path = photo_variant_path(photo_data, PHOTO_VARIANT_TELEGRAM)
+            
+            # Если есть путь к файлу, загружаем и отправляем
+            if photo_path:
+                import os
+                full_path = photo_full_path(photo_path)
                 
-                # Если есть путь к файлу, загружаем и отправляем
-                if photo_path:
-                    import os
-                    
-                    # Используем Config.UPLOAD_FOLDER напрямую
-                    try:
-                        from app.config import Config
-                        upload_folder = Config.UPLOAD_FOLDER
-                    except (ImportError, AttributeError):
-                        # Fallback to default path
-                        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-                        upload_folder = os.path.join(base_dir, 'static', 'uploads')
-                    
-                    # photo_path может быть "uploads/filename.jpg" или просто "filename.jpg"
-                    if photo_path.startswith('uploads/'):
-                        # Убираем префикс "uploads/" и используем upload_folder
-                        filename = photo_path.replace('uploads/', '', 1)
-                        full_path = os.path.join(upload_folder, filename)
-                    elif photo_path.startswith('/'):
-                        # Абсолютный путь
-                        full_path = photo_path
-                    else:
-                        # Относительный путь - используем upload_folder
-                        full_path = os.path.join(upload_folder, photo_path)
-                    
-                    logger.info(f"Trying to send photo in preview: photo_path={photo_path}, full_path={full_path}, exists={os.path.exists(full_path)}")
-                    if os.path.exists(full_path):
-                        # Открываем файл и отправляем
-                        with open(full_path, 'rb') as f:
-                            preview_message = await message.reply_photo(
-                                photo=f,
-                                caption=text,
-                                parse_mode='HTML'
-                            )
-                    else:
-                        logger.warning(f"Photo file not found: {full_path} (original: {photo_path})")
-                        preview_message = await message.reply_text(text, parse_mode='HTML')
+                logger.info(f"Trying to send photo in preview: photo_path={photo_path}, full_path={full_path}, exists={os.path.exists(full_path)}")
+                if os.path.exists(full_path):
+                    # Открываем файл и отправляем
+                    with open(full_path, 'rb') as f:
+                        preview_message = await message.reply_photo(
+                            photo=f,
+                            caption=text,
+                            parse_mode='HTML'
+                        )
                 else:
-                    # Если не удалось определить фото - отправляем только текст
+                    logger.warning(f"Photo file not found: {full_path} (original: {photo_path})")
                     preview_message = await message.reply_text(text, parse_mode='HTML')
-            except Exception as e:
-                logger.error(f"Error sending media: {e}", exc_info=True)
+            else:
+                # Если не удалось определить фото - отправляем только текст
                 preview_message = await message.reply_text(text, parse_mode='HTML')
-        else:
-            # Если фото нет - отправляем только текст
+        except Exception as e:
+            logger.error(f"Error sending media: {e}", exc_info=True)
             preview_message = await message.reply_text(text, parse_mode='HTML')
-        
-        # Send menu
-        menu_text = "Выберите действие:"
-        menu_message = await message.reply_text(menu_text, reply_markup=reply_markup)
-        
-        # Store message IDs for later deletion if needed
-        if user.id not in user_data:
-            user_data[user.id] = {}
-        user_data[user.id]["preview_message_id"] = preview_message.message_id
-        user_data[user.id]["menu_message_id"] = menu_message.message_id
-        user_data[user.id]["preview_chat_id"] = message.chat_id
-        
-    finally:
-        db_session.close()
+    else:
+        # Если фото нет - отправляем только текст
+        preview_message = await message.reply_text(text, parse_mode='HTML')
+    
+    # Send menu
+    menu_text = "Выберите действие:"
+    menu_message = await message.reply_text(menu_text, reply_markup=reply_markup)
+    
+    # Store message IDs for later deletion if needed
+    if user.id not in user_data:
+        user_data[user.id] = {}
+    user_data[user.id]["preview_message_id"] = preview_message.message_id
+    user_data[user.id]["menu_message_id"] = menu_message.message_id
+    user_data[user.id]["preview_chat_id"] = message.chat_id
     
     # Return preview menu state instead of END to allow editing
     from bot.handlers.object_edit import OBJECT_PREVIEW_MENU
@@ -662,22 +551,15 @@ async def finish_object_creation(update: Update, context: ContextTypes.DEFAULT_T
         return ConversationHandler.END
     
     object_id = user_data[user.id]["object_id"]
-    db_session = get_db()
-    try:
-        obj = db_session.query(Object).filter_by(object_id=object_id).first()
-        
-        if not obj:
-            if update.callback_query:
-                await update.callback_query.edit_message_text("Ошибка: объект не найден.")
-            else:
-                await update.message.reply_text("Ошибка: объект не найден.")
-            return ConversationHandler.END
-        
-        # Mark as draft
-        obj.status = 'черновик'
-        db_session.commit()
-    finally:
-        db_session.close()
+    
+    # Mark as draft
+    obj = await update_object_async(object_id, {"status": 'черновик'})
+    if not obj:
+        if update.callback_query:
+            await update.callback_query.edit_message_text("Ошибка: объект не найден.")
+        else:
+            await update.message.reply_text("Ошибка: объект не найден.")
+        return ConversationHandler.END
     
     # Show preview with menu (don't clear user_data - keep object_id for editing)
     return await show_object_preview_with_menu(update, context, object_id)
@@ -690,13 +572,7 @@ async def cancel_object_creation(update: Update, context: ContextTypes.DEFAULT_T
         object_id = user_data[user.id].get("object_id")
         if object_id:
             try:
-                obj = get_object(object_id)
-                if obj:
-                    try:
-                        db.session.delete(obj)
-                        db.session.commit()
-                    except Exception as e:
-                        logger.error(f"Error deleting object from database: {e}")
+                await run_db(_discard_object, object_id)
             except Exception as e:
                 logger.error(f"Error deleting object: {e}")
         user_data.pop(user.id, None)
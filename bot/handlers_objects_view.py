@@ -4,9 +4,8 @@ Object viewing handlers for bot
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CallbackQueryHandler
-from bot.utils import get_user, get_user_objects, get_object
-from bot.database import get_db
-from bot.models import Object, ActionLog
+from bot.utils import get_user_async, get_user_objects_async, get_object_async
+from bot.utils_logger import log_bot_action
 from bot.handlers_object import user_data
 from datetime import datetime
 
@@ -19,7 +18,7 @@ async def my_objects_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
     user_id_str = str(user.id)
     
     # Get user from DB
-    user_obj = get_user(user_id_str)
+    user_obj = await get_user_async(user_id_str)
     if not user_obj:
         if update.message:
             await update.message.reply_text("Ошибка: пользователь не найден.")
@@ -28,7 +27,7 @@ async def my_objects_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
         return
     
     # Get objects
-    objects = get_user_objects(user_id_str)
+    objects = await get_user_objects_async(user_id_str)
     
     if not objects:
         keyboard = [[InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")]]
@@ -92,17 +91,11 @@ async def my_objects_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
         await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode='HTML')
     
     # Log action
-    try:
-        action_log = ActionLog(
-            user_id=user_obj.user_id,
-            action='bot_my_objects_viewed',
-            details_json={'objects_count': len(objects), 'page': page},
-            created_at=datetime.utcnow()
-        )
-        db.session.add(action_log)
-        db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    log_bot_action(
+        action='bot_my_objects_viewed',
+        user_id=user_obj.user_id,
+        details={'objects_count': len(objects), 'page': page}
+    )
 
 
 async def my_objects_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -131,13 +124,13 @@ async def edit_object_from_list(update: Update, context: ContextTypes.DEFAULT_TY
     object_id = query.data.replace("edit_object_from_list_", "")
     
     # Check if object exists and belongs to user
-    obj = get_object(object_id)
+    obj = await get_object_async(object_id)
     if not obj:
         await query.answer("Объект не найден.", show_alert=True)
         from telegram.ext import ConversationHandler
         return ConversationHandler.END
     
-    user_obj = get_user(str(user.id))
+    user_obj = await get_user_async(str(user.id))
     if not user_obj or obj.user_id != user_obj.user_id:
         await query.answer("Этот объект вам не принадлежит.", show_alert=True)
         from telegram.ext import ConversationHandler
@@ -7,11 +7,14 @@ from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InputMediaVideo, InputFile
 from telegram.ext import ContextTypes, ConversationHandler
 from bot.utils import (
-    get_user, get_object, update_object, get_districts_config, get_price_ranges,
-    format_publication_text, get_moscow_time, format_moscow_datetime
+    get_object_async, get_user_async, update_object_async, get_object_publication_async,
+    get_districts_config, get_moscow_time, format_moscow_datetime
 )
+from bot.database import run_db
+from bot.utils_logger import log_bot_action
 from app.database import db
-from bot.models import Object, ActionLog, Chat, PublicationHistory
+from bot.models import Object, Chat, PublicationHistory
+from app.utils.photos import PHOTO_VARIANT_TELEGRAM, photo_file_id_of, photo_full_path, photo_variant_path
 from datetime import timedelta
 from bot.handlers_object import user_data, show_object_preview_with_menu
 from bot.handlers.object_edit import OBJECT_PREVIEW_MENU
@@ -27,7 +30,41 @@ def get_parse_mode_for_text(text: str):
 
 
 async def get_target_chats_for_object(obj: Object) -> list:
-    """Определить целевые чаты для объекта"""
+    """Определить целевые чаты для объекта (chat_id в порядке подбора)"""
+    return await run_db(_find_target_chats, obj)
+
+
+def _get_chats(chat_ids: list) -> dict:
+    """Чаты по chat_id: {chat_id: Chat}"""
+    if not chat_ids:
+        return {}
+    chats = db.session.query(Chat).filter(Chat.chat_id.in_(chat_ids)).all()
+    return {chat.chat_id: chat for chat in chats}
+
+
+def _record_publication(object_id: str, chat_id: int):
+    """Статистика чата и запись в историю публикаций после отправки ботом"""
+    chat = db.session.query(Chat).filter_by(chat_id=chat_id).first()
+    if not chat:
+        return
+    chat.total_publications = (chat.total_publications or 0) + 1
+    chat.last_publication = datetime.utcnow()
+    
+    # Create publication history entry
+    history = PublicationHistory(
+        object_id=object_id,
+        chat_id=chat_id,
+        account_id=None,  # Bot publication
+        published_at=datetime.utcnow(),
+        message_id=None,  # Will be updated if needed
+        deleted=False
+    )
+    db.session.add(history)
+    db.session.commit()
+
+
+def _find_target_chats(obj: Object) -> list:
+    """Подбор чатов по фильтрам (синхронно, выполняется через run_db)"""
     target_chats = []
     
     # Get all active bot chats
@@ -133,12 +170,12 @@ async def publish_immediate_handler(update: Update, context: ContextTypes.DEFAUL
         user_data[user.id] = {}
     user_data[user.id]["object_id"] = object_id
     
-    obj = get_object(object_id)
+    obj = await get_object_async(object_id)
     if not obj:
         await query.answer("Ошибка: объект не найден.", show_alert=True)
         return OBJECT_PREVIEW_MENU
     
-    user_obj = get_user(str(user.id))
+    user_obj = await get_user_async(str(user.id))
     
     # Check contacts
     phone = obj.phone_number
@@ -171,8 +208,8 @@ async def publish_immediate_handler(update: Update, context: ContextTypes.DEFAUL
     
     # Get chat names
     chat_names = []
-    chats = db.session.query(Chat).filter(Chat.chat_id.in_(target_chats)).all()
-    for chat in chats:
+    chats = await run_db(_get_chats, target_chats)
+    for chat in chats.values():
         chat_names.append(chat.title or f'Чат {chat.chat_id}')
     
     # Format text with chat list
@@ -226,36 +263,18 @@ async def confirm_publish_handler(update: Update, context: ContextTypes.DEFAULT_
 
 async def publish_object_immediate(update: Update, context: ContextTypes.DEFAULT_TYPE, object_id: str):
     """Немедленная публикация объекта"""
-    obj = get_object(object_id)
+    user = update.effective_user
+    
+    # Объект, пользователь и текст публикации (формат из конфигурации автопубликации)
+    obj, user_obj, publication_text = await get_object_publication_async(object_id, str(user.id), is_preview=False)
     if not obj:
         if update.callback_query:
             await update.callback_query.answer("Объект не найден.", show_alert=True)
         return
     
-    user = update.effective_user
-    user_obj = get_user(str(user.id))
-    
-    # Получаем формат публикации из конфигурации автопубликации
-    publication_format = 'default'
-    try:
-        from app.database import db as web_db
-        from app.models.autopublish_config import AutopublishConfig
-        web_cfg = web_db.session.query(AutopublishConfig).filter_by(
-            object_id=object_id
-        ).first()
-        if web_cfg and web_cfg.accounts_config_json:
-            accounts_cfg = web_cfg.accounts_config_json
-            if isinstance(accounts_cfg, dict):
-                publication_format = accounts_cfg.get('publication_format', 'default')
-    except Exception:
-        # Если не удалось получить конфигурацию, используем формат по умолчанию
-        pass
-    
-    # Format publication text
-    publication_text = format_publication_text(obj, user_obj, is_preview=False, publication_format=publication_format)
-    
     # Get target chats
     target_chats = await get_target_chats_for_object(obj)
+    chats = await run_db(_get_chats, target_chats)
     
     if not target_chats:
         if update.callback_query:
@@ -271,7 +290,7 @@ async def publish_object_immediate(update: Update, context: ContextTypes.DEFAULT
     # Publish to each chat
     for chat_id in target_chats:
         try:
-            chat = db.session.query(Chat).filter_by(chat_id=chat_id).first()
+            chat = chats.get(chat_id)
             if not chat:
                 continue
             
@@ -285,43 +304,15 @@ async def publish_object_immediate(update: Update, context: ContextTypes.DEFAULT
                 # Берем первое фото (только одно фото разрешено)
                 photo_data = photos_json[0]
                 
-                # Извлекаем путь к файлу
-                photo_path = None
-                photo_file_id = None
-                if isinstance(photo_data, dict):
-                    # Если это объект - сначала пробуем path (новый формат)
-                    photo_path = photo_data.get('path') or ''
-                    # Если path нет, пробуем legacy-формат с file_id
-                    if not photo_path:
-                        photo_file_id = photo_data.get('file_id') or None
-                elif isinstance(photo_data, str):
-                    # Если это строка - это путь к файлу
-                    photo_path = photo_data
+                # Путь к файлу: вариант для Telegram (пока его нет - оригинал);
+                # legacy file_id используется, только если пути нет
+                photo_path = photo_variant_path(photo_data, PHOTO_VARIANT_TELEGRAM)
+                photo_file_id = None if photo_path else photo_file_id_of(photo_data)
                 
                 # Сначала пытаемся отправить фото по пути к файлу
                 if photo_path:
                     import os
-                    
-                    # Используем Config.UPLOAD_FOLDER напрямую
-                    try:
-                        from app.config import Config
-                        upload_folder = Config.UPLOAD_FOLDER
-                    except (ImportError, AttributeError):
-                        # Fallback to default path
-                        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-                        upload_folder = os.path.join(base_dir, 'static', 'uploads')
-                    
-                    # photo_path может быть "uploads/filename.jpg" или просто "filename.jpg"
-                    if photo_path.startswith('uploads/'):
-                        # Убираем префикс "uploads/" и используем upload_folder
-                        filename = photo_path.replace('uploads/', '', 1)
-                        full_path = os.path.join(upload_folder, filename)
-                    elif photo_path.startswith('/'):
-                        # Абсолютный путь
-                        full_path = photo_path
-                    else:
-                        # Относительный путь - используем upload_folder
-                        full_path = os.path.join(upload_folder, photo_path)
+                    full_path = photo_full_path(photo_path)
                     
                     logger.info(f"Trying to send photo in publication: photo_path={photo_path}, full_path={full_path}, exists={os.path.exists(full_path)}")
                     if os.path.exists(full_path):
@@ -375,22 +366,7 @@ async def publish_object_immediate(update: Update, context: ContextTypes.DEFAULT
                 )
             
             # Update chat statistics and create publication history
-            chat = db.session.query(Chat).filter_by(chat_id=chat_id).first()
-            if chat:
-                chat.total_publications = (chat.total_publications or 0) + 1
-                chat.last_publication = datetime.utcnow()
-                
-                # Create publication history entry
-                history = PublicationHistory(
-                    object_id=object_id,
-                    chat_id=chat_id,
-                    account_id=None,  # Bot publication
-                    published_at=datetime.utcnow(),
-                    message_id=None,  # Will be updated if needed
-                    deleted=False
-                )
-                db.session.add(history)
-                db.session.commit()
+            await run_db(_record_publication, object_id, chat_id)
             
             published_count += 1
             
@@ -405,32 +381,27 @@ async def publish_object_immediate(update: Update, context: ContextTypes.DEFAULT
             errors.append(str(e))
             continue
     
-    # Update object status
+    # Статус меняется, только если хотя бы одна отправка прошла
     now = get_moscow_time()
     publication_datetime = format_moscow_datetime(now)
-    update_object(object_id, {
-        "status": "опубликовано",
-        "publication_date": datetime.utcnow()
-    })
+    if published_count > 0:
+        await update_object_async(object_id, {
+            "status": "опубликовано",
+            "publication_date": datetime.utcnow()
+        })
     
     # Log action
-    try:
-        if user_obj:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_object_published',
-                details_json={
-                    'object_id': object_id,
-                    'chats_count': len(target_chats),
-                    'published_count': published_count,
-                    'errors': errors
-                },
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log action: {e}")
+    if user_obj:
+        log_bot_action(
+            action='bot_object_published',
+            user_id=user_obj.user_id,
+            details={
+                'object_id': object_id,
+                'chats_count': len(target_chats),
+                'published_count': published_count,
+                'errors': errors
+            }
+        )
     
     # Send notification to user and show preview again
     if update.callback_query:
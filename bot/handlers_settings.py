@@ -2,12 +2,14 @@
 Settings handlers for bot
 """
 import logging
-from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, CallbackQueryHandler, filters
-from bot.utils import get_user, save_user
+from sqlalchemy.orm.attributes import flag_modified
+from bot.utils import get_user_async, update_user_activity
+from bot.database import run_db
+from bot.utils_logger import log_bot_action
 from app.database import db
-from bot.models import ActionLog
+from bot.models import User
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +19,54 @@ SETTINGS_WAITING_PHONE = 31
 SETTINGS_WAITING_NAME = 32
 
 
+# Работа с БД для обработчиков настроек - выполняется через run_db (вне event loop)
+
+def _get_or_create_user(telegram_id: str, username: str = None):
+    """Пользователь по Telegram ID; если его нет - создаётся (как при /start)"""
+    user_obj = db.session.query(User).filter_by(telegram_id=int(telegram_id)).first()
+    if not user_obj:
+        update_user_activity(telegram_id, username)
+        user_obj = db.session.query(User).filter_by(telegram_id=int(telegram_id)).first()
+    return user_obj
+
+
+def _save_phone(telegram_id: str, username: str, phone: str):
+    """Сохранить номер телефона, возвращает user_id (None - пользователя нет)"""
+    user_obj = _get_or_create_user(telegram_id, username)
+    if not user_obj:
+        return None
+    user_obj.phone = phone
+    db.session.commit()
+    return user_obj.user_id
+
+
+def _save_setting(telegram_id: str, username: str, key: str, value):
+    """Сохранить ключ settings_json, возвращает user_id (None - пользователя нет)"""
+    user_obj = _get_or_create_user(telegram_id, username)
+    if not user_obj:
+        return None
+    # Создаем новый словарь для отслеживания изменений SQLAlchemy
+    settings = dict(user_obj.settings_json) if user_obj.settings_json else {}
+    settings[key] = value
+    user_obj.settings_json = settings
+    flag_modified(user_obj, 'settings_json')
+    db.session.commit()
+    return user_obj.user_id
+
+
+def _toggle_setting(telegram_id: str, key: str):
+    """Переключить булев ключ settings_json: (user_id, новое значение) или None"""
+    user_obj = db.session.query(User).filter_by(telegram_id=int(telegram_id)).first()
+    if not user_obj:
+        return None
+    settings = dict(user_obj.settings_json) if user_obj.settings_json else {}
+    settings[key] = not settings.get(key, False)
+    user_obj.settings_json = settings
+    flag_modified(user_obj, 'settings_json')
+    db.session.commit()
+    return user_obj.user_id, settings[key]
+
+
 async def settings_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик кнопки настроек"""
     query = update.callback_query
@@ -24,7 +74,7 @@ async def settings_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.answer()
     
     user = update.effective_user
-    user_obj = get_user(str(user.id))
+    user_obj = await get_user_async(str(user.id))
     
     phone = user_obj.phone if user_obj else None
     contact_name = user_obj.settings_json.get('contact_name', '') if user_obj and user_obj.settings_json else None
@@ -90,33 +140,10 @@ async def settings_phone_input(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text(text, reply_markup=reply_markup)
         return SETTINGS_WAITING_PHONE
     
-    # Сохранение номера - используем одну сессию для получения и обновления
-    from bot.models import User
-    user_obj = db.session.query(User).filter_by(telegram_id=int(user.id)).first()
-    
-    if not user_obj:
-        # Create user if doesn't exist
-        from bot.utils import update_user_activity
-        update_user_activity(str(user.id), user.username)
-        user_obj = db.session.query(User).filter_by(telegram_id=int(user.id)).first()
-    
-    if user_obj:
-        user_obj.phone = phone
-        db.session.commit()
-        
-        # Log action
-        try:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_settings_phone_updated',
-                details_json={'phone': phone},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-        except Exception as e:
-            logger.error(f"Failed to log action: {e}")
-            db.session.rollback()
+    # Сохранение номера - одна сессия для получения и обновления
+    user_id = await run_db(_save_phone, str(user.id), user.username, phone)
+    if user_id:
+        log_bot_action(action='bot_settings_phone_updated', user_id=user_id, details={'phone': phone})
     
     await update.message.reply_text("✅ Номер телефона сохранен!")
     
@@ -149,38 +176,9 @@ async def settings_name_input(update: Update, context: ContextTypes.DEFAULT_TYPE
     user = update.effective_user
     name = update.message.text.strip()
     
-    from bot.models import User
-    user_obj = db.session.query(User).filter_by(telegram_id=int(user.id)).first()
-    
-    if not user_obj:
-        from bot.utils import update_user_activity
-        update_user_activity(str(user.id), user.username)
-        user_obj = db.session.query(User).filter_by(telegram_id=int(user.id)).first()
-    
-    if user_obj:
-        if not user_obj.settings_json:
-            user_obj.settings_json = {}
-        # Создаем новый словарь для отслеживания изменений SQLAlchemy
-        settings = dict(user_obj.settings_json) if user_obj.settings_json else {}
-        settings['contact_name'] = name
-        user_obj.settings_json = settings
-        from sqlalchemy.orm.attributes import flag_modified
-        flag_modified(user_obj, 'settings_json')
-        db.session.commit()
-        
-        # Log action
-        try:
-            action_log = ActionLog(
-                user_id=user_obj.user_id,
-                action='bot_settings_name_updated',
-                details_json={'name': name},
-                created_at=datetime.utcnow()
-            )
-            db.session.add(action_log)
-            db.session.commit()
-        except Exception as e:
-            logger.error(f"Failed to log action: {e}")
-            db.session.rollback()
+    user_id = await run_db(_save_setting, str(user.id), user.username, 'contact_name', name)
+    if user_id:
+        log_bot_action(action='bot_settings_name_updated', user_id=user_id, details={'name': name})
     
     await update.message.reply_text("✅ Имя сохранено!")
     
@@ -194,34 +192,14 @@ async def settings_toggle_username(update: Update, context: ContextTypes.DEFAULT
     query = update.callback_query
     await query.answer()
     
-    from bot.models import User
-    user_obj = db.session.query(User).filter_by(telegram_id=int(update.effective_user.id)).first()
-    
-    if user_obj:
-            if not user_obj.settings_json:
-                user_obj.settings_json = {}
-            # Создаем новый словарь для отслеживания изменений SQLAlchemy
-            settings = dict(user_obj.settings_json) if user_obj.settings_json else {}
-            current_value = settings.get('default_show_username', False)
-            settings['default_show_username'] = not current_value
-            user_obj.settings_json = settings
-            from sqlalchemy.orm.attributes import flag_modified
-            flag_modified(user_obj, 'settings_json')
-            db.session.commit()
-            
-            # Log action
-            try:
-                action_log = ActionLog(
-                    user_id=user_obj.user_id,
-                    action='bot_settings_username_toggled',
-                    details_json={'default_show_username': not current_value},
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(action_log)
-                db.session.commit()
-            except Exception as e:
-                logger.error(f"Failed to log action: {e}")
-                db.session.rollback()
+    toggled = await run_db(_toggle_setting, str(update.effective_user.id), 'default_show_username')
+    if toggled:
+        user_id, new_value = toggled
+        log_bot_action(
+            action='bot_settings_username_toggled',
+            user_id=user_id,
+            details={'default_show_username': new_value}
+        )
     
     await settings_handler(update, context)
     return SETTINGS_MENU
@@ -49,7 +49,8 @@ from bot.handlers_object import (
     OBJECT_WAITING_MEDIA, OBJECT_WAITING_RENOVATION, OBJECT_WAITING_ADDRESS,
     OBJECT_WAITING_CONTACTS
 )
-from bot.config import BOT_TOKEN, ADMIN_ID
+from bot.config import BOT_TOKEN, ADMIN_ID, BOT_CONCURRENT_UPDATES
+from bot.update_processor import UserOrderedUpdateProcessor, instrument_handlers
 
 # Импортируем единую систему логирования для бота
 from bot.utils_logger import setup_bot_logging, log_bot_action, log_bot_error
@@ -63,15 +64,24 @@ logger = setup_bot_logging()
 
 def main():
     """Main function to run the bot"""
-    # Глобальный Flask application context для бота:
-    # после унификации БД бот использует app.database.db.session и модели app.models,
-    # поэтому все операции с БД должны выполняться внутри app_context().
+    # Глобальный Flask application context для бота (конфигурация и код вне обработчиков).
+    # Запросы к БД из обработчиков идут через bot.database.run_db: пул потоков
+    # и отдельный app_context с сессией на вызов, event loop не блокируется.
     flask_app.app_context().push()
 
     # Create application
     # ВАЖНО: использовать drop_pending_updates=True и уникальный токен,
     # но контроль количества инстансов бота должен быть на уровне оркестрации (Docker/systemd).
-    application = Application.builder().token(BOT_TOKEN).build()
+    # Обновления разных пользователей - параллельно, одного пользователя - по очереди.
+    # Пул HTTP-соединений по числу параллельных обработчиков (по умолчанию в PTB одно
+    # соединение - запросы к Bot API снова выстроились бы в очередь)
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(UserOrderedUpdateProcessor(BOT_CONCURRENT_UPDATES))
+        .connection_pool_size(BOT_CONCURRENT_UPDATES)
+        .build()
+    )
     
     # Add error handler first
     async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
@@ -264,11 +274,10 @@ def main():
     async def save_chat_from_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Save chat from update to database (async, non-blocking)"""
         from bot.utils_chat import save_chat_from_update as save_chat
+        from bot.database import run_db
         try:
-            # Выполняем синхронную операцию в executor, чтобы не блокировать event loop
-            import asyncio
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, save_chat, update)
+            # Выполняем синхронную операцию в пуле БД, чтобы не блокировать event loop
+            await run_db(save_chat, update)
         except Exception as e:
             logger.error(f"Error saving chat from update: {e}", exc_info=True)
     
@@ -303,7 +312,15 @@ def main():
     # This ensures conversation handlers process messages first
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, log_update), group=-1)
     
+    instrument_handlers(application)
     logger.info("All handlers registered successfully")
+
+    from app.config import Config
+    from app.utils.metrics import start_bot_metrics_server
+    try:
+        start_bot_metrics_server(Config.METRICS_PORT)
+    except OSError as e:
+        logger.warning(f"Bot metrics server not started: {e}")
     
     # Add more handlers from botOLD.py as needed
     # TODO: Port all handlers from botOLD.py
@@ -0,0 +1,143 @@
+"""
+Параллельная обработка обновлений бота с сохранением порядка внутри пользователя
+Логика: по умолчанию PTB обрабатывает обновления по одному - загрузка фото одного
+пользователя или публикация в несколько чатов задерживает нажатия кнопок у всех остальных.
+UserOrderedUpdateProcessor выполняет обновления разных пользователей параллельно
+(не больше BOT_CONCURRENT_UPDATES одновременно), а обновления одного пользователя -
+строго по очереди: состояние ConversationHandler и context.user_data меняются так же,
+как при последовательной обработке. Переопределяется только do_process_update (точка
+расширения PTB): блокировка пользователя и собственный семафор слотов берутся в нём.
+Очередь обновлений - bot_updates_waiting{stage=user|slot}: PTB сразу превращает
+полученное обновление в задачу, поэтому update_queue Application почти всегда пуста.
+Обновления без пользователя (изменения статуса бота в канале и т.п.) не упорядочиваются.
+"""
+import asyncio
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+
+from telegram.ext import BaseUpdateProcessor, ConversationHandler
+
+from app.utils.metrics import BOT_HANDLER_DURATION, BOT_UPDATES_RUNNING, BOT_UPDATES_WAITING
+
+
+# Ограничение BaseUpdateProcessor не используется: порядок и лимит обеспечивает do_process_update
+_BASE_MAX_CONCURRENT_UPDATES = 65536
+
+
+class UserOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Параллельно для разных пользователей, по очереди для одного (по effective_user.id)"""
+
+    def __init__(self, max_concurrent_updates: int):
+        if max_concurrent_updates < 1:
+            raise ValueError('`max_concurrent_updates` must be a positive integer!')
+        super().__init__(_BASE_MAX_CONCURRENT_UPDATES)
+        self.max_parallel_updates = max_concurrent_updates
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # user_id -> [Lock, число обновлений пользователя в обработке и ожидании]
+        self._user_locks = {}
+
+    async def do_process_update(self, update, coroutine):
+        user = getattr(update, 'effective_user', None)
+        try:
+            if user is None:
+                await self._run_in_slot(coroutine)
+            else:
+                await self._run_in_user_order(user.id, coroutine)
+        finally:
+            if inspect.getcoroutinestate(coroutine) == inspect.CORO_CREATED:
+                # Отменено при остановке бота до начала обработки
+                coroutine.close()
+
+    async def _run_in_user_order(self, user_id, coroutine):
+        entry = self._user_locks.get(user_id)
+        if entry is None:
+            entry = self._user_locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # Сначала очередь пользователя, потом слот: очередь одного пользователя
+            # не занимает слоты, нужные остальным
+            with _waiting('user'):
+                await entry[0].acquire()
+            try:
+                await self._run_in_slot(coroutine)
+            finally:
+                entry[0].release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._user_locks.pop(user_id, None)
+
+    async def _run_in_slot(self, coroutine):
+        with _waiting('slot'):
+            await self._slots.acquire()
+        try:
+            BOT_UPDATES_RUNNING.inc()
+            try:
+                await coroutine
+            finally:
+                BOT_UPDATES_RUNNING.dec()
+        finally:
+            self._slots.release()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+@contextmanager
+def _waiting(stage: str):
+    gauge = BOT_UPDATES_WAITING.labels(stage)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+
+def instrument_handlers(application):
+    """
+    Метрика bot_handler_duration_seconds для всех зарегистрированных обработчиков
+    Вызывать после add_handler: callback оборачивается по месту, включая обработчики
+    внутри ConversationHandler (entry_points, states, fallbacks)
+    """
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            _instrument_handler(handler)
+
+
+def _instrument_handler(handler):
+    if isinstance(handler, ConversationHandler):
+        nested = list(handler.entry_points) + list(handler.fallbacks)
+        for state_handlers in handler.states.values():
+            nested.extend(state_handlers)
+        for nested_handler in nested:
+            _instrument_handler(nested_handler)
+        return
+
+    callback = getattr(handler, 'callback', None)
+    if callback is None or getattr(callback, '_bot_metrics', False):
+        return
+    handler.callback = _timed(callback)
+
+
+def _timed(callback):
+    name = getattr(callback, '__name__', type(callback).__name__)
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        outcome = 'ok'
+        try:
+            return await callback(update, context)
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            BOT_HANDLER_DURATION.labels(name, outcome).observe(time.perf_counter() - started)
+
+    wrapper._bot_metrics = True
+    return wrapper
@@ -9,6 +9,9 @@ import logging
 from app.database import db
 from bot.models import User, Object, Chat, BotWebCode, SystemSetting, ActionLog
 from sqlalchemy import func
+from app.utils.object_ids import allocate_object_number, format_object_id
+from app.utils.id_prefixes import allocate_id_prefix, assign_id_prefix, ensure_user_id_prefix
+from bot.database import offloaded
 
 logger = logging.getLogger(__name__)
 
@@ -128,33 +131,27 @@ def get_user_id_prefix(user_id: str) -> str:
 
 
 def set_user_id_prefix(user_id: str, prefix: str):
-    """Установить префикс ID пользователя"""
+    """Установить префикс ID пользователя (реестр id_prefixes + settings_json)"""
     user = db.session.query(User).filter_by(telegram_id=int(user_id)).first()
     if user:
-        if not user.settings_json:
-            user.settings_json = {}
-        user.settings_json['id_prefix'] = prefix
+        assign_id_prefix(db.session, user, prefix)
         db.session.commit()
 
 
 def generate_next_id_prefix() -> str:
-    """Сгенерировать следующий доступный префикс"""
-    # Get all reserved prefixes
-    users = db.session.query(User).all()
-    reserved = []
-    for u in users:
-        if u.settings_json and 'id_prefix' in u.settings_json:
-            reserved.append(u.settings_json['id_prefix'])
-    
-    # Generate new prefix
-    for first in range(ord('А'), ord('Я') + 1):
-        for second in range(ord('А'), ord('Я') + 1):
-            for third in range(ord('А'), ord('Я') + 1):
-                prefix = chr(first) + chr(second) + chr(third)
-                if prefix not in reserved:
-                    return prefix
-    
-    return "ААА"
+    """Сгенерировать следующий доступный префикс (резервируется в id_prefixes одним запросом)"""
+    prefix = allocate_id_prefix(db.session)
+    db.session.commit()
+    return prefix
+
+
+def ensure_id_prefix(user: User) -> str:
+    """Префикс пользователя; при отсутствии - выдать свободный из реестра"""
+    prefix = (user.settings_json or {}).get('id_prefix')
+    if not prefix:
+        prefix = ensure_user_id_prefix(db.session, user)
+        db.session.commit()
+    return prefix
 
 
 def get_next_object_number(user_id: str) -> int:
@@ -163,26 +160,11 @@ def get_next_object_number(user_id: str) -> int:
     if not user:
         return 1
     
-    prefix = get_user_id_prefix(user_id)
-    if not prefix:
-        prefix = generate_next_id_prefix()
-        set_user_id_prefix(user_id, prefix)
-    
-    # Find max number for this prefix
-    objects = db.session.query(Object).filter(
-        Object.object_id.like(f'{prefix}%')
-    ).all()
-    
-    max_num = 0
-    for obj in objects:
-        try:
-            num = int(obj.object_id[len(prefix):])
-            if num > max_num:
-                max_num = num
-        except:
-            pass
+    prefix = ensure_id_prefix(user)
     
-    return max_num + 1
+    # Атомарный счётчик префикса (общий с веб-созданием объектов); номер
+    # зарезервирован до commit текущей транзакции
+    return allocate_object_number(db.session, prefix)
 
 
 def create_object(user_id: str) -> str:
@@ -191,13 +173,10 @@ def create_object(user_id: str) -> str:
     if not user:
         raise ValueError(f"User {user_id} not found")
     
-    prefix = get_user_id_prefix(user_id)
-    if not prefix:
-        prefix = generate_next_id_prefix()
-        set_user_id_prefix(user_id, prefix)
+    prefix = ensure_id_prefix(user)
     
     obj_number = get_next_object_number(user_id)
-    object_id = f"{prefix}{obj_number:03d}"
+    object_id = format_object_id(prefix, obj_number)
     
     default_show_username = False
     if user.settings_json:
@@ -228,8 +207,8 @@ def get_object(object_id: str) -> Optional[Object]:
     return db.session.query(Object).filter_by(object_id=object_id).first()
 
 
-def update_object(object_id: str, updates: Dict):
-    """Обновить объект"""
+def update_object(object_id: str, updates: Dict) -> Optional[Object]:
+    """Обновить объект (возвращает обновлённый объект или None, если его нет)"""
     obj = db.session.query(Object).filter_by(object_id=object_id).first()
     if obj:
         for key, value in updates.items():
@@ -237,6 +216,20 @@ def update_object(object_id: str, updates: Dict):
                 setattr(obj, key, value)
         obj.updated_at = datetime.utcnow()
         db.session.commit()
+    return obj
+
+
+def delete_object(object_id: str) -> bool:
+    """Удалить объект вместе с историей публикаций (иначе нарушается NOT NULL в publication_history)"""
+    from app.models.publication_history import PublicationHistory
+
+    obj = db.session.query(Object).filter_by(object_id=object_id).first()
+    if not obj:
+        return False
+    db.session.query(PublicationHistory).filter_by(object_id=object_id).delete(synchronize_session=False)
+    db.session.delete(obj)
+    db.session.commit()
+    return True
 
 
 def get_user_objects(user_id: str) -> List[Object]:
@@ -253,6 +246,33 @@ def get_chats() -> List[Chat]:
     return db.session.query(Chat).all()
 
 
+def get_publication_format(object_id: str) -> str:
+    """Формат публикации из конфигурации автопубликации объекта ('default', если не задан)"""
+    try:
+        from app.models.autopublish_config import AutopublishConfig
+        web_cfg = db.session.query(AutopublishConfig).filter_by(object_id=object_id).first()
+        if web_cfg and isinstance(web_cfg.accounts_config_json, dict):
+            return web_cfg.accounts_config_json.get('publication_format', 'default')
+    except Exception:
+        # Если не удалось получить конфигурацию, используем формат по умолчанию
+        db.session.rollback()
+    return 'default'
+
+
+def get_object_publication(object_id: str, user_id: str, is_preview: bool = False):
+    """
+    Объект, пользователь и текст публикации за один вызов (одна сессия)
+    Возвращает (obj, user, text); obj и text - None, если объекта нет
+    """
+    publication_format = get_publication_format(object_id)
+    obj = get_object(object_id)
+    user = get_user(user_id)
+    if not obj:
+        return None, user, None
+    text = format_publication_text(obj, user, is_preview=is_preview, publication_format=publication_format)
+    return obj, user, text
+
+
 def generate_web_code(user_id: str) -> str:
     """Сгенерировать 6-значный код для привязки к вебу"""
     user = get_user(user_id)
@@ -612,4 +632,27 @@ def format_publication_text(obj: Object, user: User = None, is_preview: bool = F
             lines.append("")
             lines.append(" ".join(room_hashtags))
     
-    return "\n".join(lines)
\ No newline at end of file
+    return "\n".join(lines)
+
+
+# Асинхронные версии для обработчиков бота: синхронные функции выполняются в пуле
+# потоков bot.database.run_db (своя сессия на вызов), event loop не блокируется.
+# Синхронные версии остаются для веба и Celery.
+get_user_async = offloaded(get_user)
+save_user_async = offloaded(save_user)
+update_user_activity_async = offloaded(update_user_activity)
+get_user_id_prefix_async = offloaded(get_user_id_prefix)
+set_user_id_prefix_async = offloaded(set_user_id_prefix)
+generate_next_id_prefix_async = offloaded(generate_next_id_prefix)
+create_object_async = offloaded(create_object)
+get_object_async = offloaded(get_object)
+update_object_async = offloaded(update_object)
+delete_object_async = offloaded(delete_object)
+get_user_objects_async = offloaded(get_user_objects)
+get_chats_async = offloaded(get_chats)
+generate_web_code_async = offloaded(generate_web_code)
+get_districts_config_async = offloaded(get_districts_config)
+get_rooms_config_async = offloaded(get_rooms_config)
+get_hashtag_suffix_async = offloaded(get_hashtag_suffix)
+get_price_ranges_async = offloaded(get_price_ranges)
+get_object_publication_async = offloaded(get_object_publication)
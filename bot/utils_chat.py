@@ -11,7 +11,7 @@ logger = logging.getLogger(__name__)
 
 
 def save_chat_from_update(update: Update):
-    """Сохранить чат из обновления в базу данных"""
+    """Сохранить чат из обновления в базу данных (в обработчиках - через run_db)"""
     chat = None
     chat_id = None
     chat_type = None
@@ -49,47 +49,40 @@ def save_chat_from_update(update: Update):
     
     username = chat.username or ''
     
-    # Save to database
+    # Save to database (вызывается через bot.database.run_db - контекст и сессия уже есть)
     try:
-        from app import app
-        with app.app_context():
-            existing_chat = db.session.query(Chat).filter_by(
-                telegram_chat_id=chat_id,
-                owner_type='bot'
-            ).first()
-            
-            if existing_chat:
-                # Update existing chat
-                existing_chat.title = title
-                existing_chat.type = chat_type
-                if username:
-                    if not existing_chat.filters_json:
-                        existing_chat.filters_json = {}
-                    existing_chat.filters_json['username'] = username
-            else:
-                # Create new chat
-                filters_data = {}
-                if username:
-                    filters_data['username'] = username
-                
-                new_chat = Chat(
-                    telegram_chat_id=chat_id,
-                    title=title,
-                    type=chat_type,
-                    owner_type='bot',
-                    is_active=False,  # Not active by default, needs to be configured
-                    filters_json=filters_data if filters_data else None,
-                    added_date=datetime.utcnow()
-                )
-                db.session.add(new_chat)
+        existing_chat = db.session.query(Chat).filter_by(
+            telegram_chat_id=chat_id,
+            owner_type='bot'
+        ).first()
+        
+        if existing_chat:
+            # Update existing chat
+            existing_chat.title = title
+            existing_chat.type = chat_type
+            if username:
+                if not existing_chat.filters_json:
+                    existing_chat.filters_json = {}
+                existing_chat.filters_json['username'] = username
+        else:
+            # Create new chat
+            filters_data = {}
+            if username:
+                filters_data['username'] = username
             
-            db.session.commit()
+            new_chat = Chat(
+                telegram_chat_id=chat_id,
+                title=title,
+                type=chat_type,
+                owner_type='bot',
+                is_active=False,  # Not active by default, needs to be configured
+                filters_json=filters_data if filters_data else None,
+                added_date=datetime.utcnow()
+            )
+            db.session.add(new_chat)
+        
+        db.session.commit()
     except Exception as e:
         logger.error(f"Error saving chat to database: {e}", exc_info=True)
-        try:
-            from app import app
-            with app.app_context():
-                db.session.rollback()
-        except:
-            pass
+        db.session.rollback()
 
@@ -2,6 +2,7 @@
 Единая система логирования для бота - использует общие стандарты из app/utils/logger.py
 Цель: тотальное логирование всех действий пользователя и событий системы
 """
+import asyncio
 import logging
 import logging.handlers
 import os
@@ -9,6 +10,9 @@ import sys
 from datetime import datetime
 from app.database import db
 from bot.models import ActionLog
+from app.config import Config
+from app.utils.log_index import RotatingLogFileHandler
+from app.utils.log_pipeline import get_pipeline
 
 # Используем ту же структуру папок, что и в app
 LOG_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
@@ -65,7 +69,7 @@ def setup_bot_logging():
     
     # Файл всех логов (ротация: 10MB, 10 файлов)
     all_logs_file = os.path.join(LOG_FOLDER, 'bot.log')
-    file_handler = logging.handlers.RotatingFileHandler(
+    file_handler = RotatingLogFileHandler(
         all_logs_file,
         maxBytes=10 * 1024 * 1024,  # 10MB
         backupCount=10,
@@ -75,10 +79,11 @@ def setup_bot_logging():
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(detailed_formatter)
     file_handler.terminator = '\n'  # Принудительный flush
+    # Ротация только переименовывает; сжатие и индекс ротаций - задача index_log_files
     
     # Файл только ошибок (ротация: 5MB, 5 файлов)
     error_logs_file = os.path.join(LOG_FOLDER, 'bot_errors.log')
-    error_handler = logging.handlers.RotatingFileHandler(
+    error_handler = RotatingLogFileHandler(
         error_logs_file,
         maxBytes=5 * 1024 * 1024,  # 5MB
         backupCount=5,
@@ -87,10 +92,12 @@ def setup_bot_logging():
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(detailed_formatter)
     
-    # Добавляем основные обработчики сначала
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    logger.addHandler(error_handler)
+    # Добавляем основные обработчики сначала.
+    # Файлы пишет поток QueueListener (app/utils/log_pipeline.py): записи 'bot.*' приходят
+    # туда через QueueHandler корневого логгера, обработчики выбирают их по имени логгера
+    pipeline = get_pipeline()
+    for handler in (console_handler, file_handler, error_handler):
+        pipeline.add_route(handler, include=('bot',))
     
     # ========== TEST LOGS (очищаются при деплое, для анализа нейросетью) ==========
     # ВАЖНО: Создаём тестовые логи ПОСЛЕ основных обработчиков, чтобы логирование работало
@@ -100,14 +107,16 @@ def setup_bot_logging():
     test_bot_handler = None
     try:
         # Убеждаемся, что файл создаётся
-        test_bot_handler = logging.FileHandler(
+        test_bot_handler = RotatingLogFileHandler(
             test_bot_logs_file,
             mode='a',  # Append mode (очищается deploy.sh)
+            maxBytes=Config.TEST_LOG_MAX_BYTES,
+            backupCount=Config.TEST_LOG_BACKUP_COUNT,
             encoding='utf-8'
         )
         test_bot_handler.setLevel(logging.DEBUG)
         test_bot_handler.setFormatter(detailed_formatter)
-        logger.addHandler(test_bot_handler)
+        pipeline.add_route(test_bot_handler, include=('bot',))
         # Теперь можем логировать - обработчики уже добавлены
         logger.info(f"Test bot log handler initialized: {test_bot_logs_file}")
     except Exception as e:
@@ -120,14 +129,16 @@ def setup_bot_logging():
     test_bot_errors_file = os.path.join(LOG_FOLDER, 'test_bot_errors.log')
     test_bot_errors_handler = None
     try:
-        test_bot_errors_handler = logging.FileHandler(
+        test_bot_errors_handler = RotatingLogFileHandler(
             test_bot_errors_file,
             mode='a',  # Append mode (очищается deploy.sh)
+            maxBytes=Config.TEST_LOG_MAX_BYTES,
+            backupCount=Config.TEST_LOG_BACKUP_COUNT,
             encoding='utf-8'
         )
         test_bot_errors_handler.setLevel(logging.ERROR)
         test_bot_errors_handler.setFormatter(detailed_formatter)
-        logger.addHandler(test_bot_errors_handler)
+        pipeline.add_route(test_bot_errors_handler, include=('bot',))
         # Теперь можем логировать - обработчики уже добавлены
         logger.info(f"Test bot errors log handler initialized: {test_bot_errors_file}")
     except Exception as e:
@@ -162,7 +173,22 @@ def log_bot_action(action: str, user_id: int = None, telegram_id: str = None,
         telegram_id: Telegram ID пользователя (опционально)
         details: Дополнительные детали как словарь
         username: Username пользователя (опционально)
+    
+    Из обработчика бота (внутри event loop) запись уходит в пул bot.database
+    и обработчик её не ждёт; вне event loop запись синхронная
     """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        _write_bot_action(action, user_id, telegram_id, details, username)
+        return
+    from bot.database import submit_db
+    submit_db(_write_bot_action, action, user_id, telegram_id, details, username)
+
+
+def _write_bot_action(action: str, user_id: int = None, telegram_id: str = None,
+                      details: dict = None, username: str = None):
+    """Запись действия в action_logs и файл (в текущей сессии)"""
     logger = logging.getLogger('bot.actions')
     
     try:
@@ -0,0 +1,23 @@
+"""
+Хуки gunicorn для метрик Prometheus в многопроцессном режиме (app/utils/metrics.py)
+Логика: воркеры пишут значения в PROMETHEUS_MULTIPROC_DIR; мастер очищает каталог при
+старте и помечает завершившиеся воркеры. Мастер не импортирует app (без --preload),
+поэтому здесь только prometheus_client.
+"""
+import os
+
+
+def on_starting(server):
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith('.db'):
+            os.remove(os.path.join(path, name))
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 """
 Скрипт для скачивания логов с сервера напрямую в папку logs_server/
-Использование: python download_logs.py [API_URL] [API_TOKEN]
+Использование: python download_logs.py [API_URL] [API_TOKEN] [--incremental]
+
+--incremental: не удалять локальные файлы, а докачивать только дописанные байты
+(HTTP Range; gzip - только при полном скачивании). Смещения и идентичность файлов хранятся в logs_server/.sync_state.json;
+ротация/очистка лога на сервере распознаётся, и файл скачивается заново целиком.
 """
 
+import json
 import os
+import re
 import sys
 import requests
 from pathlib import Path
@@ -12,6 +18,14 @@ from pathlib import Path
 # Конфигурация
 DEFAULT_API_URL = "http://localhost"  # Или ваш домен, например "https://your-domain.com"
 LOCAL_LOGS_DIR = Path(__file__).parent / "logs_server"
+SYNC_STATE_FILE = LOCAL_LOGS_DIR / ".sync_state.json"
+
+# Заголовок идентичности файла на сервере (app/utils/log_files.py): меняется при ротации
+FILE_ID_HEADER = 'X-Log-File-Id'
+
+# Позиционные аргументы (URL, токен) без флагов
+ARGS = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+INCREMENTAL = '--incremental' in sys.argv[1:]
 
 # Типы ТЕСТОВЫХ логов для скачивания (короткие, свежие логи для AI)
 TEST_LOG_TYPES = [
@@ -33,8 +47,8 @@ TEST_LOG_FILENAMES = {
 def get_api_token():
     """Получить LOGS_DOWNLOAD_TOKEN из переменной окружения или файла"""
     token = os.getenv('REALTY_LOGS_DOWNLOAD_TOKEN')
-    if not token and len(sys.argv) > 2:
-        token = sys.argv[2]
+    if not token and len(ARGS) > 1:
+        token = ARGS[1]
     if not token:
         # Пытаемся прочитать из файла (если есть)
         token_file = Path(__file__).parent / '.api_token'
@@ -59,8 +73,8 @@ def get_api_token():
 
 def get_api_url():
     """Получить API URL"""
-    if len(sys.argv) > 1:
-        return sys.argv[1].rstrip('/')
+    if ARGS:
+        return ARGS[0].rstrip('/')
     return os.getenv('REALTY_API_URL', DEFAULT_API_URL)
 
 
@@ -112,6 +126,85 @@ def download_log_file(api_url, token, log_type, output_dir):
         return False
 
 
+def load_sync_state():
+    """Состояние инкрементальной синхронизации: {имя файла: {'offset', 'file_id'}}"""
+    try:
+        return json.loads(SYNC_STATE_FILE.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_sync_state(state):
+    SYNC_STATE_FILE.write_text(json.dumps(state, indent=2), encoding='utf-8')
+
+
+def _range_total(response):
+    """Полный размер файла из Content-Range ("bytes 0-9/100" или "bytes */100")"""
+    match = re.search(r'/(\d+)$', response.headers.get('Content-Range', ''))
+    return int(match.group(1)) if match else None
+
+
+def sync_log_file(api_url, token, log_type, output_dir, state):
+    """
+    Докачать дописанную часть файла лога.
+    Локальный файл продолжается, только если он не менялся с прошлой синхронизации
+    и сервер подтвердил тот же файл (X-Log-File-Id); иначе - полное скачивание.
+    """
+    url = f"{api_url}/api/logs/file/{log_type}"
+    filename = TEST_LOG_FILENAMES[log_type]
+    output_path = output_dir / filename
+    entry = state.get(filename) or {}
+    offset = entry.get('offset', 0)
+
+    headers = {'Accept-Encoding': 'gzip'}
+    resume = bool(entry.get('file_id')) and output_path.exists() and output_path.stat().st_size == offset
+    if resume:
+        headers['Range'] = f'bytes={offset}-'
+        headers[FILE_ID_HEADER] = entry['file_id']
+
+    try:
+        response = requests.get(url, params={'token': token}, headers=headers, stream=True, timeout=30)
+
+        if response.status_code == 416:
+            total = _range_total(response)
+            response.close()
+            if total == offset and response.headers.get(FILE_ID_HEADER) == entry.get('file_id'):
+                print(f"  [OK] {filename} - без изменений")
+                return True
+            # Файл на сервере короче сохранённого смещения - очищен или ротирован
+            state.pop(filename, None)
+            return sync_log_file(api_url, token, log_type, output_dir, state)
+
+        response.raise_for_status()
+        appended = response.status_code == 206
+        # Полный файл может прийти в gzip: requests распаковывает Content-Encoding при iter_content
+        with open(output_path, 'ab' if appended else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                f.write(chunk)
+
+        state[filename] = {
+            'offset': output_path.stat().st_size,
+            'file_id': response.headers.get(FILE_ID_HEADER)
+        }
+        size_kb = (output_path.stat().st_size - (offset if appended else 0)) / 1024
+        if appended:
+            print(f"  [OK] {filename} +{size_kb:.1f} KB")
+        else:
+            reason = " (файл ротирован на сервере)" if resume else ""
+            print(f"  [OK] {filename} ({size_kb:.1f} KB){reason}")
+        return True
+
+    except requests.exceptions.HTTPError as e:
+        if e.response.status_code == 404:
+            print(f"  [WARN] {filename} - файл не найден на сервере")
+        else:
+            print(f"  [ERROR] {filename} - ошибка HTTP {e.response.status_code}")
+        return False
+    except Exception as e:
+        print(f"  [ERROR] {filename} - ошибка: {e}")
+        return False
+
+
 def main():
     """Основная функция"""
     # Set UTF-8 encoding for Windows
@@ -138,6 +231,22 @@ def main():
     # Создать папку если не существует
     LOCAL_LOGS_DIR.mkdir(exist_ok=True)
     
+    if INCREMENTAL:
+        print("Инкрементальная синхронизация тестовых логов...")
+        print()
+        state = load_sync_state()
+        success_count = 0
+        for log_type in TEST_LOG_TYPES:
+            print(f"Синхронизация {log_type}...", end=' ')
+            if sync_log_file(api_url, token, log_type, LOCAL_LOGS_DIR, state):
+                success_count += 1
+        save_sync_state(state)
+        print()
+        print(f"[OK] Синхронизировано файлов: {success_count}/{len(TEST_LOG_TYPES)}")
+        if success_count == 0:
+            sys.exit(1)
+        return
+    
     # Удалить старые файлы перед загрузкой новых
     print("Удаление старых файлов логов...")
     for log_type in TEST_LOG_TYPES:
@@ -58,7 +58,7 @@ export default function TypeScriptTypes(): JSX.Element {
         { name: 'contact_name', type: 'string | null', required: false, description: 'Имя контакта' },
         { name: 'phone_number', type: 'string | null', required: false, description: 'Номер телефона' },
         { name: 'show_username', type: 'boolean', required: false, description: 'Показывать username Telegram' },
-        { name: 'photos_json', type: 'string[] | null', required: false, description: 'Массив путей к фотографиям' },
+        { name: 'photos_json', type: 'ObjectPhoto[] | null', required: false, description: 'Фотографии: путь к оригиналу и варианты telegram (JPEG до 1280px) и thumb (WebP-миниатюра)' },
         { name: 'creation_date', type: 'string | null', required: false, description: 'Дата создания' },
         { name: 'publication_date', type: 'string | null', required: false, description: 'Дата публикации' },
         { name: 'user_id', type: 'number | string | null', required: false, description: 'ID пользователя' },
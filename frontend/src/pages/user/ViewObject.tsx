@@ -4,6 +4,7 @@ import { useParams, Link, useNavigate } from 'react-router-dom'
 import Layout from '../../components/Layout'
 import { GlassCard } from '../../components/GlassCard'
 import api from '../../utils/api'
+import { photoUrl } from '../../utils/photos'
 import type { RealtyObject, PublishObjectRequest, PublishObjectResponse, ApiErrorResponse } from '../../types/models'
 import './ViewObject.css'
 
@@ -337,33 +338,23 @@ export default function ViewObject(): JSX.Element {
                 <label>Фотографии</label>
                 <div className="photos-grid">
                   {object.photos_json.map((photo, idx) => {
-                    // Обработка фото: может быть строкой (путь) или объектом (dict с path)
-                    // В вебе используем только path, file_id нужен только для бота
-                    let photoUrl = ''
-                    if (typeof photo === 'string') {
-                      // Если это строка - путь к файлу (старый формат)
-                      photoUrl = `/${photo}`
-                    } else if (photo && typeof photo === 'object') {
-                      // Если это объект - извлекаем путь (path для веба, file_id для бота)
-                      photoUrl = photo.path || ''
-                      if (photoUrl && !photoUrl.startsWith('/') && !photoUrl.startsWith('http')) {
-                        photoUrl = `/${photoUrl}`
-                      }
-                    }
-                    
-                    if (!photoUrl) return null
+                    // В сетке - миниатюра, по клику - JPEG до 1280px (пока фото не обработано - оригинал)
+                    const thumbUrl = photoUrl(photo, 'thumb')
+                    if (!thumbUrl) return null
                     
                     return (
-                      <img
-                        key={idx}
-                        src={photoUrl}
-                        alt={`Фото ${idx + 1}`}
-                        className="object-photo"
-                        onError={(e) => {
-                          // Если загрузка не удалась, скрываем изображение
-                          e.currentTarget.style.display = 'none'
-                        }}
-                      />
+                      <a key={idx} href={photoUrl(photo, 'telegram')} target="_blank" rel="noreferrer">
+                        <img
+                          src={thumbUrl}
+                          alt={`Фото ${idx + 1}`}
+                          className="object-photo"
+                          loading="lazy"
+                          onError={(e) => {
+                            // Если загрузка не удалась, скрываем изображение
+                            e.currentTarget.style.display = 'none'
+                          }}
+                        />
+                      </a>
                     )
                   })}
                 </div>
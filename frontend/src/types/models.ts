@@ -77,6 +77,21 @@ export interface FetchedChatsResponse {
 }
 
 // Realty Object types
+/**
+ * Элемент photos_json: строка с путём (старый формат) или объект с вариантами,
+ * которые строит обработка фото на сервере (telegram - JPEG до 1280px, thumb - WebP-миниатюра)
+ */
+export type ObjectPhoto =
+  | string
+  | {
+      path?: string;
+      telegram?: string;
+      thumb?: string;
+      width?: number;
+      height?: number;
+      file_id?: string;
+    };
+
 export interface RealtyObject {
   object_id: string;
   status: string;
@@ -94,7 +109,7 @@ export interface RealtyObject {
   contact_name_2?: string | null;
   phone_number_2?: string | null;
   show_username?: boolean;
-  photos_json?: string[] | null;
+  photos_json?: ObjectPhoto[] | null;
   creation_date?: string;
   publication_date?: string;
   user_id?: number | string;
@@ -0,0 +1,23 @@
+import type { ObjectPhoto } from '../types/models'
+
+/**
+ * Вариант фото объекта: thumb - WebP-миниатюра для списков и карточек,
+ * telegram - JPEG до 1280px для просмотра, path - оригинал.
+ * Пока фото не обработано (или элемент старого формата), используется оригинал.
+ */
+export type PhotoVariant = 'thumb' | 'telegram' | 'path'
+
+function toUrl(path: string): string {
+  if (!path) return ''
+  if (path.startsWith('/') || path.startsWith('http')) return path
+  return `/${path}`
+}
+
+/**
+ * URL нужного варианта фото из photos_json
+ */
+export function photoUrl(photo: ObjectPhoto | null | undefined, variant: PhotoVariant = 'path'): string {
+  if (!photo) return ''
+  if (typeof photo === 'string') return toUrl(photo)
+  return toUrl(photo[variant] || photo.path || '')
+}
@@ -0,0 +1,3 @@
+"""
+Нагрузочный стенд публикаций: заглушка Telegram и драйвер нагрузки (см. loadtest/run_local.sh)
+"""
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Драйвер нагрузки: ставит публикации в очереди и измеряет, как их разбирает весь конвейер
+(beat -> диспетчер -> Celery -> отправка в заглушку -> publication_history)
+
+Драйвер не вызывает задачи сам: он вставляет pending-строки в publication_queues (бот,
+класс scheduled) и account_publication_queues (аккаунты) с scheduled_time, растянутым
+с заданной частотой --rate, и опрашивает их статусы до завершения или --timeout.
+
+Отчёт:
+    posts/sec - устойчивая пропускная способность (завершённые строки / время от первой
+    плановой точки до последнего завершения) и пик за 10 секунд;
+    dispatch lag p50/p99 - started_at - scheduled_time, end-to-end - completed_at - scheduled_time;
+    DB queries/post - прирост db_queries_total на /metrics воркеров (--metrics-url) на публикацию;
+    статистика заглушки (/stats) и перцентили этапов из publication_traces.
+
+Использование (стенд поднимает loadtest/run_local.sh):
+python -m loadtest.driver --database-url postgresql://realty@127.0.0.1:55432/realty_loadtest --generate --posts 600 --rate 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+# Добавляем корневую директорию проекта в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Строки бота: пары объект x чат из активных объектов и чатов бота (детерминированный порядок)
+_BOT_ROWS_SQL = """
+    WITH objs AS (
+        SELECT object_id, user_id, row_number() OVER (ORDER BY md5(object_id)) AS n
+        FROM objects WHERE status <> 'архив'
+        ORDER BY md5(object_id) LIMIT :count
+    ), chats_bot AS (
+        SELECT chat_id, row_number() OVER (ORDER BY md5(chat_id::text)) AS n, COUNT(*) OVER () AS total
+        FROM chats WHERE owner_type = 'bot' AND is_active
+    )
+    INSERT INTO publication_queues (object_id, chat_id, user_id, type, mode, priority, status,
+                                    scheduled_time, created_at, attempts)
+    SELECT o.object_id, c.chat_id, o.user_id, 'bot', 'scheduled', 'scheduled', 'pending',
+           CAST(:start AS timestamp) + (o.n - 1) * CAST(:interval AS float8) * INTERVAL '1 second',
+           CAST(:now AS timestamp), 0
+    FROM objs o
+    JOIN chats_bot c ON c.n = 1 + (o.n - 1) % c.total
+    RETURNING queue_id
+"""
+
+# Строки аккаунтов: только сочетания из accounts_config_json включённой автопубликации,
+# иначе process_account_autopublish отменит строку как "not in autopublish config"
+_ACCOUNT_ROWS_SQL = """
+    WITH candidates AS (
+        SELECT cfg.object_id, cfg.user_id, (acc->>'account_id')::int AS account_id,
+               chat_ref::int AS chat_id,
+               row_number() OVER (ORDER BY md5(cfg.object_id || ':' || chat_ref)) AS n
+        FROM autopublish_configs cfg
+        CROSS JOIN LATERAL json_array_elements(cfg.accounts_config_json->'accounts') AS acc
+        CROSS JOIN LATERAL json_array_elements_text(acc->'chat_ids') AS chat_ref
+        JOIN telegram_accounts a ON a.account_id = (acc->>'account_id')::int AND a.is_active
+        WHERE cfg.enabled
+    )
+    INSERT INTO account_publication_queues (object_id, chat_id, account_id, user_id, status,
+                                            scheduled_time, created_at, attempts)
+    SELECT object_id, chat_id, account_id, user_id, 'pending',
+           CAST(:start AS timestamp) + (n - 1) * CAST(:interval AS float8) * INTERVAL '1 second',
+           CAST(:now AS timestamp), 0
+    FROM candidates
+    WHERE n <= :count
+    RETURNING queue_id
+"""
+
+_PROGRESS_SQL = """
+    SELECT status, COUNT(*) FROM {table} WHERE queue_id = ANY(:ids) GROUP BY status
+"""
+
+_LATENCY_SQL = """
+    SELECT COUNT(*) AS completed,
+           MIN(scheduled_time) AS first_planned,
+           MAX(completed_at) AS last_completed,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM started_at - scheduled_time)) AS lag_p50,
+           percentile_cont(0.99) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM started_at - scheduled_time)) AS lag_p99,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM completed_at - scheduled_time)) AS e2e_p50,
+           percentile_cont(0.99) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM completed_at - scheduled_time)) AS e2e_p99
+    FROM {table}
+    WHERE queue_id = ANY(:ids) AND status = 'completed'
+"""
+
+_COMPLETIONS_SQL = """
+    SELECT EXTRACT(EPOCH FROM completed_at) FROM {table}
+    WHERE queue_id = ANY(:ids) AND status = 'completed' AND completed_at IS NOT NULL
+"""
+
+# Строки, которые ещё могут завершиться (retrying/429 возвращают строку в pending с новым временем)
+_IN_FLIGHT = ('pending', 'processing', 'retrying')
+
+_TABLES = {'bot': 'publication_queues', 'account': 'account_publication_queues'}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Драйвер нагрузки конвейера публикаций')
+    parser.add_argument('--database-url', default=os.environ.get('LOADTEST_DATABASE_URL') or os.environ.get('DATABASE_URL'),
+                        help='База стенда (имя должно содержать "loadtest" или "bench")')
+    parser.add_argument('--force', action='store_true', help='Разрешить базу с другим именем')
+    parser.add_argument('--generate', action='store_true',
+                        help='Пересоздать синтетический набор данных (benchmarks/datagen.py)')
+    parser.add_argument('--scale', type=float, default=0.05, help='Масштаб набора данных при --generate')
+    parser.add_argument('--posts', type=int, default=600, help='Сколько публикаций поставить')
+    parser.add_argument('--rate', type=float, default=5.0, help='Плановая частота публикаций, в секунду')
+    parser.add_argument('--account-share', type=float, default=0.2, help='Доля публикаций через аккаунты')
+    parser.add_argument('--timeout', type=int, default=900, help='Сколько ждать завершения, секунд')
+    parser.add_argument('--poll', type=float, default=5.0, help='Период опроса статусов, секунд')
+    parser.add_argument('--stub-url', default=os.environ.get('TELETHON_STUB_URL', 'http://127.0.0.1:8081'),
+                        help='Адрес заглушки Telegram (для /config, /reset и /stats)')
+    parser.add_argument('--stub-config', action='append', default=[], metavar='KEY=VALUE',
+                        help='Настройка заглушки на время прогона (например rate_429=0.05)')
+    parser.add_argument('--metrics-url', action='append', default=[],
+                        help='/metrics воркеров Celery для подсчёта SQL-запросов (можно несколько)')
+    parser.add_argument('--label', default='', help='Подпись прогона (конфигурация воркеров и т.п.)')
+    parser.add_argument('--output', help='Куда записать JSON с результатами')
+    return parser.parse_args(argv)
+
+
+def _database_name(url: str) -> str:
+    from sqlalchemy.engine import make_url
+    return make_url(url).database or ''
+
+
+def _round(value, digits: int = 2):
+    return round(float(value), digits) if value is not None else None
+
+
+def read_db_queries(metrics_urls) -> float:
+    """Сумма db_queries_total по всем /metrics; None, если ни один не ответил"""
+    total, answered = 0.0, False
+    for url in metrics_urls:
+        try:
+            body = requests.get(url, timeout=5).text
+        except requests.RequestException as e:
+            print(f"⚠️ {url} недоступен: {e}")
+            continue
+        answered = True
+        for line in body.splitlines():
+            if line.startswith('db_queries_total'):
+                total += float(line.rsplit(' ', 1)[1])
+    return total if answered else None
+
+
+def stub_call(stub_url: str, path: str, payload: dict = None):
+    try:
+        if payload is None and path == '/stats':
+            return requests.get(f'{stub_url}{path}', timeout=5).json()
+        return requests.post(f'{stub_url}{path}', json=payload or {}, timeout=5).json()
+    except requests.RequestException as e:
+        print(f"⚠️ Заглушка {stub_url} недоступна: {e}")
+        return None
+
+
+def peak_rate(completions, window: float = 10.0) -> float:
+    """Наибольшее число завершений за скользящее окно window секунд, в секунду"""
+    completions = sorted(completions)
+    best, left = 0, 0
+    for right, value in enumerate(completions):
+        while value - completions[left] > window:
+            left += 1
+        best = max(best, right - left + 1)
+    return best / window
+
+
+def enqueue(session, args, now: datetime) -> dict:
+    from sqlalchemy import text
+    account_posts = int(round(args.posts * args.account_share))
+    bot_posts = args.posts - account_posts
+    start = now + timedelta(seconds=5)
+    ids = {}
+    # Потоки бота и аккаунтов идут параллельно, каждый со своей долей частоты
+    for source, sql, count in (('bot', _BOT_ROWS_SQL, bot_posts), ('account', _ACCOUNT_ROWS_SQL, account_posts)):
+        if count <= 0:
+            ids[source] = []
+            continue
+        rate = args.rate * count / args.posts
+        rows = session.execute(text(sql), {
+            'count': count, 'start': start, 'now': now, 'interval': 1.0 / rate
+        }).fetchall()
+        ids[source] = [row[0] for row in rows]
+    session.commit()
+    return ids
+
+
+def progress(session, ids: dict) -> dict:
+    from sqlalchemy import text
+    statuses = {}
+    for source, queue_ids in ids.items():
+        if not queue_ids:
+            continue
+        rows = session.execute(text(_PROGRESS_SQL.format(table=_TABLES[source])), {'ids': queue_ids}).fetchall()
+        statuses[source] = {status: count for status, count in rows}
+    session.commit()
+    return statuses
+
+
+def measure(session, ids: dict) -> dict:
+    from sqlalchemy import text
+    results = {}
+    all_completions, first_planned, last_completed = [], None, None
+    for source, queue_ids in ids.items():
+        if not queue_ids:
+            continue
+        row = session.execute(text(_LATENCY_SQL.format(table=_TABLES[source])), {'ids': queue_ids}).fetchone()
+        completions = [float(value) for (value,) in session.execute(
+            text(_COMPLETIONS_SQL.format(table=_TABLES[source])), {'ids': queue_ids}
+        )]
+        all_completions.extend(completions)
+        if row.first_planned is not None:
+            first_planned = min(first_planned or row.first_planned, row.first_planned)
+            last_completed = max(last_completed or row.last_completed, row.last_completed)
+        results[source] = {
+            'enqueued': len(queue_ids),
+            'completed': row.completed,
+            'dispatch_lag_p50_s': _round(row.lag_p50),
+            'dispatch_lag_p99_s': _round(row.lag_p99),
+            'end_to_end_p50_s': _round(row.e2e_p50),
+            'end_to_end_p99_s': _round(row.e2e_p99),
+        }
+    session.commit()
+
+    completed = len(all_completions)
+    span = (last_completed - first_planned).total_seconds() if completed and last_completed else 0.0
+    results['total'] = {
+        'completed': completed,
+        'sustained_posts_per_second': _round(completed / span) if span > 0 else None,
+        'peak_posts_per_second_10s': _round(peak_rate(all_completions)) if completed else None,
+        'span_seconds': _round(span, 1),
+    }
+    return results
+
+
+def stage_breakdown(session) -> dict:
+    """p50/p99 этапов из publication_traces за последний час (если трассировка включена)"""
+    from app.utils.publication_trace import get_stage_latency_stats
+    breakdown = {}
+    try:
+        for source in _TABLES:
+            groups = get_stage_latency_stats(session, hours=1, source=source, group_by='stage', limit=1)
+            if groups:
+                breakdown[source] = {
+                    stage: {'p50_ms': values['p50'], 'p99_ms': values['p99']}
+                    for stage, values in groups[0]['stages'].items()
+                }
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️ Этапы из publication_traces недоступны: {e}")
+    return breakdown
+
+
+def print_report(report: dict):
+    print()
+    print("=" * 80)
+    print(f"РЕЗУЛЬТАТ {report['meta']['label']}".strip())
+    print("=" * 80)
+    total = report['results']['total']
+    print(f"Завершено: {total['completed']} из {report['meta']['posts']} за {total['span_seconds']}s")
+    print(f"Устойчиво: {total['sustained_posts_per_second']} posts/sec, пик за 10с: {total['peak_posts_per_second_10s']}")
+    for source in _TABLES:
+        result = report['results'].get(source)
+        if not result:
+            continue
+        print(
+            f"  {source:<8} {result['completed']}/{result['enqueued']}  "
+            f"dispatch lag p50={result['dispatch_lag_p50_s']}s p99={result['dispatch_lag_p99_s']}s  "
+            f"end-to-end p50={result['end_to_end_p50_s']}s p99={result['end_to_end_p99_s']}s"
+        )
+    if report['db_queries_per_post'] is not None:
+        print(f"SQL-запросов на публикацию: {report['db_queries_per_post']}")
+    else:
+        print("SQL-запросов на публикацию: нет данных (--metrics-url воркеров не задан или недоступен)")
+    if report['stub']:
+        print()
+        print("Заглушка Telegram:")
+        for method, values in report['stub'].get('methods', {}).items():
+            print(f"  {method:<22} {values['total']:>7}  {values['avg_latency_ms']:>7.1f}ms  {values['outcomes']}")
+    for source, stages in report['stages'].items():
+        print()
+        print(f"Этапы ({source}):")
+        for stage, values in stages.items():
+            print(f"  {stage:<18} p50={values['p50_ms']}ms p99={values['p99_ms']}ms")
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.database_url:
+        print("❌ Укажите --database-url или LOADTEST_DATABASE_URL")
+        return 2
+    name = _database_name(args.database_url)
+    if 'loadtest' not in name and 'bench' not in name and not args.force:
+        print(f"❌ База '{name}' не похожа на базу стенда; драйвер пишет в её очереди. Используйте --force, если уверены.")
+        return 2
+    # До импорта app: Config читает DATABASE_URL при импорте
+    os.environ['DATABASE_URL'] = args.database_url
+
+    from app import app
+    from app.database import db
+    from app.utils.partitioning import add_months, ensure_monthly_partitions
+
+    stub_config = dict(item.split('=', 1) for item in args.stub_config)
+    metrics_urls = args.metrics_url or [f"http://127.0.0.1:{os.environ.get('METRICS_PORT', '9101')}/metrics"]
+
+    with app.app_context():
+        if args.generate:
+            from benchmarks.datagen import generate_dataset
+            print(f"Генерация набора данных (scale={args.scale})...")
+            with db.engine.begin() as connection:
+                generate_dataset(connection, args.scale)
+        now = datetime.utcnow()
+        with db.engine.begin() as connection:
+            ensure_monthly_partitions(connection, 'publication_history', now, add_months(now, 1))
+
+        if stub_config:
+            stub_call(args.stub_url, '/config', stub_config)
+        stub_call(args.stub_url, '/reset')
+        queries_before = read_db_queries(metrics_urls)
+
+        ids = enqueue(db.session, args, now)
+        enqueued = sum(len(queue_ids) for queue_ids in ids.values())
+        print(f"Поставлено {enqueued} публикаций (бот: {len(ids['bot'])}, аккаунты: {len(ids['account'])}), "
+              f"плановая частота {args.rate}/s")
+        if enqueued < args.posts:
+            print(f"⚠️ Данных хватило только на {enqueued} из {args.posts} (увеличьте --scale)")
+
+        deadline = time.monotonic() + args.timeout
+        while True:
+            statuses = progress(db.session, ids)
+            in_flight = sum(count for source in statuses.values()
+                            for status, count in source.items() if status in _IN_FLIGHT)
+            line = '  '.join(f"{source}: {dict(sorted(values.items()))}" for source, values in statuses.items())
+            print(f"[{datetime.utcnow():%H:%M:%S}] {line}")
+            if not in_flight:
+                break
+            if time.monotonic() >= deadline:
+                print(f"⚠️ Таймаут: {in_flight} публикаций не завершились")
+                break
+            time.sleep(args.poll)
+
+        queries_after = read_db_queries(metrics_urls)
+        results = measure(db.session, ids)
+        completed = results['total']['completed']
+        queries_per_post = None
+        if queries_before is not None and queries_after is not None and completed:
+            queries_per_post = round((queries_after - queries_before) / completed, 1)
+
+        report = {
+            'meta': {
+                'label': args.label,
+                'timestamp': datetime.utcnow().isoformat(),
+                'posts': args.posts,
+                'rate': args.rate,
+                'account_share': args.account_share,
+                'stub_config': stub_config,
+            },
+            'results': results,
+            'statuses': progress(db.session, ids),
+            'db_queries_per_post': queries_per_post,
+            'stub': stub_call(args.stub_url, '/stats'),
+            'stages': stage_breakdown(db.session),
+        }
+
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        print()
+        print(f"Результаты сохранены: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/bin/bash
+# Нагрузочный стенд на одной Linux-машине без Docker:
+# временный кластер PostgreSQL и Redis в LOADTEST_WORKDIR, заглушка Telegram,
+# один воркер Celery на всех очередях, beat и драйвер нагрузки (loadtest/driver.py).
+# При выходе всё останавливается; данные кластера остаются для повторных прогонов.
+#
+# Нужны бинарники PostgreSQL (initdb, pg_ctl - ищутся и в /usr/lib/postgresql/*/bin),
+# redis-server и зависимости из requirements.txt.
+#
+# Использование:
+#   bash loadtest/run_local.sh --generate --posts 600 --rate 5
+#   STUB_ARGS="--latency-ms 80 --rate-429 0.02" CELERY_CONCURRENCY=8 bash loadtest/run_local.sh --posts 2000 --rate 20
+# Аргументы передаются драйверу как есть.
+
+set -e
+
+cd "$(dirname "$0")/.."
+
+WORKDIR=${LOADTEST_WORKDIR:-/tmp/realty_loadtest}
+PG_PORT=${LOADTEST_PG_PORT:-55432}
+REDIS_PORT=${LOADTEST_REDIS_PORT:-56379}
+STUB_PORT=${LOADTEST_STUB_PORT:-8081}
+METRICS_PORT=${LOADTEST_METRICS_PORT:-9191}
+CELERY_CONCURRENCY=${CELERY_CONCURRENCY:-4}
+STUB_ARGS=${STUB_ARGS:-}
+
+if ! command -v initdb >/dev/null 2>&1; then
+    PG_BIN=$(ls -d /usr/lib/postgresql/*/bin 2>/dev/null | sort -V | tail -1)
+    if [ -z "$PG_BIN" ]; then
+        echo "❌ initdb не найден: установите PostgreSQL или добавьте его bin в PATH"
+        exit 1
+    fi
+    export PATH="$PG_BIN:$PATH"
+fi
+command -v redis-server >/dev/null 2>&1 || { echo "❌ redis-server не найден"; exit 1; }
+
+mkdir -p "$WORKDIR/logs"
+PIDS=()
+
+cleanup() {
+    echo "🧹 Остановка стенда..."
+    for pid in "${PIDS[@]}"; do
+        kill "$pid" 2>/dev/null || true
+    done
+    wait 2>/dev/null || true
+    redis-cli -p "$REDIS_PORT" shutdown nosave >/dev/null 2>&1 || true
+    pg_ctl -D "$WORKDIR/pg" -m fast stop >/dev/null 2>&1 || true
+}
+trap cleanup EXIT
+
+# PostgreSQL: отдельный кластер с trust-аутентификацией только на 127.0.0.1
+if [ ! -d "$WORKDIR/pg" ]; then
+    echo "🐘 initdb $WORKDIR/pg"
+    initdb -D "$WORKDIR/pg" -U realty --auth=trust -E UTF8 >/dev/null
+fi
+pg_ctl -D "$WORKDIR/pg" -l "$WORKDIR/logs/postgres.log" -w \
+    -o "-p $PG_PORT -k $WORKDIR -c listen_addresses=127.0.0.1 -c fsync=off -c synchronous_commit=off" start >/dev/null
+createdb -h 127.0.0.1 -p "$PG_PORT" -U realty realty_loadtest 2>/dev/null || true
+
+# Redis без сохранения на диск
+redis-server --port "$REDIS_PORT" --bind 127.0.0.1 --save '' --appendonly no \
+    --daemonize yes --dir "$WORKDIR" --logfile "$WORKDIR/logs/redis.log"
+
+export DATABASE_URL="postgresql://realty@127.0.0.1:$PG_PORT/realty_loadtest"
+export LOADTEST_DATABASE_URL="$DATABASE_URL"
+export REDIS_URL="redis://127.0.0.1:$REDIS_PORT/0"
+export TELEGRAM_BOT_TOKEN="000000:loadtest"
+export TELEGRAM_BOT_API_URL="http://127.0.0.1:$STUB_PORT"
+export TELETHON_SENDER=stub
+export TELETHON_STUB_URL="http://127.0.0.1:$STUB_PORT"
+export PROMETHEUS_MULTIPROC_DIR="$WORKDIR/prometheus_multiproc"
+export METRICS_PORT
+export LOG_FOLDER="$WORKDIR/logs"
+
+echo "📡 Заглушка Telegram на :$STUB_PORT"
+python -u -m loadtest.stub_telegram --port "$STUB_PORT" $STUB_ARGS > "$WORKDIR/logs/stub.log" 2>&1 &
+PIDS+=($!)
+
+# Таблицы создаёт init_db при первом импорте app; воркер стартует после этого
+python -c "from app import app" >/dev/null
+
+echo "⚙️  Celery worker (concurrency=$CELERY_CONCURRENCY) и beat"
+celery -A workers.celery_app worker --loglevel=warning --concurrency="$CELERY_CONCURRENCY" \
+    -Q celery,publish_dispatch,publish_interactive,publish_scheduled,publish_autopublish -n loadtest@%h \
+    > "$WORKDIR/logs/celery_worker.log" 2>&1 &
+PIDS+=($!)
+celery -A workers.celery_app beat --loglevel=warning --schedule "$WORKDIR/celerybeat-schedule" \
+    > "$WORKDIR/logs/celery_beat.log" 2>&1 &
+PIDS+=($!)
+
+sleep 5
+python -m loadtest.driver --metrics-url "http://127.0.0.1:$METRICS_PORT/metrics" \
+    --label "concurrency=$CELERY_CONCURRENCY $STUB_ARGS" "$@"
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Заглушка Telegram для нагрузочного стенда: Bot API и "MTProto" аккаунтов на одном порту
+
+Bot API (TELEGRAM_BOT_API_URL=http://127.0.0.1:8081):
+    /bot<token>/sendMessage, /sendPhoto, /getChatMember, /getMe - ответы в формате Bot API
+MTProto (TELETHON_SENDER=stub, TELETHON_STUB_URL=http://127.0.0.1:8081):
+    POST /mtproto/sendMessage, /mtproto/sendFile - для app/utils/telethon/telethon_stub.py
+Управление:
+    GET /stats - счётчики по методам и исходам, POST /reset - обнулить
+    GET /config, POST /config {"latency_ms": 80, "rate_429": 0.05, ...} - поменять на ходу
+
+Задержка - latency_ms ± latency_jitter_ms (+ photo_latency_ms для фото). Отказы:
+rate_429 (429 с retry_after), error_rate (400 "chat not found"), server_error_rate (502),
+chat_limit_per_minute (429, как лимит Telegram на сообщения в группу), для MTProto -
+flood_wait_rate и mtproto_error_rate. Решения принимаются генератором с зерном seed.
+
+Запуск: python -m loadtest.stub_telegram --port 8081 --latency-ms 60 --rate-429 0.02
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULTS = {
+    'latency_ms': 40.0,
+    'latency_jitter_ms': 20.0,
+    'photo_latency_ms': 120.0,
+    'rate_429': 0.0,
+    'retry_after': 5,
+    'error_rate': 0.0,
+    'server_error_rate': 0.0,
+    'chat_limit_per_minute': 0,
+    'mtproto_latency_ms': 150.0,
+    'flood_wait_rate': 0.0,
+    'flood_wait_seconds': 30,
+    'mtproto_error_rate': 0.0,
+    'seed': 1,
+}
+
+_BOT_PATH = re.compile(r'^/bot[^/]+/(\w+)$')
+_MTPROTO_PATH = re.compile(r'^/mtproto/(\w+)$')
+_MULTIPART_CHAT_ID = re.compile(rb'name="chat_id"\r\n\r\n([^\r]*)\r\n')
+
+
+class StubState:
+    """Настройки, генератор отказов и статистика (общие для всех потоков сервера)"""
+
+    def __init__(self, config: dict):
+        self.lock = threading.Lock()
+        self.config = dict(DEFAULTS)
+        self.config.update(config)
+        self.random = random.Random(self.config['seed'])
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.message_id = 0
+            self.counts = defaultdict(lambda: defaultdict(int))
+            self.latency_total = defaultdict(float)
+            self.chat_sent = defaultdict(deque)
+
+    def update(self, values: dict):
+        with self.lock:
+            for key, value in values.items():
+                if key in DEFAULTS:
+                    self.config[key] = type(DEFAULTS[key])(value)
+            if 'seed' in values:
+                self.random = random.Random(self.config['seed'])
+
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return rate > 0 and self.random.random() < rate
+
+    def latency(self, base_key: str, extra: float = 0.0) -> float:
+        with self.lock:
+            jitter = self.config['latency_jitter_ms']
+            value = self.config[base_key] + extra + self.random.uniform(-jitter, jitter)
+        return max(value, 0.0) / 1000
+
+    def chat_limited(self, chat_id: str) -> bool:
+        """Лимит сообщений в чат за скользящую минуту (0 - без лимита)"""
+        limit = self.config['chat_limit_per_minute']
+        if not limit:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            sent = self.chat_sent[chat_id]
+            while sent and sent[0] <= now - 60:
+                sent.popleft()
+            if len(sent) >= limit:
+                return True
+            sent.append(now)
+            return False
+
+    def next_message_id(self) -> int:
+        with self.lock:
+            self.message_id += 1
+            return self.message_id
+
+    def record(self, api: str, method: str, outcome: str, elapsed: float):
+        with self.lock:
+            self.counts[f'{api}.{method}'][outcome] += 1
+            self.latency_total[f'{api}.{method}'] += elapsed
+
+    def stats(self) -> dict:
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            methods = {}
+            for name, outcomes in self.counts.items():
+                total = sum(outcomes.values())
+                methods[name] = {
+                    'total': total,
+                    'per_second': round(total / elapsed, 2),
+                    'avg_latency_ms': round(self.latency_total[name] / total * 1000, 1) if total else 0.0,
+                    'outcomes': dict(outcomes),
+                }
+            return {'uptime_seconds': round(elapsed, 1), 'methods': methods, 'config': dict(self.config)}
+
+
+def _bot_error(code: int, description: str, retry_after: int = None) -> dict:
+    body = {'ok': False, 'error_code': code, 'description': description}
+    if retry_after is not None:
+        body['parameters'] = {'retry_after': retry_after}
+    return body
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = 'TelegramStub/1.0'
+    state: StubState = None
+
+    def log_message(self, format, *args):
+        # Сотни запросов в секунду: access-лог только мешает
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_params(self) -> dict:
+        """Параметры запроса: query string, JSON, form-urlencoded или multipart (только chat_id)"""
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return params
+        body = self.rfile.read(length)
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('application/json'):
+            params.update(json.loads(body or b'{}'))
+        elif content_type.startswith('application/x-www-form-urlencoded'):
+            params.update({key: values[0] for key, values in parse_qs(body.decode()).items()})
+        elif content_type.startswith('multipart/form-data'):
+            match = _MULTIPART_CHAT_ID.search(body)
+            if match:
+                params['chat_id'] = match.group(1).decode()
+        return params
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        path = urlsplit(self.path).path
+        try:
+            params = self._read_params()
+        except ValueError:
+            self._send_json(400, _bot_error(400, 'Bad Request: can\'t parse request body'))
+            return
+
+        if path == '/stats':
+            self._send_json(200, self.state.stats())
+        elif path == '/reset' and self.command == 'POST':
+            self.state.reset()
+            self._send_json(200, {'ok': True})
+        elif path == '/config':
+            if self.command == 'POST':
+                self.state.update(params)
+            self._send_json(200, dict(self.state.config))
+        elif _BOT_PATH.match(path):
+            self._bot_api(_BOT_PATH.match(path).group(1), params)
+        elif _MTPROTO_PATH.match(path) and self.command == 'POST':
+            self._mtproto(_MTPROTO_PATH.match(path).group(1), params)
+        else:
+            self._send_json(404, _bot_error(404, 'Not Found'))
+
+    def _bot_api(self, method: str, params: dict):
+        state = self.state
+        started = time.perf_counter()
+        chat_id = str(params.get('chat_id', ''))
+
+        if method == 'getMe':
+            status, body = 200, {'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'Stub', 'username': 'stub_bot'}}
+        elif method == 'getChatMember':
+            time.sleep(state.latency('latency_ms'))
+            status, body = 200, {'ok': True, 'result': {
+                'status': 'administrator',
+                'user': {'id': int(params.get('user_id') or 1), 'is_bot': True, 'first_name': 'Stub'},
+            }}
+        elif method in ('sendMessage', 'sendPhoto'):
+            config = state.config
+            if state.roll(config['rate_429']) or state.chat_limited(chat_id):
+                retry_after = int(config['retry_after'])
+                status, body = 429, _bot_error(429, f'Too Many Requests: retry after {retry_after}', retry_after)
+            elif state.roll(config['server_error_rate']):
+                time.sleep(state.latency('latency_ms'))
+                status, body = 502, _bot_error(502, 'Bad Gateway')
+            elif state.roll(config['error_rate']):
+                time.sleep(state.latency('latency_ms'))
+                status, body = 400, _bot_error(400, 'Bad Request: chat not found')
+            else:
+                extra = config['photo_latency_ms'] if method == 'sendPhoto' else 0.0
+                time.sleep(state.latency('latency_ms', extra))
+                status, body = 200, {'ok': True, 'result': {
+                    'message_id': state.next_message_id(),
+                    'date': int(time.time()),
+                    'chat': {'id': int(chat_id) if chat_id.lstrip('-').isdigit() else 0, 'type': 'supergroup'},
+                }}
+        else:
+            status, body = 404, _bot_error(404, 'Not Found: method not supported by stub')
+
+        state.record('bot', method, str(status), time.perf_counter() - started)
+        self._send_json(status, body)
+
+    def _mtproto(self, method: str, params: dict):
+        state = self.state
+        config = state.config
+        started = time.perf_counter()
+        if state.roll(config['flood_wait_rate']):
+            outcome, body = 'flood_wait', {'ok': False, 'flood_wait': int(config['flood_wait_seconds'])}
+        elif state.roll(config['mtproto_error_rate']):
+            time.sleep(state.latency('mtproto_latency_ms'))
+            outcome, body = 'error', {'ok': False, 'error': 'CHAT_WRITE_FORBIDDEN'}
+        else:
+            extra = config['photo_latency_ms'] if params.get('file_size') else 0.0
+            time.sleep(state.latency('mtproto_latency_ms', extra))
+            outcome, body = 'ok', {'ok': True, 'message_id': state.next_message_id()}
+        state.record('mtproto', method, outcome, time.perf_counter() - started)
+        self._send_json(200, body)
+
+
+def build_server(host: str, port: int, config: dict) -> ThreadingHTTPServer:
+    handler = type('BoundStubHandler', (StubHandler,), {'state': StubState(config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Заглушка Bot API и MTProto для нагрузочного стенда')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    for key, default in DEFAULTS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(default), default=default, dest=key)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = {key: getattr(args, key) for key in DEFAULTS}
+    server = build_server(args.host, args.port, config)
+    print(f"Telegram stub listening on http://{args.host}:{args.port} ({json.dumps(config)})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Add action log search indexes, JSONB details and actions dictionary table
+
+Revision ID: add_action_log_search
+Revises: add_object_search
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_action_log_search'
+down_revision = 'add_object_search'
+branch_labels = None
+depends_on = None
+
+# (имя индекса, колонки, метод, операторные классы)
+# Должно совпадать с ActionLog.__table_args__
+_INDEXES = (
+    ('ix_action_logs_action_trgm', ['action'], 'gin', {'action': 'gin_trgm_ops'}),
+    ('ix_action_logs_ip_address_trgm', ['ip_address'], 'gin', {'ip_address': 'gin_trgm_ops'}),
+    ('ix_action_logs_user_agent_trgm', ['user_agent'], 'gin', {'user_agent': 'gin_trgm_ops'}),
+    ('ix_action_logs_details_json', ['details_json'], 'gin', {'details_json': 'jsonb_path_ops'}),
+    ('ix_action_logs_user_created', ['user_id', 'created_at'], None, None),
+)
+
+
+def _details_json_type(conn):
+    return conn.execute(sa.text(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_name = 'action_logs' AND column_name = 'details_json'"
+    )).scalar()
+
+
+def upgrade() -> None:
+    # Check if tables, column type and indexes already exist (idempotent migration)
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'action_log_actions' not in tables:
+        op.create_table(
+            'action_log_actions',
+            sa.Column('action', sa.String(length=100), nullable=False),
+            sa.Column('first_seen_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('action')
+        )
+        if 'action_logs' in tables:
+            # Словарь заполняется один раз по существующему журналу
+            op.execute(
+                "INSERT INTO action_log_actions (action, first_seen_at) "
+                "SELECT action, MIN(created_at) FROM action_logs GROUP BY action"
+            )
+
+    if 'action_logs' not in tables:
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    if _details_json_type(conn) == 'json':
+        # Переписывает таблицу под эксклюзивной блокировкой - выполнять в окно обслуживания
+        op.execute("ALTER TABLE action_logs ALTER COLUMN details_json TYPE jsonb USING details_json::jsonb")
+
+    indexes = [idx['name'] for idx in inspector.get_indexes('action_logs')]
+    pending = [index for index in _INDEXES if index[0] not in indexes]
+    if not pending:
+        return
+
+    # Журнал пишется непрерывно: индексы строим CONCURRENTLY
+    with op.get_context().autocommit_block():
+        for name, columns, using, ops in pending:
+            op.create_index(
+                name,
+                'action_logs',
+                columns,
+                postgresql_using=using,
+                postgresql_ops=ops,
+                postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    # Check if tables and indexes exist before dropping
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'action_logs' in tables:
+        indexes = [idx['name'] for idx in inspector.get_indexes('action_logs')]
+        with op.get_context().autocommit_block():
+            for name, columns, using, ops in _INDEXES:
+                if name in indexes:
+                    op.drop_index(name, table_name='action_logs', postgresql_concurrently=True)
+
+        if _details_json_type(conn) == 'jsonb':
+            op.execute("ALTER TABLE action_logs ALTER COLUMN details_json TYPE json USING details_json::json")
+
+    if 'action_log_actions' in tables:
+        op.drop_table('action_log_actions')
@@ -0,0 +1,73 @@
+"""
+Add id_prefixes registry of object ID prefixes
+
+Revision ID: add_id_prefixes
+Revises: add_object_id_sequences
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_id_prefixes'
+down_revision = 'add_object_id_sequences'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Check if table already exists (idempotent migration)
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'id_prefixes' in tables:
+        return
+
+    op.create_table(
+        'id_prefixes',
+        sa.Column('prefix', sa.String(length=20), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('prefix'),
+        sa.UniqueConstraint('user_id')
+    )
+
+    if 'users' in tables:
+        # Префиксы пользователей; если один префикс оказался у нескольких - владельцем
+        # становится первый пользователь, остальные продолжают пользоваться им как раньше
+        op.execute(
+            """
+            INSERT INTO id_prefixes (prefix, user_id, created_at)
+            SELECT DISTINCT ON (prefix) prefix, user_id, now()
+            FROM (
+                SELECT settings_json->>'id_prefix' AS prefix, user_id
+                FROM users
+                WHERE settings_json IS NOT NULL AND COALESCE(settings_json->>'id_prefix', '') <> ''
+            ) AS user_prefixes
+            ORDER BY prefix, user_id
+            """
+        )
+
+    if 'object_id_sequences' in tables:
+        # Префиксы, по которым уже есть объекты (например WEB), занимаем без владельца
+        op.execute(
+            """
+            INSERT INTO id_prefixes (prefix, user_id, created_at)
+            SELECT prefix, NULL, now() FROM object_id_sequences
+            ON CONFLICT (prefix) DO NOTHING
+            """
+        )
+
+
+def downgrade() -> None:
+    # Check if table exists before dropping
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'id_prefixes' in inspector.get_table_names():
+        op.drop_table('id_prefixes')
@@ -0,0 +1,60 @@
+"""
+Add object_id_sequences table with per-prefix object number counters
+
+Revision ID: add_object_id_sequences
+Revises: add_action_log_search
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_object_id_sequences'
+down_revision = 'add_action_log_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Check if table already exists (idempotent migration)
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'object_id_sequences' in tables:
+        return
+
+    op.create_table(
+        'object_id_sequences',
+        sa.Column('prefix', sa.String(length=20), nullable=False),
+        sa.Column('next_value', sa.Integer(), nullable=False, server_default='1'),
+        sa.PrimaryKeyConstraint('prefix')
+    )
+
+    if 'objects' in tables:
+        # Счётчики по существующим объектам: префикс - всё до числового суффикса,
+        # следующий номер - максимум суффикса + 1 (числовое сравнение: АБВ1000 > АБВ999)
+        op.execute(
+            """
+            INSERT INTO object_id_sequences (prefix, next_value)
+            SELECT parts[1], MAX(CAST(parts[2] AS INTEGER)) + 1
+            FROM (
+                SELECT regexp_match(object_id, '^(.*?)([0-9]+)$') AS parts
+                FROM objects
+            ) AS ids
+            WHERE parts IS NOT NULL AND parts[1] <> ''
+            GROUP BY parts[1]
+            """
+        )
+
+
+def downgrade() -> None:
+    # Check if table exists before dropping
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'object_id_sequences' in inspector.get_table_names():
+        op.drop_table('object_id_sequences')
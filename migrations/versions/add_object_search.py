@@ -0,0 +1,98 @@
+"""
+Add full-text search vector and trigram indexes for objects
+
+Revision ID: add_object_search
+Revises: partition_publication_history
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_object_search'
+down_revision = 'partition_publication_history'
+branch_labels = None
+depends_on = None
+
+# Должно совпадать с app.models.object.SEARCH_VECTOR_SQL; {json} - json или jsonb
+# в зависимости от фактического типа districts_json
+_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(address, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(residential_complex, '')), 'A') || "
+    "setweight({json}_to_tsvector('russian', coalesce(districts_json, '[]'::{json}), '[\"string\"]'), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(comment, '')), 'C')"
+)
+
+# (имя индекса, колонка, операторный класс)
+_INDEXES = (
+    ('ix_objects_search_vector', 'search_vector', None),
+    ('ix_objects_object_id_trgm', 'object_id', 'gin_trgm_ops'),
+    ('ix_objects_address_trgm', 'address', 'gin_trgm_ops'),
+)
+
+
+def _districts_json_type(conn):
+    return conn.execute(sa.text(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_name = 'objects' AND column_name = 'districts_json'"
+    )).scalar()
+
+
+def upgrade() -> None:
+    # Check if column and indexes already exist (idempotent migration)
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'objects' not in inspector.get_table_names():
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    columns = [col['name'] for col in inspector.get_columns('objects')]
+    if 'search_vector' not in columns:
+        json_type = 'jsonb' if _districts_json_type(conn) == 'jsonb' else 'json'
+        # STORED generated column: вектор пересчитывается PostgreSQL при каждом INSERT/UPDATE
+        op.execute(
+            "ALTER TABLE objects ADD COLUMN search_vector tsvector "
+            f"GENERATED ALWAYS AS ({_SEARCH_VECTOR_SQL.format(json=json_type)}) STORED"
+        )
+
+    indexes = [idx['name'] for idx in inspector.get_indexes('objects')]
+    pending = [index for index in _INDEXES if index[0] not in indexes]
+    if not pending:
+        return
+
+    # GIN-индексы строим CONCURRENTLY, чтобы не блокировать запись объектов
+    with op.get_context().autocommit_block():
+        for name, column, opclass in pending:
+            op.create_index(
+                name,
+                'objects',
+                [column],
+                postgresql_using='gin',
+                postgresql_ops={column: opclass} if opclass else None,
+                postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    # Check if column and indexes exist before dropping
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'objects' not in inspector.get_table_names():
+        return
+
+    indexes = [idx['name'] for idx in inspector.get_indexes('objects')]
+    with op.get_context().autocommit_block():
+        for name, column, opclass in _INDEXES:
+            if name in indexes:
+                op.drop_index(name, table_name='objects', postgresql_concurrently=True)
+
+    columns = [col['name'] for col in inspector.get_columns('objects')]
+    if 'search_vector' in columns:
+        op.drop_column('objects', 'search_vector')
+    # Расширение pg_trgm не удаляем: на него могут опираться другие индексы
@@ -0,0 +1,209 @@
+"""
+Add photo_blobs and move object photos to content-addressed storage
+
+Revision ID: add_photo_blobs
+Revises: add_publication_traces
+Create Date: 2026-10-18 23:00:00.000000
+
+Файлы из photos_json (uploads/<timestamp>_<name>.jpg) связываются жёсткой ссылкой
+(или копируются) в UPLOAD_FOLDER/ab/cd/<sha256>.<ext>, пути в photos_json переписываются,
+photo_blobs заполняется счётчиками ссылок. Старые файлы не удаляются здесь: если миграция
+откатится, прежние пути остаются рабочими; без ссылок их уберёт collect_photo_garbage
+через PHOTO_GC_GRACE_HOURS. Downgrade удаляет только таблицу - новые пути остаются рабочими.
+"""
+from alembic import op
+import sqlalchemy as sa
+import hashlib
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+
+# revision identifiers, used by Alembic.
+revision = 'add_photo_blobs'
+down_revision = 'add_publication_traces'
+branch_labels = None
+depends_on = None
+
+_BLOB_PATH = re.compile(r'(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})\.[a-z0-9]+$')
+_ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.heic', '.bmp', '.tif', '.tiff'}
+_VARIANTS = (('telegram', 'tg.jpg'), ('thumb', 'thumb.webp'))
+
+
+def _upload_folder():
+    from app.config import Config
+    return Config.UPLOAD_FOLDER
+
+
+def _full_path(upload_folder, photo_path):
+    if photo_path.startswith('uploads/'):
+        return os.path.join(upload_folder, photo_path[len('uploads/'):])
+    if photo_path.startswith('/'):
+        return photo_path
+    return os.path.join(upload_folder, photo_path)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _extension(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.jpeg':
+        ext = '.jpg'
+    return ext if ext in _ALLOWED_EXTENSIONS else '.jpg'
+
+
+def _link(src, dst):
+    if os.path.exists(dst):
+        return
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _store(upload_folder, photo_path, stored):
+    """(sha256, новый путь) для старого пути; None - файла нет"""
+    if photo_path in stored:
+        return stored[photo_path]
+    full_path = _full_path(upload_folder, photo_path)
+    if not os.path.isfile(full_path):
+        stored[photo_path] = None
+        return None
+    sha256 = _sha256(full_path)
+    new_path = f'uploads/{sha256[:2]}/{sha256[2:4]}/{sha256}{_extension(photo_path)}'
+    _link(full_path, _full_path(upload_folder, new_path))
+    stored[photo_path] = (sha256, new_path)
+    return stored[photo_path]
+
+
+def upgrade() -> None:
+    # Check if table already exists (idempotent migration)
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    # Таблицу может заранее создать db.create_all() при старте приложения -
+    # перенос файлов выполняется в любом случае (пути хранилища пропускаются)
+    if 'photo_blobs' not in tables:
+        _create_table()
+
+    if 'objects' not in tables:
+        return
+    _move_photos(conn)
+
+
+def _create_table():
+    op.create_table(
+        'photo_blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('path', sa.String(length=255), nullable=False),
+        sa.Column('size_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('unreferenced_since', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_index(
+        'ix_photo_blobs_unreferenced', 'photo_blobs', ['unreferenced_since'],
+        postgresql_where=sa.text('ref_count = 0')
+    )
+
+
+def _move_photos(conn):
+    upload_folder = _upload_folder()
+    stored = {}
+    blobs = {}
+    rows = conn.execute(sa.text("SELECT object_id, photos_json FROM objects WHERE photos_json IS NOT NULL")).fetchall()
+    for object_id, photos in rows:
+        if isinstance(photos, str):
+            photos = json.loads(photos)
+        if not isinstance(photos, list):
+            continue
+        changed = False
+        refs = set()
+        new_photos = []
+        for entry in photos:
+            path = entry if isinstance(entry, str) else (entry.get('path') if isinstance(entry, dict) else None)
+            if not path:
+                new_photos.append(entry)
+                continue
+            match = _BLOB_PATH.search(path)
+            if match:
+                blobs.setdefault(match.group(3), [path, 0])
+                refs.add(match.group(3))
+                new_photos.append(entry)
+                continue
+            result = _store(upload_folder, path, stored)
+            if result is None:
+                new_photos.append(entry)
+                continue
+            sha256, new_path = result
+            new_entry = dict(entry) if isinstance(entry, dict) else {}
+            new_entry['path'] = new_path
+            for key, suffix in _VARIANTS:
+                variant = new_entry.get(key)
+                if not variant:
+                    continue
+                if variant == path:
+                    new_entry[key] = new_path
+                    continue
+                variant_full = _full_path(upload_folder, variant)
+                if os.path.isfile(variant_full):
+                    new_variant = f'{os.path.splitext(new_path)[0]}.{suffix}'
+                    _link(variant_full, _full_path(upload_folder, new_variant))
+                    new_entry[key] = new_variant
+                else:
+                    # Вариант пропал - будет построен заново scripts/process_photo_variants.py
+                    new_entry.pop(key)
+            blobs.setdefault(sha256, [new_path, 0])
+            refs.add(sha256)
+            new_photos.append(new_entry if isinstance(entry, dict) else new_path)
+            changed = True
+        for sha256 in refs:
+            blobs[sha256][1] += 1
+        if changed:
+            conn.execute(
+                sa.text("UPDATE objects SET photos_json = CAST(:photos AS json) WHERE object_id = :object_id"),
+                {'photos': json.dumps(new_photos, ensure_ascii=False), 'object_id': object_id}
+            )
+
+    now = datetime.utcnow()
+    for sha256, (path, ref_count) in blobs.items():
+        full_path = _full_path(upload_folder, path)
+        conn.execute(
+            sa.text(
+                "INSERT INTO photo_blobs (sha256, path, size_bytes, ref_count, created_at, unreferenced_since) "
+                "VALUES (:sha256, :path, :size, :ref_count, :now, :unreferenced_since) "
+                # Счётчики считаются здесь по всем объектам - они точнее строк, записанных до миграции
+                "ON CONFLICT (sha256) DO UPDATE SET ref_count = EXCLUDED.ref_count, "
+                "unreferenced_since = EXCLUDED.unreferenced_since"
+            ),
+            {
+                'sha256': sha256,
+                'path': path,
+                'size': os.path.getsize(full_path) if os.path.isfile(full_path) else 0,
+                'ref_count': ref_count,
+                'now': now,
+                'unreferenced_since': None if ref_count else now,
+            }
+        )
+
+
+def downgrade() -> None:
+    # Check if table exists before dropping
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'photo_blobs' in inspector.get_table_names():
+        op.drop_index('ix_photo_blobs_unreferenced', table_name='photo_blobs')
+        op.drop_table('photo_blobs')
@@ -0,0 +1,160 @@
+"""
+Add partitioned archive tables for finished publication queue rows
+
+Revision ID: add_publication_queue_archives
+Revises: add_query_shaped_indexes
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_publication_queue_archives'
+down_revision = 'add_query_shaped_indexes'
+branch_labels = None
+depends_on = None
+
+# Колонки повторяют горячие таблицы + archived_at; ключ партиционирования (created_at) входит в PK.
+# Внешних ключей нет: архив не должен мешать удалению объектов/чатов/аккаунтов
+_ARCHIVE_TABLES = {
+    'publication_queues_archive': """
+        CREATE TABLE publication_queues_archive (
+            queue_id INTEGER NOT NULL,
+            object_id VARCHAR(50) NOT NULL,
+            chat_id INTEGER NOT NULL,
+            account_id INTEGER,
+            user_id INTEGER,
+            type VARCHAR(10) NOT NULL,
+            mode VARCHAR(20) NOT NULL,
+            priority VARCHAR(20) NOT NULL DEFAULT 'autopublish',
+            status VARCHAR(20) NOT NULL,
+            scheduled_time TIMESTAMP,
+            started_at TIMESTAMP,
+            lease_until TIMESTAMP,
+            worker_id VARCHAR(100),
+            completed_at TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error_message TEXT,
+            attempt_history_json JSON,
+            message_id VARCHAR(50),
+            created_at TIMESTAMP NOT NULL,
+            archived_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            PRIMARY KEY (queue_id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """,
+    'account_publication_queues_archive': """
+        CREATE TABLE account_publication_queues_archive (
+            queue_id INTEGER NOT NULL,
+            object_id VARCHAR(50) NOT NULL,
+            chat_id INTEGER NOT NULL,
+            account_id INTEGER NOT NULL,
+            user_id INTEGER,
+            status VARCHAR(20) NOT NULL,
+            scheduled_time TIMESTAMP NOT NULL,
+            started_at TIMESTAMP,
+            lease_until TIMESTAMP,
+            worker_id VARCHAR(100),
+            completed_at TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error_message TEXT,
+            message_id VARCHAR(50),
+            created_at TIMESTAMP NOT NULL,
+            archived_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            PRIMARY KEY (queue_id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """,
+}
+
+# Индексы на партиционированной таблице автоматически создаются в каждой партиции
+_ARCHIVE_INDEXES = (
+    ('ix_publication_queues_archive_object_created', 'publication_queues_archive', ['object_id', 'created_at']),
+    ('ix_publication_queues_archive_status_created', 'publication_queues_archive', ['status', 'created_at']),
+    ('ix_account_publication_queues_archive_object_created', 'account_publication_queues_archive', ['object_id', 'created_at']),
+    ('ix_account_publication_queues_archive_account_created', 'account_publication_queues_archive', ['account_id', 'created_at']),
+    ('ix_account_publication_queues_archive_status_created', 'account_publication_queues_archive', ['status', 'created_at']),
+)
+
+
+def upgrade() -> None:
+    # Check if tables already exist (idempotent migration)
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    for table, ddl in _ARCHIVE_TABLES.items():
+        if table not in tables:
+            op.execute(ddl)
+
+    inspector = inspect(conn)
+    for name, table, columns in _ARCHIVE_INDEXES:
+        indexes = [idx['name'] for idx in inspector.get_indexes(table)]
+        if name not in indexes:
+            op.create_index(name, table, columns)
+
+    # История ссылается на queue_id, который после архивации живёт в архиве:
+    # внешний ключ publication_history -> publication_queues снимаем, колонка остаётся
+    if 'publication_history' in tables:
+        for fk in inspector.get_foreign_keys('publication_history'):
+            if fk.get('referred_table') == 'publication_queues' and fk.get('name'):
+                op.drop_constraint(fk['name'], 'publication_history', type_='foreignkey')
+
+    # Партиции создаёт задача архивации (app/utils/partitioning.py) под фактический диапазон строк
+
+
+def downgrade() -> None:
+    # Check if tables exist before dropping
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    # Возвращаем архивные строки в горячие таблицы, чтобы не потерять историю
+    # (только те, чьи объекты/чаты/аккаунты ещё существуют - у горячих таблиц есть внешние ключи)
+    if 'publication_queues_archive' in tables and 'publication_queues' in tables:
+        op.execute("""
+            INSERT INTO publication_queues (queue_id, object_id, chat_id, account_id, user_id, type, mode,
+                priority, status, scheduled_time, started_at, lease_until, worker_id, completed_at,
+                attempts, error_message, attempt_history_json, message_id, created_at)
+            SELECT queue_id, object_id, chat_id, account_id, user_id, type, mode,
+                priority, status, scheduled_time, started_at, lease_until, worker_id, completed_at,
+                attempts, error_message, attempt_history_json, message_id, created_at
+            FROM publication_queues_archive
+            WHERE object_id IN (SELECT object_id FROM objects)
+              AND chat_id IN (SELECT chat_id FROM chats)
+              AND (account_id IS NULL OR account_id IN (SELECT account_id FROM telegram_accounts))
+              AND (user_id IS NULL OR user_id IN (SELECT user_id FROM users))
+            ON CONFLICT (queue_id) DO NOTHING
+        """)
+    if 'account_publication_queues_archive' in tables and 'account_publication_queues' in tables:
+        op.execute("""
+            INSERT INTO account_publication_queues (queue_id, object_id, chat_id, account_id, user_id,
+                status, scheduled_time, started_at, lease_until, worker_id, completed_at,
+                attempts, error_message, message_id, created_at)
+            SELECT queue_id, object_id, chat_id, account_id, user_id,
+                status, scheduled_time, started_at, lease_until, worker_id, completed_at,
+                attempts, error_message, message_id, created_at
+            FROM account_publication_queues_archive
+            WHERE object_id IN (SELECT object_id FROM objects)
+              AND chat_id IN (SELECT chat_id FROM chats)
+              AND account_id IN (SELECT account_id FROM telegram_accounts)
+              AND (user_id IS NULL OR user_id IN (SELECT user_id FROM users))
+            ON CONFLICT (queue_id) DO NOTHING
+        """)
+
+    for table in _ARCHIVE_TABLES:
+        if table in tables:
+            # DROP родительской таблицы удаляет и все её партиции
+            op.execute(f'DROP TABLE {table}')
+
+    # Внешний ключ восстанавливаем только для строк, у которых очередь существует
+    if 'publication_history' in tables and 'publication_queues' in tables:
+        op.execute("""
+            UPDATE publication_history SET queue_id = NULL
+            WHERE queue_id IS NOT NULL
+              AND queue_id NOT IN (SELECT queue_id FROM publication_queues)
+        """)
+        op.create_foreign_key(
+            'publication_history_queue_id_fkey', 'publication_history',
+            'publication_queues', ['queue_id'], ['queue_id']
+        )
@@ -0,0 +1,48 @@
+"""
+Add attempt_history_json to publication_queues for retry tracking
+
+Revision ID: add_publication_attempt_history
+Revises: add_publication_priority
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_publication_attempt_history'
+down_revision = 'add_publication_priority'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Check if column already exists (idempotent migration)
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    tables = inspector.get_table_names()
+    if 'publication_queues' not in tables:
+        return
+
+    columns = [col['name'] for col in inspector.get_columns('publication_queues')]
+
+    if 'attempt_history_json' not in columns:
+        op.add_column('publication_queues', sa.Column('attempt_history_json', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    # Check if column exists before dropping
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    tables = inspector.get_table_names()
+    if 'publication_queues' not in tables:
+        return
+
+    columns = [col['name'] for col in inspector.get_columns('publication_queues')]
+
+    if 'attempt_history_json' in columns:
+        op.drop_column('publication_queues', 'attempt_history_json')
@@ -0,0 +1,56 @@
+"""
+Add priority lane column to publication_queues
+
+Revision ID: add_publication_priority
+Revises: add_fix_interval_account
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_publication_priority'
+down_revision = 'add_fix_interval_account'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Check if column already exists (idempotent migration)
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    tables = inspector.get_table_names()
+    if 'publication_queues' not in tables:
+        return
+
+    columns = [col['name'] for col in inspector.get_columns('publication_queues')]
+
+    if 'priority' not in columns:
+        op.add_column(
+            'publication_queues',
+            sa.Column('priority', sa.String(length=20), nullable=False, server_default='autopublish')
+        )
+        # Backfill: класс приоритета выводится из режима публикации
+        op.execute("UPDATE publication_queues SET priority = 'interactive' WHERE mode = 'immediate'")
+        op.execute("UPDATE publication_queues SET priority = 'scheduled' WHERE mode = 'scheduled'")
+        op.create_index('ix_publication_queues_priority', 'publication_queues', ['priority'])
+
+
+def downgrade() -> None:
+    # Check if column exists before dropping
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    tables = inspector.get_table_names()
+    if 'publication_queues' not in tables:
+        return
+
+    columns = [col['name'] for col in inspector.get_columns('publication_queues')]
+
+    if 'priority' in columns:
+        op.drop_index('ix_publication_queues_priority', table_name='publication_queues')
+        op.drop_column('publication_queues', 'priority')
@@ -0,0 +1,56 @@
+"""
+Add publication_traces with per-stage publication timings
+
+Revision ID: add_publication_traces
+Revises: add_id_prefixes
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_publication_traces'
+down_revision = 'add_id_prefixes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Check if table already exists (idempotent migration)
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'publication_traces' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'publication_traces',
+        sa.Column('trace_id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('source', sa.String(length=10), nullable=False),
+        sa.Column('queue_id', sa.Integer(), nullable=False),
+        sa.Column('object_id', sa.String(length=50), nullable=True),
+        sa.Column('chat_id', sa.Integer(), nullable=True),
+        sa.Column('account_id', sa.Integer(), nullable=True),
+        sa.Column('priority', sa.String(length=20), nullable=True),
+        sa.Column('outcome', sa.String(length=20), nullable=False),
+        sa.Column('planned_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('total_ms', sa.Integer(), nullable=False),
+        sa.Column('stages_json', sa.JSON(), nullable=False),
+        sa.PrimaryKeyConstraint('trace_id')
+    )
+    op.create_index('ix_publication_traces_finished_at', 'publication_traces', ['finished_at'])
+    op.create_index('ix_publication_traces_source_queue', 'publication_traces', ['source', 'queue_id'])
+
+
+def downgrade() -> None:
+    # Check if table exists before dropping
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'publication_traces' in inspector.get_table_names():
+        op.drop_table('publication_traces')
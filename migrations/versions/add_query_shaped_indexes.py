@@ -0,0 +1,80 @@
+"""
+Add query-shaped composite and partial indexes for queue and history tables
+
+Revision ID: add_query_shaped_indexes
+Revises: add_queue_leases
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_query_shaped_indexes'
+down_revision = 'add_queue_leases'
+branch_labels = None
+depends_on = None
+
+# (имя индекса, таблица, колонки, условие частичного индекса)
+# Должно совпадать с __table_args__ моделей PublicationQueue, AccountPublicationQueue, PublicationHistory
+_INDEXES = (
+    ('ix_publication_queues_pending_dispatch', 'publication_queues',
+     ['priority', 'scheduled_time', 'created_at'], "status = 'pending'"),
+    ('ix_account_publication_queues_pending_account', 'account_publication_queues',
+     ['account_id', 'scheduled_time'], "status = 'pending'"),
+    ('ix_account_publication_queues_pending_scheduled', 'account_publication_queues',
+     ['scheduled_time'], "status = 'pending'"),
+    ('ix_publication_history_account_published', 'publication_history',
+     ['account_id', 'published_at'], None),
+)
+
+
+def upgrade() -> None:
+    # Check if indexes already exist (idempotent migration)
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    pending = []
+    for name, table, columns, where in _INDEXES:
+        if table not in tables:
+            continue
+        indexes = [idx['name'] for idx in inspector.get_indexes(table)]
+        if name not in indexes:
+            pending.append((name, table, columns, where))
+
+    if not pending:
+        return
+
+    # Очереди пишутся непрерывно: строим индексы CONCURRENTLY, без блокировки записи.
+    # CREATE INDEX CONCURRENTLY нельзя выполнять в транзакции - отсюда autocommit_block
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in pending:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    # Check if indexes exist before dropping
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    existing = []
+    for name, table, columns, where in _INDEXES:
+        if table not in tables:
+            continue
+        indexes = [idx['name'] for idx in inspector.get_indexes(table)]
+        if name in indexes:
+            existing.append((name, table))
+
+    with op.get_context().autocommit_block():
+        for name, table in existing:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
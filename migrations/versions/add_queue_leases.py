@@ -0,0 +1,74 @@
+"""
+Add lease_until / worker_id to publication queues (lease-based visibility timeout)
+
+Revision ID: add_queue_leases
+Revises: add_publication_attempt_history
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_queue_leases'
+down_revision = 'add_publication_attempt_history'
+branch_labels = None
+depends_on = None
+
+_QUEUE_TABLES = ('publication_queues', 'account_publication_queues')
+
+
+def upgrade() -> None:
+    # Check if columns already exist (idempotent migration)
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    for table in _QUEUE_TABLES:
+        if table not in tables:
+            continue
+
+        columns = [col['name'] for col in inspector.get_columns(table)]
+
+        if 'lease_until' not in columns:
+            op.add_column(table, sa.Column('lease_until', sa.DateTime(), nullable=True))
+
+        if 'worker_id' not in columns:
+            op.add_column(table, sa.Column('worker_id', sa.String(length=100), nullable=True))
+
+        # Reaper ищет только processing-строки с истекшей арендой - частичный индекс маленький
+        indexes = [idx['name'] for idx in inspector.get_indexes(table)]
+        index_name = f'ix_{table}_processing_lease_until'
+        if index_name not in indexes:
+            op.create_index(
+                index_name,
+                table,
+                ['lease_until'],
+                postgresql_where=sa.text("status = 'processing'")
+            )
+
+
+def downgrade() -> None:
+    # Check if columns exist before dropping
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    for table in _QUEUE_TABLES:
+        if table not in tables:
+            continue
+
+        indexes = [idx['name'] for idx in inspector.get_indexes(table)]
+        index_name = f'ix_{table}_processing_lease_until'
+        if index_name in indexes:
+            op.drop_index(index_name, table_name=table)
+
+        columns = [col['name'] for col in inspector.get_columns(table)]
+
+        if 'worker_id' in columns:
+            op.drop_column(table, 'worker_id')
+
+        if 'lease_until' in columns:
+            op.drop_column(table, 'lease_until')
@@ -0,0 +1,182 @@
+"""
+Convert publication_history to monthly range partitions with BRIN index
+
+Revision ID: partition_publication_history
+Revises: add_publication_queue_archives
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'partition_publication_history'
+down_revision = 'add_publication_queue_archives'
+branch_labels = None
+depends_on = None
+
+# Сколько месяцев вперёд создаём партиции при миграции (дальше их ведёт
+# задача ensure_publication_history_partitions)
+_MONTHS_AHEAD = 3
+
+_COLUMNS = (
+    'history_id, queue_id, object_id, chat_id, account_id, published_at, '
+    'message_id, deleted, deleted_at, created_at'
+)
+
+_PARTITIONED_DDL = """
+    CREATE TABLE {table} (
+        history_id INTEGER NOT NULL DEFAULT nextval('{sequence}'::regclass),
+        queue_id INTEGER,
+        object_id VARCHAR(50) NOT NULL,
+        chat_id INTEGER NOT NULL,
+        account_id INTEGER,
+        published_at TIMESTAMP NOT NULL,
+        message_id VARCHAR(50),
+        deleted BOOLEAN NOT NULL DEFAULT false,
+        deleted_at TIMESTAMP,
+        created_at TIMESTAMP NOT NULL
+    ) PARTITION BY RANGE (published_at)
+"""
+
+_PLAIN_DDL = """
+    CREATE TABLE {table} (
+        history_id INTEGER NOT NULL DEFAULT nextval('{sequence}'::regclass),
+        queue_id INTEGER,
+        object_id VARCHAR(50) NOT NULL,
+        chat_id INTEGER NOT NULL,
+        account_id INTEGER,
+        published_at TIMESTAMP NOT NULL,
+        message_id VARCHAR(50),
+        deleted BOOLEAN NOT NULL DEFAULT false,
+        deleted_at TIMESTAMP,
+        created_at TIMESTAMP NOT NULL
+    )
+"""
+
+
+def _add_months(value, months):
+    index = value.year * 12 + (value.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _is_partitioned(conn):
+    relkind = conn.execute(sa.text(
+        "SELECT relkind FROM pg_class WHERE relname = 'publication_history' AND relkind IN ('r', 'p')"
+    )).scalar()
+    return relkind == 'p'
+
+
+def _history_sequence(conn):
+    sequence = conn.execute(sa.text(
+        "SELECT pg_get_serial_sequence('publication_history', 'history_id')"
+    )).scalar()
+    if not sequence:
+        # Таблица без serial (создана вручную) - заводим собственную последовательность
+        op.execute("CREATE SEQUENCE IF NOT EXISTS publication_history_history_id_seq")
+        op.execute(
+            "SELECT setval('publication_history_history_id_seq', "
+            "COALESCE((SELECT MAX(history_id) FROM publication_history), 0) + 1, false)"
+        )
+        sequence = 'publication_history_history_id_seq'
+    return sequence
+
+
+def _add_constraints_and_indexes(partitioned):
+    """PK, внешние ключи и индексы новой таблицы (после удаления старой - имена свободны)"""
+    if partitioned:
+        # Ключ партиционирования обязан входить в первичный ключ
+        op.execute("ALTER TABLE publication_history ADD CONSTRAINT publication_history_pkey PRIMARY KEY (history_id, published_at)")
+    else:
+        op.execute("ALTER TABLE publication_history ADD CONSTRAINT publication_history_pkey PRIMARY KEY (history_id)")
+
+    op.create_foreign_key('publication_history_object_id_fkey', 'publication_history', 'objects', ['object_id'], ['object_id'])
+    op.create_foreign_key('publication_history_chat_id_fkey', 'publication_history', 'chats', ['chat_id'], ['chat_id'])
+    op.create_foreign_key('publication_history_account_id_fkey', 'publication_history', 'telegram_accounts', ['account_id'], ['account_id'])
+
+    # На партиционированной таблице индексы создаются в каждой партиции автоматически
+    op.create_index('ix_publication_history_queue_id', 'publication_history', ['queue_id'])
+    op.create_index('ix_publication_history_chat_id', 'publication_history', ['chat_id'])
+    op.create_index('ix_publication_history_account_published', 'publication_history', ['account_id', 'published_at'])
+    if partitioned:
+        op.create_index('ix_publication_history_object_chat_published', 'publication_history',
+                        ['object_id', 'chat_id', 'published_at'])
+        op.create_index('ix_publication_history_published_at_brin', 'publication_history',
+                        ['published_at'], postgresql_using='brin')
+    else:
+        op.create_index('ix_publication_history_object_id', 'publication_history', ['object_id'])
+        op.create_index('ix_publication_history_published_at', 'publication_history', ['published_at'])
+
+
+def upgrade() -> None:
+    # Check if table exists and is not partitioned yet (idempotent migration)
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'publication_history' not in inspector.get_table_names():
+        return
+    if _is_partitioned(conn):
+        return
+
+    sequence = _history_sequence(conn)
+
+    # Партиции покрывают все существующие данные и _MONTHS_AHEAD месяцев вперёд
+    now = datetime.utcnow()
+    oldest = conn.execute(sa.text("SELECT MIN(published_at) FROM publication_history")).scalar() or now
+    month = _add_months(oldest, 0)
+    last = _add_months(now, _MONTHS_AHEAD)
+
+    op.execute(_PARTITIONED_DDL.format(table='publication_history_partitioned', sequence=sequence))
+    while month <= last:
+        next_month = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE publication_history_y{month.year:04d}m{month.month:02d} "
+            f"PARTITION OF publication_history_partitioned "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+        )
+        month = next_month
+
+    # Перенос данных в рамках транзакции миграции; строки сами разложатся по партициям
+    op.execute(
+        f"INSERT INTO publication_history_partitioned ({_COLUMNS}) "
+        f"SELECT {_COLUMNS} FROM publication_history"
+    )
+
+    # Последовательность принадлежит старой колонке - отвязываем, иначе DROP TABLE удалит её
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    op.execute("DROP TABLE publication_history")
+    op.execute("ALTER TABLE publication_history_partitioned RENAME TO publication_history")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY publication_history.history_id")
+
+    _add_constraints_and_indexes(partitioned=True)
+    op.execute("ANALYZE publication_history")
+
+
+def downgrade() -> None:
+    # Check if table is partitioned before converting back
+    from sqlalchemy import inspect
+    conn = op.get_bind()
+    inspector = inspect(conn)
+
+    if 'publication_history' not in inspector.get_table_names():
+        return
+    if not _is_partitioned(conn):
+        return
+
+    sequence = _history_sequence(conn)
+
+    op.execute(_PLAIN_DDL.format(table='publication_history_plain', sequence=sequence))
+    op.execute(
+        f"INSERT INTO publication_history_plain ({_COLUMNS}) "
+        f"SELECT {_COLUMNS} FROM publication_history"
+    )
+
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    # DROP партиционированной таблицы удаляет и все партиции
+    op.execute("DROP TABLE publication_history")
+    op.execute("ALTER TABLE publication_history_plain RENAME TO publication_history")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY publication_history.history_id")
+
+    _add_constraints_and_indexes(partitioned=False)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Проверка планов горячих запросов очередей и истории публикаций (регрессия индексов)
+
+Скрипт в одной транзакции создаёт временные копии таблиц publication_queues,
+account_publication_queues и publication_history (TEMP-таблицы перекрывают
+основные по search_path), заполняет их реалистичными объёмами, строит те же
+индексы, что описаны в моделях, и проверяет через EXPLAIN, что каждый запрос
+диспетчеров использует предназначенный для него индекс. В конце транзакция
+откатывается - рабочие данные не затрагиваются.
+
+Использование в Docker:
+docker exec -it realty_web python scripts/check_query_plans.py [--rows 200000]
+
+Код возврата 1, если хотя бы один запрос не использует ожидаемый индекс.
+"""
+import sys
+import os
+import argparse
+from datetime import datetime, timedelta
+
+# Добавляем корневую директорию проекта в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app import app
+from app.database import db
+from app.models.publication_queue import PublicationQueue
+from app.models.account_publication_queue import AccountPublicationQueue
+from app.models.publication_history import PublicationHistory
+from app.utils.publication_priority import PRIORITY_ORDER
+from workers.tasks.tasks_publication import due_publications_query
+
+_MODELS = (PublicationQueue, AccountPublicationQueue, PublicationHistory)
+
+# Доли строк подобраны под продовую картину: очередь - в основном завершённые задачи,
+# pending - малая часть; у истории примерно вдвое больше строк, чем у очереди
+_SEED_SQL = (
+    """
+    INSERT INTO publication_queues (queue_id, object_id, chat_id, type, mode, priority, status,
+                                    scheduled_time, created_at, attempts)
+    SELECT g,
+           'OBJ' || (g % 5000),
+           g % 2000,
+           'bot',
+           CASE WHEN g % 20 = 0 THEN 'immediate' WHEN g % 20 < 4 THEN 'scheduled' ELSE 'autopublish' END,
+           CASE WHEN g % 20 = 0 THEN 'interactive' WHEN g % 20 < 4 THEN 'scheduled' ELSE 'autopublish' END,
+           CASE WHEN g % 50 = 0 THEN 'pending' WHEN g % 50 = 1 THEN 'failed' ELSE 'completed' END,
+           CAST(:now AS timestamp) - (g % 43200) * INTERVAL '1 minute' + INTERVAL '1 day',
+           CAST(:now AS timestamp) - (g % 43200) * INTERVAL '1 minute',
+           0
+    FROM generate_series(1, :rows) AS g
+    """,
+    """
+    INSERT INTO account_publication_queues (queue_id, object_id, chat_id, account_id, status,
+                                            scheduled_time, created_at, attempts)
+    SELECT g,
+           'OBJ' || (g % 5000),
+           g % 2000,
+           g % 100,
+           CASE WHEN g % 20 = 0 THEN 'pending' WHEN g % 20 = 1 THEN 'failed' ELSE 'completed' END,
+           CAST(:now AS timestamp) - (g % 43200) * INTERVAL '1 minute' + INTERVAL '1 day',
+           CAST(:now AS timestamp) - (g % 43200) * INTERVAL '1 minute',
+           0
+    FROM generate_series(1, :rows) AS g
+    """,
+    """
+    INSERT INTO publication_history (history_id, object_id, chat_id, account_id, published_at,
+                                     deleted, created_at)
+    SELECT g,
+           'OBJ' || (g % 5000),
+           g % 2000,
+           CASE WHEN g % 10 = 0 THEN NULL ELSE g % 100 END,
+           CAST(:now AS timestamp) - (g % 129600) * INTERVAL '1 minute',
+           g % 30 = 0,
+           CAST(:now AS timestamp) - (g % 129600) * INTERVAL '1 minute'
+    FROM generate_series(1, :rows * 2) AS g
+    """,
+)
+
+
+def _build_checks(session, now):
+    """(описание, запрос, ожидаемый индекс) - запросы повторяют продовые"""
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    checks = []
+
+    for priority in PRIORITY_ORDER:
+        checks.append((
+            f'dispatch_due_publications [{priority}]',
+            due_publications_query(session, priority, now),
+            'ix_publication_queues_pending_dispatch',
+        ))
+
+    # process_account_autopublish: задачи аккаунта, готовые к публикации
+    checks.append((
+        'process_account_autopublish: задачи аккаунта',
+        session.query(AccountPublicationQueue).filter(
+            AccountPublicationQueue.account_id == 7,
+            AccountPublicationQueue.status == 'pending',
+            AccountPublicationQueue.scheduled_time <= now
+        ).order_by(AccountPublicationQueue.scheduled_time.asc()).limit(10),
+        'ix_account_publication_queues_pending_account',
+    ))
+
+    # process_account_autopublish: общее число готовых задач
+    checks.append((
+        'process_account_autopublish: счётчик готовых задач',
+        session.query(func.count(AccountPublicationQueue.queue_id)).filter(
+            AccountPublicationQueue.status == 'pending',
+            AccountPublicationQueue.scheduled_time <= now
+        ),
+        'ix_account_publication_queues_pending_scheduled',
+    ))
+
+    # Проверка дневного лимита аккаунта
+    checks.append((
+        'дневной лимит аккаунта (publication_history)',
+        session.query(func.count(PublicationHistory.history_id)).filter(
+            PublicationHistory.account_id == 7,
+            PublicationHistory.published_at >= today_start,
+            PublicationHistory.deleted == False
+        ),
+        'ix_publication_history_account_published',
+    ))
+
+    # Проверка дубликатов (app/utils/duplicate_checker.py)
+    checks.append((
+        'проверка дубликатов (publication_history)',
+        session.query(PublicationHistory).filter(
+            PublicationHistory.object_id == 'OBJ7',
+            PublicationHistory.chat_id == 7,
+            PublicationHistory.published_at >= now - timedelta(days=1),
+            PublicationHistory.deleted == False
+        ),
+        'ix_publication_history_object_chat_published',
+    ))
+
+    return checks
+
+
+def _plan_indexes(plan_node, found=None):
+    """Собрать имена всех индексов, которые использует план (Index/Index Only/Bitmap Index Scan)"""
+    found = found if found is not None else set()
+    if 'Index Name' in plan_node:
+        found.add(plan_node['Index Name'])
+    for child in plan_node.get('Plans', []):
+        _plan_indexes(child, found)
+    return found
+
+
+def _explain(connection, query):
+    """EXPLAIN (FORMAT JSON) для ORM-запроса; возвращает корневой узел плана"""
+    compiled = query.statement.compile(dialect=connection.dialect)
+    result = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params)
+    return result.scalar()[0]['Plan']
+
+
+def check_query_plans(rows: int) -> bool:
+    """Засеять временные таблицы и проверить планы; True, если все проверки прошли"""
+    with app.app_context():
+        print("=" * 80)
+        print("ПРОВЕРКА ПЛАНОВ ЗАПРОСОВ ОЧЕРЕДЕЙ И ИСТОРИИ ПУБЛИКАЦИЙ")
+        print("=" * 80)
+        print()
+
+        now = datetime.utcnow()
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        try:
+            # TEMP-таблицы с теми же именами перекрывают основные: запросы ниже
+            # компилируются как в проде, но читают засеянные данные
+            for model in _MODELS:
+                table = model.__tablename__
+                connection.execute(text(
+                    f'CREATE TEMP TABLE {table} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP'
+                ))
+
+            print(f"Заполнение временных таблиц ({rows} строк очередей, {rows * 2} строк истории)...")
+            for seed_sql in _SEED_SQL:
+                connection.execute(text(seed_sql), {'now': now, 'rows': rows})
+
+            # Все индексы моделей (включая одиночные index=True): планировщик должен
+            # выбрать нужный индекс среди конкурентов, как в рабочей базе
+            for model in _MODELS:
+                for index in model.__table__.indexes:
+                    index.create(bind=connection)
+                connection.execute(text(f'ANALYZE {model.__tablename__}'))
+            print()
+
+            session = Session(bind=connection)
+            failures = 0
+            for title, query, expected_index in _build_checks(session, now):
+                plan = _explain(connection, query)
+                used = _plan_indexes(plan)
+                if expected_index in used:
+                    print(f"✅ {title}: {expected_index}")
+                else:
+                    failures += 1
+                    print(f"❌ {title}: ожидался {expected_index}, план использует {sorted(used) or 'Seq Scan'}")
+                    print(f"    Узел плана: {plan.get('Node Type')}, стоимость {plan.get('Total Cost')}")
+            session.close()
+        finally:
+            transaction.rollback()
+            connection.close()
+
+        print()
+        print("=" * 80)
+        print(f"Результат: {'все планы используют ожидаемые индексы' if not failures else f'ошибок: {failures}'}")
+        print("=" * 80)
+        return failures == 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Проверка планов горячих запросов (EXPLAIN)')
+    parser.add_argument('--rows', type=int, default=200000, help='Строк в каждой очереди (истории - вдвое больше)')
+    args = parser.parse_args()
+
+    sys.exit(0 if check_query_plans(args.rows) else 1)
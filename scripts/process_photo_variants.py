@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Построение вариантов фото для уже существующих объектов.
+
+Находит объекты, у которых есть фото без вариантов (загружены до появления обработки
+или брокер был недоступен при загрузке), и ставит для них задачу process_object_photos
+в Celery. С --inline обрабатывает прямо в этом процессе (без воркеров).
+
+Использование:
+docker exec -it realty_web python scripts/process_photo_variants.py [--inline] [--limit N]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import app
+from app.database import db
+from app.models.object import Object
+from app.utils.photos import needs_processing, process_object_photos
+
+BATCH_SIZE = 500
+
+
+def iter_pending_object_ids(limit: int = None):
+    """object_id объектов с необработанными фото (keyset-проход по object_id)"""
+    last_id = ''
+    found = 0
+    while True:
+        rows = (
+            db.session.query(Object.object_id, Object.photos_json)
+            .filter(Object.object_id > last_id)
+            .order_by(Object.object_id)
+            .limit(BATCH_SIZE)
+            .all()
+        )
+        if not rows:
+            return
+        for object_id, photos in rows:
+            if any(needs_processing(entry) for entry in photos or []):
+                yield object_id
+                found += 1
+                if limit and found >= limit:
+                    return
+        last_id = rows[-1].object_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Построение вариантов фото существующих объектов")
+    parser.add_argument("--inline", action="store_true", help="обработать в этом процессе, без Celery")
+    parser.add_argument("--limit", type=int, default=None, help="не больше N объектов")
+    args = parser.parse_args()
+
+    with app.app_context():
+        object_ids = list(iter_pending_object_ids(args.limit))
+        db.session.rollback()
+        print(f"Объектов с необработанными фото: {len(object_ids)}")
+
+        if args.inline:
+            updated = 0
+            for index, object_id in enumerate(object_ids, 1):
+                updated += process_object_photos(db.session, object_id)
+                if index % 50 == 0:
+                    print(f"  обработано объектов: {index}/{len(object_ids)}")
+            print(f"Готово: обновлено фото {updated}")
+        else:
+            from workers.tasks.tasks_media import enqueue_photo_processing
+            for object_id in object_ids:
+                enqueue_photo_processing(object_id)
+            print(f"Поставлено задач process_object_photos: {len(object_ids)}")
+
+
+if __name__ == "__main__":
+    main()
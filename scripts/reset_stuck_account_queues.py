@@ -7,7 +7,7 @@ docker exec -it realty_web python scripts/reset_stuck_account_queues.py
 """
 import sys
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 
 # Добавляем корневую директорию проекта в путь
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -15,6 +15,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from app import app
 from app.database import db
 from app.models.account_publication_queue import AccountPublicationQueue
+from app.utils.queue_leases import expired_lease_filter, reap_expired_leases
 
 def reset_stuck_queues():
     """Сброс застрявших задач в статусе 'processing'"""
@@ -26,16 +27,14 @@ def reset_stuck_queues():
         print()
         
         now = datetime.utcnow()
-        stuck_threshold = now - timedelta(minutes=5)
         
         print(f"Текущее время UTC: {now}")
-        print(f"Порог для застрявших задач: {stuck_threshold} (более 5 минут)")
+        print("Застрявшие задачи: статус 'processing' с истекшей арендой (lease_until)")
         print()
         
         # Находим застрявшие задачи
         stuck_queues = db.session.query(AccountPublicationQueue).filter(
-            AccountPublicationQueue.status == 'processing',
-            AccountPublicationQueue.started_at < stuck_threshold
+            expired_lease_filter(AccountPublicationQueue, now)
         ).all()
         
         print(f"Найдено застрявших задач: {len(stuck_queues)}")
@@ -52,6 +51,7 @@ def reset_stuck_queues():
             print(f"    Аккаунт: {q.account_id}")
             print(f"    Чат: {q.chat_id}")
             print(f"    Начато: {q.started_at}")
+            print(f"    Аренда до: {q.lease_until} (воркер: {q.worker_id})")
             print(f"    Прошло времени: {now - q.started_at}")
             print(f"    Попыток: {q.attempts}")
             print()
@@ -62,25 +62,18 @@ def reset_stuck_queues():
             print("Отменено.")
             return
         
-        # Сбрасываем задачи
-        reset_count = 0
-        failed_count = 0
+        # Сбрасываем задачи одним UPDATE (тот же reaper, что и в Celery-задачах)
+        try:
+            rows = reap_expired_leases(db.session, AccountPublicationQueue)
+        except Exception as e:
+            print(f"❌ Ошибка при сбросе задач: {e}")
+            db.session.rollback()
+            return
         
-        for stuck_queue in stuck_queues:
-            try:
-                stuck_queue.status = 'pending'
-                stuck_queue.attempts += 1
-                if stuck_queue.attempts >= 3:
-                    stuck_queue.status = 'failed'
-                    stuck_queue.error_message = 'Task timeout - exceeded soft time limit'
-                    failed_count += 1
-                else:
-                    reset_count += 1
-                db.session.commit()
-                print(f"✅ Queue {stuck_queue.queue_id}: {'сброшена' if reset_count > 0 else 'помечена как failed'}")
-            except Exception as e:
-                print(f"❌ Ошибка при сбросе queue {stuck_queue.queue_id}: {e}")
-                db.session.rollback()
+        failed_count = sum(1 for row in rows if row.status == 'failed')
+        reset_count = len(rows) - failed_count
+        for row in rows:
+            print(f"✅ Queue {row.queue_id}: {'сброшена' if row.status == 'pending' else 'помечена как failed'}")
         
         print()
         print("=" * 80)
@@ -3,8 +3,11 @@ Celery application configuration
 """
 from celery import Celery
 from celery.schedules import crontab
+from kombu import Queue
 import os
 
+from app.utils.publication_priority import DISPATCH_CELERY_QUEUE, PRIORITY_CELERY_QUEUES, PRIORITY_AUTOPUBLISH
+
 # Redis URL for Celery
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
@@ -25,6 +28,21 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=300,  # 5 minutes
     task_soft_time_limit=240,  # 4 minutes
+    # Priority lanes: у каждого класса публикаций своя очередь и свои воркеры,
+    # диспетчер срочных классов - в очереди срочного воркера, служебные задачи
+    # (автопубликация аккаунтов, подписки, архив) - в очереди по умолчанию 'celery'
+    task_default_queue='celery',
+    task_queues=(
+        [Queue('celery'), Queue(DISPATCH_CELERY_QUEUE)]
+        + [Queue(name) for name in PRIORITY_CELERY_QUEUES.values()]
+    ),
+    task_routes={
+        # Класс по умолчанию; ручные и запланированные публикации передают queue явно
+        'workers.tasks.publish_to_telegram': {'queue': PRIORITY_CELERY_QUEUES[PRIORITY_AUTOPUBLISH]},
+        'workers.tasks.process_scheduled_publications': {'queue': DISPATCH_CELERY_QUEUE},
+    },
+    # Не резервируем пачки задач на воркер: иначе срочная задача ждёт за чужим prefetch
+    worker_prefetch_multiplier=1,
     beat_schedule={
         'process-scheduled-publications-every-minute': {
             'task': 'workers.tasks.process_scheduled_publications',
@@ -48,9 +66,75 @@ celery_app.conf.update(
             'task': 'workers.tasks.process_account_autopublish',
             'schedule': 60.0,
         },
+        # Перенос завершённых строк очередей в архив (каждые 15 минут)
+        'archive-finished-publication-queues': {
+            'task': 'workers.tasks.archive_finished_publication_queues',
+            'schedule': crontab(minute='*/15'),
+        },
+        # Месячные партиции publication_history на несколько месяцев вперёд (ежедневно)
+        'ensure-publication-history-partitions-daily': {
+            'task': 'workers.tasks.ensure_publication_history_partitions',
+            'schedule': crontab(minute=30, hour=0),
+        },
+        # Прогрев журнала недавних публикаций в Redis (no-op, если журнал уже прогрет)
+        'warm-publication-ledger-every-10-minutes': {
+            'task': 'workers.tasks.warm_publication_ledger',
+            'schedule': crontab(minute='*/10'),
+        },
+        # Инкрементальная индексация файлов логов для запросов по времени/queue/object/user
+        'index-log-files-every-minute': {
+            'task': 'workers.tasks.index_log_files',
+            'schedule': 60.0,
+        },
+        # Удаление трасс публикаций старше PUBLICATION_TRACE_RETENTION_DAYS (ежедневно)
+        'purge-publication-traces-daily': {
+            'task': 'workers.tasks.purge_publication_traces',
+            'schedule': crontab(minute=45, hour=0),
+        },
+        # Сборка мусора в хранилище фото: файлы без ссылок старше PHOTO_GC_GRACE_HOURS (ежедневно)
+        'collect-photo-garbage-daily': {
+            'task': 'workers.tasks.collect_photo_garbage',
+            'schedule': crontab(minute=30, hour=3),
+        },
     },
 )
 
 # Import tasks
 from workers import tasks
 
+
+# Метрики Prometheus (app/utils/metrics.py): задачи выполняются в дочерних процессах prefork,
+# значения складываются в PROMETHEUS_MULTIPROC_DIR, главный процесс отдаёт их на METRICS_PORT
+from celery.signals import task_prerun, task_postrun, worker_init, worker_process_shutdown
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    from app.config import Config
+    from app.utils.metrics import prepare_multiprocess_dir, start_worker_metrics_server
+    prepare_multiprocess_dir()
+    try:
+        start_worker_metrics_server(Config.METRICS_PORT)
+    except OSError as e:
+        # Второй воркер на том же хосте (локальный запуск) - метрики отдаёт первый
+        import logging
+        logging.getLogger(__name__).warning(f"Celery metrics server not started: {e}")
+
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid=None, **kwargs):
+    from app.utils.metrics import mark_process_dead
+    mark_process_dead(pid or os.getpid())
+
+
+@task_prerun.connect
+def observe_task_start(task_id=None, **kwargs):
+    from app.utils.metrics import task_started
+    task_started(task_id)
+
+
+@task_postrun.connect
+def observe_task_finish(task_id=None, task=None, state=None, **kwargs):
+    from app.utils.metrics import task_finished
+    task_finished(task_id, getattr(task, 'name', None), state)
+
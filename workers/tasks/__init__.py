@@ -8,6 +8,8 @@ from workers.tasks.tasks_autopublish import process_autopublish, schedule_daily_
 from workers.tasks.tasks_scheduled import process_scheduled_publications
 from workers.tasks.tasks_chat_subscriptions import process_chat_subscriptions, subscribe_to_chats_task
 from workers.tasks.tasks_account_autopublish import process_account_autopublish
+from workers.tasks.tasks_maintenance import archive_finished_publication_queues, ensure_publication_history_partitions, warm_publication_ledger, index_log_files, purge_publication_traces
+from workers.tasks.tasks_media import process_object_photos, collect_photo_garbage
 
 __all__ = [
     'publish_to_telegram',
@@ -18,5 +20,12 @@ __all__ = [
     'process_chat_subscriptions',
     'subscribe_to_chats_task',
     'process_account_autopublish',
+    'archive_finished_publication_queues',
+    'ensure_publication_history_partitions',
+    'warm_publication_ledger',
+    'index_log_files',
+    'purge_publication_traces',
+    'process_object_photos',
+    'collect_photo_garbage',
 ]
 
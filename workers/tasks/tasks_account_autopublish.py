@@ -27,9 +27,42 @@ from app.models.chat_group import ChatGroup as AppChatGroup
 from app.models.telegram_account_chat import TelegramAccountChat as AppTelegramAccountChat
 from app.models.telegram_account import TelegramAccount as AppTelegramAccount
 from app.utils.account_publication_utils import calculate_scheduled_times_for_account
+from app.utils.publication_retry import has_retry_budget
+from app.utils.queue_leases import (
+    LeaseHeartbeat,
+    claim_values,
+    reap_expired_leases,
+    release_worker_leases
+)
+from app.utils.metrics import observe_dispatch_lag
+from app.utils.publication_trace import SOURCE_ACCOUNT, finish_trace, start_trace
 
 logger = logging.getLogger(__name__)
 
+# Пауза перед повтором неудачной отправки через аккаунт
+ACCOUNT_RETRY_DELAY = timedelta(minutes=5)
+
+
+def _register_failed_attempt(queue, error_message: str, retry: bool = True) -> bool:
+    """
+    Засчитать неудачную попытку строки account_publication_queues и снять аренду.
+    Единственное место, где растёт attempts при обработке (попытку упавшего воркера
+    засчитывает reap_expired_leases); бюджет общий - PUBLICATION_RETRY_MAX_ATTEMPTS.
+    Возвращает True, если строка перенесена на повтор.
+    """
+    queue.attempts = (queue.attempts or 0) + 1
+    queue.error_message = error_message
+    queue.lease_until = None
+    retried = retry and has_retry_budget(queue.attempts)
+    if retried:
+        queue.status = 'pending'
+        queue.scheduled_time = datetime.utcnow() + ACCOUNT_RETRY_DELAY
+    else:
+        queue.status = 'failed'
+    app_db.session.commit()
+    return retried
+
+
 @celery_app.task(name='workers.tasks.process_account_autopublish')
 def process_account_autopublish():
     """
@@ -59,6 +92,13 @@ def process_account_autopublish():
                 now = datetime.utcnow()
                 logger.info(f"process_account_autopublish: Current time UTC: {now}")
                 
+                # Строки, брошенные упавшим воркером (истекла аренда), возвращаем одним UPDATE
+                try:
+                    reap_expired_leases(app_db.session, AccountPublicationQueue)
+                except Exception as reap_error:
+                    app_db.session.rollback()
+                    logger.error(f"Error reaping expired account queue leases: {reap_error}", exc_info=True)
+                
                 # Получаем настройку проверки дубликатов
                 # Используем SystemSetting.query напрямую, так как мы уже в app_context
                 duplicates_setting = SystemSetting.query.filter_by(key='allow_duplicates').first()
@@ -118,13 +158,25 @@ def process_account_autopublish():
                         work_items.append((account, queue))
                 
                 for account, queue in work_items:
+                    # Трасса этапов строки; send_object_message отмечает rate_limit_wait/connect/upload/api_call
+                    trace = start_trace(SOURCE_ACCOUNT, queue.queue_id)
                     try:
                         logger.info(f"Starting publication for queue {queue.queue_id}: object {queue.object_id} to chat {queue.chat_id} via account {account.account_id}")
-                        # Обновляем статус
-                        queue.status = 'processing'
-                        queue.started_at = datetime.utcnow()
-                        queue.attempts += 1
+                        # Атомарно забираем строку и берём аренду на этот воркер: строки загружены
+                        # заранее, и пересекающийся запуск beat мог уже забрать их
+                        claimed = app_db.session.query(AccountPublicationQueue).filter(
+                            AccountPublicationQueue.queue_id == queue.queue_id,
+                            AccountPublicationQueue.status == 'pending'
+                        ).update(claim_values(), synchronize_session=False)
                         app_db.session.commit()
+                        if not claimed:
+                            logger.info(f"Account queue {queue.queue_id} already taken by another worker, skipping")
+                            trace.discard()
+                            continue
+                        app_db.session.refresh(queue)
+                        observe_dispatch_lag('account', queue.scheduled_time, queue.started_at)
+                        trace.set_planned(queue.scheduled_time)
+                        trace.mark('claim')
                         
                         # Получаем объект и чат
                         obj = app_db.session.query(AppObject).get(queue.object_id)
@@ -133,6 +185,7 @@ def process_account_autopublish():
                         if not obj or not chat:
                             queue.status = 'failed'
                             queue.error_message = 'Object or chat not found'
+                            queue.lease_until = None
                             app_db.session.commit()
                             continue
                         
@@ -146,6 +199,7 @@ def process_account_autopublish():
                             logger.warning(f"Autopublish disabled for object {queue.object_id}, cancelling account queue {queue.queue_id}")
                             queue.status = 'failed'
                             queue.error_message = 'Autopublish disabled for this object'
+                            queue.lease_until = None
                             app_db.session.commit()
                             continue
                         
@@ -166,6 +220,7 @@ def process_account_autopublish():
                                     logger.warning(f"Account {queue.account_id} or chat {queue.chat_id} not in autopublish config for object {queue.object_id}, cancelling queue {queue.queue_id}")
                                     queue.status = 'failed'
                                     queue.error_message = 'Account or chat not in autopublish config'
+                                    queue.lease_until = None
                                     app_db.session.commit()
                                     continue
                         
@@ -177,6 +232,7 @@ def process_account_autopublish():
                             # Откладываем задачу на следующую минуту
                             queue.status = 'pending'
                             queue.scheduled_time = datetime.utcnow() + timedelta(minutes=1)
+                            queue.lease_until = None
                             app_db.session.commit()
                             continue
                         
@@ -225,19 +281,24 @@ def process_account_autopublish():
                             if isinstance(accounts_cfg, dict):
                                 publication_format = accounts_cfg.get('publication_format', 'default')
                         
+                        trace.mark('db_load')
+                        
                         # Форматируем текст публикации
                         publication_text = format_publication_text(bot_obj, bot_user, is_preview=False, publication_format=publication_format)
+                        trace.mark('render')
                         
                         # Отправляем через Telethon
+                        # Отправка может ждать rate limiter/переподключение дольше аренды - продлеваем её heartbeat'ом
                         try:
-                            success, error_msg, message_id = run_async(
-                                send_object_message(
-                                    account.phone,
-                                    chat.telegram_chat_id,
-                                    publication_text,
-                                    obj.photos_json or []
+                            with LeaseHeartbeat(app_db.engine, AccountPublicationQueue, queue.queue_id):
+                                success, error_msg, message_id = run_async(
+                                    send_object_message(
+                                        account.phone,
+                                        chat.telegram_chat_id,
+                                        publication_text,
+                                        obj.photos_json or []
+                                    )
                                 )
-                            )
                         except Exception as send_error:
                             # Проверяем, не FloodWait ли это
                             error_str = str(send_error)
@@ -261,6 +322,7 @@ def process_account_autopublish():
                                 account.last_error = f"FLOOD_WAIT: {wait_seconds} seconds. Account deactivated. Please reactivate manually."
                                 queue.status = 'flood_wait'
                                 queue.error_message = f"FLOOD_WAIT: {wait_seconds} seconds"
+                                queue.lease_until = None
                                 app_db.session.commit()
                                 # Записываем ошибку
                                 from app.utils.logger import log_error
@@ -278,12 +340,8 @@ def process_account_autopublish():
                                 processed_count += 1
                                 continue
                             logger.error(f"Exception in send_object_message for account {account.account_id}: {send_error}", exc_info=True)
-                            # Иные ошибки - пробуем повторить еще 2 раза в конце очереди
-                            if queue.attempts < 3:
-                                queue.status = 'pending'
-                                queue.scheduled_time = datetime.utcnow() + timedelta(minutes=5)  # Откладываем на 5 минут
-                                queue.error_message = str(send_error)
-                                app_db.session.commit()
+                            # Иные ошибки - повторяем через 5 минут, пока есть бюджет попыток
+                            if _register_failed_attempt(queue, str(send_error)):
                                 # Записываем ошибку
                                 from app.utils.logger import log_error
                                 log_error(
@@ -297,10 +355,6 @@ def process_account_autopublish():
                                         'attempt': queue.attempts
                                     }
                                 )
-                            else:
-                                queue.status = 'failed'
-                                queue.error_message = str(send_error)
-                                app_db.session.commit()
                             continue
                         
                         if not success:
@@ -325,6 +379,7 @@ def process_account_autopublish():
                                 account.last_error = f"FLOOD_WAIT: {wait_seconds} seconds. Account deactivated. Please reactivate manually."
                                 queue.status = 'flood_wait'
                                 queue.error_message = f"FLOOD_WAIT: {wait_seconds} seconds"
+                                queue.lease_until = None
                                 app_db.session.commit()
                                 # Записываем ошибку
                                 from app.utils.logger import log_error
@@ -342,12 +397,8 @@ def process_account_autopublish():
                                 processed_count += 1
                                 continue
                             
-                            # Иные ошибки - пробуем повторить
-                            if queue.attempts < 3:
-                                queue.status = 'pending'
-                                queue.scheduled_time = datetime.utcnow() + timedelta(minutes=5)
-                                queue.error_message = error_msg
-                                app_db.session.commit()
+                            # Иные ошибки - повторяем через 5 минут, пока есть бюджет попыток
+                            if _register_failed_attempt(queue, error_msg):
                                 # Записываем ошибку
                                 from app.utils.logger import log_error
                                 log_error(
@@ -362,15 +413,12 @@ def process_account_autopublish():
                                         'error_message': error_msg
                                     }
                                 )
-                            else:
-                                queue.status = 'failed'
-                                queue.error_message = error_msg
-                                app_db.session.commit()
                             continue
                         
                         # Успешная публикация
                         queue.status = 'completed'
                         queue.completed_at = datetime.utcnow()
+                        queue.lease_until = None
                         queue.message_id = str(message_id) if message_id else None
                         
                         # Создаем запись в истории
@@ -394,16 +442,15 @@ def process_account_autopublish():
                         account.last_error = None
                         
                         app_db.session.commit()
+                        trace.mark('commit')
                         processed_count += 1
                         logger.info(f"✅ Successfully published object {obj.object_id} via account {account.account_id} ({account.phone}) to chat {chat.telegram_chat_id} (message_id: {message_id})")
                         
                     except Exception as e:
                         logger.error(f"❌ Error processing queue {queue.queue_id} for account {account.account_id} ({account.phone}): {e}", exc_info=True)
                         try:
-                            queue.status = 'failed'
-                            queue.error_message = str(e)
-                            queue.attempts += 1
-                            app_db.session.commit()
+                            app_db.session.rollback()
+                            _register_failed_attempt(queue, str(e), retry=False)
                         except Exception as commit_error:
                             logger.error(f"Failed to commit error status for queue {queue.queue_id}: {commit_error}", exc_info=True)
                             app_db.session.rollback()
@@ -418,35 +465,24 @@ def process_account_autopublish():
                                 'queue_id': queue.queue_id if queue else None
                             }
                         )
+                    finally:
+                        finish_trace(trace)
             
                 logger.info(f"process_account_autopublish: processed {processed_count} tasks")
                 return processed_count
                 
             except SoftTimeLimitExceeded as e:
                 # Время выполнения задачи превысило soft time limit (240 секунд)
-                # Помечаем все задачи в статусе 'processing' обратно в 'pending' для повторной обработки
-                logger.warning(f"⚠️ SoftTimeLimitExceeded in process_account_autopublish (processed {processed_count} tasks so far) - resetting stuck tasks")
+                # Строки, захваченные этим воркером, сразу возвращаем в 'pending' (не ждём истечения аренды),
+                # остальные зависшие строки забирает reaper по истекшей аренде
+                logger.warning(f"⚠️ SoftTimeLimitExceeded in process_account_autopublish (processed {processed_count} tasks so far) - releasing leases")
                 try:
-                    stuck_threshold = datetime.utcnow() - timedelta(minutes=5)
-                    stuck_queues = app_db.session.query(AccountPublicationQueue).filter(
-                        AccountPublicationQueue.status == 'processing',
-                        AccountPublicationQueue.started_at < stuck_threshold
-                    ).all()
-                    
-                    logger.warning(f"Found {len(stuck_queues)} stuck queues (processing for more than 5 minutes)")
-                    
-                    for stuck_queue in stuck_queues:
-                        logger.warning(f"Resetting stuck queue {stuck_queue.queue_id} (started at {stuck_queue.started_at}, attempts: {stuck_queue.attempts})")
-                        stuck_queue.status = 'pending'
-                        stuck_queue.attempts += 1
-                        if stuck_queue.attempts >= 3:
-                            stuck_queue.status = 'failed'
-                            stuck_queue.error_message = 'Task timeout - exceeded soft time limit'
-                        app_db.session.commit()
-                    
-                    logger.info(f"Reset {len(stuck_queues)} stuck account publication tasks")
+                    app_db.session.rollback()
+                    released = release_worker_leases(app_db.session, AccountPublicationQueue)
+                    logger.info(f"Released {released} account publication tasks held by this worker")
+                    reap_expired_leases(app_db.session, AccountPublicationQueue)
                 except Exception as reset_error:
-                    logger.error(f"Error resetting stuck tasks: {reset_error}", exc_info=True)
+                    logger.error(f"Error releasing account queue leases: {reset_error}", exc_info=True)
                     app_db.session.rollback()
                 
                 return processed_count
@@ -462,22 +498,9 @@ def process_account_autopublish():
         # Пытаемся войти в контекст для сброса stuck задач
         try:
             with app.app_context():
-                stuck_threshold = datetime.utcnow() - timedelta(minutes=5)
-                stuck_queues = app_db.session.query(AccountPublicationQueue).filter(
-                    AccountPublicationQueue.status == 'processing',
-                    AccountPublicationQueue.started_at < stuck_threshold
-                ).all()
-                
-                for stuck_queue in stuck_queues:
-                    logger.warning(f"Resetting stuck queue {stuck_queue.queue_id} (started at {stuck_queue.started_at})")
-                    stuck_queue.status = 'pending'
-                    stuck_queue.attempts += 1
-                    if stuck_queue.attempts >= 3:
-                        stuck_queue.status = 'failed'
-                        stuck_queue.error_message = 'Task timeout - exceeded soft time limit'
-                    app_db.session.commit()
-                
-                logger.info(f"Reset {len(stuck_queues)} stuck account publication tasks")
+                released = release_worker_leases(app_db.session, AccountPublicationQueue)
+                reap_expired_leases(app_db.session, AccountPublicationQueue)
+                logger.info(f"Released {released} account publication tasks held by this worker")
         except Exception as reset_error:
             logger.error(f"Error resetting stuck tasks in outer handler: {reset_error}", exc_info=True)
         
@@ -5,7 +5,7 @@ Celery tasks for autopublish
 from workers.celery_app import celery_app
 from app.database import db
 from bot.models import PublicationQueue, Object, Chat, PublicationHistory, AutopublishConfig, TelegramAccount
-from workers.tasks.tasks_publication import publish_to_telegram  # Celery-задача отправки в Telegram
+from workers.tasks.tasks_publication import dispatch_due_publications  # Постановка в Celery по классам приоритета
 from datetime import datetime, timedelta
 from sqlalchemy import or_, func
 import logging
@@ -28,6 +28,9 @@ from app.models.chat_group import ChatGroup as AppChatGroup
 from app.models.telegram_account_chat import TelegramAccountChat as AppTelegramAccountChat
 from app.models.telegram_account import TelegramAccount as AppTelegramAccount
 from app.utils.account_publication_utils import calculate_scheduled_times_for_account
+from app.utils.publication_priority import PRIORITY_AUTOPUBLISH
+from app.utils.queue_leases import reap_expired_leases
+from app.config import Config
 
 logger = logging.getLogger(__name__)
 
@@ -39,68 +42,16 @@ def process_autopublish():
     
     try:
         with app.app_context():
-            # Сбрасываем зависшие задачи в статусе 'processing'
+            # Возвращаем в работу строки с истекшей арендой (упавший/убитый воркер) одним UPDATE
             try:
-                stuck_threshold = datetime.utcnow() - timedelta(minutes=5)
-                stuck_queues = db.session.query(PublicationQueue).filter(
-                    PublicationQueue.status == 'processing',
-                    PublicationQueue.started_at < stuck_threshold
-                ).all()
-                
-                for stuck_queue in stuck_queues:
-                    logger.warning(f"Resetting stuck bot queue {stuck_queue.queue_id} (started at {stuck_queue.started_at})")
-                    stuck_queue.status = 'pending'
-                    stuck_queue.attempts += 1
-                    if stuck_queue.attempts >= 3:
-                        stuck_queue.status = 'failed'
-                        stuck_queue.error_message = 'Task timeout - exceeded time limit'
-                    db.session.commit()
-                
-                if stuck_queues:
-                    logger.info(f"Reset {len(stuck_queues)} stuck bot publication tasks")
+                reap_expired_leases(db.session, PublicationQueue, max_attempts=Config.PUBLICATION_RETRY_MAX_ATTEMPTS)
             except Exception as reset_error:
-                logger.error(f"Error resetting stuck bot tasks: {reset_error}", exc_info=True)
-            
-            now = datetime.utcnow()
-            
-            # Get pending autopublish tasks that are ready to publish
-            # Сортируем по scheduled_time (старейшие первыми), если scheduled_time не установлено - по created_at
-            queues = db.session.query(PublicationQueue).filter(
-                PublicationQueue.mode == 'autopublish',
-                PublicationQueue.status == 'pending',
-                or_(
-                    PublicationQueue.scheduled_time <= now,
-                    PublicationQueue.scheduled_time.is_(None)
-                )
-            ).order_by(
-                PublicationQueue.scheduled_time.asc().nullslast(),
-                PublicationQueue.created_at.asc()
-            ).limit(10).all()  # Обрабатываем по 10 задач за раз
-            
-            logger.info(f"Processing {len(queues)} autopublish tasks")
-            
-            for queue in queues:
-                scheduled_str = queue.scheduled_time.strftime('%Y-%m-%d %H:%M:%S') if queue.scheduled_time else 'not scheduled'
-                logger.info(
-                    f"Publishing queue {queue.queue_id} for object {queue.object_id} "
-                    f"to chat {queue.chat_id} (scheduled: {scheduled_str}, created: {queue.created_at})"
-                )
-                try:
-                    # Ставим задачу publish_to_telegram в очередь Celery
-                publish_to_telegram.delay(queue.queue_id)
-                except Exception as enqueue_error:
-                    # ВАЖНО: если даже постановка задачи упала, помечаем очередь с ошибкой,
-                    # чтобы она не висела в pending бесконечно.
-                    logger.error(
-                        f"Failed to enqueue publish_to_telegram for queue {queue.queue_id}: {enqueue_error}",
-                        exc_info=True,
-                    )
-                    queue.status = 'failed'
-                    queue.error_message = str(enqueue_error)
-                    queue.attempts = (queue.attempts or 0) + 1
-                    db.session.commit()
+                db.session.rollback()
+                logger.error(f"Error reaping expired bot leases: {reset_error}", exc_info=True)
             
-            return len(queues)
+            # Автопубликация - самый низкий класс приоритета, у неё своя Celery-очередь
+            # и свой лимит батча, поэтому ручные публикации её не ждут
+            return dispatch_due_publications((PRIORITY_AUTOPUBLISH,))
     except SoftTimeLimitExceeded:
         logger.warning("SoftTimeLimitExceeded in process_autopublish")
         return 0
@@ -217,9 +168,16 @@ def schedule_daily_autopublish():
     from app.models.autopublish_config import AutopublishConfig as AppAutopublishConfig
     from app.models.telegram_account import TelegramAccount as AppTelegramAccount
     from app.utils.account_publication_utils import calculate_scheduled_times_for_account
+    from app.utils.duplicate_checker import load_allow_duplicates_setting, check_duplicates_many
     
     try:
         with app.app_context():
+            # Дубликаты: объект уходит в чат не чаще раза в календарный день МСК
+            # (окно "последние 24 часа" отбрасывало бы чаты, опубликованные вчера чуть позже 08:00)
+            allow_duplicates_setting = load_allow_duplicates_setting()
+            today_start_utc = msk_to_utc(get_moscow_time().replace(hour=0, minute=0, second=0, microsecond=0))
+            skipped_duplicates = 0
+            
             # Через бота: создаем задачи в publication_queues
             configs = db.session.query(AutopublishConfig).filter_by(enabled=True).all()
             created_bot_queues = 0
@@ -236,6 +194,15 @@ def schedule_daily_autopublish():
                 # Через бота: чаты подбираются автоматически
                 if cfg.bot_enabled:
                     chats = _get_matching_bot_chats_for_object(db.session, obj)
+                    recent = check_duplicates_many(
+                        obj.object_id, [chat.chat_id for chat in chats], None,
+                        publication_type='autopublish_bot',
+                        allow_duplicates_setting=allow_duplicates_setting,
+                        since=today_start_utc
+                    )
+                    if recent:
+                        skipped_duplicates += len(recent)
+                        chats = [chat for chat in chats if chat.chat_id not in recent]
                     # Получаем время для публикации (8:00-22:00 МСК)
                     now_msk = get_moscow_time()
                     scheduled_time_msk = get_next_allowed_time_msk(now_msk)
@@ -251,6 +218,7 @@ def schedule_daily_autopublish():
                             user_id=obj.user_id,
                             type='bot',
                             mode='autopublish',
+                            priority=PRIORITY_AUTOPUBLISH,
                             status='pending',
                             scheduled_time=scheduled_time_utc,
                             created_at=datetime.utcnow(),
@@ -259,7 +227,7 @@ def schedule_daily_autopublish():
                         created_bot_queues += 1
 
             db.session.commit()
-            logger.info(f"schedule_daily_autopublish: created {created_bot_queues} bot queue items")
+            logger.info(f"schedule_daily_autopublish: created {created_bot_queues} bot queue items, skipped {skipped_duplicates} duplicates")
             
             # Через аккаунты: создаем задачи в account_publication_queues
             from app.models.account_publication_queue import AccountPublicationQueue
@@ -328,6 +296,18 @@ def schedule_daily_autopublish():
                             logger.warning(f"schedule_daily_autopublish: No valid chats found for account {account_id} and object {obj.object_id}. chat_ids in config: {chat_ids}")
                             continue
                         
+                        recent = check_duplicates_many(
+                            obj.object_id, [chat.chat_id for chat in user_chats], account_id,
+                            publication_type='autopublish_account',
+                            allow_duplicates_setting=allow_duplicates_setting,
+                            since=today_start_utc
+                        )
+                        if recent:
+                            skipped_duplicates += len(recent)
+                            user_chats = [chat for chat in user_chats if chat.chat_id not in recent]
+                            if not user_chats:
+                                continue
+                        
                         if account_id not in account_tasks:
                             account_tasks[account_id] = []
                         
@@ -378,7 +358,7 @@ def schedule_daily_autopublish():
                         created_account_queues += 1
             
             app_db.session.commit()
-            logger.info(f"schedule_daily_autopublish: created {created_account_queues} account queue items for {len(account_tasks)} accounts")
+            logger.info(f"schedule_daily_autopublish: created {created_account_queues} account queue items for {len(account_tasks)} accounts, skipped {skipped_duplicates} duplicates in total")
             
             if created_account_queues == 0:
                 logger.warning("schedule_daily_autopublish: No account queue items created! Check configs and chat-account links.")
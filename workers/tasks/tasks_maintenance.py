@@ -0,0 +1,132 @@
+"""
+Celery tasks for database maintenance
+Логика: фоновое обслуживание таблиц публикаций (архивация завершённых строк очередей,
+заблаговременное создание месячных партиций publication_history,
+прогрев журнала недавних публикаций в Redis, индексация файлов логов,
+удаление старых трасс публикаций)
+"""
+from workers.celery_app import celery_app
+from app.database import db
+from datetime import datetime
+import logging
+
+from app.models.publication_queue import PublicationQueue
+from app.models.account_publication_queue import AccountPublicationQueue
+from app.models.publication_history import PublicationHistory
+from app.utils.queue_archive import archive_finished_rows
+from app.utils.partitioning import add_months, ensure_monthly_partitions
+from app.utils.publication_ledger import is_warm, warm_ledger
+from app.utils.log_index import index_log_folder
+from app.utils.publication_trace import purge_old_traces
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name='workers.tasks.archive_finished_publication_queues')
+def archive_finished_publication_queues():
+    """
+    Перенос завершённых строк очередей в *_archive таблицы
+    Логика: горячие таблицы остаются размером с активные сутки, поэтому выборки
+    диспетчеров и списки в админке не замедляются по мере накопления истории
+    """
+    from app import app
+    from celery.exceptions import SoftTimeLimitExceeded
+    
+    archived = {}
+    try:
+        with app.app_context():
+            for model in (PublicationQueue, AccountPublicationQueue):
+                try:
+                    archived[model.__tablename__] = archive_finished_rows(db.session, model)
+                except SoftTimeLimitExceeded:
+                    raise
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error archiving {model.__tablename__}: {e}", exc_info=True)
+            return archived
+    except SoftTimeLimitExceeded:
+        # Уже перенесённые батчи закоммичены - продолжим в следующем запуске
+        logger.warning(f"SoftTimeLimitExceeded in archive_finished_publication_queues (archived so far: {archived})")
+        return archived
+
+
+@celery_app.task(name='workers.tasks.ensure_publication_history_partitions')
+def ensure_publication_history_partitions():
+    """
+    Заблаговременное создание месячных партиций publication_history
+    Логика: у таблицы нет DEFAULT-партиции, поэтому партиции текущего и
+    Config.PUBLICATION_HISTORY_PARTITIONS_AHEAD следующих месяцев должны существовать заранее
+    """
+    from app import app
+    
+    try:
+        with app.app_context():
+            now = datetime.utcnow()
+            created = ensure_monthly_partitions(
+                db.session.connection(),
+                PublicationHistory.__tablename__,
+                now,
+                add_months(now, Config.PUBLICATION_HISTORY_PARTITIONS_AHEAD)
+            )
+            db.session.commit()
+            return created
+    except Exception as e:
+        logger.error(f"Error creating publication_history partitions: {e}", exc_info=True)
+        return []
+
+
+@celery_app.task(name='workers.tasks.warm_publication_ledger')
+def warm_publication_ledger():
+    """
+    Прогрев журнала недавних публикаций в Redis из publication_history
+    Логика: пока маркер прогрева стоит - ничего не делаем; после сброса Redis или сбоя
+    записи журнал заполняется заново, до этого проверки дубликатов идут в БД
+    """
+    from app import app
+    
+    try:
+        with app.app_context():
+            if is_warm():
+                return 0
+            loaded = warm_ledger(db.session)
+            logger.info(f"Publication ledger warmed with {loaded} publications")
+            return loaded
+    except Exception as e:
+        logger.error(f"Error warming publication ledger: {e}", exc_info=True)
+        return 0
+
+
+@celery_app.task(name='workers.tasks.index_log_files')
+def index_log_files():
+    """
+    Доиндексация файлов логов (контрольные точки по времени и токены queue/object/user)
+    Логика: читаются только дописанные с прошлого запуска байты; индексы удалённых
+    ротаций убираются. Запрос логов из админки доиндексирует остаток сам
+    """
+    try:
+        stats = index_log_folder(Config.LOG_FOLDER)
+        logger.debug(f"Log files indexed: {stats}")
+        return stats
+    except Exception as e:
+        logger.error(f"Error indexing log files: {e}", exc_info=True)
+        return {}
+
+
+@celery_app.task(name='workers.tasks.purge_publication_traces')
+def purge_publication_traces():
+    """
+    Удаление трасс публикаций старше Config.PUBLICATION_TRACE_RETENTION_DAYS
+    Логика: трасса нужна для разбора задержек за последние дни, а не как история
+    """
+    from app import app
+    
+    try:
+        with app.app_context():
+            deleted = purge_old_traces(db.session)
+            if deleted:
+                logger.info(f"Purged {deleted} publication traces")
+            return deleted
+    except Exception as e:
+        logger.error(f"Error purging publication traces: {e}", exc_info=True)
+        return 0
@@ -0,0 +1,64 @@
+"""
+Celery tasks for object photos
+Логика: построение вариантов загруженных фото (JPEG для Telegram, WebP-миниатюра для веба)
+вне веб-запроса и обработчика бота - см. app/utils/photos.py; сборка мусора
+в хранилище фото - см. app/utils/photo_storage.py
+"""
+from workers.celery_app import celery_app
+from app.database import db
+import logging
+
+from app.utils.photos import process_object_photos as build_object_photo_variants
+from app.utils.photo_storage import collect_garbage
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name='workers.tasks.process_object_photos')
+def process_object_photos(object_id: str):
+    """Построить варианты необработанных фото объекта и записать их в photos_json"""
+    from app import app
+
+    try:
+        with app.app_context():
+            updated = build_object_photo_variants(db.session, object_id)
+            if updated:
+                logger.info(f"Photo variants built for object {object_id}: {updated}")
+            return updated
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error processing photos of object {object_id}: {e}", exc_info=True)
+        return 0
+
+
+def enqueue_photo_processing(object_id: str):
+    """
+    Поставить обработку фото объекта в Celery (вызывать после commit).
+    Недоступный брокер не ломает сохранение объекта: до обработки публикации и веб
+    используют оригинал, а пропущенные объекты подбирает scripts/process_photo_variants.py
+    """
+    try:
+        return process_object_photos.delay(object_id)
+    except Exception as e:
+        logger.warning(f"Failed to enqueue photo processing for object {object_id}: {e}")
+        return None
+
+
+@celery_app.task(name='workers.tasks.collect_photo_garbage')
+def collect_photo_garbage():
+    """
+    Удаление файлов фото без ссылок
+    Логика: сверка photo_blobs.ref_count с objects.photos_json, удаление файлов с нулевым
+    счётчиком старше PHOTO_GC_GRACE_HOURS и осиротевших файлов (загрузки без объекта)
+    """
+    from app import app
+
+    try:
+        with app.app_context():
+            stats = collect_garbage(db.session)
+            logger.info(f"Photo garbage collection: {stats}")
+            return stats
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error collecting photo garbage: {e}", exc_info=True)
+        return {}
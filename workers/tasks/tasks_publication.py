@@ -10,6 +10,7 @@ from sqlalchemy import or_, func
 import logging
 import asyncio
 import random
+import time
 
 from bot.utils import get_districts_config
 from app.utils.time_utils import (
@@ -27,29 +28,155 @@ from app.models.chat_group import ChatGroup as AppChatGroup
 from app.models.telegram_account_chat import TelegramAccountChat as AppTelegramAccountChat
 from app.models.telegram_account import TelegramAccount as AppTelegramAccount
 from app.utils.account_publication_utils import calculate_scheduled_times_for_account
+from app.config import Config
+from app.utils.publication_retry import (
+    ERROR_PERMANENT,
+    ERROR_RATE_LIMITED,
+    append_attempt_history,
+    classify_bot_api_error,
+    compute_retry_delay,
+    deactivate_chats_bulk,
+    has_rate_limit_budget,
+    has_retry_budget,
+    is_chat_gone_error
+)
+from app.utils.queue_leases import LeaseHeartbeat, claim_values
+from app.utils.metrics import observe_bot_api_response, observe_dispatch_lag
+from app.utils.publication_trace import SOURCE_BOT, current_trace, mark_stage, traced_publication
+from app.utils.photos import PHOTO_VARIANT_TELEGRAM, photo_file_id_of, photo_full_path, photo_variant_path
+from app.utils.publication_priority import (
+    PRIORITY_AUTOPUBLISH,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_ORDER,
+    PRIORITY_SCHEDULED,
+    celery_queue_for_priority
+)
 
 logger = logging.getLogger(__name__)
 
+
+def enqueue_publication(queue_id: int, priority: str = PRIORITY_AUTOPUBLISH):
+    """
+    Поставить отправку строки publication_queues в Celery-очередь её класса приоритета.
+    Все места, которые запускают publish_to_telegram, должны идти через эту функцию,
+    иначе ручная публикация окажется в общей очереди с автопубликацией.
+    """
+    return publish_to_telegram.apply_async(
+        args=[queue_id],
+        kwargs={'enqueued_at': time.time()},  # Этап pickup трассы - ожидание в брокере
+        queue=celery_queue_for_priority(priority)
+    )
+
+
+# Сколько строк каждого класса диспетчер ставит в Celery за один проход
+DISPATCH_BATCH_SIZES = {
+    PRIORITY_INTERACTIVE: 100,
+    PRIORITY_SCHEDULED: 100,
+    PRIORITY_AUTOPUBLISH: 10,
+}
+
+# Ручные публикации ставятся в Celery сразу из роута; диспетчер подбирает только те,
+# которые так и не начали обрабатываться (например, брокер был недоступен)
+INTERACTIVE_REDISPATCH_AFTER = timedelta(minutes=2)
+
+
+def due_publications_query(db_session, priority: str, now: datetime):
+    """
+    Запрос готовых pending-строк одного класса приоритета (старейшие первыми).
+    Форма запроса совпадает с частичным индексом ix_publication_queues_pending_dispatch;
+    план проверяется scripts/check_query_plans.py.
+    """
+    query = db_session.query(PublicationQueue.queue_id).filter(
+        PublicationQueue.priority == priority,
+        PublicationQueue.status == 'pending',
+        or_(
+            PublicationQueue.scheduled_time <= now,
+            PublicationQueue.scheduled_time.is_(None)
+        )
+    )
+    if priority == PRIORITY_INTERACTIVE:
+        query = query.filter(PublicationQueue.created_at <= now - INTERACTIVE_REDISPATCH_AFTER)
+    
+    # Старейшие первыми; без scheduled_time - по created_at
+    return query.order_by(
+        PublicationQueue.scheduled_time.asc().nullslast(),
+        PublicationQueue.created_at.asc()
+    ).limit(DISPATCH_BATCH_SIZES[priority])
+
+
+def dispatch_due_publications(priorities=PRIORITY_ORDER) -> int:
+    """
+    Поставить в Celery все готовые pending-строки указанных классов.
+    Классы обрабатываются строго в порядке PRIORITY_ORDER: пока не разобран более
+    срочный класс, менее срочный не получает места в батче.
+    """
+    now = datetime.utcnow()
+    dispatched = 0
+    
+    for priority in PRIORITY_ORDER:
+        if priority not in priorities:
+            continue
+        
+        queue_ids = [row.queue_id for row in due_publications_query(db.session, priority, now).all()]
+        
+        for queue_id in queue_ids:
+            try:
+                enqueue_publication(queue_id, priority)
+                dispatched += 1
+            except Exception as enqueue_error:
+                # ВАЖНО: если даже постановка задачи упала, помечаем очередь с ошибкой,
+                # чтобы она не висела в pending бесконечно.
+                logger.error(f"Failed to enqueue publish_to_telegram for queue {queue_id}: {enqueue_error}", exc_info=True)
+                db.session.query(PublicationQueue).filter_by(queue_id=queue_id).update({
+                    'status': 'failed',
+                    'error_message': str(enqueue_error),
+                    'attempts': PublicationQueue.attempts + 1
+                }, synchronize_session=False)
+                db.session.commit()
+        
+        if queue_ids:
+            logger.info(f"Dispatched {len(queue_ids)} {priority} publication tasks to {celery_queue_for_priority(priority)}")
+    
+    return dispatched
+
+
 @celery_app.task(name='workers.tasks.publish_to_telegram')
-def publish_to_telegram(queue_id: int):
+@traced_publication(SOURCE_BOT)
+def publish_to_telegram(queue_id: int, enqueued_at: float = None):
     """
     Публикация объекта недвижимости в Telegram чат
     Логика: проверка дубликатов (24 часа), форматирование текста, отправка через API, создание истории
-    Все этапы логируются для отслеживания процесса публикации
+    Все этапы логируются для отслеживания процесса публикации; длительность этапов
+    пишется в publication_traces (enqueued_at - время постановки в Celery)
     """
     from app import app
     from celery.exceptions import SoftTimeLimitExceeded
     
     with app.app_context():
+        # Атомарно забираем задачу: одна и та же строка может попасть в Celery дважды
+        # (ручная постановка + повторная диспетчеризация), отправить её должен ровно один воркер.
+        # Захват выдаёт аренду (lease_until): если воркер упадёт, reaper вернёт строку в pending
+        claimed = db.session.query(PublicationQueue).filter(
+            PublicationQueue.queue_id == queue_id,
+            PublicationQueue.status == 'pending'
+        ).update(claim_values(), synchronize_session=False)
+        db.session.commit()
+        
+        trace = current_trace()
         queue = db.session.query(PublicationQueue).get(queue_id)
         if not queue:
             logger.error(f"Queue {queue_id} not found")
+            trace.discard()
             return False
         
-        # Update status
-        queue.status = 'processing'
-        queue.started_at = datetime.utcnow()
-        db.session.commit()
+        if not claimed:
+            logger.info(f"Queue {queue_id} is already {queue.status}, skipping duplicate dispatch")
+            trace.discard()
+            return False
+        
+        observe_dispatch_lag(queue.priority, queue.scheduled_time or queue.created_at, queue.started_at)
+        trace.set_planned(queue.scheduled_time or queue.created_at)
+        trace.mark('claim')
         
         # Get object and chat
         obj = db.session.query(Object).get(queue.object_id)
@@ -58,6 +185,7 @@ def publish_to_telegram(queue_id: int):
         if not obj or not chat:
             queue.status = 'failed'
             queue.error_message = 'Object or chat not found'
+            queue.lease_until = None
             db.session.commit()
             return False
         
@@ -72,6 +200,7 @@ def publish_to_telegram(queue_id: int):
                 logger.warning(f"Autopublish disabled for object {queue.object_id}, cancelling queue {queue_id}")
                 queue.status = 'failed'
                 queue.error_message = 'Autopublish disabled for this object'
+                queue.lease_until = None
                 db.session.commit()
                 return False
             
@@ -80,6 +209,7 @@ def publish_to_telegram(queue_id: int):
                 logger.warning(f"Bot autopublish disabled for object {queue.object_id}, cancelling queue {queue_id}")
                 queue.status = 'failed'
                 queue.error_message = 'Bot autopublish disabled for this object'
+                queue.lease_until = None
                 db.session.commit()
                 return False
             
@@ -109,6 +239,7 @@ def publish_to_telegram(queue_id: int):
                     next_time_utc = msk_to_utc(next_time_msk)
                     queue.scheduled_time = next_time_utc
                     queue.status = 'pending'
+                    queue.lease_until = None
                     db.session.commit()
                     return False
         
@@ -117,7 +248,7 @@ def publish_to_telegram(queue_id: int):
         # Реализация публикации через Telegram API
         import requests
         import os
-        from bot.config import BOT_TOKEN
+        from bot.config import BOT_TOKEN, TELEGRAM_BOT_API_URL
         from bot.utils import format_publication_text
         from bot.models import User as BotUser
         
@@ -125,6 +256,7 @@ def publish_to_telegram(queue_id: int):
             logger.error("BOT_TOKEN is not configured")
             queue.status = 'failed'
             queue.error_message = 'BOT_TOKEN is not configured'
+            queue.lease_until = None
             db.session.commit()
             return False
         
@@ -149,8 +281,11 @@ def publish_to_telegram(queue_id: int):
             # Если не удалось получить конфигурацию, используем формат по умолчанию
             pass
         
+        trace.mark('db_load')
+        
         # Форматируем текст публикации
         publication_text = format_publication_text(obj, bot_user, is_preview=False, publication_format=publication_format)
+        trace.mark('render')
         
         # Отправляем сообщение - всегда отправляем фото если оно есть
         # Поддерживаем несколько форматов photos_json:
@@ -160,109 +295,103 @@ def publish_to_telegram(queue_id: int):
         photos_json = obj.photos_json or []
         
         try:
-            if photos_json and len(photos_json) > 0:
-                # Берем первое фото (только одно фото разрешено)
-                raw_photo = photos_json[0]
-                
-                photo_path = None
-                photo_file_id = None
+            # Таймаут requests ограничивает каждое чтение сокета, а не всю загрузку фото:
+            # отправка может идти дольше аренды, поэтому она продлевается heartbeat'ом
+            with LeaseHeartbeat(db.engine, PublicationQueue, queue_id):
+                if photos_json and len(photos_json) > 0:
+                    # Берем первое фото (только одно фото разрешено)
+                    raw_photo = photos_json[0]
                 
-                if isinstance(raw_photo, dict):
-                    # Новый формат: path
-                    photo_path = raw_photo.get('path') or ''
-                    # Legacy: file_id
-                    if not photo_path:
-                        photo_file_id = raw_photo.get('file_id') or None
-                elif isinstance(raw_photo, str):
-                    # Строка - путь к файлу
-                    photo_path = raw_photo
+                    # Путь к файлу: вариант для Telegram (≤1280px JPEG, пока его нет - оригинал);
+                    # legacy file_id используется, только если пути нет
+                    photo_path = photo_variant_path(raw_photo, PHOTO_VARIANT_TELEGRAM)
+                    photo_file_id = None if photo_path else photo_file_id_of(raw_photo)
                 
-                # Пытаемся отправить по локальному пути
-                if photo_path:
-                    import os
-                    from app.config import Config
-                    
-                    # Используем Config.UPLOAD_FOLDER напрямую
-                    # photo_path может быть "uploads/filename.jpg" или просто "filename.jpg"
-                    if photo_path.startswith('uploads/'):
-                        # Убираем префикс "uploads/" и используем Config.UPLOAD_FOLDER
-                        filename = photo_path.replace('uploads/', '', 1)
-                        full_path = os.path.join(Config.UPLOAD_FOLDER, filename)
-                    elif photo_path.startswith('/'):
-                        # Абсолютный путь
-                        full_path = photo_path
-                    else:
-                        # Относительный путь - используем Config.UPLOAD_FOLDER
-                        full_path = os.path.join(Config.UPLOAD_FOLDER, photo_path)
+                    # Пытаемся отправить по локальному пути
+                    if photo_path:
+                        import os
+                        full_path = photo_full_path(photo_path)
                     
-                    if os.path.exists(full_path):
-                        url = f'https://api.telegram.org/bot{BOT_TOKEN}/sendPhoto'
-                        with open(full_path, 'rb') as photo_file:
-                            files = {'photo': photo_file}
-                            payload = {
-                                'chat_id': chat.telegram_chat_id,
-                                'caption': publication_text,
-                                'parse_mode': 'HTML'
-                            }
-                            response = requests.post(url, files=files, data=payload, timeout=30)
-                    else:
-                        logger.warning(f"Photo file not found: {full_path}, sending text only or using legacy file_id if available")
-                        if photo_file_id:
-                            # Падаем обратно на отправку по file_id
-                            url = f'https://api.telegram.org/bot{BOT_TOKEN}/sendPhoto'
-                            payload = {
-                                'chat_id': chat.telegram_chat_id,
-                                'photo': photo_file_id,
-                                'caption': publication_text,
-                                'parse_mode': 'HTML'
-                            }
-                            response = requests.post(url, data=payload, timeout=30)
+                        if os.path.exists(full_path):
+                            url = f'{TELEGRAM_BOT_API_URL}/bot{BOT_TOKEN}/sendPhoto'
+                            with open(full_path, 'rb') as photo_file:
+                                files = {'photo': photo_file}
+                                payload = {
+                                    'chat_id': chat.telegram_chat_id,
+                                    'caption': publication_text,
+                                    'parse_mode': 'HTML'
+                                }
+                                response = requests.post(url, files=files, data=payload, timeout=30)
                         else:
-                            url = f'https://api.telegram.org/bot{BOT_TOKEN}/sendMessage'
-                            payload = {
-                                'chat_id': chat.telegram_chat_id,
-                                'text': publication_text,
-                                'parse_mode': 'HTML'
-                            }
-                            response = requests.post(url, json=payload, timeout=10)
-                elif photo_file_id:
-                    # Нет пути, но есть legacy file_id – отправляем фото по нему
-                    url = f'https://api.telegram.org/bot{BOT_TOKEN}/sendPhoto'
-                    payload = {
-                        'chat_id': chat.telegram_chat_id,
-                        'photo': photo_file_id,
-                        'caption': publication_text,
-                        'parse_mode': 'HTML'
-                    }
-                    response = requests.post(url, data=payload, timeout=30)
+                            logger.warning(f"Photo file not found: {full_path}, sending text only or using legacy file_id if available")
+                            if photo_file_id:
+                                # Падаем обратно на отправку по file_id
+                                url = f'{TELEGRAM_BOT_API_URL}/bot{BOT_TOKEN}/sendPhoto'
+                                payload = {
+                                    'chat_id': chat.telegram_chat_id,
+                                    'photo': photo_file_id,
+                                    'caption': publication_text,
+                                    'parse_mode': 'HTML'
+                                }
+                                response = requests.post(url, data=payload, timeout=30)
+                            else:
+                                url = f'{TELEGRAM_BOT_API_URL}/bot{BOT_TOKEN}/sendMessage'
+                                payload = {
+                                    'chat_id': chat.telegram_chat_id,
+                                    'text': publication_text,
+                                    'parse_mode': 'HTML'
+                                }
+                                response = requests.post(url, json=payload, timeout=10)
+                    elif photo_file_id:
+                        # Нет пути, но есть legacy file_id – отправляем фото по нему
+                        url = f'{TELEGRAM_BOT_API_URL}/bot{BOT_TOKEN}/sendPhoto'
+                        payload = {
+                            'chat_id': chat.telegram_chat_id,
+                            'photo': photo_file_id,
+                            'caption': publication_text,
+                            'parse_mode': 'HTML'
+                        }
+                        response = requests.post(url, data=payload, timeout=30)
+                    else:
+                        # Ничего не известно о фото – отправляем только текст
+                        url = f'{TELEGRAM_BOT_API_URL}/bot{BOT_TOKEN}/sendMessage'
+                        payload = {
+                            'chat_id': chat.telegram_chat_id,
+                            'text': publication_text,
+                            'parse_mode': 'HTML'
+                        }
+                        response = requests.post(url, json=payload, timeout=10)
                 else:
-                    # Ничего не известно о фото – отправляем только текст
-                    url = f'https://api.telegram.org/bot{BOT_TOKEN}/sendMessage'
+                    # Если фото нет - отправляем только текст
+                    url = f'{TELEGRAM_BOT_API_URL}/bot{BOT_TOKEN}/sendMessage'
                     payload = {
                         'chat_id': chat.telegram_chat_id,
                         'text': publication_text,
                         'parse_mode': 'HTML'
                     }
                     response = requests.post(url, json=payload, timeout=10)
-            else:
-                # Если фото нет - отправляем только текст
-                url = f'https://api.telegram.org/bot{BOT_TOKEN}/sendMessage'
-                payload = {
-                    'chat_id': chat.telegram_chat_id,
-                    'text': publication_text,
-                    'parse_mode': 'HTML'
-                }
-                response = requests.post(url, json=payload, timeout=10)
             
-            response.raise_for_status()
-            result = response.json()
+            # Multipart-загрузка фото и ответ Bot API - один HTTP-запрос, этап общий
+            trace.mark('api_call')
+            observe_bot_api_response(response)
+            
+            # Bot API отвечает JSON с ok=false и на 4xx/429, поэтому не используем raise_for_status:
+            # error_code, description и parameters.retry_after нужны для классификации ошибки
+            try:
+                result = response.json()
+            except ValueError:
+                result = {
+                    'ok': False,
+                    'error_code': response.status_code,
+                    'description': f'HTTP {response.status_code}: {response.text[:200]}'
+                }
             
             if not result.get('ok'):
                 error_description = result.get('description', 'Unknown error')
-                logger.error(f"Failed to publish: {error_description}")
-                queue.status = 'failed'
-                queue.error_message = error_description
-                db.session.commit()
+                error_code = result.get('error_code') or response.status_code
+                retry_after = (result.get('parameters') or {}).get('retry_after')
+                logger.error(f"Failed to publish queue {queue_id}: [{error_code}] {error_description}")
+                _handle_publication_failure(queue, error_description, error_code, retry_after)
                 return False
             
             message_id = result.get('result', {}).get('message_id')
@@ -270,7 +399,9 @@ def publish_to_telegram(queue_id: int):
             # Успешная публикация
             queue.status = 'completed'
             queue.completed_at = datetime.utcnow()
+            queue.lease_until = None
             queue.message_id = str(message_id) if message_id else None
+            queue.attempt_history_json = append_attempt_history(queue.attempt_history_json, 'completed')
             
             # Создаем запись в истории
             history = PublicationHistory(
@@ -287,35 +418,80 @@ def publish_to_telegram(queue_id: int):
             chat.total_publications = (chat.total_publications or 0) + 1
             chat.last_publication = datetime.utcnow()
             
+            # Ручная публикация: объект считается опубликованным после первой доставленной строки,
+            # а не при постановке в очередь
+            if queue.priority == PRIORITY_INTERACTIVE and obj.status != 'опубликовано':
+                obj.status = 'опубликовано'
+                obj.publication_date = datetime.utcnow()
+            
             db.session.commit()
+            trace.mark('commit')
             
             logger.info(f"Successfully published object {obj.object_id} to chat {chat.telegram_chat_id}")
             return True
             
         except requests.exceptions.RequestException as e:
+            # Таймауты и обрывы соединения - временные ошибки, повторяем по политике
             logger.error(f"Error sending message to Telegram: {e}")
             if queue:
-                queue.status = 'failed'
-                queue.error_message = str(e)
-                db.session.commit()
+                _handle_publication_failure(queue, str(e))
             return False
         
         except SoftTimeLimitExceeded:
             logger.warning(f"SoftTimeLimitExceeded in publish_to_telegram for queue {queue_id}")
             if queue:
-                queue.status = 'failed'
-                queue.error_message = 'Task timeout - exceeded soft time limit'
-                queue.attempts += 1
-                db.session.commit()
+                _handle_publication_failure(queue, 'Task timeout - exceeded soft time limit')
             return False
         
         except Exception as e:
             logger.error(f"Error publishing to Telegram: {e}", exc_info=True)
             if queue:
-                queue.status = 'failed'
-                queue.error_message = str(e)
-                queue.attempts += 1
-                db.session.commit()
+                db.session.rollback()
+                _handle_publication_failure(queue, str(e))
             return False
 
 
+def _handle_publication_failure(queue, description: str, status_code: int = None, retry_after: int = None):
+    """
+    Применить политику повторов к неудачной отправке.
+    rate_limited — перенос на retry_after без расхода бюджета попыток, но не больше
+    PUBLICATION_RETRY_MAX_RATE_LIMITED переносов подряд;
+    retryable — перенос с экспоненциальной задержкой, пока есть бюджет;
+    permanent — задача проваливается, недоступный чат деактивируется вместе с его pending-задачами.
+    """
+    error_kind = classify_bot_api_error(status_code, description, retry_after)
+    queue.error_message = description
+    queue.lease_until = None  # Строка больше не в processing - аренда снимается
+    
+    if error_kind != ERROR_RATE_LIMITED:
+        queue.attempts = (queue.attempts or 0) + 1
+        exhausted = not has_retry_budget(queue.attempts)
+    else:
+        exhausted = not has_rate_limit_budget(queue.attempt_history_json)
+    
+    if error_kind == ERROR_PERMANENT or exhausted:
+        outcome = error_kind if error_kind == ERROR_PERMANENT else 'exhausted'
+        queue.status = 'failed'
+        queue.attempt_history_json = append_attempt_history(queue.attempt_history_json, outcome, description)
+        db.session.commit()
+        mark_stage('commit')
+        logger.warning(f"Queue {queue.queue_id} failed permanently ({outcome}) after {queue.attempts} attempts: {description}")
+        
+        if error_kind == ERROR_PERMANENT and is_chat_gone_error(description):
+            deactivated = deactivate_chats_bulk(db.session, [queue.chat_id], description)
+            if deactivated:
+                logger.warning(f"Chat {queue.chat_id} deactivated: {description}")
+        return
+    
+    delay_seconds = compute_retry_delay(queue.attempts, retry_after)
+    queue.status = 'pending'
+    queue.scheduled_time = datetime.utcnow() + timedelta(seconds=delay_seconds)
+    queue.attempt_history_json = append_attempt_history(
+        queue.attempt_history_json, error_kind, description, retry_after, delay_seconds
+    )
+    db.session.commit()
+    mark_stage('commit')
+    logger.info(
+        f"Queue {queue.queue_id} rescheduled ({error_kind}) in {delay_seconds:.0f}s, "
+        f"attempt {queue.attempts}/{Config.PUBLICATION_RETRY_MAX_ATTEMPTS}"
+    )
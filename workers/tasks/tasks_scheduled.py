@@ -3,9 +3,8 @@ Celery tasks for scheduled publications
 Логика: обработка запланированных публикаций
 """
 from workers.celery_app import celery_app
-from app.database import db
-from bot.models import PublicationQueue, Object, Chat, PublicationHistory, AutopublishConfig, TelegramAccount
-from datetime import datetime, timedelta
+from bot.models import Object, Chat, PublicationHistory, AutopublishConfig, TelegramAccount
+from datetime import timedelta
 from sqlalchemy import or_, func
 import logging
 import asyncio
@@ -27,31 +26,23 @@ from app.models.chat_group import ChatGroup as AppChatGroup
 from app.models.telegram_account_chat import TelegramAccountChat as AppTelegramAccountChat
 from app.models.telegram_account import TelegramAccount as AppTelegramAccount
 from app.utils.account_publication_utils import calculate_scheduled_times_for_account
+from app.utils.publication_priority import PRIORITY_INTERACTIVE, PRIORITY_SCHEDULED
+from workers.tasks.tasks_publication import dispatch_due_publications
 
 logger = logging.getLogger(__name__)
 
 @celery_app.task(name='workers.tasks.process_scheduled_publications')
 def process_scheduled_publications():
-    """Process scheduled publications"""
+    """
+    Process scheduled publications
+    Логика: диспетчер срочных классов (interactive, затем scheduled); автопубликация
+    разбирается отдельно в process_autopublish и не занимает их место в батче
+    """
     from app import app
     try:
         with app.app_context():
-            now = datetime.utcnow()
-            
-            # Get scheduled tasks ready to publish
-            # Используем явный список полей для избежания NotImplementedError
-            queues = db.session.query(PublicationQueue).filter(
-                PublicationQueue.mode == 'scheduled',
-                PublicationQueue.status == 'pending',
-                PublicationQueue.scheduled_time <= now
-            ).all()
-            
-            for queue in queues:
-                publish_to_telegram.delay(queue.queue_id)
-            
-            return len(queues)
+            return dispatch_due_publications((PRIORITY_INTERACTIVE, PRIORITY_SCHEDULED))
     except Exception as e:
         logger.error(f"Error processing scheduled publications: {e}", exc_info=True)
         return 0
 
-